@@ -5,7 +5,7 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from .config import Config, app_state
 from .meta import MetaInformation
-from .data import init_mongodb
+from .data import StorageFactory
 from .core.utils.logging import init_logging
 
 from .scheduling import configure_scheduling
@@ -25,14 +25,15 @@ def create_app():
     
     logger = logging.getLogger(__name__)
 
-    # Initialize MongoDB
-    mongodb = init_mongodb(
-        conf.MONGODB_URI,
-        conf.MONGODB_DB_NAME,
-        conf.DB_RETENTION_MIN
-    )
-    app.state.mongodb = mongodb
-    app_state.mongodb = mongodb
+    # Initialize the storage backend
+    storage = StorageFactory.create(conf)
+    logger.info(f"Using {storage.backend} storage backend")
+    app.state.storage = storage
+    app.state.mongodb = storage.mongodb
+    app_state.mongodb = storage.mongodb
+    app.state.repository = storage.repository
+    app_state.repository = storage.repository
+    app_state.aircraft_repository = storage.aircraft_repository
 
     # Store app state
     app.state.config = conf
@@ -55,13 +56,25 @@ def create_app():
     from .api import router as api_router
     app.include_router(api_router, prefix="/api/v1")
 
+    from .api.endpoints.flights import connection_manager
+    connection_manager.configure(conf.WS_SEND_QUEUE_SIZE, conf.WS_MAX_LAG_SEC)
+
     # Configure async tasks
     @app.on_event("startup")
     async def startup():
         configure_scheduling(app, conf)
+        live_hub = getattr(app.state, 'live_hub', None)
+        if live_hub is not None:
+            await live_hub.start()
 
     @app.on_event("shutdown")
     def shutdown():
         logger.info("Application shutdown initiated")
+        for live_state in (getattr(app.state, 'live_hub', None), getattr(app.state, 'live_replica', None)):
+            if live_state is not None:
+                live_state.close()
+        lease = getattr(app.state, 'leader_lease', None)
+        if lease is not None:
+            lease.release()
 
     return app
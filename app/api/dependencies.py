@@ -2,7 +2,7 @@ from typing import Annotated
 from fastapi import Depends
 from pymongo.database import Database
 
-from ..data.repositories.aircraft_repository import AircraftRepository
+from ..data.repositories.base import FlightPositionStore, AircraftStore
 from ..core.utils.modes_util import ModesUtil
 from ..config import Config, app_state
 from ..meta import MetaInformation
@@ -13,6 +13,12 @@ def get_mongodb() -> Database:
 
 MongoDBDep = Annotated[Database, Depends(get_mongodb)]
 
+def get_repository() -> FlightPositionStore:
+    """Get the shared flight and position repository"""
+    return app_state.repository
+
+RepositoryDep = Annotated[FlightPositionStore, Depends(get_repository)]
+
 def get_config() -> Config:
     """Get application configuration"""
     from ..config import Config
@@ -27,12 +33,12 @@ def get_meta_info() -> MetaInformation:
     """Get MetaInformation instance"""
     return MetaInformation()
 
-def get_aircraft_repository(mongodb: MongoDBDep) -> AircraftRepository:
-    """Get AircraftRepository instance"""
-    return AircraftRepository(mongodb)
+def get_aircraft_repository() -> AircraftStore:
+    """Get the shared aircraft repository of the configured storage backend"""
+    return app_state.aircraft_repository
 
 ConfigDep = Annotated[Config, Depends(get_config)]
 ModesUtilDep = Annotated[ModesUtil, Depends(get_modes_util)]
 MetaInfoDep = Annotated[MetaInformation, Depends(get_meta_info)]
-AircraftRepositoryDep = Annotated[AircraftRepository, Depends(get_aircraft_repository)]
+AircraftRepositoryDep = Annotated[AircraftStore, Depends(get_aircraft_repository)]
 
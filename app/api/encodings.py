@@ -0,0 +1,23 @@
+from typing import Optional, Sequence
+
+from fastapi import Request
+
+from ..core.utils.position_codec import ENCODINGS, PACKED, POLYLINE
+
+POLYLINE_MEDIA_TYPE = "application/vnd.flightradar.polyline"
+PACKED_MEDIA_TYPE = "application/vnd.flightradar.packed"
+
+MEDIA_TYPES = {
+    POLYLINE: POLYLINE_MEDIA_TYPE,
+    PACKED: PACKED_MEDIA_TYPE
+}
+
+
+def negotiate_encoding(request: Request, supported: Sequence[str] = ENCODINGS) -> Optional[str]:
+    """Compact position encoding listed first in the Accept header, None for JSON"""
+    for media_range in request.headers.get("accept", "").split(','):
+        media_type = media_range.split(';')[0].strip().lower()
+        for encoding in supported:
+            if MEDIA_TYPES[encoding] == media_type:
+                return encoding
+    return None
@@ -1,17 +1,30 @@
-from fastapi import Request, Query, HTTPException, Depends, WebSocket, WebSocketDisconnect
-from typing import List, Dict, Optional, Any
+from fastapi import Header, Request, Response, Query, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from typing import Any, Collection, Dict, List, Optional
+from itertools import islice
+from datetime import datetime
 from pydantic import BaseModel
-from pymongo.database import Database
-from bson import ObjectId
-import logging
-import threading
 import asyncio
+import json
+import logging
 
 from .. import router
 from ..mappers import toFlightDto
-from ..models import FlightDto, to_datestring
+from ..models import FlightDto, FlightHistoryDto, NearbyPositionDto
+from ..pagination import encode_cursor, decode_cursor
+from ..response_cache import ResponseCache
+from ..trajectory_cache import TrajectoryCache
+from ..streaming import EVENT_STREAM_MEDIA_TYPE, NDJSON_MEDIA_TYPE, stream_response, wants_ndjson
+from ..encodings import MEDIA_TYPES, PACKED_MEDIA_TYPE, POLYLINE_MEDIA_TYPE, negotiate_encoding
+from ...core.utils.position_codec import (ENCODINGS, PACKED, POLYLINE, TRAJECTORY, TRAJECTORY_UPDATE, encode_polyline,
+                                          pack_trajectory)
+from ...core.utils.simplification import simplify, tolerance_bucket, zoom_tolerance
+from ...data.spatial_grid import BoundingBox
+from ...websocket.delta_log import Delta
+from ...websocket.live_feed import LiveFeed, parse_event_id
 from ...websocket.manager import ConnectionManager
-from ..dependencies import MetaInfoDep, get_mongodb
+from ...websocket.subscriptions import FlightSubscriptions
+from ..dependencies import MetaInfoDep, RepositoryDep
 from ...scheduling import UPDATER_JOB_NAME
 
 # Initialize logging
@@ -19,9 +32,38 @@ logger = logging.getLogger(__name__)
 
 # Create a WebSocket connection manager
 connection_manager = ConnectionManager()
+live_feed = LiveFeed()
+
+# Subscribers of single flight streams by flight id
+flight_subscriptions = FlightSubscriptions()
+
+# Serialized live responses, rebuilt at most once per updater cycle
+response_cache = ResponseCache()
+
+# Simplified trajectories per flight and tolerance, recomputed when a flight gets new positions
+trajectory_cache = TrajectoryCache()
 
 # Constants
 MAX_FLIGHTS_LIMIT = 300
+DEFAULT_HISTORY_PAGE_SIZE = 50
+MAX_NEAREST_K = 100
+MAX_RADIUS_KM = 1000
+DEFAULT_POLL_TIMEOUT_SEC = 30
+MAX_POLL_TIMEOUT_SEC = 60
+BBOX_DESCRIPTION = ("Only aircraft within the bounding box 'west,south,east,north' in degrees, west > east crosses "
+                    "the antimeridian. The box is expanded to multiples of 0.1 degrees")
+# Bounding boxes are expanded to this grid, nearby viewports share their cached responses
+BBOX_STEP_DEG = 0.1
+# Documents fetched per database round trip when streaming
+STREAM_BATCH_SIZE = 1000
+# Pending updates of a single flight stream before the oldest are dropped
+FLIGHT_UPDATE_QUEUE_SIZE = 100
+
+
+def _parse_bbox(bbox: Optional[str]) -> Optional[BoundingBox]:
+    """Bounding box of a query, expanded to the grid of the cached responses"""
+    return BoundingBox.parse(bbox).quantized(BBOX_STEP_DEG) if bbox else None
+
 
 # Define response models
 
@@ -53,6 +95,20 @@ def alive():
 
 @router.get('/ready')
 def ready(request: Request):
+    replica = getattr(request.app.state, 'live_replica', None)
+    if replica is not None:
+        # API worker following the ingest process
+        if replica.connected:
+            return "Yes"
+        raise HTTPException(status_code=500, detail="Service not ready")
+
+    lease = getattr(request.app.state, 'leader_lease', None)
+    if lease is not None and not lease.is_leader:
+        # Replica following the leader through the database, ready once it loaded the live state
+        if lease.last_checked is not None:
+            return "Yes"
+        raise HTTPException(status_code=500, detail="Service not ready")
+
     updater_job = request.app.state.apscheduler.get_job(UPDATER_JOB_NAME)
     if updater_job and not updater_job.pending:
         return "Yes"
@@ -60,6 +116,25 @@ def ready(request: Request):
         raise HTTPException(status_code=500, detail="Service not ready")
 
 
+@router.get('/ws/stats', response_model=Dict[str, Any],
+    summary="Get live WebSocket metrics",
+    description="Connected clients, send queue depth, coalesced updates and slow consumer disconnects of /ws/positions/live, "
+                "readers of /positions/live and pending /positions/changes requests")
+def get_websocket_stats():
+    return {**connection_manager.get_stats(), "live_feed_readers": live_feed.readers}
+
+
+@router.get('/retention/stats', response_model=Dict[str, Any],
+    summary="Get retention purge metrics",
+    description="Runs, deleted flights and documents, delete rate and latency, backoff state and cursor of the retention purge. "
+                "Only available in the process running the purge")
+def get_retention_stats(request: Request):
+    retention_worker = getattr(request.app.state, 'retention_worker', None)
+    if retention_worker is None:
+        raise HTTPException(status_code=404, detail="Retention purge is not running in this process")
+    return retention_worker.get_stats()
+
+
 @router.get('/flights', response_model=List[FlightDto], 
     summary="Get all flights",
     description="Returns a list of currently tracked flights. icao24 is the ICAO 24-bit hex address, cls is the callsign, lstCntct is the time of last contact, firstCntct is the time of first contact",
@@ -85,48 +160,94 @@ def ready(request: Request):
 def get_flights(
     request: Request,
     filter: Optional[str] = Query(None, description="Filter flights (e.g. 'mil' for military only)"),
-    limit: Optional[int] = Query(None, description="Maximum number of flights to return")
+    limit: Optional[int] = Query(None, description="Maximum number of flights to return"),
+    bbox: Optional[str] = Query(None, description=BBOX_DESCRIPTION)
 ):
     try:
-        # Get currently tracked flights from memory
-        cached_flights = request.app.state.updater.get_cached_flights()
-        
-        flight_manager = request.app.state.updater._flight_manager
-        modes_util = request.app.state.modes_util
-        
-        flight_dtos = []
-        
-        for flight_id, position_report in cached_flights.items():
-            if filter == 'mil' and not modes_util.is_military(position_report.icao24):
-                continue
-                
-            callsign = position_report.callsign
-            last_contact = flight_manager.flight_last_contact.get(flight_id)
-            
-            if last_contact:
-                flight_dto = FlightDto(
-                    id=flight_id,
-                    icao24=position_report.icao24,
-                    cls=callsign,
-                    lstCntct=to_datestring(last_contact),
-                    firstCntct=to_datestring(last_contact)  # For live flights, use last contact as first contact approximation
-                )
-                flight_dtos.append(flight_dto)
-        
-        flight_dtos.sort(key=lambda x: x.lstCntct, reverse=True)
-        
         # Apply limit (default and max limit is MAX_FLIGHTS_LIMIT)
         if limit is not None:
             applied_limit = min(limit, MAX_FLIGHTS_LIMIT)
         else:
             applied_limit = MAX_FLIGHTS_LIMIT
-            
-        return flight_dtos[:applied_limit]
+
+        updater = request.app.state.updater
+        snapshot = updater.snapshot
+        box = _parse_bbox(bbox)
+        return response_cache.respond(request, ('flights', filter == 'mil', applied_limit, box), snapshot.generation,
+                                      lambda: snapshot.flights_body(filter == 'mil', applied_limit,
+                                                                    updater.flights_in_bbox(box) if box else None))
 
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Invalid arguments: {str(e)}")
 
 
+@router.get('/flights/history', response_model=FlightHistoryDto,
+    summary="Get flight history",
+    description="Returns past and current flights, most recent contact first. Pass the returned next cursor to get the following page; next is null on the last page. "
+                "With Accept: application/x-ndjson all matching flights are streamed instead, one flight per line, up to limit if given",
+    responses={
+        200: {
+            "description": "Page of flights",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "flights": [
+                            {
+                                "id": "683f570bd570101935e7ff63",
+                                "icao24": "394a03",
+                                "cls": "AFR990",
+                                "lstCntct": "2025-06-03T20:12:03.615000Z",
+                                "firstCntct": "2025-06-03T19:41:55.542000Z"
+                            }
+                        ],
+                        "next": "MTc0ODk4MTUyMzYxNS42ODNmNTcwYmQ1NzAxMDE5MzVlN2ZmNjM"
+                    }
+                },
+                NDJSON_MEDIA_TYPE: {}
+            }
+        },
+        400: {"description": "Invalid cursor or arguments"}
+    }
+)
+def get_flight_history(
+    request: Request,
+    repository: RepositoryDep,
+    filter: Optional[str] = Query(None, description="Filter flights (e.g. 'mil' for military only)"),
+    callsign: Optional[str] = Query(None, description="Only flights whose callsign starts with this prefix"),
+    since: Optional[datetime] = Query(None, description="Only flights with last contact at or after this time"),
+    until: Optional[datetime] = Query(None, description="Only flights with last contact before this time"),
+    limit: Optional[int] = Query(None, ge=1, description="Maximum number of flights per page, or in total when streaming"),
+    cursor: Optional[str] = Query(None, description="Cursor of the next page, as returned by the previous page")
+):
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    filters = {
+        "military_only": filter == 'mil',
+        "callsign_prefix": callsign.strip().upper() if callsign else None,
+        "since": since,
+        "until": until
+    }
+
+    if wants_ndjson(request):
+        flights = repository.iter_flight_history(after=after, batch_size=STREAM_BATCH_SIZE, **filters)
+        if limit:
+            flights = islice(flights, limit)
+        return stream_response(request, (toFlightDto(f).model_dump() for f in flights))
+
+    page_size = min(limit or DEFAULT_HISTORY_PAGE_SIZE, MAX_FLIGHTS_LIMIT)
+    flights = repository.get_flight_history(page_size, after=after, **filters)
+
+    next_cursor = None
+    if len(flights) == page_size:
+        last = flights[-1]
+        next_cursor = encode_cursor(last["last_contact"], last["_id"])
+
+    return FlightHistoryDto(flights=[toFlightDto(f) for f in flights], next=next_cursor)
+
+
 @router.get('/flights/{flight_id}', response_model=FlightDto,
     summary="Get flight by ID",
     description="Returns a specific flight by its ID. icao24 is the ICAO 24-bit hex address, cls is the callsign, lstCntct is the time of last contact, firstCntct is the time of first contact",
@@ -148,9 +269,9 @@ def get_flights(
         404: {"description": "Flight not found"}
     }
 )
-def get_flight(flight_id: str, mongodb: Database = Depends(get_mongodb)):
+def get_flight(flight_id: str, repository: RepositoryDep):
     try:
-        flight = mongodb.flights.find_one({"_id": ObjectId(flight_id)})
+        flight = repository.get_flight(flight_id)
 
         if flight:
             return toFlightDto(flight)
@@ -162,65 +283,44 @@ def get_flight(flight_id: str, mongodb: Database = Depends(get_mongodb)):
 
 
 @router.websocket('/ws/positions/live')
-async def websocket_all_positions(websocket: WebSocket):
-    """WebSocket endpoint for real-time position updates"""
+async def websocket_all_positions(websocket: WebSocket, encoding: Optional[str] = None, since: Optional[int] = None):
+    """
+    WebSocket endpoint for real-time position updates, encoding=packed sends binary messages.
+    Send {"type": "subscribe", "bbox": "west,south,east,north", "minAlt": .., "maxAlt": .., "mil": true}
+    to receive only the aircraft within a viewport, {"type": "unsubscribe"} for all aircraft again.
+    Reconnecting clients pass the seq of the last message received as since, to receive only the
+    updates they missed instead of all positions
+    """
     # Get application state from the WebSocket scope
     app = websocket.app
 
-    # Create a broadcast function for this specific WebSocket connection
-    def broadcast_positions(positions_dict):
-        """Function to broadcast positions to all connected clients"""
-        logger.debug(f"WebSocket callback triggered with {len(positions_dict)} positions")
-
-        # Use a thread for handling the async operation from a sync context
-        def run_in_thread(positions_data):                
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-
-            try:
-                # Run the coroutine in this thread's event loop
-                loop.run_until_complete(connection_manager.broadcast_positions(positions_data))
-            except Exception as e:
-                logger.error(f"Error in WebSocket broadcast thread: {str(e)}", exc_info=True)
-            finally:
-                loop.close()
-
-        # Start a dedicated thread for this broadcast
-        broadcast_thread = threading.Thread(
-            target=run_in_thread,
-            args=(positions_dict,),
-            daemon=True
-        )
-        broadcast_thread.start()
-
-    # Register the callback with the flight updater and store the reference
-    registered_callback = app.state.updater.register_websocket_callback(broadcast_positions)
-    
-    # Store the callback reference for later cleanup
-    callback_key = f"ws_live_callback_{id(websocket)}"
-    setattr(app.state, callback_key, registered_callback)
-    logger.info("WebSocket broadcast callback registered with updater")
-
-    # Accept the WebSocket connection
-    await connection_manager.connect(websocket)
+    if encoding and encoding != PACKED:
+        await websocket.accept()
+        await websocket.close(code=1003, reason=f'Unsupported encoding {encoding}')
+        return
 
-    try:
-        # Send initial positions immediately after connection
+    # A resuming client receives the deltas it missed, as long as they are still retained
+    replay = app.state.updater.delta_log.since(since) if since is not None else None
+    if replay is not None:
+        initial, seq = None, since
+    else:
         # For initial connection, we send all current positions with full data
-        cached_flights = app.state.updater.get_cached_flights()
-        initial_positions = {str(k): v.__dict__ for k, v in cached_flights.items()}
-
-        # Add a message type to indicate this is the initial full data set
-        message = {
-            "type": "initial",
-            "count": len(initial_positions),
-            "positions": initial_positions
-        }
-        await websocket.send_json(message)
+        # The message is already serialized in the live snapshot, typed "initial" to mark the full data set
+        snapshot = app.state.updater.snapshot
+        initial = snapshot.packed_positions if encoding == PACKED else snapshot.initial_message.decode()
+        seq, replay = snapshot.seq, []
 
-        # Keep the connection alive
+    # Accept the WebSocket connection, its writer sends the initial positions or missed updates before any update
+    await connection_manager.connect(websocket, encoding, initial, seq, replay)
+
+    # One broadcast per cycle serves all live connections, registering it again is a no-op
+    app.state.updater.register_websocket_callback(connection_manager.broadcast)
+
+    try:
+        # Keep the connection alive, clients may subscribe to a viewport
         while True:
-            await websocket.receive_text()
+            message = await websocket.receive_text()
+            connection_manager.handle_message(websocket, message, app.state.updater)
     except WebSocketDisconnect:
         # Handle client disconnect
         connection_manager.disconnect(websocket)
@@ -228,30 +328,29 @@ async def websocket_all_positions(websocket: WebSocket):
         logger.error(f"WebSocket error: {str(e)}")
         connection_manager.disconnect(websocket)
     finally:
-        # Clean up the callback when the connection is closed
-        callback_key = f"ws_live_callback_{id(websocket)}"
-        registered_callback = getattr(app.state, callback_key, None)
-        if registered_callback:
-            app.state.updater.unregister_websocket_callback(registered_callback)
-            setattr(app.state, callback_key, None)
+        # Stop broadcasting once the last live connection is gone
+        if not connection_manager.active_connections:
+            app.state.updater.unregister_websocket_callback(connection_manager.broadcast)
             logger.info("Live WebSocket broadcast callback unregistered")
 
 
 @router.websocket('/ws/flights/{flight_id}/positions')
-async def websocket_flight_positions(websocket: WebSocket, flight_id: str):
-    """WebSocket endpoint for real-time position updates for a specific flight"""
+async def websocket_flight_positions(websocket: WebSocket, flight_id: str, encoding: Optional[str] = None):
+    """WebSocket endpoint for real-time position updates for a specific flight, encoding=packed|polyline for compact messages"""
 
     app = websocket.app
-    mongodb = app.state.mongodb
+    repository = app.state.repository
 
-    # Flight-specific connection manager
-    flight_connection_manager = ConnectionManager()
+    if encoding and encoding not in ENCODINGS:
+        await websocket.accept()
+        await websocket.close(code=1003, reason=f'Unsupported encoding {encoding}')
+        return
 
     # Check if flight exists before accepting the connection
     try:
-        flight = mongodb.flights.find_one({"_id": ObjectId(flight_id)})
+        flight = repository.get_flight(flight_id)
         if not flight:
-            await flight_connection_manager.connect(websocket)
+            await websocket.accept()
             await websocket.close(code=1000, reason=f'Flight {flight_id} not found')
             return
     except Exception as e:
@@ -259,20 +358,50 @@ async def websocket_flight_positions(websocket: WebSocket, flight_id: str):
         await websocket.close(code=1011, reason="Server error")
         return
     
-    await flight_connection_manager.connect(websocket)
+    await websocket.accept()
+
+    # Updates waiting to be sent by the writer task of this connection
+    updates: asyncio.Queue = asyncio.Queue(maxsize=FLIGHT_UPDATE_QUEUE_SIZE)
+    writer = None
+    last_position = None
+
+    # Called by the subscription registry when this flight has a new position, must not block
+    def deliver(new_position):
+        nonlocal last_position
+
+        # Only send update if position has changed
+        if (last_position is not None and
+            last_position["lat"] == new_position["lat"] and
+            last_position["lon"] == new_position["lon"] and
+            last_position["alt"] == new_position["alt"] and
+            last_position.get("gs") == new_position.get("gs")):
+            return
+
+        last_position = new_position
+        if updates.full():
+            # The client does not keep up, drop the oldest update
+            updates.get_nowait()
+        updates.put_nowait(new_position)
+
+    # Helper async function to send the updates of this flight
+    async def send_updates():
+        while True:
+            position_data = await updates.get()
+            if encoding:
+                await _send_encoded(websocket, encoding, [position_data], update=True)
+            else:
+                # Format the update message
+                update_message = {
+                    "type": "update",
+                    "count": 1,
+                    "positions": {flight_id: position_data}
+                }
+                await websocket.send_json(update_message)
+            logger.debug(f"Sent position update for flight {flight_id}")
 
-    # Flag to track connection state
-    websocket_active = True
-    callback_registered = False
-    callback_key = f"ws_flight_callback_{flight_id}"
-    
     try:
-        # Get the flight ID in ObjectId format
-        flight_oid = ObjectId(flight_id)
-        
-        # Fetch initial positions from mongodb for the given flight
-        positions = list(mongodb.positions.find({"flight_id": flight_oid}).sort("timestmp", 1))
-        last_position = None
+        # Fetch initial positions for the given flight, active flights are served from memory
+        positions = app.state.updater.get_flight_positions(flight_id)
         
         # Format all positions for the initial message
         all_positions = []
@@ -291,103 +420,23 @@ async def websocket_flight_positions(websocket: WebSocket, flight_id: str):
             # Save the most recent position for comparison with future updates
             last_position = all_positions[-1] if all_positions else None
         
-        # Create the initial message with all positions
-        initial_pos_message = {
-            "type": "initial",
-            "count": len(all_positions),
-            "positions": {flight_id: all_positions} if all_positions else {}
-        }
+        if encoding:
+            await _send_encoded(websocket, encoding, all_positions)
+        else:
+            # Create the initial message with all positions
+            initial_pos_message = {
+                "type": "initial",
+                "count": len(all_positions),
+                "positions": {flight_id: all_positions} if all_positions else {}
+            }
 
-        await websocket.send_json(initial_pos_message)
-        
-        # Function to check if websocket is still active
-        def is_websocket_active():
-            return websocket_active
-        
-        # Function to track position changes for a specific flight
-        def send_flight_position_updates(positions_dict):
-            """Callback function to send position updates for a specific flight"""
-            # First check if the WebSocket is still active
-            if not is_websocket_active():
-                return
-                
-            # Check if this update contains this flight
-            if flight_id not in positions_dict:
-                return
-                
-            # Get flight's new position
-            new_position = positions_dict[flight_id]
-            
-            # Get a reference to the previous position
-            nonlocal last_position
-            
-            # Skip if there's no previous position yet
-            if last_position is None:
-                last_position = new_position
-                # Use thread-based approach for async operations from sync context
-                _send_update_in_thread(new_position)
-                return
-            
-            # Only send update if position has changed
-            if (last_position["lat"] != new_position["lat"] or 
-                last_position["lon"] != new_position["lon"] or 
-                last_position["alt"] != new_position["alt"] or
-                last_position.get("gs") != new_position.get("gs")):
-                
-                # Update the last known position
-                last_position = new_position
-                
-                # Use thread-based approach for async operations from sync context
-                _send_update_in_thread(new_position)
-        
-        # Helper function to send updates through a separate thread with its own event loop
-        def _send_update_in_thread(position_data):
-            def run_in_thread(pos_data):
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                try:
-                    # Check if still active before running
-                    if is_websocket_active():
-                        loop.run_until_complete(send_update(pos_data))
-                except Exception as e:
-                    logger.error(f"Error in flight WebSocket update thread: {str(e)}", exc_info=True)
-                finally:
-                    loop.close()
-            
-            # Start a dedicated thread for this update
-            broadcast_thread = threading.Thread(
-                target=run_in_thread,
-                args=(position_data,),
-                daemon=True
-            )
-            broadcast_thread.start()
-        
-        # Helper async function to send a single flight update
-        async def send_update(position_data):
+            await websocket.send_json(initial_pos_message)
 
-            if not is_websocket_active():
-                return
-                
-            try:
-                # Format the update message
-                update_message = {
-                    "type": "update",
-                    "count": 1,
-                    "positions": {flight_id: position_data}
-                }
-                # Send to this specific connection only
-                await websocket.send_json(update_message)
-                logger.debug(f"Sent position update for flight {flight_id}")
-            except Exception as e:
-                # If we get a closed websocket error, mark inactive
-                websocket_active = False
-                logger.error(f"Error sending flight position update: {str(e)}")
-        
-        # Register the callback with the flight updater and store the reference
-        registered_callback = app.state.updater.register_websocket_callback(send_flight_position_updates)
-        setattr(app.state, callback_key, registered_callback)
-        callback_registered = True
-        logger.info(f"WebSocket callback registered for flight {flight_id}")
+        writer = asyncio.create_task(send_updates())
+        flight_subscriptions.subscribe(flight_id, deliver)
+        # A single callback serves all flight streams, registering it again is a no-op
+        app.state.updater.register_websocket_callback(flight_subscriptions.publish)
+        logger.info(f"WebSocket subscribed to flight {flight_id}")
         
         # Keep the connection alive
         while True:
@@ -396,29 +445,26 @@ async def websocket_flight_positions(websocket: WebSocket, flight_id: str):
 
     except WebSocketDisconnect:
         logger.info(f"WebSocket for flight {flight_id} disconnected")
-        websocket_active = False
-        flight_connection_manager.disconnect(websocket)
     except Exception as e:
         logger.error(f"WebSocket error: {str(e)}")
-        websocket_active = False
-        flight_connection_manager.disconnect(websocket)
+        try:
+            await websocket.close(code=1011, reason="Server error")
+        except Exception:
+            pass
     finally:
-        # Make sure to mark connection as inactive
-        websocket_active = False
-        
-        # Clean up callback if we registered one
-        if callback_registered:
-            # Get the callback reference
-            registered_callback = getattr(app.state, callback_key, None)
-            if registered_callback:
-                # Properly unregister it from the updater
-                app.state.updater.unregister_websocket_callback(registered_callback)
-                setattr(app.state, callback_key, None)
-                logger.info(f"WebSocket callback for flight {flight_id} unregistered and deactivated")
+        flight_subscriptions.unsubscribe(flight_id, deliver)
+        if writer is not None:
+            writer.cancel()
+        if not flight_subscriptions:
+            app.state.updater.unregister_websocket_callback(flight_subscriptions.publish)
+        logger.info(f"WebSocket for flight {flight_id} unsubscribed")
 
 @router.get('/flights/{flight_id}/positions',
     summary="Get flight positions",
-    description="Returns an array of position coordinates [lat, lon, alt] for a specific flight",
+    description="Returns an array of position coordinates [lat, lon, alt] for a specific flight. The whole trajectory is streamed; "
+                "with Accept: application/x-ndjson each position is written as a separate line. "
+                f"Accept: {POLYLINE_MEDIA_TYPE} or {PACKED_MEDIA_TYPE} returns a compact encoding of the trajectory. "
+                "With tolerance (meters) or zoom (map zoom level) the trajectory is simplified with the Douglas-Peucker algorithm",
     responses={
         200: {
             "description": "Array of position coordinates",
@@ -428,30 +474,53 @@ async def websocket_flight_positions(websocket: WebSocket, flight_id: str):
                         [47.520152, 7.920509, 32025],
                         [47.655716, 11.048882, 28475]
                     ]
-                }
+                },
+                NDJSON_MEDIA_TYPE: {},
+                POLYLINE_MEDIA_TYPE: {},
+                PACKED_MEDIA_TYPE: {}
             }
         },
         404: {"description": "Flight not found"}
     }
 )
-def get_positions(flight_id: str, mongodb: Database = Depends(get_mongodb)):
+def get_positions(
+    flight_id: str,
+    request: Request,
+    repository: RepositoryDep,
+    tolerance: Optional[float] = Query(None, gt=0, description="Simplify the trajectory, maximum deviation in meters"),
+    zoom: Optional[float] = Query(None, ge=0, le=24, description="Simplify the trajectory for display at this map zoom level")
+):
     try:
-        flight = mongodb.flights.find_one({"_id": ObjectId(flight_id)})
-        if not flight:
-            raise HTTPException(status_code=404, detail="Flight not found")
+        projection = {"lat": 1, "lon": 1, "alt": 1, "_id": 0}  # Only fetch needed fields
 
-        positions = list(mongodb.positions.find(
-            {"flight_id": ObjectId(flight_id)},
-            {"lat": 1, "lon": 1, "alt": 1, "_id": 0}  # Only fetch needed fields
-        ).sort("timestmp", 1).limit(10000))  # Limit to prevent memory issues
+        if tolerance is None and zoom is None:
+            if not repository.flight_exists(flight_id):
+                raise HTTPException(status_code=404, detail="Flight not found")
 
-        # Convert to array of arrays format
-        result = []
-        for p in positions:
-            alt = p["alt"] if p["alt"] is not None else -1
-            result.append([p["lat"], p["lon"], alt])
+            # Read in batches while the response is written, memory use does not depend on the flight length
+            positions = request.app.state.updater.iter_flight_positions(flight_id, projection=projection, batch_size=STREAM_BATCH_SIZE)
+            points = ((p["lat"], p["lon"], p["alt"]) for p in positions)
+        else:
+            flight = repository.get_flight(flight_id)
+            if not flight:
+                raise HTTPException(status_code=404, detail="Flight not found")
+
+            bucket = tolerance_bucket(tolerance if tolerance is not None else zoom_tolerance(zoom))
+            points = trajectory_cache.get(flight_id, bucket, flight["last_contact"])
+            if points is None:
+                positions = request.app.state.updater.iter_flight_positions(flight_id, projection=projection, batch_size=STREAM_BATCH_SIZE)
+                points = simplify([(p["lat"], p["lon"], p["alt"]) for p in positions], 2 ** bucket)
+                trajectory_cache.put(flight_id, bucket, flight["last_contact"], points)
+
+        encoding = negotiate_encoding(request)
+        if encoding:
+            # Compact encodings are a few bytes per position, they are built in one piece
+            points = list(points)
+            body = encode_polyline(points).encode() if encoding == POLYLINE else pack_trajectory(points)
+            return Response(content=body, media_type=MEDIA_TYPES[encoding], headers={"Vary": "Accept"})
 
-        return result
+        # Convert to array of arrays format
+        return stream_response(request, ([lat, lon, alt if alt is not None else -1] for lat, lon, alt in points))
 
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Invalid flight id format: {str(e)}")
@@ -459,7 +528,8 @@ def get_positions(flight_id: str, mongodb: Database = Depends(get_mongodb)):
 
 @router.get('/positions',
     summary="Get all positions",
-    description="Returns a map with ICAO24 hex address as key and arrays of [lat, lon, alt] coordinates as values",
+    description="Returns a map with ICAO24 hex address as key and arrays of [lat, lon, alt] coordinates as values. "
+                f"Accept: {PACKED_MEDIA_TYPE} returns the positions in the packed binary encoding",
     responses={
         200: {
             "description": "Map of ICAO24 addresses to position arrays",
@@ -471,29 +541,158 @@ def get_positions(flight_id: str, mongodb: Database = Depends(get_mongodb)):
                             [47.655716, 11.048882, 28475]
                         ]
                     }
-                }
+                },
+                PACKED_MEDIA_TYPE: {}
             }
         }
     }
 )
 def get_all_positions(
     request: Request,
+    filter: Optional[str] = Query(None, description="Filter positions (e.g. 'mil' for military only)"),
+    bbox: Optional[str] = Query(None, description=BBOX_DESCRIPTION)
+):
+    try:
+        box = _parse_bbox(bbox)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    updater = request.app.state.updater
+    snapshot = updater.snapshot
+    mil = filter == 'mil'
+
+    def flight_ids():
+        return updater.flights_in_bbox(box) if box else None
+
+    if negotiate_encoding(request, (PACKED,)):
+        return response_cache.respond(request, ('positions', mil, box, PACKED), snapshot.generation,
+                                      lambda: snapshot.packed_positions_body(mil, flight_ids()),
+                                      media_type=PACKED_MEDIA_TYPE, vary="Accept")
+
+    return response_cache.respond(request, ('positions', mil, box), snapshot.generation,
+                                  lambda: snapshot.positions_body(mil, flight_ids()), vary="Accept")
+
+
+def _nearby_positions(snapshot, matches) -> List[NearbyPositionDto]:
+    points = snapshot.points
+    return [NearbyPositionDto(id=flight_id, lat=points[flight_id][0], lon=points[flight_id][1],
+                              alt=points[flight_id][2], dist=round(distance, 3))
+            for distance, flight_id in matches if flight_id in points]
+
+
+def _snapshot_filter(snapshot, military_only: bool):
+    """Accept only flights of the published snapshot, the spatial index may be ahead of it"""
+    if military_only:
+        return snapshot.military.__contains__
+    return snapshot.points.__contains__
+
+
+def _changed_positions_body(deltas: List[Delta], military: Optional[Collection[str]], box: Optional[BoundingBox]) -> bytes:
+    """Positions document of the latest position of each flight changed by the deltas"""
+    changed = {}
+    for delta in deltas:
+        changed.update(delta.positions)
+    return json.dumps({
+        flight_id: [[p["lat"], p["lon"], p["alt"] if p["alt"] is not None else -1]]
+        for flight_id, p in changed.items()
+        if (military is None or flight_id in military) and (box is None or box.contains(p["lat"], p["lon"]))
+    }, separators=(',', ':')).encode()
+
+
+@router.get('/positions/changes',
+    summary="Wait for position changes",
+    description="Long polling variant of /positions. Waits until the updater publishes changes after the given seq "
+                "or the timeout elapses, then returns only the positions of the flights changed since. The X-Seq "
+                "header holds the seq to pass with the next request. Without seq, or when it is too old or from "
+                "before a restart, all positions are returned immediately",
+    responses={200: {"description": "Map of flight ids to position arrays, as /positions"}}
+)
+async def get_position_changes(
+    request: Request,
+    seq: Optional[int] = Query(None, description="X-Seq of the previous response"),
+    timeout: float = Query(DEFAULT_POLL_TIMEOUT_SEC, ge=0, le=MAX_POLL_TIMEOUT_SEC, description="Maximum wait in seconds"),
+    filter: Optional[str] = Query(None, description="Filter positions (e.g. 'mil' for military only)"),
+    bbox: Optional[str] = Query(None, description=BBOX_DESCRIPTION)
+):
+    try:
+        box = _parse_bbox(bbox)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    updater = request.app.state.updater
+    mil = filter == 'mil'
+
+    # Sequence numbers start from the wall clock, those of another process are never resumed from
+    deltas = await live_feed.changes(updater, seq, timeout) if seq is not None else None
+
+    if deltas is None:
+        snapshot = updater.snapshot
+        flight_ids = updater.flights_in_bbox(box) if box else None
+        response = response_cache.respond(request, ('positions', mil, box), snapshot.generation,
+                                          lambda: snapshot.positions_body(mil, flight_ids))
+        response.headers["X-Seq"] = str(snapshot.seq)
+        return response
+
+    latest = deltas[-1].seq if deltas else seq
+    # Pollers of the same seq wake up together, the changes are encoded once for them
+    military = updater.snapshot.military if mil else None
+    response = response_cache.respond(request, ('position_changes', seq, mil, box), latest,
+                                      lambda: _changed_positions_body(deltas, military, box))
+    response.headers["X-Seq"] = str(latest)
+    return response
+
+
+@router.get('/positions/live', response_class=StreamingResponse,
+    summary="Stream live position updates",
+    description="Server-sent events of the live positions: an initial event with all positions, then an update event "
+                "per updater cycle with the changed positions, as on /ws/positions/live. Reconnecting clients "
+                "send the id of the last event as Last-Event-ID and receive only the updates they missed",
+    responses={200: {"content": {EVENT_STREAM_MEDIA_TYPE: {}}}}
+)
+async def stream_live_positions(request: Request, last_event_id: Optional[str] = Header(None)):
+    events = live_feed.events(request.app.state.updater, parse_event_id(last_event_id))
+    return StreamingResponse(events, media_type=EVENT_STREAM_MEDIA_TYPE,
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@router.get('/positions/nearest', response_model=List[NearbyPositionDto],
+    summary="Get the aircraft nearest to a point",
+    description="Returns the live aircraft closest to the given point, closest first. "
+                "Answered from the in-memory spatial index of the live positions")
+def get_nearest_positions(
+    request: Request,
+    lat: float = Query(..., ge=-90, le=90, description="Latitude in degrees"),
+    lon: float = Query(..., ge=-180, le=180, description="Longitude in degrees"),
+    k: int = Query(10, ge=1, le=MAX_NEAREST_K, description="Number of aircraft to return"),
     filter: Optional[str] = Query(None, description="Filter positions (e.g. 'mil' for military only)")
 ):
-    cached_flights = request.app.state.updater.get_cached_flights()
-    
-    positions = {}
-    
-    for icao24, flight_data in cached_flights.items():
-        if filter == 'mil' and not request.app.state.modes_util.is_military(icao24):
-            continue
-            
-        # Convert flight data to position array format
-        if hasattr(flight_data, 'lat') and hasattr(flight_data, 'lon'):
-            alt = getattr(flight_data, 'alt', -1)
-            if alt is None:
-                alt = -1
-                
-            positions[icao24] = [[flight_data.lat, flight_data.lon, alt]]
-    
-    return positions
+    updater = request.app.state.updater
+    snapshot = updater.snapshot
+    matches = updater.nearest_flights(lat, lon, k, _snapshot_filter(snapshot, filter == 'mil'))
+    return _nearby_positions(snapshot, matches)
+
+
+@router.get('/positions/within', response_model=List[NearbyPositionDto],
+    summary="Get the aircraft within a radius",
+    description="Returns the live aircraft within the radius around the given point, closest first. "
+                "Answered from the in-memory spatial index of the live positions")
+def get_positions_within(
+    request: Request,
+    lat: float = Query(..., ge=-90, le=90, description="Latitude in degrees"),
+    lon: float = Query(..., ge=-180, le=180, description="Longitude in degrees"),
+    radius: float = Query(..., gt=0, le=MAX_RADIUS_KM, description="Radius in km"),
+    filter: Optional[str] = Query(None, description="Filter positions (e.g. 'mil' for military only)")
+):
+    updater = request.app.state.updater
+    snapshot = updater.snapshot
+    matches = updater.flights_within(lat, lon, radius, _snapshot_filter(snapshot, filter == 'mil'))
+    return _nearby_positions(snapshot, matches)
+
+
+async def _send_encoded(websocket: WebSocket, encoding: str, positions: List[Dict[str, Any]], update: bool = False) -> None:
+    """Send positions of a single flight in a compact encoding, updates are appended to the trajectory by the client"""
+    points = [(p["lat"], p["lon"], p["alt"]) for p in positions]
+    if encoding == POLYLINE:
+        await websocket.send_text(encode_polyline(points))
+    else:
+        await websocket.send_bytes(pack_trajectory(points, TRAJECTORY_UPDATE if update else TRAJECTORY))
@@ -1,15 +1,9 @@
 from datetime import datetime
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
+
+from ..core.utils.time_util import to_datestring
 
-def to_datestring(obj: datetime) -> str:
-    if obj.tzinfo:
-        # eg: '2015-09-25T23:14:42.588601+00:00'
-        return obj.isoformat('T')
-    else:
-        # No timezone present - assume UTC.
-        # eg: '2015-09-25T23:14:42.588601Z'
-        return obj.isoformat('T') + 'Z'
 
 class FlightDto(BaseModel):
     id: str
@@ -21,6 +15,10 @@ class FlightDto(BaseModel):
     class Config:
         arbitrary_types_allowed = True
 
+class FlightHistoryDto(BaseModel):
+    flights: List[FlightDto]
+    next: Optional[str] = None
+
 class AircraftDto(BaseModel):
     icao24: str
     reg: Optional[str] = None
@@ -31,3 +29,10 @@ class AircraftDto(BaseModel):
     
     class Config:
         arbitrary_types_allowed = True
+
+class NearbyPositionDto(BaseModel):
+    id: str
+    lat: float
+    lon: float
+    alt: int
+    dist: float = Field(description="Great-circle distance in km")
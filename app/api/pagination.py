@@ -0,0 +1,29 @@
+import base64
+import binascii
+from datetime import datetime, timedelta
+from typing import Any, Tuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from ..data.partitioning import as_utc
+
+_EPOCH = datetime(1970, 1, 1)
+_MILLISECOND = timedelta(milliseconds=1)
+
+
+def encode_cursor(last_contact: datetime, flight_id: Any) -> str:
+    """Opaque keyset cursor pointing at a (last_contact, _id) position"""
+    millis = (as_utc(last_contact).replace(tzinfo=None) - _EPOCH) // _MILLISECOND
+    raw = f"{millis}.{flight_id}".encode('ascii')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    """Raises ValueError for cursors that were not issued by encode_cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('ascii')
+        millis, flight_id = raw.split('.', 1)
+        return _EPOCH + int(millis) * _MILLISECOND, ObjectId(flight_id)
+    except (binascii.Error, UnicodeDecodeError, InvalidId, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
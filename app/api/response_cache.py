@@ -0,0 +1,76 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable, NamedTuple, Optional
+
+from fastapi import Request, Response
+
+
+class CachedResponse(NamedTuple):
+    generation: int
+    body: bytes
+    etag: str
+
+
+def make_etag(body: bytes) -> str:
+    """Strong ETag derived from the response body, so unchanged data keeps its tag across generations"""
+    return '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    # Weak comparison as required for If-None-Match
+    return any(tag.strip().removeprefix('W/') == etag for tag in if_none_match.split(','))
+
+
+class ResponseCache:
+    """
+    Serialized response bodies of the live endpoints, valid for one updater generation.
+
+    Entries are keyed by endpoint and query arguments; a stale generation counts as a miss.
+    The number of keys is bounded, least recently used keys are dropped first.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, generation: int) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.generation != generation:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: Hashable, generation: int, body: bytes) -> CachedResponse:
+        entry = CachedResponse(generation, body, make_etag(body))
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def respond(self, request: Request, key: Hashable, generation: int, build: Callable[[], bytes],
+                media_type: str = "application/json", vary: Optional[str] = None) -> Response:
+        """Response for the key, built at most once per generation. Answers If-None-Match with 304"""
+        entry = self.get(key, generation)
+        if entry is None:
+            entry = self.put(key, generation, build())
+
+        headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+        if vary:
+            headers["Vary"] = vary
+        if etag_matches(request.headers.get("if-none-match"), entry.etag):
+            return Response(status_code=304, headers=headers)
+
+        return Response(content=entry.body, media_type=media_type, headers=headers)
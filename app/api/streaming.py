@@ -0,0 +1,51 @@
+import json
+from itertools import islice
+from typing import Any, Iterable, Iterator
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+EVENT_STREAM_MEDIA_TYPE = "text/event-stream"
+
+# Items serialized per chunk written to the response
+STREAM_CHUNK_ITEMS = 500
+
+
+def _encode(item: Any) -> str:
+    return json.dumps(item, separators=(',', ':'))
+
+
+def _batches(items: Iterable[Any], size: int) -> Iterator[list]:
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def ndjson_chunks(items: Iterable[Any], chunk_items: int = STREAM_CHUNK_ITEMS) -> Iterator[bytes]:
+    """One JSON document per line"""
+    for batch in _batches(items, chunk_items):
+        yield ''.join(_encode(item) + '\n' for item in batch).encode()
+
+
+def json_array_chunks(items: Iterable[Any], chunk_items: int = STREAM_CHUNK_ITEMS) -> Iterator[bytes]:
+    """A single JSON array, written incrementally"""
+    separator = '['
+    for batch in _batches(items, chunk_items):
+        yield (separator + ','.join(_encode(item) for item in batch)).encode()
+        separator = ','
+    yield b'[]' if separator == '[' else b']'
+
+
+def wants_ndjson(request: Request) -> bool:
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def stream_response(request: Request, items: Iterable[Any]) -> StreamingResponse:
+    """
+    Stream items as NDJSON if the client accepts it, as a chunked JSON array otherwise.
+    Blocking iterators are consumed in the thread pool, one chunk at a time.
+    """
+    if wants_ndjson(request):
+        return StreamingResponse(ndjson_chunks(items), media_type=NDJSON_MEDIA_TYPE)
+    return StreamingResponse(json_array_chunks(items), media_type="application/json")
@@ -0,0 +1,59 @@
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Hashable, List, NamedTuple, Optional
+
+from ..core.utils.simplification import Point
+
+
+class SimplifiedTrajectory(NamedTuple):
+    last_contact: datetime
+    points: List[Point]
+
+
+class TrajectoryCache:
+    """
+    Simplified trajectories keyed by flight id and tolerance bucket.
+
+    An entry is only valid while the last contact of its flight is unchanged, so flights that are
+    still growing are simplified again while finished flights are served from memory.
+    The cache is bounded by the total number of cached points, least recently used entries are dropped first.
+    """
+
+    def __init__(self, max_points: int = 500_000):
+        self.max_points = max_points
+        self.points = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key)
+        self.points -= len(entry.points)
+
+    def get(self, flight_id: str, bucket: int, last_contact: datetime) -> Optional[List[Point]]:
+        key = (flight_id, bucket)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.last_contact != last_contact:
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.points
+
+    def put(self, flight_id: str, bucket: int, last_contact: datetime, points: List[Point]):
+        if len(points) > self.max_points:
+            return
+
+        key = (flight_id, bucket)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = SimplifiedTrajectory(last_contact, points)
+            self.points += len(points)
+            while self.points > self.max_points:
+                self._remove(next(iter(self._entries)))
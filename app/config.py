@@ -8,6 +8,8 @@ logger = logging.getLogger("Config")
 
 class AppState:
     mongodb = None
+    repository = None
+    aircraft_repository = None
     
 app_state = AppState()
 
@@ -55,12 +57,35 @@ class Config:
     RADAR_SERVICE_TYPE = 'vrs'
     MILTARY_ONLY = False
     DB_RETENTION_MIN = 1440
+    DB_RETENTION_DELETES_PER_SEC = 2000
     LOGGING_CONFIG = None
     UNKNOWN_AIRCRAFT_CRAWLING = False
+    TRAJECTORY_BUFFER_POSITIONS = 1500
     
     # Database configuration
+    DB_BACKEND = 'mongodb'
+    SQLITE_PATH = 'flightradar.sqlite'
+    MEMORY_RETENTION_MIN = 30
+    MEMORY_MAX_FLIGHTS = 1000
+    MEMORY_POSITIONS_PER_FLIGHT = 500
     MONGODB_URI = 'mongodb://localhost:27017/'
     MONGODB_DB_NAME = 'flightradar'
+    DB_POSITION_PARTITIONING = None
+    DB_TRAJECTORY_COMPACTION = False
+    DB_POSITION_ENCODING = 'double'
+
+    # Live websocket updates queued per client before they are merged, and lag before a client is dropped
+    WS_SEND_QUEUE_SIZE = 4
+    WS_MAX_LAG_SEC = 30
+
+    # Unix socket of the ingest process when running several API workers, None runs the updater in every process
+    LIVE_HUB_SOCKET = None
+    # Shared memory segment the ingest process writes the live flights to, instead of sending them over the socket
+    LIVE_SHARED_MEMORY = None
+
+    # Replicas sharing a MongoDB database elect the one that ingests, crawls and runs the database jobs
+    LEADER_ELECTION = False
+    LEADER_LEASE_SEC = 15
 
     def __init__(self, config_file='config.json'):
 
@@ -80,6 +105,10 @@ class Config:
     def str2bool(self, v):
         return v.lower() in ("yes", "true", "t", "1")
 
+    def normalize(self, v):
+        """Option values of the config file, case-insensitive like in the environment"""
+        return v.strip().lower() if isinstance(v, str) else v
+
     def sanitize_url(self, url):
         return url[:-1] if url[-1] == "/" else url
 
@@ -90,10 +119,26 @@ class Config:
         ENV_RADAR_SERVICE_TYPE = 'SERVICE_TYPE'
         ENV_MIL_ONLY = 'MIL_ONLY'
         ENV_DB_RETENTION_MIN = 'DB_RETENTION_MIN'
+        ENV_DB_RETENTION_DELETES_PER_SEC = 'DB_RETENTION_DELETES_PER_SEC'
         ENV_UNKNOWN_AIRCRAFT_CRAWLING = 'UNKNOWN_AIRCRAFT_CRAWLING'
+        ENV_TRAJECTORY_BUFFER_POSITIONS = 'TRAJECTORY_BUFFER_POSITIONS'
         ENV_LOGGING_CONFIG = 'LOGGING_CONFIG'
+        ENV_DB_BACKEND = 'DB_BACKEND'
+        ENV_SQLITE_PATH = 'SQLITE_PATH'
+        ENV_MEMORY_RETENTION_MIN = 'MEMORY_RETENTION_MIN'
+        ENV_MEMORY_MAX_FLIGHTS = 'MEMORY_MAX_FLIGHTS'
+        ENV_MEMORY_POSITIONS_PER_FLIGHT = 'MEMORY_POSITIONS_PER_FLIGHT'
         ENV_MONGODB_URI = 'MONGODB_URI'
         ENV_MONGODB_DB_NAME = 'MONGODB_DB_NAME'
+        ENV_DB_POSITION_PARTITIONING = 'DB_POSITION_PARTITIONING'
+        ENV_DB_TRAJECTORY_COMPACTION = 'DB_TRAJECTORY_COMPACTION'
+        ENV_DB_POSITION_ENCODING = 'DB_POSITION_ENCODING'
+        ENV_WS_SEND_QUEUE_SIZE = 'WS_SEND_QUEUE_SIZE'
+        ENV_WS_MAX_LAG_SEC = 'WS_MAX_LAG_SEC'
+        ENV_LIVE_HUB_SOCKET = 'LIVE_HUB_SOCKET'
+        ENV_LIVE_SHARED_MEMORY = 'LIVE_SHARED_MEMORY'
+        ENV_LEADER_ELECTION = 'LEADER_ELECTION'
+        ENV_LEADER_LEASE_SEC = 'LEADER_LEASE_SEC'
 
         if os.environ.get(ENV_DATA_FOLDER):
             self.DATA_FOLDER = os.environ.get(ENV_DATA_FOLDER)
@@ -110,16 +155,72 @@ class Config:
                 self.DB_RETENTION_MIN = int(os.environ.get(ENV_DB_RETENTION_MIN))
             except ValueError:
                 pass
+        if os.environ.get(ENV_DB_RETENTION_DELETES_PER_SEC):
+            try:
+                self.DB_RETENTION_DELETES_PER_SEC = int(os.environ.get(ENV_DB_RETENTION_DELETES_PER_SEC))
+            except ValueError:
+                pass
+        if os.environ.get(ENV_TRAJECTORY_BUFFER_POSITIONS):
+            try:
+                self.TRAJECTORY_BUFFER_POSITIONS = int(os.environ.get(ENV_TRAJECTORY_BUFFER_POSITIONS))
+            except ValueError:
+                pass
         if os.environ.get(ENV_LOGGING_CONFIG):
             try:
                 logging_json = json.loads(os.environ.get(ENV_LOGGING_CONFIG))
                 self.LOGGING_CONFIG = LoggingConfig.from_json(logging_json)
             except ValueError as e:
                 logging.getLogger().error(e)
+        if os.environ.get(ENV_DB_BACKEND):
+            self.DB_BACKEND = os.environ.get(ENV_DB_BACKEND).strip().lower()
+        if os.environ.get(ENV_SQLITE_PATH):
+            self.SQLITE_PATH = os.environ.get(ENV_SQLITE_PATH)
+        if os.environ.get(ENV_MEMORY_RETENTION_MIN):
+            try:
+                self.MEMORY_RETENTION_MIN = int(os.environ.get(ENV_MEMORY_RETENTION_MIN))
+            except ValueError:
+                pass
+        if os.environ.get(ENV_MEMORY_MAX_FLIGHTS):
+            try:
+                self.MEMORY_MAX_FLIGHTS = int(os.environ.get(ENV_MEMORY_MAX_FLIGHTS))
+            except ValueError:
+                pass
+        if os.environ.get(ENV_MEMORY_POSITIONS_PER_FLIGHT):
+            try:
+                self.MEMORY_POSITIONS_PER_FLIGHT = int(os.environ.get(ENV_MEMORY_POSITIONS_PER_FLIGHT))
+            except ValueError:
+                pass
         if os.environ.get(ENV_MONGODB_URI):
             self.MONGODB_URI = os.environ.get(ENV_MONGODB_URI)
         if os.environ.get(ENV_MONGODB_DB_NAME):
             self.MONGODB_DB_NAME = os.environ.get(ENV_MONGODB_DB_NAME)
+        if os.environ.get(ENV_DB_POSITION_PARTITIONING):
+            self.DB_POSITION_PARTITIONING = os.environ.get(ENV_DB_POSITION_PARTITIONING).strip().lower()
+        if os.environ.get(ENV_DB_TRAJECTORY_COMPACTION):
+            self.DB_TRAJECTORY_COMPACTION = self.str2bool(os.environ.get(ENV_DB_TRAJECTORY_COMPACTION))
+        if os.environ.get(ENV_DB_POSITION_ENCODING):
+            self.DB_POSITION_ENCODING = os.environ.get(ENV_DB_POSITION_ENCODING).strip().lower()
+        if os.environ.get(ENV_WS_SEND_QUEUE_SIZE):
+            try:
+                self.WS_SEND_QUEUE_SIZE = int(os.environ.get(ENV_WS_SEND_QUEUE_SIZE))
+            except ValueError:
+                pass
+        if os.environ.get(ENV_WS_MAX_LAG_SEC):
+            try:
+                self.WS_MAX_LAG_SEC = float(os.environ.get(ENV_WS_MAX_LAG_SEC))
+            except ValueError:
+                pass
+        if os.environ.get(ENV_LIVE_HUB_SOCKET):
+            self.LIVE_HUB_SOCKET = os.environ.get(ENV_LIVE_HUB_SOCKET)
+        if os.environ.get(ENV_LIVE_SHARED_MEMORY):
+            self.LIVE_SHARED_MEMORY = os.environ.get(ENV_LIVE_SHARED_MEMORY)
+        if os.environ.get(ENV_LEADER_ELECTION):
+            self.LEADER_ELECTION = self.str2bool(os.environ.get(ENV_LEADER_ELECTION))
+        if os.environ.get(ENV_LEADER_LEASE_SEC):
+            try:
+                self.LEADER_LEASE_SEC = float(os.environ.get(ENV_LEADER_LEASE_SEC))
+            except ValueError:
+                pass
         self.config_src = ConfigSource.ENV
 
     def from_file(self, filename):
@@ -146,6 +247,30 @@ class Config:
             if 'deleteAfterMinutes' in config:
                 self.DB_RETENTION_MIN = config['deleteAfterMinutes']  
 
+            if 'retentionDeletesPerSecond' in config:
+                self.DB_RETENTION_DELETES_PER_SEC = config['retentionDeletesPerSecond']
+
+            if 'trajectoryBufferPositions' in config:
+                self.TRAJECTORY_BUFFER_POSITIONS = config['trajectoryBufferPositions']
+
+            if 'websocketSendQueueSize' in config:
+                self.WS_SEND_QUEUE_SIZE = config['websocketSendQueueSize']
+
+            if 'websocketMaxLagSeconds' in config:
+                self.WS_MAX_LAG_SEC = config['websocketMaxLagSeconds']
+
+            if 'liveHubSocket' in config:
+                self.LIVE_HUB_SOCKET = config['liveHubSocket']
+
+            if 'liveSharedMemory' in config:
+                self.LIVE_SHARED_MEMORY = config['liveSharedMemory']
+
+            if 'leaderElection' in config:
+                self.LEADER_ELECTION = config['leaderElection']
+
+            if 'leaderLeaseSeconds' in config:
+                self.LEADER_LEASE_SEC = config['leaderLeaseSeconds']
+
             if 'logging' in config:
                 try:
                     self.LOGGING_CONFIG = LoggingConfig.from_json(config['logging'])
@@ -154,10 +279,26 @@ class Config:
                     
             if 'database' in config:
                 db_config = config['database']
+                if 'backend' in db_config:
+                    self.DB_BACKEND = self.normalize(db_config['backend'])
+                if 'sqlite_path' in db_config:
+                    self.SQLITE_PATH = db_config['sqlite_path']
+                if 'memory_retention_min' in db_config:
+                    self.MEMORY_RETENTION_MIN = db_config['memory_retention_min']
+                if 'memory_max_flights' in db_config:
+                    self.MEMORY_MAX_FLIGHTS = db_config['memory_max_flights']
+                if 'memory_positions_per_flight' in db_config:
+                    self.MEMORY_POSITIONS_PER_FLIGHT = db_config['memory_positions_per_flight']
                 if 'mongodb_uri' in db_config:
                     self.MONGODB_URI = db_config['mongodb_uri']
                 if 'mongodb_db_name' in db_config:
                     self.MONGODB_DB_NAME = db_config['mongodb_db_name']
+                if 'position_partitioning' in db_config:
+                    self.DB_POSITION_PARTITIONING = self.normalize(db_config['position_partitioning'])
+                if 'trajectory_compaction' in db_config:
+                    self.DB_TRAJECTORY_COMPACTION = db_config['trajectory_compaction']
+                if 'position_encoding' in db_config:
+                    self.DB_POSITION_ENCODING = self.normalize(db_config['position_encoding'])
 
             self.config_src = ConfigSource.FILE
 
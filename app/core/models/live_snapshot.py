@@ -0,0 +1,117 @@
+import json
+from datetime import datetime
+from typing import Callable, Collection, Dict, FrozenSet, NamedTuple, Optional, Tuple
+
+from .position_report import PositionReport
+from ..utils.time_util import to_datestring
+from ..utils.position_codec import Point, pack_positions
+
+
+def _encode(obj) -> bytes:
+    return json.dumps(obj, separators=(',', ':')).encode()
+
+
+class LiveSnapshot(NamedTuple):
+    """
+    Live state of one updater cycle, serialized once for all readers.
+
+    Flights are kept as encoded JSON objects, most recent contact first, so that any
+    limit is a join of a prefix. The other views are complete JSON documents, the
+    packed positions serve both /positions and the websocket initial message.
+    The encoded entries of single flights are kept as well, subsets such as the flights
+    within a bounding box are joined from them.
+    Snapshots are never modified, the coordinator replaces them as a whole.
+    """
+    generation: int
+    flights: Tuple[bytes, ...]
+    mil_flights: Tuple[bytes, ...]
+    positions: bytes
+    mil_positions: bytes
+    packed_positions: bytes
+    mil_packed_positions: bytes
+    initial_message: bytes
+    # Rank in the flights order and encoded flight, by flight id
+    flight_entries: Dict[str, Tuple[int, bytes]]
+    # Encoded '"id":[[lat,lon,alt]]' members of the positions document, by flight id
+    position_entries: Dict[str, bytes]
+    points: Dict[str, Point]
+    military: FrozenSet[str]
+    # Sequence number of the latest delta included, live clients resume from it
+    seq: int = 0
+
+    @classmethod
+    def empty(cls, generation: int = 0) -> 'LiveSnapshot':
+        return cls.build(generation, {}, {}, lambda icao24: False)
+
+    @classmethod
+    def build(cls, generation: int, cached_flights: Dict[str, PositionReport], last_contacts: Dict[str, datetime],
+              is_military: Callable[[str], bool], seq: int = 0) -> 'LiveSnapshot':
+        flights = []
+        points = {}
+        position_entries = {}
+        military = set()
+        initial = {}
+
+        for flight_id, pos in cached_flights.items():
+            flight_id = str(flight_id)
+            alt = pos.alt if pos.alt is not None else -1
+
+            points[flight_id] = (pos.lat, pos.lon, alt)
+            position_entries[flight_id] = _encode(flight_id) + b':' + _encode([[pos.lat, pos.lon, alt]])
+            initial[flight_id] = pos.__dict__
+            if pos.icao24 and is_military(pos.icao24):
+                military.add(flight_id)
+
+            last_contact = last_contacts.get(flight_id)
+            if last_contact:
+                contact = to_datestring(last_contact)
+                flights.append((contact, flight_id, _encode({
+                    "id": flight_id,
+                    "icao24": pos.icao24,
+                    "cls": pos.callsign,
+                    "lstCntct": contact,
+                    "firstCntct": contact  # For live flights, use last contact as first contact approximation
+                })))
+
+        flights.sort(key=lambda f: f[0], reverse=True)
+
+        return cls(
+            generation=generation,
+            flights=tuple(f[2] for f in flights),
+            mil_flights=tuple(f[2] for f in flights if f[1] in military),
+            positions=b'{' + b','.join(position_entries.values()) + b'}',
+            mil_positions=b'{' + b','.join(position_entries[k] for k in position_entries if k in military) + b'}',
+            packed_positions=pack_positions(points, seq=seq),
+            mil_packed_positions=pack_positions({k: v for k, v in points.items() if k in military}, seq=seq),
+            initial_message=_encode({"type": "initial", "seq": seq, "count": len(initial), "positions": initial}),
+            flight_entries={f[1]: (rank, f[2]) for rank, f in enumerate(flights)},
+            position_entries=position_entries,
+            points=points,
+            military=frozenset(military),
+            seq=seq
+        )
+
+    def _select(self, flight_ids: Collection[str], military_only: bool):
+        return [k for k in flight_ids if k in self.points and (not military_only or k in self.military)]
+
+    def flights_body(self, military_only: bool = False, limit: Optional[int] = None,
+                     flight_ids: Optional[Collection[str]] = None) -> bytes:
+        """JSON array of the most recently seen flights, optionally only of the given flights"""
+        if flight_ids is None:
+            flights = self.mil_flights if military_only else self.flights
+            return b'[' + b','.join(flights[:limit]) + b']'
+
+        selected = sorted(self.flight_entries[k] for k in self._select(flight_ids, military_only) if k in self.flight_entries)
+        return b'[' + b','.join(entry for _, entry in selected[:limit]) + b']'
+
+    def positions_body(self, military_only: bool = False, flight_ids: Optional[Collection[str]] = None) -> bytes:
+        """JSON positions document, optionally only of the given flights"""
+        if flight_ids is None:
+            return self.mil_positions if military_only else self.positions
+        return b'{' + b','.join(self.position_entries[k] for k in self._select(flight_ids, military_only)) + b'}'
+
+    def packed_positions_body(self, military_only: bool = False, flight_ids: Optional[Collection[str]] = None) -> bytes:
+        """Packed positions, optionally only of the given flights"""
+        if flight_ids is None:
+            return self.mil_packed_positions if military_only else self.packed_positions
+        return pack_positions({k: self.points[k] for k in self._select(flight_ids, military_only)}, seq=self.seq)
@@ -1,5 +1,5 @@
 import logging
-from typing import List
+from typing import Dict, List
 from datetime import datetime, timedelta, timezone
 
 from ..utils.modes_util import ModesUtil
@@ -18,28 +18,28 @@ class FlightManager:
         self._flight_callsign_cache = {}
         self.modeS_flightid_map = dict()
         self.flight_last_contact = dict()
-        self._use_ttl_indexes = True
-        self._retention_minutes = config.DB_RETENTION_MIN
-        
-        self._use_ttl_indexes = True
-        if self._retention_minutes <= 0:
-            self._use_ttl_indexes = False
-            logger.info("Document expiration disabled: no retention period specified")
 
     def initialize(self, repository):
         """Initializes cache from database with optimized loading"""
         self.repository = repository
         recent_flight_timestamp = self._threshold_timestamp()
         logger.info(f"Loading flights newer than {recent_flight_timestamp}")
+        loaded = self.load_recent_flights(recent_flight_timestamp)
+        logger.info(f"Flight manager cache initialized with {len(loaded)} recent flights")
 
+    def load_recent_flights(self, min_timestamp: datetime) -> Dict[str, PositionReport]:
+        """
+        Caches the flights with contact after min_timestamp as stored in the database,
+        returns their last positions by flight id
+        """
         page_size = 100
         last_id = None
         more_results = True
-        total_loaded = 0
+        last_positions = {}
 
         while more_results:
             results = self.repository.get_recent_flights_last_pos(
-                recent_flight_timestamp,
+                min_timestamp,
                 page_size=page_size,
                 last_id=last_id
             )
@@ -58,23 +58,21 @@ class FlightManager:
 
                 self.modeS_flightid_map[flight["modeS"]] = flight_id
 
-                pos_report = PositionReport(
-                    flight["modeS"], position["lat"], position["lon"],
-                    position.get("alt"), position.get("track", 0.0), flight.get("callsign"))
+                last_positions[flight_id] = PositionReport(
+                    flight["modeS"], position["lat"], position["lon"], position.get("alt"),
+                    gs=position.get("gs"), track=position.get("track"), callsign=flight.get("callsign"))
                 
                 self.flight_last_contact[flight_id] = flight["last_contact"]
                 
                 if flight.get("callsign"):
                     self._flight_callsign_cache[flight_id] = flight["callsign"].strip().upper() if flight["callsign"] else ""
-                
-                total_loaded += 1
 
             if len(results) < page_size:
                 more_results = False
             else:
-                logger.debug(f"Loaded {total_loaded} flights so far...")
-        
-        logger.info(f"Flight manager cache initialized with {total_loaded} recent flights")
+                logger.debug(f"Loaded {len(last_positions)} flights so far...")
+
+        return last_positions
     
     def _threshold_timestamp(self):
         """
@@ -166,9 +164,6 @@ class FlightManager:
             if callsign:
                 flight_data["callsign"] = callsign
             
-            if self._use_ttl_indexes and self._retention_minutes > 0:
-                flight_data["expire_at"] = now + timedelta(minutes=self._retention_minutes)
-            
             flight_obj = self.repository.get_or_create_flight(**flight_data)
             flight_id = str(flight_obj["_id"])
             
@@ -237,10 +232,6 @@ class FlightManager:
                 
                 update_data = {"last_contact": now}
                 
-                # Add expiration time if TTL indexes are enabled
-                if self._use_ttl_indexes and self._retention_minutes > 0:
-                    update_data["expire_at"] = now + timedelta(minutes=self._retention_minutes)
-                
                 self._update_flight(modeS, flight_id, f, now, update_data, callsign_updates, updated_flights)
                 
         if not unknown_modes:
@@ -303,10 +294,6 @@ class FlightManager:
                 
                 update_data = {"last_contact": now}
                 
-                # Add expiration time if TTL indexes are enabled
-                if self._use_ttl_indexes and self._retention_minutes > 0:
-                    update_data["expire_at"] = now + timedelta(minutes=self._retention_minutes)
-                
                 self._update_flight(modeS, flight_id, f, now, update_data, callsign_updates, updated_flights)
                 
                 db_callsign = matching_flight.get("callsign", "").strip().upper() if matching_flight.get("callsign") else ""
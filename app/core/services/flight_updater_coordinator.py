@@ -1,16 +1,21 @@
+import asyncio
 import logging
 import threading
-from typing import Any, Dict, Callable, Set, Optional
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Dict, Callable, Iterator, List, Set, Optional, Tuple
 
 from ...data.sources.radar_service_factory import RadarServiceFactory
 from .flight_manager import FlightManager
 from ...data.repositories.flight_repository import FlightRepository
-from .position_manager import PositionManager
+from .position_manager import LIVE_FLIGHT_MAX_AGE_SEC, PositionManager
 from ...data.repositories.position_repository import PositionRepository
-from ...data.repositories.mongodb_repository import MongoDBRepository
 from ...websocket.notifier import WebSocketNotifier
+from ...websocket.delta_log import Delta, DeltaLog, position_updates
 from ...monitoring.performance_monitor import PerformanceMonitor
 from ..models.position_report import PositionReport
+from ..models.live_snapshot import LiveSnapshot
+from ..utils.time_util import make_datetimes_comparable
+from ...data.spatial_grid import BoundingBox, SpatialGrid
 from .incomplete_aircraft_manager import IncompleteAircraftManager
 from ...config import app_state
 from ...exceptions import DatabaseException
@@ -25,21 +30,36 @@ class FlightUpdaterCoordinator:
         self.sleep_time = 1
         self._t = None
         self.interrupted = False
+        # Incremented after every update cycle, readers use it to tell whether the live state may have changed
+        self.generation = 0
+        # Serialized live state of the last cycle, replaced as a whole so readers need no lock
+        self.snapshot = LiveSnapshot.empty()
+        # Changed positions of the recent generations, shared by the live feeds
+        self.delta_log = DeltaLog()
+        # Grid index of the live positions, maintained incrementally with every cycle
+        self._spatial_index = SpatialGrid()
+        # Called on the updater thread with the snapshot and delta of every cycle
+        self._cycle_listeners: List[Callable[[LiveSnapshot, Optional[Delta]], None]] = []
+        # Flights the snapshot was built from
+        self._live_flights: Dict[str, PositionReport] = {}
+        # Earliest last contact of the flights in the snapshot, the snapshot is stale once it is too old
+        self._oldest_live_contact: Optional[datetime] = None
+        # Tells whether this process may write, checked before every write of a cycle
+        self._may_ingest: Callable[[], bool] = lambda: True
         
-    def initialize(self, config, mongodb=None):
+    def initialize(self, config, storage):
         """Initialize all components with configuration"""
         
         self._radar_service = RadarServiceFactory.create(config)
         
         self._retention_minutes = getattr(config, 'DB_RETENTION_MIN', 0)
-        self._use_ttl_indexes = self._retention_minutes > 0
         
-        if not self._use_ttl_indexes:
+        if self._retention_minutes <= 0:
             logger.info("Document expiration disabled: no retention period specified")
         else:
-            logger.info(f"Using TTL indexes for document expiration with retention of {self._retention_minutes} minutes")
+            logger.info(f"Flights and positions are purged by the retention worker after {self._retention_minutes} minutes")
             
-        db_repo = MongoDBRepository(mongodb)
+        db_repo = storage.repository
         
         # Create repositories
         self._flight_repository = FlightRepository(db_repo)
@@ -55,7 +75,8 @@ class FlightUpdaterCoordinator:
         self._websocket_notifier = WebSocketNotifier()
         self._performance_monitor = PerformanceMonitor()
         
-        self._unknown_aircraft_manager = IncompleteAircraftManager(config, mongodb)
+        self._unknown_aircraft_manager = IncompleteAircraftManager.create_with_repositories(
+            storage.aircraft_repository, storage.processing_repository)
             
         
         logger.info("Loading cached position data...")
@@ -66,27 +87,180 @@ class FlightUpdaterCoordinator:
                 self._position_manager.flight_lastpos_map[flight_id] = flight_pos
                 position_count += 1
         logger.info(f"Loaded {position_count} cached positions")
+        self._publish_snapshot()
 
     def is_service_alive(self) -> bool:
         """Check if the radar service connection is alive"""
         return self._radar_service.connection_alive
         
-    def register_websocket_callback(self, callback: Callable[[Dict[str, Any]], None]):
-        """Register a callback for WebSocket notifications"""
+    def attach_event_loop(self, loop: asyncio.AbstractEventLoop):
+        """Deliver WebSocket notifications on the server event loop"""
+        self._websocket_notifier.attach_loop(loop)
+
+    def register_websocket_callback(self, callback: Callable[[Delta], Awaitable[None]]):
+        """Register a coroutine callback for WebSocket notifications, called with the delta of each generation"""
         return self._websocket_notifier.register_callback(callback)
         
-    def unregister_websocket_callback(self, callback: Callable[[Dict[str, Any]], None]):
+    def unregister_websocket_callback(self, callback: Callable[[Delta], Awaitable[None]]):
         """Unregister a WebSocket callback"""
         return self._websocket_notifier.unregister_callback(callback)
+
+    def register_cycle_listener(self, listener: Callable[[LiveSnapshot, Optional[Delta]], None]):
+        """Call listener with the published snapshot and delta of every cycle, on the updater thread"""
+        self._cycle_listeners.append(listener)
         
     def get_cached_flights(self) -> Dict[str, PositionReport]:
         """Get flights with recent positions"""
         return self._position_manager.get_cached_flights(self._flight_manager)
         
+    def live_state(self) -> Tuple[Dict[str, PositionReport], Dict[str, Any], Callable[[str], bool]]:
+        """Flights of the published snapshot, their last contacts and the military test, for cycle listeners"""
+        return self._live_flights, self._flight_manager.flight_last_contact, self._flight_manager.mil_ranges.is_military
+
+    def get_flight_positions(self, flight_id: str, limit: Optional[int] = None,
+                             projection: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Get positions of a flight, from memory while the flight is active"""
+        return self._position_manager.get_flight_positions(flight_id, limit, projection)
+
+    def iter_flight_positions(self, flight_id: str, projection: Optional[Dict[str, Any]] = None,
+                              batch_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        """Iterate all positions of a flight, reading from the database in batches"""
+        return self._position_manager.iter_flight_positions(flight_id, projection, batch_size)
+
+    def flights_in_bbox(self, bbox: BoundingBox) -> Set[str]:
+        """Ids of the live flights positioned within the bounding box"""
+        return self._spatial_index.query(bbox)
+
+    def nearest_flights(self, lat: float, lon: float, k: int,
+                        accept: Optional[Callable[[str], bool]] = None) -> List[Tuple[float, str]]:
+        """(distance in km, flight id) of the k live flights closest to the point"""
+        return self._spatial_index.nearest(lat, lon, k, accept)
+
+    def flights_within(self, lat: float, lon: float, radius_km: float,
+                       accept: Optional[Callable[[str], bool]] = None) -> List[Tuple[float, str]]:
+        """(distance in km, flight id) of the live flights within the radius, closest first"""
+        return self._spatial_index.within(lat, lon, radius_km, accept)
+
+    def _update_spatial_index(self, cached_flights: Dict[str, PositionReport]):
+        """Move flights with new positions to their cell, drop flights that are no longer live"""
+        changed = self._position_manager.get_changed_flight_ids()
+        for flight_id, pos in cached_flights.items():
+            if flight_id in changed or flight_id not in self._spatial_index:
+                self._spatial_index.update(flight_id, pos.lat, pos.lon)
+
+        if len(self._spatial_index) > len(cached_flights):
+            self._spatial_index.remove(self._spatial_index.flight_ids() - cached_flights.keys())
+
+    def _publish_snapshot(self) -> Optional[Delta]:
+        """Serialize the live state of the current generation and swap it in, returns the delta of this generation"""
+        try:
+            cached_flights = self.get_cached_flights()
+            self._live_flights = cached_flights
+            last_contacts = self._flight_manager.flight_last_contact
+            self._oldest_live_contact = min((last_contacts[k] for k in cached_flights if k in last_contacts),
+                                            key=lambda dt: dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc),
+                                            default=None)
+            self._update_spatial_index(cached_flights)
+            delta = self._record_delta(cached_flights)
+            self.snapshot = LiveSnapshot.build(
+                self.generation,
+                cached_flights,
+                self._flight_manager.flight_last_contact,
+                self._flight_manager.mil_ranges.is_military,
+                seq=self.delta_log.last_seq
+            )
+            return delta
+        except Exception as e:
+            logger.exception(f"Failed to build live snapshot: {str(e)}")
+            return None
+
+    def _record_delta(self, cached_flights: Dict[str, PositionReport]) -> Optional[Delta]:
+        """Append the changed positions of this generation to the delta log"""
+        if not self._position_manager.has_positions_changed():
+            return None
+
+        positions = position_updates(cached_flights, self._position_manager.get_changed_flight_ids())
+        if not positions:
+            return None
+        return self.delta_log.append(self.generation, positions)
+
+    def _publish_generation(self):
+        """Publish the live state as a new generation, called with the update lock held"""
+        self.generation += 1
+        delta = self._publish_snapshot()
+        # Websocket clients are notified once the snapshot and the spatial index of the new generation are published
+        self._notify_websockets(delta)
+        self._notify_cycle_listeners(delta)
+
+    def _notify_cycle_listeners(self, delta: Optional[Delta]):
+        for listener in self._cycle_listeners:
+            try:
+                listener(self.snapshot, delta)
+            except Exception as e:
+                logger.exception(f"Failed to notify cycle listener: {str(e)}")
+
+    def _notify_websockets(self, delta: Optional[Delta]):
+        """Broadcast the changed positions via WebSocket if needed"""
+        if delta is None or not self._websocket_notifier.has_callbacks():
+            return
+
+        try:
+            self._performance_monitor.start_timer('websocket')
+            self._websocket_notifier.notify_clients(delta)
+            self._performance_monitor.stop_timer('websocket')
+        except Exception as e:
+            logger.exception(f"Failed to notify websocket clients: {str(e)}")
+
     def get_silhouete_params(self):
         """Get silhouette parameters from radar service"""
         return self._radar_service.get_silhouete_params()
 
+    def set_ingest_guard(self, may_ingest: Callable[[], bool]):
+        """Skip the writes of a cycle unless may_ingest(), e.g. while this replica holds the leader lease"""
+        self._may_ingest = may_ingest
+
+    def evict_idle_trajectories(self):
+        """Drop the trajectory buffers of flights that went idle"""
+        self._position_manager.evict_idle_trajectories(self._flight_manager)
+
+    def reset_trajectories(self):
+        """Drop all trajectory buffers, when another replica stored positions meanwhile or may store them from now on"""
+        self._position_manager.clear_trajectories()
+
+    def load_recent_state(self, min_timestamp: datetime):
+        """
+        Refresh the live state from the flights stored with contact after min_timestamp, without
+        querying the radar. Replicas that do not ingest follow the leader with it, and a replica
+        taking over ingestion continues the flights of the previous leader.
+        """
+        with FlightUpdaterCoordinator._update_lock:
+            try:
+                self._position_manager.clear_changes()
+                last_positions = self._flight_manager.load_recent_flights(min_timestamp)
+                self._position_manager.set_last_positions(last_positions)
+            except Exception as e:
+                logger.exception(f"Failed to load the recent flights: {str(e)}")
+            finally:
+                self._publish_generation()
+
+    def expire_stale_flights(self):
+        """
+        Publish a generation without the flights that stopped reporting once the snapshot holds one,
+        for when no update cycle publishes meanwhile. Run on a timer
+        """
+        oldest, cutoff = self._oldest_live_contact, datetime.now(timezone.utc) - timedelta(seconds=LIVE_FLIGHT_MAX_AGE_SEC)
+        if oldest is None or make_datetimes_comparable(oldest, cutoff)[0] > cutoff:
+            return
+
+        # A cycle in progress publishes a new generation anyway
+        if not FlightUpdaterCoordinator._update_lock.acquire(blocking=False):
+            return
+        try:
+            self._position_manager.clear_changes()
+            self._publish_generation()
+        finally:
+            FlightUpdaterCoordinator._update_lock.release()
+
     def update(self):
         """Main update method that coordinates the update process"""
         # Use thread lock to prevent concurrent updates
@@ -105,7 +279,7 @@ class FlightUpdaterCoordinator:
             positions = self._radar_service.query_live_flights(False)
             self._performance_monitor.stop_timer('service')
                 
-            if not positions:
+            if not positions or not self._may_ingest():
                 return        
             live_icao24s = {pos.icao24 for pos in positions if pos.icao24}
             self._unknown_aircraft_manager.schedule_aircraft_for_processing(live_icao24s)
@@ -123,24 +297,14 @@ class FlightUpdaterCoordinator:
                 self._flight_manager.update_flights(filtered_pos)
                 self._performance_monitor.stop_timer('flight')
 
+                if not self._may_ingest():
+                    logger.warning("No longer allowed to ingest, dropping the positions of this cycle")
+                    return
+
                 self._performance_monitor.start_timer('position')
                 self._position_manager.add_positions(valid_positions, self._flight_manager)
                 self._performance_monitor.stop_timer('position')
 
-                # Broadcast positions via WebSocket if needed
-                if (self._websocket_notifier.has_callbacks() and 
-                    self._position_manager.has_positions_changed() and 
-                    len(self._position_manager.get_changed_flight_ids()) > 0):
-                    
-                    self._performance_monitor.start_timer('websocket')
-                    
-                    all_cached_flights = self.get_cached_flights()
-                    changed_flight_ids = self._position_manager.get_changed_flight_ids()
-                    
-                    self._websocket_notifier.notify_position_changes(all_cached_flights, changed_flight_ids)
-                        
-                    self._performance_monitor.stop_timer('websocket')
-
             except (KeyboardInterrupt, SystemExit):
                 raise
             except Exception as e:
@@ -152,6 +316,7 @@ class FlightUpdaterCoordinator:
             self._performance_monitor.log_performance(threshold=0.2)
             
         finally:
+            self._publish_generation()
             self.is_updating = False
             FlightUpdaterCoordinator._update_lock.release()
 
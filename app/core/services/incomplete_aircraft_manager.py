@@ -25,7 +25,7 @@ class IncompleteAircraftManager:
 
     @classmethod
     def create_with_repositories(cls, aircraft_repo: AircraftRepository, processing_aircraft_repo: AircraftProcessingRepository):
-        """Create manager with existing repositories (for testing)"""
+        """Create manager with existing repositories, e.g. those of the configured storage backend"""
         instance = cls.__new__(cls)
         instance.aircraft_repo = aircraft_repo
         instance.processing_aircraft_repo = processing_aircraft_repo
@@ -80,9 +80,7 @@ class IncompleteAircraftManager:
                     aircraft_to_process.append(icao24)
                     continue
 
-                aircraft_doc = self.aircraft_repo.db[self.aircraft_repo.collection_name].find_one(
-                    {"modeS": icao24.strip().upper()}
-                )
+                aircraft_doc = self.aircraft_repo.get_aircraft_record(icao24)
 
                 if aircraft_doc:
                     last_modified = aircraft_doc.get("lastModified")
@@ -0,0 +1,113 @@
+"""
+Leader election of the application replicas
+
+With several replicas sharing a MongoDB database, only one of them may ingest positions,
+crawl aircraft metadata and run the database maintenance jobs. The replicas compete for
+a lease, a lock document holding the owner and the expiry of the lease. The leader renews
+it every heartbeat, the other replicas take it over once it has expired.
+
+Expiry is computed from the time of the database server, so the clocks of the replicas
+do not need to agree. The leader considers itself the leader until its lease would expire
+by its own clock, counted from before the renewal was sent: it steps down before any other
+replica can acquire the lease, even while the database cannot be reached.
+"""
+
+import logging
+import os
+import socket
+import time
+import uuid
+from typing import Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+logger = logging.getLogger('LeaderLease')
+
+LEASE_COLLECTION = 'leader_lease'
+INGEST_LEASE = 'ingest'
+DEFAULT_LEASE_SEC = 15
+# Renewals per lease period, the leader survives missing all but the last one
+HEARTBEATS_PER_LEASE = 3
+
+
+def replica_id() -> str:
+    """Owner id of this process, unique across restarts"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class LeaderLease:
+    """Lease of the leader role, acquired and renewed with a single atomic update of the lock document"""
+
+    def __init__(self, collection, ttl_sec: float = DEFAULT_LEASE_SEC, name: str = INGEST_LEASE,
+                 owner: Optional[str] = None):
+        self._collection = collection
+        self.ttl_sec = ttl_sec
+        self.name = name
+        self.owner = owner or replica_id()
+        # Monotonic time until which this replica holds the lease, None if it does not
+        self._valid_until: Optional[float] = None
+        # Monotonic time of the latest renewal attempt, None before the first one
+        self.last_checked: Optional[float] = None
+        self._released = False
+
+    @property
+    def heartbeat_sec(self) -> float:
+        return self.ttl_sec / HEARTBEATS_PER_LEASE
+
+    @property
+    def is_leader(self) -> bool:
+        return self._valid_until is not None and time.monotonic() < self._valid_until
+
+    def renew(self) -> bool:
+        """Acquire the lease if it is free or expired, extend it if it is held by this replica. Returns is_leader"""
+        if self._released:
+            return False
+
+        started = time.monotonic()
+        try:
+            self._collection.find_one_and_update(
+                {
+                    "_id": self.name,
+                    "$or": [
+                        {"owner": self.owner},
+                        {"$expr": {"$lt": ["$expires", "$$NOW"]}}
+                    ]
+                },
+                [{"$set": {
+                    "owner": self.owner,
+                    "expires": {"$add": ["$$NOW", int(self.ttl_sec * 1000)]},
+                    "renewed": "$$NOW"
+                }}],
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            if self._valid_until is None:
+                logger.info(f"Acquired the {self.name} lease as {self.owner}")
+            self._valid_until = started + self.ttl_sec
+        except DuplicateKeyError:
+            # The lock document exists and did not match: another replica holds the lease
+            if self._valid_until is not None:
+                logger.warning(f"The {self.name} lease was taken over by another replica")
+            self._valid_until = None
+        except PyMongoError as e:
+            # Still the leader until the lease runs out, unless a renewal succeeds before
+            logger.error(f"Failed to renew the {self.name} lease: {str(e)}")
+            if not self.is_leader:
+                self._valid_until = None
+        finally:
+            self.last_checked = time.monotonic()
+
+        return self.is_leader
+
+    def release(self):
+        """Give up the lease on shutdown so that another replica takes over without waiting for it to expire"""
+        self._released = True
+        if self._valid_until is None:
+            return
+        self._valid_until = None
+        try:
+            self._collection.delete_one({"_id": self.name, "owner": self.owner})
+            logger.info(f"Released the {self.name} lease")
+        except PyMongoError as e:
+            logger.error(f"Failed to release the {self.name} lease: {str(e)}")
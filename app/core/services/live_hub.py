@@ -0,0 +1,344 @@
+"""
+Live state shared by the API worker processes
+
+With several uvicorn workers, a single ingest process runs the flight updater and
+publishes the snapshot and delta of every cycle over a Unix domain socket. The other
+workers mirror that live state in a LiveReplica and serve the REST and websocket
+endpoints from it. The ingest process is the one holding the lock file next to the
+socket, it is released when the process exits.
+
+Messages are encoded once per cycle on the updater thread and written to all workers:
+a JSON header with the generation and the deltas, followed by the live flights as
+fixed size records of the shared memory layout. Nothing received is executed, and both
+ends check that the peer runs as the same user. The socket belongs in a directory only
+accessible to that user. With a shared memory segment, the flights are written there
+instead and the messages only carry the deltas, workers read the live state straight
+from the segment.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import struct
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from ..models.live_snapshot import LiveSnapshot
+from .live_shared_memory import LiveStateReader, LiveStateWriter, decode_flights, encode_flights
+from ...data.spatial_grid import BoundingBox, SpatialGrid
+from ...websocket.delta_log import Delta, DeltaLog
+from ...websocket.notifier import WebSocketNotifier
+
+logger = logging.getLogger('LiveHub')
+
+# Lengths of the JSON header and of the flight records that follow it
+_HEADER = struct.Struct('>II')
+# pid, uid, gid of the peer of a Unix socket
+_PEERCRED = struct.Struct('3i')
+# Messages: full state on connect, then one per updater cycle
+STATE = 'state'
+CYCLE = 'cycle'
+
+# Unsent bytes before a worker is dropped, it reconnects and receives the full state
+MAX_WORKER_BUFFER = 64 * 1024 * 1024
+RECONNECT_DELAY_SEC = 1.0
+
+
+def _frame(header: Dict[str, Any], flights: bytes = b'') -> bytes:
+    meta = json.dumps(header, separators=(',', ':')).encode()
+    return _HEADER.pack(len(meta), len(flights)) + meta + flights
+
+
+def _delta_list(delta: Optional[Delta]) -> Optional[List]:
+    return [delta.seq, delta.generation, delta.positions] if delta is not None else None
+
+
+def _peer_is_same_user(writer: asyncio.StreamWriter) -> bool:
+    """Whether the process at the other end of the socket runs as the user of this one"""
+    if not hasattr(socket, 'SO_PEERCRED'):
+        # Not available on this platform, only the permissions of the socket directory apply
+        return True
+    sock = writer.get_extra_info('socket')
+    _, uid, _ = _PEERCRED.unpack(sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, _PEERCRED.size))
+    return uid == os.geteuid()
+
+
+def acquire_ingest_lock(socket_path: str) -> Optional[int]:
+    """
+    Take the ingest role: an exclusive lock on the lock file of the socket, held until the
+    process exits. Returns the locked file descriptor, None if another process holds it
+    """
+    import fcntl
+
+    fd = os.open(socket_path + '.lock', os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        os.close(fd)
+        return None
+    return fd
+
+
+class LiveHub:
+    """Publishes the live state of the ingest process to the API workers"""
+
+    def __init__(self, updater, socket_path: str, shared_state: Optional[LiveStateWriter] = None):
+        self._updater = updater
+        self.socket_path = socket_path
+        self._shared_state = shared_state
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._workers: Set[asyncio.StreamWriter] = set()
+
+    @property
+    def workers(self) -> int:
+        return len(self._workers)
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        directory = os.path.dirname(os.path.abspath(self.socket_path))
+        if os.stat(directory).st_mode & 0o077:
+            logger.warning(f"{directory} is accessible by other users, keep the live hub socket in a private directory")
+        # The lock is held, a socket file left over is from a previous ingest process
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self._server = await asyncio.start_unix_server(self._connected, path=self.socket_path)
+        os.chmod(self.socket_path, 0o600)
+        self._updater.register_cycle_listener(self.publish)
+        logger.info(f"Publishing live state on {self.socket_path}")
+
+    def close(self):
+        if self._server is not None:
+            self._server.close()
+        for writer in list(self._workers):
+            writer.close()
+        self._workers.clear()
+        if self._shared_state is not None:
+            self._shared_state.close()
+
+    def _flights(self) -> Tuple[Optional[int], bytes]:
+        """Number of live flights and their records, None if the workers read them from shared memory"""
+        if self._shared_state is not None:
+            return None, b''
+        flights, last_contacts, is_military = self._updater.live_state()
+        return len(flights), encode_flights(flights, last_contacts, is_military)
+
+    async def _connected(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        if not _peer_is_same_user(writer):
+            logger.warning("Refused a live state connection of another user")
+            writer.close()
+            return
+
+        updater = self._updater
+        delta_log = updater.delta_log
+        snapshot = updater.snapshot
+        count, flights = self._flights()
+        writer.write(_frame({
+            "type": STATE,
+            "generation": snapshot.generation,
+            "seq": snapshot.seq,
+            "flights": count,
+            "deltas": [_delta_list(d) for d in delta_log.deltas()],
+            "last_seq": delta_log.last_seq
+        }, flights))
+        self._workers.add(writer)
+        logger.info(f"API worker connected, {len(self._workers)} workers")
+
+        # Workers do not send anything, reading only tells when they are gone
+        try:
+            await reader.read()
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self._workers.discard(writer)
+            writer.close()
+            logger.info(f"API worker disconnected, {len(self._workers)} workers")
+
+    def publish(self, snapshot: LiveSnapshot, delta: Optional[Delta]):
+        """Cycle listener: encode the cycle once on the updater thread, write it on the event loop"""
+        if self._shared_state is not None:
+            self._shared_state.write(snapshot.generation, snapshot.seq, *self._updater.live_state())
+        if not self._workers or self._loop is None:
+            return
+        count, flights = self._flights()
+        data = _frame({
+            "type": CYCLE,
+            "generation": snapshot.generation,
+            "seq": snapshot.seq,
+            "flights": count,
+            "delta": _delta_list(delta)
+        }, flights)
+        try:
+            self._loop.call_soon_threadsafe(self._write, data)
+        except RuntimeError:
+            logger.debug("Event loop closed, skipping live state")
+
+    def _write(self, data: bytes):
+        for writer in list(self._workers):
+            if writer.transport.get_write_buffer_size() > MAX_WORKER_BUFFER:
+                logger.warning("API worker does not keep up with the live state, disconnecting")
+                self._workers.discard(writer)
+                writer.close()
+            else:
+                writer.write(data)
+
+
+class LiveReplica:
+    """
+    Live state of the ingest process mirrored by an API worker, in place of the flight updater.
+    Provides the read side of FlightUpdaterCoordinator: snapshot, delta log, spatial queries
+    and websocket callbacks. Flight positions are read from the database.
+    With shared memory, the snapshot is rebuilt from the segment when a message of the ingest process
+    tells that its generation changed, never by the readers of the snapshot.
+    """
+
+    def __init__(self, socket_path: str, position_repository, shared_state: Optional[LiveStateReader] = None):
+        self.socket_path = socket_path
+        self._position_repository = position_repository
+        self._shared_state = shared_state
+        self.generation = 0
+        self._snapshot = LiveSnapshot.empty()
+        self.delta_log = DeltaLog()
+        self.connected = False
+        # Sequence number of the latest delta of the ingest process applied
+        self._seq: Optional[int] = None
+        self._spatial_index = SpatialGrid()
+        self._websocket_notifier = WebSocketNotifier()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def snapshot(self) -> LiveSnapshot:
+        """Snapshot of the latest cycle applied, replaced as a whole so readers need no lock"""
+        return self._snapshot
+
+    def _refresh(self):
+        """Rebuild the snapshot from shared memory if it holds a newer generation, on the thread applying the messages"""
+        if self._shared_state.generation() in (None, self.generation):
+            return
+        snapshot = self._shared_state.snapshot()
+        if snapshot is not None:
+            points = self._snapshot.points
+            self._publish(snapshot, {k for k, p in snapshot.points.items() if points.get(k) != p})
+
+    def attach_event_loop(self, loop: asyncio.AbstractEventLoop):
+        self._websocket_notifier.attach_loop(loop)
+
+    def start(self):
+        """Follow the ingest process, reconnecting until the application stops"""
+        if self._shared_state is not None:
+            self._shared_state.open()
+        self._task = asyncio.get_running_loop().create_task(self._follow())
+
+    def close(self):
+        if self._task is not None:
+            self._task.cancel()
+        if self._shared_state is not None:
+            self._shared_state.close()
+
+    def register_websocket_callback(self, callback: Callable[[Delta], Awaitable[None]]):
+        return self._websocket_notifier.register_callback(callback)
+
+    def unregister_websocket_callback(self, callback: Callable[[Delta], Awaitable[None]]):
+        return self._websocket_notifier.unregister_callback(callback)
+
+    def get_flight_positions(self, flight_id: str, limit: Optional[int] = None,
+                             projection: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        return self._position_repository.get_positions(flight_id, limit, projection)
+
+    def iter_flight_positions(self, flight_id: str, projection: Optional[Dict[str, Any]] = None,
+                              batch_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        return self._position_repository.iter_positions(flight_id, projection, batch_size=batch_size)
+
+    def flights_in_bbox(self, bbox: BoundingBox) -> Set[str]:
+        return self._spatial_index.query(bbox)
+
+    def nearest_flights(self, lat: float, lon: float, k: int,
+                        accept: Optional[Callable[[str], bool]] = None) -> List[Tuple[float, str]]:
+        return self._spatial_index.nearest(lat, lon, k, accept)
+
+    def flights_within(self, lat: float, lon: float, radius_km: float,
+                       accept: Optional[Callable[[str], bool]] = None) -> List[Tuple[float, str]]:
+        return self._spatial_index.within(lat, lon, radius_km, accept)
+
+    async def _follow(self):
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.socket_path)
+            except (ConnectionError, FileNotFoundError, OSError):
+                await asyncio.sleep(RECONNECT_DELAY_SEC)
+                continue
+
+            if not _peer_is_same_user(writer):
+                logger.error(f"{self.socket_path} is served by another user, not following it")
+                writer.close()
+                await asyncio.sleep(RECONNECT_DELAY_SEC)
+                continue
+
+            logger.info(f"Following the live state on {self.socket_path}")
+            try:
+                while True:
+                    header_size, flights_size = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+                    header = await reader.readexactly(header_size)
+                    flights = await reader.readexactly(flights_size)
+                    # Decoded and applied off the event loop, like the cycles of the flight updater
+                    await asyncio.to_thread(self._apply_frame, header, flights)
+                    self.connected = True
+            except (asyncio.IncompleteReadError, ConnectionError, OSError):
+                logger.warning("Lost the connection to the ingest process, reconnecting")
+            finally:
+                self.connected = False
+                writer.close()
+            await asyncio.sleep(RECONNECT_DELAY_SEC)
+
+    def _apply_frame(self, header: bytes, flights: bytes):
+        self.apply(json.loads(header), flights)
+
+    def apply(self, message: Dict[str, Any], flights: bytes = b''):
+        """Apply a message of the ingest process, websocket clients are notified on the event loop"""
+        snapshot = None
+        if message["flights"] is not None:
+            cached_flights, last_contacts, military = decode_flights(flights)
+            snapshot = LiveSnapshot.build(message["generation"], cached_flights, last_contacts,
+                                          military.__contains__, seq=message["seq"])
+
+        if message["type"] == STATE:
+            self._seq = message["last_seq"]
+            for seq, generation, positions in message["deltas"]:
+                self.delta_log.append(generation, positions, seq)
+            if snapshot is None:
+                # The segment of a restarted ingest process is a new one
+                self._shared_state.open()
+                self.generation = 0
+                self._refresh()
+            else:
+                self._publish(snapshot, snapshot.points)
+        elif message["type"] == CYCLE:
+            delta = message["delta"]
+            if delta is not None:
+                seq, generation, positions = delta
+                if self._seq is not None and seq <= self._seq:
+                    # A cycle published while the worker connected may already be part of the state
+                    delta = None
+                else:
+                    delta = self.delta_log.append(generation, positions, seq)
+                    self._seq = seq
+
+            if snapshot is None:
+                self._refresh()
+            elif snapshot.generation >= self.generation:
+                self._publish(snapshot, delta.positions if delta is not None else ())
+            if delta is not None:
+                self._websocket_notifier.notify_clients(delta)
+
+    def _publish(self, snapshot: LiveSnapshot, changed):
+        # Same incremental maintenance of the spatial index as the flight updater
+        points = snapshot.points
+        for flight_id, point in points.items():
+            if flight_id in changed or flight_id not in self._spatial_index:
+                self._spatial_index.update(flight_id, point[0], point[1])
+        if len(self._spatial_index) > len(points):
+            self._spatial_index.remove(self._spatial_index.flight_ids() - points.keys())
+
+        self.generation = snapshot.generation
+        self._snapshot = snapshot
@@ -0,0 +1,250 @@
+"""
+Live aircraft state in shared memory
+
+The ingest process writes the flights of every updater cycle into a shared memory
+segment, API workers read them without a round trip to the ingest process.
+
+Layout: a header followed by two record arrays of fixed capacity. The writer fills the
+buffer that is not active and then switches the active index, so readers always find a
+complete generation. A buffer's generation is cleared while it is written; readers
+check it before and after reading a buffer and retry if it changed, they never block
+the writer.
+"""
+
+import logging
+import struct
+from datetime import datetime, timedelta, timezone
+from multiprocessing import shared_memory
+from typing import Callable, Dict, Iterable, Optional, Set, Tuple
+
+from ..models.live_snapshot import LiveSnapshot
+from ..models.position_report import PositionReport
+
+logger = logging.getLogger('LiveSharedMemory')
+
+MAGIC = b'FRLIVE01'
+DEFAULT_CAPACITY = 20_000
+READ_ATTEMPTS = 5
+
+# Magic, capacity, active buffer
+_HEADER = struct.Struct('<8sII')
+# Per buffer: generation (0 while written), snapshot seq, record count
+_BUFFER_HEADER = struct.Struct('<QqI4x')
+# Flight id, icao24, callsign, lat, lon, alt, track, gs, last contact in us, flags
+_RECORD = struct.Struct('<12s8s8sdddddqB3x')
+
+_NAN = float('nan')
+_MICROSECOND = timedelta(microseconds=1)
+_MILITARY = 1
+_AWARE = 2
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _segment_size(capacity: int) -> int:
+    return _HEADER.size + 2 * _BUFFER_HEADER.size + 2 * capacity * _RECORD.size
+
+
+def _buffer_header_offset(index: int) -> int:
+    return _HEADER.size + index * _BUFFER_HEADER.size
+
+
+def _records_offset(capacity: int, index: int) -> int:
+    return _HEADER.size + 2 * _BUFFER_HEADER.size + index * capacity * _RECORD.size
+
+
+def _number(value: float):
+    """Inverse of the float encoding of optional numbers"""
+    if value != value:
+        return None
+    return int(value) if value.is_integer() else value
+
+
+def _text(value: bytes) -> Optional[str]:
+    return value.rstrip(b'\0').decode() or None
+
+
+def _record(flight_id: str, pos: PositionReport, contact: Optional[datetime],
+            is_military: Callable[[str], bool]) -> Tuple:
+    """Values of the record of a flight"""
+    flags = _MILITARY if pos.icao24 and is_military(pos.icao24) else 0
+    contact_us = 0
+    if contact is not None:
+        if contact.tzinfo:
+            flags |= _AWARE
+        else:
+            # Naive contacts are UTC
+            contact = contact.replace(tzinfo=timezone.utc)
+        contact_us = (contact - _EPOCH) // _MICROSECOND
+
+    return (bytes.fromhex(str(flight_id)),
+            (pos.icao24 or '').encode()[:8],
+            (pos.callsign or '').encode()[:8],
+            pos.lat, pos.lon,
+            pos.alt if pos.alt is not None else _NAN,
+            pos.track if pos.track is not None else _NAN,
+            pos.gs if pos.gs is not None else _NAN,
+            contact_us, flags)
+
+
+def _decode_records(records: Iterable[Tuple]) -> Tuple[Dict[str, PositionReport], Dict[str, datetime], Set[str]]:
+    """Flights, last contacts and military icao24s of unpacked records"""
+    flights, contacts, military = {}, {}, set()
+    for flight_id, icao24, callsign, lat, lon, alt, track, gs, contact_us, flags in records:
+        flight_id = flight_id.hex()
+        icao24 = _text(icao24)
+        flights[flight_id] = PositionReport(icao24, lat, lon, _number(alt),
+                                            gs=_number(gs), track=_number(track), callsign=_text(callsign))
+        if contact_us:
+            contact = _EPOCH + contact_us * _MICROSECOND
+            contacts[flight_id] = contact if flags & _AWARE else contact.replace(tzinfo=None)
+        if flags & _MILITARY and icao24:
+            military.add(icao24)
+    return flights, contacts, military
+
+
+def encode_flights(cached_flights: Dict[str, PositionReport], last_contacts: Dict[str, datetime],
+                   is_military: Callable[[str], bool]) -> bytes:
+    """Flights as consecutive records of the segment layout, e.g. to send them to another process"""
+    return b''.join(_RECORD.pack(*_record(flight_id, pos, last_contacts.get(flight_id), is_military))
+                    for flight_id, pos in cached_flights.items())
+
+
+def decode_flights(data: bytes) -> Tuple[Dict[str, PositionReport], Dict[str, datetime], Set[str]]:
+    """Inverse of encode_flights: flights, last contacts and military icao24s"""
+    return _decode_records(_RECORD.iter_unpack(data))
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Attach to an existing segment, without the resource tracker unlinking it when this process exits"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        pass
+
+    # Python < 3.13 registers attached segments as if this process owned them
+    from multiprocessing import resource_tracker
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None if rtype == 'shared_memory' else register(name, rtype)
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+class LiveStateWriter:
+    """Writes the flights of every cycle to the segment, used by the ingest process only"""
+
+    def __init__(self, name: str, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = capacity
+        size = _segment_size(capacity)
+        try:
+            self._segment = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # Left over by an ingest process that did not shut down
+            stale = _attach(name)
+            stale.close()
+            stale.unlink()
+            self._segment = shared_memory.SharedMemory(name=name, create=True, size=size)
+
+        self._active = 0
+        self._truncated = False
+        _HEADER.pack_into(self._segment.buf, 0, MAGIC, capacity, self._active)
+
+    def close(self):
+        self._segment.close()
+        self._segment.unlink()
+
+    def write(self, generation: int, seq: int, cached_flights: Dict[str, PositionReport],
+              last_contacts: Dict[str, datetime], is_military: Callable[[str], bool]):
+        buf = self._segment.buf
+        index = 1 - self._active
+        header_offset = _buffer_header_offset(index)
+        offset = _records_offset(self.capacity, index)
+
+        # Readers of this buffer, two generations old, retry from now on
+        _BUFFER_HEADER.pack_into(buf, header_offset, 0, seq, 0)
+
+        count = 0
+        for flight_id, pos in cached_flights.items():
+            if count == self.capacity:
+                if not self._truncated:
+                    logger.warning(f"More than {self.capacity} live flights, the shared live state is truncated")
+                    self._truncated = True
+                break
+
+            _RECORD.pack_into(buf, offset + count * _RECORD.size,
+                              *_record(flight_id, pos, last_contacts.get(flight_id), is_military))
+            count += 1
+
+        _BUFFER_HEADER.pack_into(buf, header_offset, generation, seq, count)
+        self._active = index
+        _HEADER.pack_into(buf, 0, MAGIC, self.capacity, index)
+
+
+class LiveStateReader:
+    """Reads the flights of the latest cycle from the segment written by the ingest process"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._segment: Optional[shared_memory.SharedMemory] = None
+
+    def open(self) -> bool:
+        """(Re)attach to the segment, e.g. after the ingest process was restarted"""
+        self.close()
+        try:
+            segment = _attach(self.name)
+        except FileNotFoundError:
+            return False
+        magic, capacity, _ = _HEADER.unpack_from(segment.buf, 0)
+        if magic != MAGIC:
+            segment.close()
+            return False
+        self._segment, self._capacity = segment, capacity
+        return True
+
+    def close(self):
+        if self._segment is not None:
+            self._segment.close()
+            self._segment = None
+
+    def generation(self) -> Optional[int]:
+        """Generation of the active buffer, None if there is no segment"""
+        if self._segment is None:
+            return None
+        _, _, active = _HEADER.unpack_from(self._segment.buf, 0)
+        return _BUFFER_HEADER.unpack_from(self._segment.buf, _buffer_header_offset(active))[0]
+
+    def read(self) -> Optional[Tuple[int, int, Dict[str, PositionReport], Dict[str, datetime], Set[str]]]:
+        """
+        (generation, seq, flights, last contacts, military icao24s) of the active buffer, None if
+        there is no segment or the writer kept overwriting the buffer being read
+        """
+        if self._segment is None:
+            return None
+        buf = self._segment.buf
+
+        for _ in range(READ_ATTEMPTS):
+            _, _, active = _HEADER.unpack_from(buf, 0)
+            header_offset = _buffer_header_offset(active)
+            generation, seq, count = _BUFFER_HEADER.unpack_from(buf, header_offset)
+            if generation == 0:
+                continue
+
+            offset = _records_offset(self._capacity, active)
+            # Unpacked straight from the shared buffer, the result is discarded if it was overwritten meanwhile
+            records = list(_RECORD.iter_unpack(buf[offset:offset + count * _RECORD.size]))
+            if _BUFFER_HEADER.unpack_from(buf, header_offset)[0] != generation:
+                continue
+
+            flights, contacts, military = _decode_records(records)
+            return generation, seq, flights, contacts, military
+
+        return None
+
+    def snapshot(self) -> Optional[LiveSnapshot]:
+        """Live snapshot of the active buffer"""
+        state = self.read()
+        if state is None:
+            return None
+        generation, seq, flights, contacts, military = state
+        return LiveSnapshot.build(generation, flights, contacts, military.__contains__, seq=seq)
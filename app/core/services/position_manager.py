@@ -1,12 +1,19 @@
 import logging
-from typing import Dict, List
-from datetime import datetime, timezone
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from datetime import datetime, timedelta, timezone
 from bson import ObjectId
 
 from ..models.position_report import PositionReport
+from ..constants import MINUTES_BEFORE_CONSIDERED_NEW_FLIGHT
+from ...data.trajectory_buffer import TrajectoryBuffer
 
 logger = logging.getLogger('PositionManager')
 
+TRAJECTORY_EVICTION_INTERVAL_SEC = 30
+# Flights are live while their last position report is at most this old
+LIVE_FLIGHT_MAX_AGE_SEC = 60
+
 class PositionManager:
     def __init__(self, config):
         self._insert_batch_size = 200
@@ -15,6 +22,14 @@ class PositionManager:
         self._changed_flight_ids = set()
         self._positions_changed = False
 
+        # Recent trajectories of active flights, so that reads don't have to go to the database.
+        # The memory backend keeps trajectories itself, no need to buffer them twice.
+        self._trajectory_capacity = 0 if config.DB_BACKEND == 'memory' else max(0, config.TRAJECTORY_BUFFER_POSITIONS)
+        self._trajectories: Dict[str, TrajectoryBuffer] = {}
+        # Buffers of flights that already had positions before they were buffered
+        self._partial_trajectories = set()
+        self._trajectory_lock = threading.Lock()
+
     def initialize(self, repository):
         self.repository = repository
         
@@ -23,6 +38,15 @@ class PositionManager:
         self._positions_changed = False
         self._changed_flight_ids.clear()
         
+    def set_last_positions(self, last_positions: Dict[str, PositionReport]) -> None:
+        """Caches last positions read from the database, without storing them, and tracks those that changed"""
+        for flight_id, pos in last_positions.items():
+            last_pos = self.flight_lastpos_map.get(flight_id)
+            if last_pos is None or (last_pos.lat, last_pos.lon, last_pos.alt) != (pos.lat, pos.lon, pos.alt):
+                self.flight_lastpos_map[flight_id] = pos
+                self._positions_changed = True
+                self._changed_flight_ids.add(str(flight_id))
+
     def add_positions(self, positions: List[PositionReport], flight_manager):
         """Inserts positions into the database with highly optimized batch processing"""
 
@@ -125,6 +149,7 @@ class PositionManager:
                 
                 # Update in-memory cache immediately
                 flight_manager.flight_last_contact[flight_id] = timestamp
+                has_earlier_positions = flight_id in self.flight_lastpos_map
                 self.flight_lastpos_map[flight_id] = pos
                 
                 # Mark for WebSocket notification
@@ -139,8 +164,11 @@ class PositionManager:
                     "track": pos.track,
                     "timestmp": timestamp
                 }
+                if pos.gs is not None:
+                    position_doc["gs"] = pos.gs
                 
                 positions_to_insert.append(position_doc)
+                self._buffer_position(str(flight_id), position_doc, has_earlier_positions)
                 
                 flight_updates.append((flight_id, timestamp))
         
@@ -148,12 +176,98 @@ class PositionManager:
         
         return positions_to_insert, flight_updates
     
+    def _buffer_position(self, flight_id: str, position_doc: Dict[str, Any], has_earlier_positions: bool):
+        if not self._trajectory_capacity:
+            return
+
+        with self._trajectory_lock:
+            trajectory = self._trajectories.get(flight_id)
+            if trajectory is None:
+                trajectory = self._trajectories[flight_id] = TrajectoryBuffer(self._trajectory_capacity)
+                if has_earlier_positions:
+                    self._partial_trajectories.add(flight_id)
+            trajectory.append_position(position_doc)
+
+    def evict_idle_trajectories(self, flight_manager) -> None:
+        """Drop the buffers of flights that went idle, their next position starts a new flight. Run on a timer"""
+        now = datetime.now(timezone.utc)
+        idle_before = now - timedelta(minutes=MINUTES_BEFORE_CONSIDERED_NEW_FLIGHT)
+
+        from ..utils.time_util import make_datetimes_comparable
+
+        def is_idle(flight_id):
+            last_contact, threshold = make_datetimes_comparable(flight_manager.flight_last_contact.get(flight_id, now), idle_before)
+            return last_contact < threshold
+
+        with self._trajectory_lock:
+            idle = [flight_id for flight_id in self._trajectories if is_idle(flight_id)]
+            for flight_id in idle:
+                del self._trajectories[flight_id]
+                self._partial_trajectories.discard(flight_id)
+
+        if idle:
+            logger.debug(f"Evicted {len(idle)} idle trajectories, {len(self._trajectories)} buffered")
+
+    def clear_trajectories(self) -> None:
+        """Drop all buffers, e.g. when positions were stored by another replica meanwhile"""
+        with self._trajectory_lock:
+            self._trajectories.clear()
+            self._partial_trajectories.clear()
+
+    def _buffered_positions(self, flight_id: str, projection: Optional[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Optional[datetime]]:
+        """
+        Buffered positions of a flight and, if the buffer does not hold the whole flight,
+        the timestamp before which the positions have to be read from the database
+        """
+        with self._trajectory_lock:
+            trajectory = self._trajectories.get(flight_id)
+            if trajectory is None:
+                return [], None
+            buffered = trajectory.positions(flight_id=ObjectId(flight_id))
+            complete = trajectory.dropped == 0 and flight_id not in self._partial_trajectories
+            first_timestamp = trajectory.first_timestamp
+
+        if projection:
+            fields = [k for k, v in projection.items() if v]
+            buffered = [{k: p[k] for k in fields if k in p} for p in buffered]
+
+        return buffered, None if complete else first_timestamp
+
+    def get_flight_positions(self, flight_id: str, limit: Optional[int] = None,
+                             projection: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Positions of a flight, ordered by time. Active flights are served from the trajectory buffer,
+        the database is only read for the part of a flight that precedes its buffer.
+        """
+        buffered, read_before = self._buffered_positions(flight_id, projection)
+
+        if not buffered:
+            return self.repository.get_positions(flight_id, limit, projection)
+
+        if read_before:
+            older = self.repository.get_positions(flight_id, limit, projection, before=read_before)
+            buffered = older + buffered
+
+        return buffered[:limit] if limit else buffered
+
+    def iter_flight_positions(self, flight_id: str, projection: Optional[Dict[str, Any]] = None,
+                              batch_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        """All positions of a flight like get_flight_positions, reading the database part in batches"""
+        buffered, read_before = self._buffered_positions(flight_id, projection)
+
+        if not buffered:
+            yield from self.repository.iter_positions(flight_id, projection, batch_size=batch_size)
+            return
+
+        if read_before:
+            yield from self.repository.iter_positions(flight_id, projection, before=read_before, batch_size=batch_size)
+        yield from buffered
+
     def get_cached_flights(self, flight_manager) -> Dict[str, PositionReport]:
-        """Get all cached flights with a recent position report (within the last minute)"""
-        from datetime import timedelta
+        """Get all cached flights with a recent position report (within LIVE_FLIGHT_MAX_AGE_SEC)"""
         from ..utils.time_util import make_datetimes_comparable
         
-        timestamp = datetime.now(timezone.utc) - timedelta(minutes=1)
+        timestamp = datetime.now(timezone.utc) - timedelta(seconds=LIVE_FLIGHT_MAX_AGE_SEC)
         
         result = {}
         for k, v in flight_manager.modeS_flightid_map.items():
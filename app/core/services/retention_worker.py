@@ -0,0 +1,130 @@
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from timeit import default_timer as timer
+from typing import Any, Dict
+
+logger = logging.getLogger('RetentionWorker')
+
+
+class RetentionWorker:
+    """
+    Incrementally removes flights older than the retention period together with their positions.
+
+    Flights are visited in (last_contact, _id) order from a persisted cursor, so a restart resumes
+    where the previous run stopped. Deletes are paced to a documents-per-second budget and the batch
+    size shrinks while delete latency is high, so purging a large backlog never starves the updater's writes.
+    """
+
+    MIN_BATCH_SIZE = 5
+    MAX_BATCH_SIZE = 200
+    # Delete latency per batch above which the worker backs off
+    LATENCY_BACKOFF_THRESHOLD_SEC = 0.5
+    MAX_BACKOFF_FACTOR = 16
+
+    def __init__(self, config, repository, max_run_seconds: float = 20.0):
+        self.repository = repository
+        self._retention_minutes = config.DB_RETENTION_MIN
+        self._deletes_per_sec = max(1, config.DB_RETENTION_DELETES_PER_SEC)
+        self._max_run_seconds = max_run_seconds
+
+        self._batch_size = self.MIN_BATCH_SIZE
+        self._backoff_factor = 1
+        self._cursor = None
+        self._cursor_loaded = False
+
+        self._stats = {
+            "runs": 0,
+            "deleted_flights": 0,
+            "deleted_documents": 0,
+            "backoffs": 0,
+            "last_batch_latency_ms": 0.0,
+            "last_run_rate": 0.0,
+            "last_run": None,
+            "caught_up": False
+        }
+
+    def _cutoff(self) -> datetime:
+        return datetime.now(timezone.utc) - timedelta(minutes=self._retention_minutes)
+
+    def _load_cursor(self):
+        if not self._cursor_loaded:
+            self._cursor = self.repository.get_retention_cursor()
+            self._cursor_loaded = True
+            if self._cursor:
+                logger.info(f"Resuming retention purge after last_contact={self._cursor[0]}")
+
+    def _adapt_to_latency(self, latency: float):
+        """Shrink the batch and slow down while deletes are slow, recover gradually once they are fast again"""
+        if latency > self.LATENCY_BACKOFF_THRESHOLD_SEC:
+            self._batch_size = max(self.MIN_BATCH_SIZE, self._batch_size // 2)
+            self._backoff_factor = min(self.MAX_BACKOFF_FACTOR, self._backoff_factor * 2)
+            self._stats["backoffs"] += 1
+            logger.debug(f"Delete latency {latency * 1000:.0f}ms, backing off (batch={self._batch_size}, factor={self._backoff_factor})")
+        else:
+            self._batch_size = min(self.MAX_BATCH_SIZE, self._batch_size + self.MIN_BATCH_SIZE)
+            self._backoff_factor = max(1, self._backoff_factor // 2)
+
+    def run(self):
+        """Purge expired flights until caught up or the time slice of this run is used up"""
+        if self._retention_minutes <= 0:
+            return
+
+        self._load_cursor()
+
+        cutoff = self._cutoff()
+        run_start = timer()
+        run_deleted = 0
+        caught_up = False
+
+        try:
+            while timer() - run_start < self._max_run_seconds:
+                flights = self.repository.get_flights_for_retention(cutoff, self._cursor, self._batch_size)
+
+                if not flights:
+                    # Everything up to the cutoff is purged, the next run starts from the beginning again
+                    caught_up = True
+                    self._cursor = None
+                    self.repository.save_retention_cursor(None)
+                    break
+
+                batch_start = timer()
+                deleted = self.repository.delete_flights_and_positions([str(f["_id"]) for f in flights])
+                latency = timer() - batch_start
+
+                last = flights[-1]
+                self._cursor = (last["last_contact"], last["_id"])
+                self.repository.save_retention_cursor(self._cursor)
+
+                run_deleted += deleted
+                self._stats["deleted_flights"] += len(flights)
+                self._stats["deleted_documents"] += deleted
+                self._stats["last_batch_latency_ms"] = latency * 1000
+
+                self._adapt_to_latency(latency)
+
+                # Pace to the deletes-per-second budget, stretched while backing off
+                pause = deleted * self._backoff_factor / self._deletes_per_sec - latency
+                if pause > 0:
+                    time.sleep(min(pause, self._max_run_seconds))
+        except Exception as e:
+            logger.exception(f"Error in retention purge: {str(e)}")
+
+        elapsed = timer() - run_start
+        self._stats["runs"] += 1
+        self._stats["last_run"] = datetime.now(timezone.utc)
+        self._stats["last_run_rate"] = run_deleted / elapsed if elapsed > 0 else 0.0
+        self._stats["caught_up"] = caught_up
+
+        if run_deleted:
+            logger.info(f"Retention purge removed {run_deleted} documents ({self._stats['last_run_rate']:.0f}/s), "
+                        f"{self._stats['deleted_flights']} flights in total{'' if caught_up else ', backlog remaining'}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Progress metrics of the retention purge"""
+        return {
+            **self._stats,
+            "batch_size": self._batch_size,
+            "backoff_factor": self._backoff_factor,
+            "cursor_last_contact": self._cursor[0] if self._cursor else None
+        }
@@ -0,0 +1,153 @@
+"""
+Compact wire encodings of positions, as alternatives to JSON arrays of [lat, lon, alt]
+
+polyline: the Google encoded polyline algorithm extended by a third dimension.
+  Each point is lat and lon (degrees * 10^5) and the altitude (feet), each value
+  delta-encoded against the previous point, zigzag-signed and written as base64-like
+  5-bit groups offset by 63. A missing altitude is encoded as -1, like in JSON.
+
+packed: little-endian binary with an 8 byte header
+  magic 'FR' | version u8 | kind u8 | record count u32
+  followed by the records of the given kind:
+    TRAJECTORY, TRAJECTORY_UPDATE: lat i32, lon i32, alt i32                    (12 bytes)
+    POSITIONS, POSITIONS_UPDATE:   seq u64 once, then per record
+                                   flight id (12 bytes), lat i32, lon i32, alt i32 (24 bytes)
+  Coordinates are micro-degrees, altitudes feet with -1 for a missing altitude. seq is the
+  sequence number of the live update, for resuming the live websocket (0 if there is none).
+
+The decode functions are the reference implementation for clients.
+"""
+
+import struct
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+POLYLINE = 'polyline'
+PACKED = 'packed'
+ENCODINGS = (POLYLINE, PACKED)
+
+POLYLINE_PRECISION = 5
+
+PACKED_MAGIC = b'FR'
+PACKED_VERSION = 2
+
+TRAJECTORY = 1
+TRAJECTORY_UPDATE = 2
+POSITIONS = 3
+POSITIONS_UPDATE = 4
+
+_HEADER = struct.Struct('<2sBBI')
+_SEQ = struct.Struct('<Q')
+_POSITION_RECORD = struct.Struct('<12s3i')
+_COORD_SCALE = 1_000_000
+
+MISSING_ALT = -1
+
+Point = Tuple[float, float, int]
+
+
+def _alt(alt: Optional[float]) -> int:
+    return MISSING_ALT if alt is None else int(alt)
+
+
+def _polyline_value(value: int, out: List[str]):
+    value = ~(value << 1) if value < 0 else value << 1
+    while value >= 0x20:
+        out.append(chr((0x20 | (value & 0x1f)) + 63))
+        value >>= 5
+    out.append(chr(value + 63))
+
+
+def encode_polyline(points: Iterable[Point], precision: int = POLYLINE_PRECISION) -> str:
+    """Encode (lat, lon, alt) points into a polyline string"""
+    factor = 10 ** precision
+    out = []
+    prev_lat = prev_lon = prev_alt = 0
+
+    for lat, lon, alt in points:
+        lat = round(lat * factor)
+        lon = round(lon * factor)
+        alt = _alt(alt)
+        _polyline_value(lat - prev_lat, out)
+        _polyline_value(lon - prev_lon, out)
+        _polyline_value(alt - prev_alt, out)
+        prev_lat, prev_lon, prev_alt = lat, lon, alt
+
+    return ''.join(out)
+
+
+def decode_polyline(encoded: str, precision: int = POLYLINE_PRECISION) -> List[Point]:
+    """Decode a polyline string into (lat, lon, alt) points"""
+    factor = 10 ** precision
+    values = []
+    value = shift = 0
+
+    for char in encoded:
+        byte = ord(char) - 63
+        value |= (byte & 0x1f) << shift
+        shift += 5
+        if byte < 0x20:
+            values.append(~(value >> 1) if value & 1 else value >> 1)
+            value = shift = 0
+
+    points = []
+    lat = lon = alt = 0
+    for i in range(0, len(values) - 2, 3):
+        lat += values[i]
+        lon += values[i + 1]
+        alt += values[i + 2]
+        points.append((lat / factor, lon / factor, alt))
+    return points
+
+
+def pack_trajectory(points: Sequence[Point], kind: int = TRAJECTORY) -> bytes:
+    """Pack (lat, lon, alt) points of one flight"""
+    values = []
+    for lat, lon, alt in points:
+        values += (round(lat * _COORD_SCALE), round(lon * _COORD_SCALE), _alt(alt))
+
+    return _HEADER.pack(PACKED_MAGIC, PACKED_VERSION, kind, len(points)) + struct.pack(f'<{len(values)}i', *values)
+
+
+def pack_positions(positions: Dict[str, Point], kind: int = POSITIONS, seq: int = 0) -> bytes:
+    """Pack the current (lat, lon, alt) of several flights, keyed by flight id, as of the live update seq"""
+    body = b''.join(_POSITION_RECORD.pack(bytes.fromhex(flight_id), round(lat * _COORD_SCALE), round(lon * _COORD_SCALE), _alt(alt))
+                    for flight_id, (lat, lon, alt) in positions.items())
+
+    return _HEADER.pack(PACKED_MAGIC, PACKED_VERSION, kind, len(positions)) + _SEQ.pack(seq) + body
+
+
+def _check_header(data: bytes) -> Tuple[int, int]:
+    magic, version, kind, count = _HEADER.unpack_from(data)
+    if magic != PACKED_MAGIC or version != PACKED_VERSION:
+        raise ValueError('Not a packed position message')
+    return kind, count
+
+
+def unpack(data: bytes) -> Tuple[int, object]:
+    """
+    Decode a packed message. Returns the kind and, depending on it, a list of (lat, lon, alt)
+    points or a dict of flight id -> (lat, lon, alt)
+    """
+    kind, count = _check_header(data)
+
+    if kind in (TRAJECTORY, TRAJECTORY_UPDATE):
+        values = struct.unpack_from(f'<{count * 3}i', data, _HEADER.size)
+        return kind, [(values[i] / _COORD_SCALE, values[i + 1] / _COORD_SCALE, values[i + 2])
+                      for i in range(0, len(values), 3)]
+
+    if kind in (POSITIONS, POSITIONS_UPDATE):
+        positions = {}
+        offset = _HEADER.size + _SEQ.size
+        for flight_id, lat, lon, alt in _POSITION_RECORD.iter_unpack(data[offset:offset + count * _POSITION_RECORD.size]):
+            positions[flight_id.hex()] = (lat / _COORD_SCALE, lon / _COORD_SCALE, alt)
+        return kind, positions
+
+    raise ValueError(f'Unknown packed message kind {kind}')
+
+
+def unpack_seq(data: bytes) -> int:
+    """Sequence number of a packed positions message, to pass as since when reconnecting"""
+    kind, _ = _check_header(data)
+    if kind not in (POSITIONS, POSITIONS_UPDATE):
+        raise ValueError(f'Packed message kind {kind} has no sequence number')
+    return _SEQ.unpack_from(data, _HEADER.size)[0]
@@ -0,0 +1,85 @@
+"""
+Douglas-Peucker simplification of flight trajectories
+
+Points are (lat, lon, alt) tuples. Distances are measured in meters on a local
+equirectangular projection, which is accurate enough for the extent of a
+single flight. Tolerances are snapped to powers of two so that results can be
+shared between nearby tolerances; a map zoom level maps to the size of one
+screen pixel at that zoom.
+"""
+
+import math
+from typing import List, Sequence, Tuple
+
+Point = Tuple[float, float, int]
+
+_METERS_PER_DEGREE_LAT = 110_574.0
+_METERS_PER_DEGREE_LON = 111_320.0
+
+# Size of a web mercator pixel at zoom level 0 on the equator
+_METERS_PER_PIXEL_ZOOM_0 = 156_543.03
+
+MIN_TOLERANCE_BUCKET = 0    # 1 m
+MAX_TOLERANCE_BUCKET = 17   # ~131 km, a pixel at zoom 0
+
+
+def tolerance_bucket(tolerance: float) -> int:
+    """Power of two bucket of a tolerance in meters, the effective tolerance is 2 ** bucket"""
+    bucket = math.floor(math.log2(tolerance)) if tolerance > 0 else MIN_TOLERANCE_BUCKET
+    return max(MIN_TOLERANCE_BUCKET, min(MAX_TOLERANCE_BUCKET, bucket))
+
+
+def zoom_tolerance(zoom: float) -> float:
+    """Tolerance in meters that keeps the simplification below one pixel at the given map zoom"""
+    return _METERS_PER_PIXEL_ZOOM_0 / 2 ** zoom
+
+
+def simplify(points: Sequence[Point], tolerance: float) -> List[Point]:
+    """
+    Points of the trajectory that deviate more than tolerance meters from the simplified line,
+    always including the first and the last point
+    """
+    if len(points) < 3:
+        return list(points)
+
+    lat0 = math.radians(sum(p[0] for p in points) / len(points))
+    x_scale = _METERS_PER_DEGREE_LON * math.cos(lat0)
+    xs = [p[1] * x_scale for p in points]
+    ys = [p[0] * _METERS_PER_DEGREE_LAT for p in points]
+
+    tolerance_squared = tolerance * tolerance
+    keep = bytearray(len(points))
+    keep[0] = keep[-1] = 1
+
+    # Iterative to avoid recursion limits on long flights
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        ax, ay = xs[first], ys[first]
+        dx, dy = xs[last] - ax, ys[last] - ay
+        length = dx * dx + dy * dy
+
+        # Largest squared distance from the segment between first and last
+        max_distance = 0.0
+        index = first
+        for i in range(first + 1, last):
+            px, py = xs[i] - ax, ys[i] - ay
+            if length:
+                t = (px * dx + py * dy) / length
+                if t > 1.0:
+                    px, py = px - dx, py - dy
+                elif t > 0.0:
+                    px, py = px - t * dx, py - t * dy
+            distance = px * px + py * py
+            if distance > max_distance:
+                max_distance = distance
+                index = i
+
+        if max_distance > tolerance_squared:
+            keep[index] = 1
+            if index - first > 1:
+                stack.append((first, index))
+            if last - index > 1:
+                stack.append((index, last))
+
+    return [p for p, k in zip(points, keep) if k]
@@ -2,6 +2,16 @@ from datetime import datetime, timezone
 from typing import Tuple
 
 
+def to_datestring(obj: datetime) -> str:
+    if obj.tzinfo:
+        # eg: '2015-09-25T23:14:42.588601+00:00'
+        return obj.isoformat('T')
+    else:
+        # No timezone present - assume UTC.
+        # eg: '2015-09-25T23:14:42.588601Z'
+        return obj.isoformat('T') + 'Z'
+
+
 def make_datetimes_comparable(dt1: datetime, dt2: datetime) -> Tuple[datetime, datetime]:
     """
     Utility function to make two datetime objects comparable by ensuring they both have
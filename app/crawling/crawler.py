@@ -2,8 +2,7 @@ from ..data.sources.metadata_sources.openskynet import OpenskyNet
 from ..data.sources.metadata_sources.hexdb_io import HexdbIo
 from ..data.sources.metadata_sources import AircraftMetadataSource
 from ..core.models.aircraft import Aircraft
-from ..data.repositories.aircraft_repository import AircraftRepository
-from ..data.repositories.aircraft_processing_repository import AircraftProcessingRepository
+from ..data.repositories.base import AircraftStore, AircraftProcessingStore
 from ..core.utils.logging import init_logging
 
 import logging
@@ -15,11 +14,11 @@ logger = logging.getLogger("Crawler")
 class AirplaneCrawler:
     """Aircraft metadata crawler for retrieving and updating aircraft information"""
 
-    def __init__(self, config, mongodb=None) -> None:
+    def __init__(self, config, aircraft_repo: AircraftStore, processing_repo: AircraftProcessingStore) -> None:
         init_logging(config.LOGGING_CONFIG)
         
-        self.aircraft_repo = AircraftRepository(mongodb)
-        self.processing_repo = AircraftProcessingRepository(mongodb)
+        self.aircraft_repo = aircraft_repo
+        self.processing_repo = processing_repo
         
         self.sources: List[AircraftMetadataSource] = [
             HexdbIo(),
@@ -1,3 +1,4 @@
 from .database import init_mongodb
+from .storage import Storage, StorageFactory
 
-__all__ = ['init_mongodb']
\ No newline at end of file
+__all__ = ['init_mongodb', 'Storage', 'StorageFactory']
@@ -1,8 +1,43 @@
 import certifi
 import logging
 from pymongo import MongoClient
+from pymongo.collection import Collection
+from pymongo.database import Database
 
-def init_mongodb(connection_string: str, db_name: str, retention_minutes: int):
+from .partitioning import PositionPartitioning
+from .position_encoding import ENCODINGS, DOUBLE
+
+def create_client(connection_string: str, **options) -> MongoClient:
+    """MongoDB client, options are passed on to MongoClient"""
+    # Only add tlsCAFile if ssl or tls are not explicitly set to false
+    lower_conn = connection_string.lower()
+    use_tls = not (("ssl=false" in lower_conn) or ("tls=false" in lower_conn))
+    if use_tls:
+        options["tlsCAFile"] = certifi.where()
+    return MongoClient(connection_string, **options)
+
+def drop_ttl_indexes(collection: Collection) -> None:
+    """Drop the TTL indexes of a collection, documents are no longer expired by the server"""
+    logger = logging.getLogger("MongoDBInit")
+    for index_name, index_info in collection.index_information().items():
+        if 'expireAfterSeconds' in index_info:
+            logger.info(f"Dropping TTL index {index_name} of {collection.name}, retention is done by the retention worker")
+            collection.drop_index(index_name)
+
+def disable_collection_expiry(db: Database, collection_name: str) -> None:
+    """Switch off the expireAfterSeconds of a time-series collection"""
+    logger = logging.getLogger("MongoDBInit")
+    info = next(db.list_collections(filter={"name": collection_name}), None)
+    if info is None or "expireAfterSeconds" not in info.get("options", {}):
+        return
+    try:
+        db.command("collMod", collection_name, expireAfterSeconds="off")
+        logger.info(f"Disabled the expiry of {collection_name}, retention is done by the retention worker")
+    except Exception as e:
+        logger.warning(f"Could not disable the expiry of {collection_name}, positions also expire by TTL: {str(e)}")
+
+def init_mongodb(connection_string: str, db_name: str, retention_minutes: int, position_partitioning: str = None,
+                 position_encoding: str = None) -> Database:
     """Initialize MongoDB connection and create indexes"""
     logger = logging.getLogger("MongoDBInit")
 
@@ -15,13 +50,7 @@ def init_mongodb(connection_string: str, db_name: str, retention_minutes: int):
         else:
             logger.info(f"Connecting to MongoDB")
 
-        # Only add tlsCAFile if ssl or tls are not explicitly set to false
-        lower_conn = connection_string.lower()
-        use_tls = not (("ssl=false" in lower_conn) or ("tls=false" in lower_conn))
-        if use_tls:
-            client = MongoClient(connection_string, tlsCAFile=certifi.where())
-        else:
-            client = MongoClient(connection_string)
+        client = create_client(connection_string)
 
         # Verify connection by pinging
         client.admin.command('ping')
@@ -35,37 +64,45 @@ def init_mongodb(connection_string: str, db_name: str, retention_minutes: int):
     # Define collection names
     flights_collection = "flights"
     positions_collection = "positions"
+    position_chunks_collection = "position_chunks"
     db.flights_collection = flights_collection
     db.positions_collection = positions_collection
 
+    # Optional time-partitioned layout: one positions collection per day or hour
+    if position_partitioning and position_partitioning != 'none':
+        if not PositionPartitioning.is_valid(position_partitioning):
+            raise ValueError(f'Invalid position partitioning: {position_partitioning}')
+        logger.info(f"Using {position_partitioning}-partitioned position collections")
+        db.positions_partitioning = position_partitioning
+    else:
+        db.positions_partitioning = None
+
+    # Optional fixed-point encoding of stored positions
+    position_encoding = position_encoding or DOUBLE
+    if position_encoding not in ENCODINGS:
+        raise ValueError(f'Invalid position encoding: {position_encoding}')
+    if position_encoding != DOUBLE:
+        logger.info(f"Storing positions with {position_encoding} encoding")
+    db.positions_encoding = position_encoding
+
+    # With a retention period the retention worker owns retention, removing flights together with their
+    # positions at a paced rate. TTL expiry of an earlier setup would delete the same data a second time,
+    # possibly with another horizon, so it is switched off. Without one the worker is not scheduled and
+    # existing TTL expiry is left in place.
+    expiry_handed_off = bool(retention_minutes and retention_minutes > 0)
+
     # Create collections if they don't exist
     if flights_collection not in db.list_collection_names():
         flights_coll = db.create_collection(flights_collection)
         flights_coll.create_index("modeS", unique=False)
         flights_coll.create_index("last_contact")
         flights_coll.create_index("is_military")
-        
-        # Create TTL index if retention is specified
-        if retention_minutes and retention_minutes > 0:
-            logger.info(f"Creating TTL index for flights with retention of {retention_minutes} minutes")
-            flights_coll.create_index("expire_at", expireAfterSeconds=0)
-
-    # Create TTL index for flights collection if it doesn't exist yet
-    elif retention_minutes and retention_minutes > 0:
-        # Check if TTL index exists
-        indexes = db[flights_collection].index_information()
-        ttl_index_exists = False
-        for index_name, index_info in indexes.items():
-            if len(index_info['key']) == 1 and index_info['key'][0][0] == 'expire_at':
-                ttl_index_exists = True
-                break
-                
-        if not ttl_index_exists:
-            logger.info(f"Creating TTL index for flights with retention of {retention_minutes} minutes")
-            db[flights_collection].create_index("expire_at", expireAfterSeconds=0)
-
-    # Create time series collection for positions if it doesn't exist
-    if positions_collection not in db.list_collection_names():
+    elif expiry_handed_off:
+        drop_ttl_indexes(db[flights_collection])
+
+    # Create time series collection for positions if it doesn't exist.
+    # Partitioned layouts create their collections on demand when positions are inserted
+    if not db.positions_partitioning and positions_collection not in db.list_collection_names():
         # Configure time-series collection
         timeseries_config = {
             "timeField": "timestmp",
@@ -73,27 +110,18 @@ def init_mongodb(connection_string: str, db_name: str, retention_minutes: int):
             "granularity": "seconds"
         }
         
-        # Create collection options
-        collection_options = {"timeseries": timeseries_config}
-        
-        # Add expiration setting at collection level if retention is specified
-        if retention_minutes and retention_minutes > 0:
-            collection_options["expireAfterSeconds"] = retention_minutes * 60
-            logger.info(f"Creating time-series collection with expireAfterSeconds={retention_minutes * 60}")
-        
         # Create the collection with the configured options
         db.create_collection(
             positions_collection,
-            **collection_options
+            timeseries=timeseries_config
         )
         
         # Create index on meta field for faster queries
         db[positions_collection].create_index("flight_id")
-        
-        # No need for additional TTL index configuration for time-series collections
-        # Expiration is handled by the time-series collection configuration
-    
-    # For existing time-series collections, we can't modify the expiration directly
-    # Time-series collections handle expiration through their initial configuration
+    elif not db.positions_partitioning and expiry_handed_off:
+        disable_collection_expiry(db, positions_collection)
+
+    if expiry_handed_off and position_chunks_collection in db.list_collection_names():
+        drop_ttl_indexes(db[position_chunks_collection])
 
     return db
@@ -0,0 +1,85 @@
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+
+def as_utc(timestamp: datetime) -> datetime:
+    """Returns the timestamp as timezone-aware UTC datetime (naive values are assumed to be UTC)"""
+    if timestamp.tzinfo is None:
+        return timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.astimezone(timezone.utc)
+
+
+class PositionPartitioning:
+    """
+    Maps position timestamps to time-partitioned collection names,
+    e.g. positions_2026_10_17 (daily) or positions_2026_10_17_13 (hourly)
+    """
+
+    DAY = 'day'
+    HOUR = 'hour'
+
+    _PERIODS = {
+        DAY: timedelta(days=1),
+        HOUR: timedelta(hours=1)
+    }
+
+    _NAME_FORMATS = {
+        DAY: '%Y_%m_%d',
+        HOUR: '%Y_%m_%d_%H'
+    }
+
+    def __init__(self, base_name: str, granularity: str):
+        if granularity not in self._PERIODS:
+            raise ValueError(f'Invalid position partitioning: {granularity}')
+
+        self.base_name = base_name
+        self.granularity = granularity
+        self.period = self._PERIODS[granularity]
+        self._name_format = self._NAME_FORMATS[granularity]
+
+    @staticmethod
+    def is_valid(granularity: Optional[str]) -> bool:
+        return granularity in PositionPartitioning._PERIODS
+
+    def partition_start(self, timestamp: datetime) -> datetime:
+        """Start of the partition the timestamp belongs to"""
+        timestamp = as_utc(timestamp)
+        if self.granularity == self.DAY:
+            return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+
+    def collection_name(self, timestamp: datetime) -> str:
+        """Name of the collection holding positions with the given timestamp"""
+        return f'{self.base_name}_{self.partition_start(timestamp).strftime(self._name_format)}'
+
+    def collection_names_between(self, start: datetime, end: datetime) -> List[str]:
+        """Names of all partitions overlapping [start, end], in chronological order"""
+        names = []
+        current = self.partition_start(start)
+        end = as_utc(end)
+
+        while current <= end:
+            names.append(current.strftime(f'{self.base_name}_{self._name_format}'))
+            current += self.period
+
+        return names
+
+    def parse_partition_start(self, collection_name: str) -> Optional[datetime]:
+        """Returns the partition start for a partition collection name, None if it is not a partition"""
+        prefix = f'{self.base_name}_'
+        if not collection_name.startswith(prefix):
+            return None
+
+        try:
+            start = datetime.strptime(collection_name[len(prefix):], self._name_format)
+        except ValueError:
+            return None
+
+        return start.replace(tzinfo=timezone.utc)
+
+    def is_expired(self, collection_name: str, cutoff: datetime) -> bool:
+        """A partition is expired once its whole time range lies before the cutoff"""
+        start = self.parse_partition_start(collection_name)
+        if start is None:
+            return False
+        return start + self.period <= as_utc(cutoff)
@@ -0,0 +1,60 @@
+"""
+Fixed-point storage encoding for position documents
+
+Quantized documents store lat/lon as int32 micro-degrees, track as tenths of a
+degree and altitude/ground speed as plain ints instead of doubles. BSON has no
+16-bit integers, so track and ground speed are int32 as well. They are
+flagged with QUANTIZED_FIELD so both encodings can coexist in one collection;
+decoding happens in the repository so callers always see degrees as floats.
+
+Only the uncompressed BSON size is measured to shrink (about 8%, see the
+quantization benchmark), the saving in a compressed time-series collection is unproven.
+"""
+
+from typing import Dict, Any
+
+DOUBLE = 'double'
+QUANTIZED = 'quantized'
+ENCODINGS = (DOUBLE, QUANTIZED)
+
+QUANTIZED_FIELD = 'q'
+
+_COORD_SCALE = 1_000_000
+_TRACK_SCALE = 10
+
+
+def _to_int(value):
+    return None if value is None else int(round(value))
+
+
+def encode_position(position: Dict[str, Any]) -> Dict[str, Any]:
+    """Returns the quantized storage form of a position document"""
+    encoded = dict(position)
+    encoded["lat"] = round(position["lat"] * _COORD_SCALE)
+    encoded["lon"] = round(position["lon"] * _COORD_SCALE)
+
+    if "alt" in position:
+        encoded["alt"] = _to_int(position["alt"])
+    if position.get("track") is not None:
+        encoded["track"] = round(position["track"] * _TRACK_SCALE)
+    if "gs" in position:
+        encoded["gs"] = _to_int(position["gs"])
+
+    encoded[QUANTIZED_FIELD] = 1
+    return encoded
+
+
+def decode_position(position: Dict[str, Any]) -> Dict[str, Any]:
+    """Converts a stored position document back to degrees, in place. Unquantized documents are returned as is"""
+    if not position.get(QUANTIZED_FIELD):
+        return position
+
+    if position.get("lat") is not None:
+        position["lat"] = position["lat"] / _COORD_SCALE
+    if position.get("lon") is not None:
+        position["lon"] = position["lon"] / _COORD_SCALE
+    if position.get("track") is not None:
+        position["track"] = position["track"] / _TRACK_SCALE
+
+    del position[QUANTIZED_FIELD]
+    return position
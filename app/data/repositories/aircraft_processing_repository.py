@@ -3,10 +3,12 @@ from typing import List
 from pymongo.database import Database
 from pymongo.errors import PyMongoError
 
+from .base import AircraftProcessingStore
+
 logger = logging.getLogger(__name__)
 
 
-class AircraftProcessingRepository:
+class AircraftProcessingRepository(AircraftProcessingStore):
     """Simple repository for managing aircraft that need metadata processing"""
 
     def __init__(self, mongodb: Database):
@@ -1,13 +1,15 @@
 from datetime import datetime
 import logging
+from typing import Any, Dict, Optional
 from pymongo.database import Database
 from pymongo.errors import DuplicateKeyError, PyMongoError
 
 from ...core.models.aircraft import Aircraft
+from .base import AircraftStore
 
 logger = logging.getLogger(__name__)
 
-class AircraftRepository:
+class AircraftRepository(AircraftStore):
     """ MongoDB implementation of Aircraft Repository """
 
     def __init__(self, mongodb: Database):
@@ -45,7 +47,7 @@ class AircraftRepository:
         self._load_icao_designators()
         return self._designators_cache.get(icao_type_code)
     
-    def query_aircraft(self, icao24addr):
+    def query_aircraft(self, icao24addr: str) -> Optional[Aircraft]:
         """Query aircraft information by ICAO24 address"""
         result = self.db[self.collection_name].find_one({"modeS": icao24addr.strip().upper()})
         
@@ -62,6 +64,10 @@ class AircraftRepository:
         else:
             return None
     
+    def get_aircraft_record(self, icao24addr: str) -> Optional[Dict[str, Any]]:
+        """Raw aircraft document including bookkeeping fields such as lastModified"""
+        return self.db[self.collection_name].find_one({"modeS": icao24addr.strip().upper()})
+
     def _build_update_dict(self, aircraft):
         """Build update dictionary with ICAO designator if available"""
         base_fields = {"lastModified": datetime.now()}
@@ -100,7 +106,7 @@ class AircraftRepository:
         
         return update_dict
 
-    def update_aircraft(self, aircraft):
+    def update_aircraft(self, aircraft: Aircraft) -> bool:
         """Update existing aircraft information"""
         try:
             update_dict = self._build_update_dict(aircraft)
@@ -119,7 +125,7 @@ class AircraftRepository:
             logger.error(f'Could not update aircraft: {str(aircraft)}')
             return False
     
-    def insert_aircraft(self, acrft):
+    def insert_aircraft(self, acrft: Aircraft) -> bool:
         """Insert new aircraft into database"""
         if acrft:
             try:
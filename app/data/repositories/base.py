@@ -0,0 +1,192 @@
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import List, Dict, Tuple, Optional, Any, Set, Iterator
+
+from ...core.models.aircraft import Aircraft
+
+
+class FlightPositionStore(ABC):
+    """
+    Storage backend for flights and their position reports.
+
+    Flight documents are dicts with "_id", "modeS", "callsign", "is_military", "first_contact"
+    and "last_contact"; position documents carry "flight_id", "timestmp", "lat", "lon", "alt",
+    "track" and optionally "gs". Timestamps are returned as naive UTC datetimes.
+    """
+
+    # Time partitioning of the positions, None if positions are not partitioned
+    partitioning = None
+
+    @abstractmethod
+    def get_flight(self, flight_id: str) -> Optional[Dict[str, Any]]:
+        """Get flight by ID"""
+        pass
+
+    @abstractmethod
+    def flight_exists(self, flight_id: str) -> bool:
+        """Check if flight exists by ID"""
+        pass
+
+    @abstractmethod
+    def get_flights_batch(self, modeS_addrs: Set[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """Get flights for multiple ICAO Mode-S addresses, grouped by address"""
+        pass
+
+    @abstractmethod
+    def get_or_create_flight(self, modeS: str, is_military: bool, callsign: Optional[str] = None,
+                             expire_at: Optional[datetime] = None) -> Dict[str, Any]:
+        """Create a new flight record for an aircraft"""
+        pass
+
+    @abstractmethod
+    def bulk_update_flights(self, flight_updates: List[Tuple[str, Dict[str, Any]]]) -> None:
+        """Update multiple flights in a single operation"""
+        pass
+
+    @abstractmethod
+    def bulk_update_flight_last_contacts(self, flight_updates: List[Tuple[str, datetime]]) -> None:
+        """Update last_contact timestamps for multiple flights"""
+        pass
+
+    @abstractmethod
+    def insert_positions(self, positions: List[Dict[str, Any]]) -> None:
+        """Insert multiple position documents"""
+        pass
+
+    @abstractmethod
+    def get_positions(self, flight_id: str, limit: Optional[int] = None, projection: Optional[Dict[str, Any]] = None,
+                      before: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Get all positions for a specific flight, ordered by time, optionally only those before a timestamp"""
+        pass
+
+    def iter_positions(self, flight_id: str, projection: Optional[Dict[str, Any]] = None,
+                       before: Optional[datetime] = None, batch_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        """
+        Iterate all positions of a flight in time order. Backends that can read in batches
+        override this so that memory use does not depend on the length of the flight.
+        """
+        yield from self.get_positions(flight_id, projection=projection, before=before)
+
+    @abstractmethod
+    def get_recent_flights_last_pos(self, min_timestamp: datetime = datetime.min, page_size: Optional[int] = None,
+                                    last_id: Optional[Any] = None) -> List[Dict[str, Any]]:
+        """Get flights with last contact after min_timestamp with their latest position, paginated by _id"""
+        pass
+
+    @abstractmethod
+    def get_all_flights_last_pos(self) -> List[Dict[str, Any]]:
+        """Get all flights with their latest position"""
+        pass
+
+    @abstractmethod
+    def get_flight_history(self, limit: int, after: Optional[Tuple[datetime, Any]] = None, military_only: bool = False,
+                           callsign_prefix: Optional[str] = None, since: Optional[datetime] = None,
+                           until: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Get flights newest first in (last_contact, _id) order, continuing after the keyset cursor"""
+        pass
+
+    def iter_flight_history(self, after: Optional[Tuple[datetime, Any]] = None, military_only: bool = False,
+                            callsign_prefix: Optional[str] = None, since: Optional[datetime] = None,
+                            until: Optional[datetime] = None, batch_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """Iterate all flights in history order, read page by page along the keyset cursor"""
+        while True:
+            flights = self.get_flight_history(batch_size, after=after, military_only=military_only,
+                                              callsign_prefix=callsign_prefix, since=since, until=until)
+            yield from flights
+            if len(flights) < batch_size:
+                return
+            after = (flights[-1]["last_contact"], flights[-1]["_id"])
+
+    @abstractmethod
+    def get_flights_for_retention(self, cutoff: datetime, after: Optional[Tuple[datetime, Any]] = None,
+                                  limit: int = 100) -> List[Dict[str, Any]]:
+        """Get flights with last contact before the cutoff in (last_contact, _id) order, after the keyset cursor"""
+        pass
+
+    @abstractmethod
+    def get_retention_cursor(self) -> Optional[Tuple[datetime, Any]]:
+        """Get the persisted position of the retention worker"""
+        pass
+
+    @abstractmethod
+    def save_retention_cursor(self, cursor: Optional[Tuple[datetime, Any]]) -> None:
+        """Persist the position of the retention worker"""
+        pass
+
+    @abstractmethod
+    def delete_flights_and_positions(self, flight_ids: List[str], chunk_size: int = 200) -> int:
+        """Delete flights and their positions, returns the number of deleted records"""
+        pass
+
+    def drop_expired_position_partitions(self, cutoff: datetime) -> List[str]:
+        """Drop position partitions entirely before the cutoff. No-op for unpartitioned backends"""
+        return []
+
+    def compact_finished_flights(self, idle_before: datetime, limit: int = 50) -> Tuple[int, int]:
+        """Compact positions of finished flights. No-op for backends without compaction"""
+        return 0, 0
+
+
+class AircraftStore(ABC):
+    """Storage backend for aircraft metadata"""
+
+    @abstractmethod
+    def query_aircraft(self, icao24addr: str) -> Optional[Aircraft]:
+        """Query aircraft information by ICAO24 address"""
+        pass
+
+    @abstractmethod
+    def get_aircraft_record(self, icao24addr: str) -> Optional[Dict[str, Any]]:
+        """Raw aircraft record including bookkeeping fields such as lastModified"""
+        pass
+
+    @abstractmethod
+    def update_aircraft(self, aircraft: Aircraft) -> bool:
+        """Update existing aircraft information"""
+        pass
+
+    @abstractmethod
+    def insert_aircraft(self, acrft: Aircraft) -> bool:
+        """Insert new aircraft, updates it if it already exists"""
+        pass
+
+
+class AircraftProcessingStore(ABC):
+    """Storage backend for the queue of aircraft that need metadata processing"""
+
+    MAX_QUERY_ATTEMPTS = 3
+
+    @abstractmethod
+    def add_aircraft(self, icao24: str) -> bool:
+        """Add aircraft to processing queue"""
+        pass
+
+    @abstractmethod
+    def get_aircraft_for_processing(self, limit: int = 50) -> List[str]:
+        """Get aircraft with less than MAX_QUERY_ATTEMPTS attempts"""
+        pass
+
+    @abstractmethod
+    def increment_attempts(self, icao24: str) -> bool:
+        """Increment query attempts for an aircraft"""
+        pass
+
+    @abstractmethod
+    def remove_aircraft(self, icao24: str) -> bool:
+        """Remove aircraft from processing queue"""
+        pass
+
+    @abstractmethod
+    def aircraft_exists(self, icao24: str) -> bool:
+        """Check if aircraft exists in processing queue"""
+        pass
+
+    @abstractmethod
+    def cleanup_failed_aircraft(self) -> int:
+        """Remove aircraft that have reached max attempts"""
+        pass
+
+    @abstractmethod
+    def get_stats(self) -> dict:
+        """Get simple statistics"""
+        pass
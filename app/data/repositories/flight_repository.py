@@ -1,12 +1,12 @@
 import logging
 from typing import Dict, List, Tuple, Set, Optional, Any
 from datetime import datetime
-from .mongodb_repository import MongoDBRepository
+from .base import FlightPositionStore
 
 logger = logging.getLogger('FlightRepository')
 
 class FlightRepository:
-    def __init__(self, db_repo: MongoDBRepository) -> None:
+    def __init__(self, db_repo: FlightPositionStore) -> None:
         self.db_repo = db_repo
         
     def get_or_create_flight(self, **kwargs) -> Dict[str, Any]:
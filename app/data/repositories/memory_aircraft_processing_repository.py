@@ -0,0 +1,74 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import List
+
+from .base import AircraftProcessingStore
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryAircraftProcessingRepository(AircraftProcessingStore):
+    """Bounded in-memory queue of aircraft that need metadata processing"""
+
+    def __init__(self, max_queue_size: int = 10000):
+        self.max_queue_size = max_queue_size
+        self._lock = threading.Lock()
+        # modeS -> query attempts, in insertion order
+        self._queue = OrderedDict()
+
+    def add_aircraft(self, icao24: str) -> bool:
+        """Add aircraft to processing queue"""
+        with self._lock:
+            if icao24.upper() not in self._queue:
+                if len(self._queue) >= self.max_queue_size:
+                    return False
+                self._queue[icao24.upper()] = 0
+        return True
+
+    def get_aircraft_for_processing(self, limit: int = 50) -> List[str]:
+        """Get aircraft with less than 3 attempts"""
+        with self._lock:
+            pending = sorted(((attempts, n, modeS) for n, (modeS, attempts) in enumerate(self._queue.items())
+                              if attempts < self.MAX_QUERY_ATTEMPTS))
+        return [modeS for _, _, modeS in pending[:limit]]
+
+    def increment_attempts(self, icao24: str) -> bool:
+        """Increment query attempts for an aircraft"""
+        with self._lock:
+            if icao24.upper() not in self._queue:
+                return False
+            self._queue[icao24.upper()] += 1
+            return True
+
+    def remove_aircraft(self, icao24: str) -> bool:
+        """Remove aircraft from processing queue (successfully processed)"""
+        with self._lock:
+            return self._queue.pop(icao24.upper(), None) is not None
+
+    def aircraft_exists(self, icao24: str) -> bool:
+        """Check if aircraft exists in processing queue"""
+        return icao24.upper() in self._queue
+
+    def cleanup_failed_aircraft(self) -> int:
+        """Remove aircraft that have reached max attempts (3)"""
+        with self._lock:
+            failed = [modeS for modeS, attempts in self._queue.items() if attempts >= self.MAX_QUERY_ATTEMPTS]
+            for modeS in failed:
+                del self._queue[modeS]
+
+        if failed:
+            logger.info(f"Cleaned up {len(failed)} aircraft with max attempts")
+        return len(failed)
+
+    def get_stats(self) -> dict:
+        """Get simple statistics"""
+        with self._lock:
+            total = len(self._queue)
+            zero_attempts = sum(1 for attempts in self._queue.values() if attempts == 0)
+
+        return {
+            "total_count": total,
+            "zero_attempts": zero_attempts,
+            "in_progress": total - zero_attempts
+        }
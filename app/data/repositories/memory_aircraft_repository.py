@@ -0,0 +1,84 @@
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from ...core.models.aircraft import Aircraft
+from .base import AircraftStore
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryAircraftRepository(AircraftStore):
+    """Aircraft metadata held in process memory, least recently used records are evicted above max_records"""
+
+    def __init__(self, max_records: int = 10000):
+        self.max_records = max_records
+        self._lock = threading.Lock()
+        self._records = OrderedDict()
+
+    def query_aircraft(self, icao24addr: str) -> Optional[Aircraft]:
+        """Query aircraft information by ICAO24 address"""
+        result = self.get_aircraft_record(icao24addr)
+
+        if result:
+            return Aircraft(
+                result["modeS"],
+                reg=result.get("registration"),
+                icao_type_code=result.get("icaoTypeCode"),
+                aircraft_type_description=result.get("type"),
+                operator=result.get("registeredOwners"),
+                source=result.get("source")
+            )
+        else:
+            return None
+
+    def get_aircraft_record(self, icao24addr: str) -> Optional[Dict[str, Any]]:
+        """Raw aircraft record including bookkeeping fields such as lastModified"""
+        modeS = icao24addr.strip().upper()
+        with self._lock:
+            record = self._records.get(modeS)
+            if record:
+                self._records.move_to_end(modeS)
+                return dict(record)
+        return None
+
+    def update_aircraft(self, aircraft: Aircraft) -> bool:
+        """Update existing aircraft information"""
+        with self._lock:
+            record = self._records.get(aircraft.modes_hex)
+            if not record:
+                return False
+
+            for field, value in (("registration", aircraft.reg), ("icaoTypeCode", aircraft.icao_type_code),
+                                 ("type", aircraft.aircraft_type_description),
+                                 ("registeredOwners", aircraft.operator), ("source", aircraft.source)):
+                if value:
+                    record[field] = value
+            record["lastModified"] = datetime.now()
+            return True
+
+    def insert_aircraft(self, acrft: Aircraft) -> bool:
+        """Insert new aircraft, updates it if it already exists"""
+        if not acrft:
+            return False
+
+        if acrft.modes_hex in self._records:
+            return self.update_aircraft(acrft)
+
+        timestamp = datetime.now()
+        with self._lock:
+            self._records[acrft.modes_hex] = {
+                "modeS": acrft.modes_hex,
+                "firstCreated": timestamp,
+                "lastModified": timestamp,
+                "registration": acrft.reg,
+                "icaoTypeCode": acrft.icao_type_code,
+                "type": acrft.aircraft_type_description,
+                "registeredOwners": acrft.operator,
+                "source": acrft.source
+            }
+            while len(self._records) > self.max_records:
+                self._records.popitem(last=False)
+        return True
@@ -0,0 +1,241 @@
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Tuple, Optional, Any, Set
+
+from bson.objectid import ObjectId
+
+from ..partitioning import as_utc
+from ..trajectory_buffer import TrajectoryBuffer
+from .base import FlightPositionStore
+
+logger = logging.getLogger("MemoryRepository")
+
+
+def _naive_utc(timestamp: datetime) -> datetime:
+    """Naive UTC with millisecond precision, like the timestamps stored by the database backends"""
+    return as_utc(timestamp).replace(tzinfo=None, microsecond=timestamp.microsecond // 1000 * 1000)
+
+
+class MemoryRepository(FlightPositionStore):
+    """
+    Flights and positions held in process memory only, for live-only deployments and benchmarks.
+
+    Each flight keeps a fixed-capacity trajectory ring buffer. The flight table is bounded: flights idle
+    for longer than the retention period are evicted, and above max_flights the least recently seen
+    flights go first, so memory use never exceeds max_flights * positions_per_flight positions.
+    """
+
+    def __init__(self, max_flights: int, positions_per_flight: int, retention_minutes: int):
+        self.max_flights = max_flights
+        self.positions_per_flight = positions_per_flight
+        self._retention = timedelta(minutes=retention_minutes)
+
+        self._lock = threading.RLock()
+        # Ordered by last update, least recently seen flight first
+        self._flights = OrderedDict()
+        self._trajectories = {}
+        self._flight_ids_by_modeS = {}
+        self._retention_cursor = None
+
+    def _remove_flight(self, flight_id: str) -> int:
+        flight = self._flights.pop(flight_id, None)
+        if not flight:
+            return 0
+
+        flight_ids = self._flight_ids_by_modeS.get(flight["modeS"], [])
+        if flight_id in flight_ids:
+            flight_ids.remove(flight_id)
+        if not flight_ids:
+            self._flight_ids_by_modeS.pop(flight["modeS"], None)
+
+        trajectory = self._trajectories.pop(flight_id, None)
+        return 1 + (len(trajectory) if trajectory else 0)
+
+    def _evict(self):
+        """Drop idle flights and enforce the flight table bound, oldest first"""
+        idle_before = datetime.now(timezone.utc).replace(tzinfo=None) - self._retention
+        evicted = 0
+
+        while self._flights:
+            flight_id, flight = next(iter(self._flights.items()))
+            if len(self._flights) <= self.max_flights and flight["last_contact"] >= idle_before:
+                break
+            self._remove_flight(flight_id)
+            evicted += 1
+
+        if evicted:
+            logger.debug(f"Evicted {evicted} flights, {len(self._flights)} remaining")
+
+    def _touch(self, flight_id: str, last_contact: datetime):
+        flight = self._flights.get(flight_id)
+        if flight:
+            flight["last_contact"] = _naive_utc(last_contact)
+            self._flights.move_to_end(flight_id)
+
+    def get_flight(self, flight_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            flight = self._flights.get(str(flight_id))
+            return dict(flight) if flight else None
+
+    def flight_exists(self, flight_id: str) -> bool:
+        return str(flight_id) in self._flights
+
+    def get_flights_batch(self, modeS_addrs: Set[str]) -> Dict[str, List[Dict[str, Any]]]:
+        flights_by_modeS = {}
+        with self._lock:
+            for modeS in modeS_addrs:
+                flight_ids = self._flight_ids_by_modeS.get(modeS)
+                if flight_ids:
+                    flights = [dict(self._flights[id]) for id in flight_ids]
+                    flights.sort(key=lambda f: f["last_contact"], reverse=True)
+                    flights_by_modeS[modeS] = flights
+        return flights_by_modeS
+
+    def get_or_create_flight(self, modeS: str, is_military: bool, callsign: Optional[str] = None,
+                             expire_at: Optional[datetime] = None) -> Dict[str, Any]:
+        now = _naive_utc(datetime.now(timezone.utc))
+        object_id = ObjectId()
+        flight_id = str(object_id)
+
+        flight = {
+            "_id": object_id,
+            "modeS": modeS,
+            "last_contact": now,
+            "is_military": is_military,
+            "first_contact": now
+        }
+        if callsign:
+            flight["callsign"] = callsign
+
+        with self._lock:
+            self._flights[flight_id] = flight
+            self._trajectories[flight_id] = TrajectoryBuffer(self.positions_per_flight)
+            self._flight_ids_by_modeS.setdefault(modeS, []).append(flight_id)
+            self._evict()
+            return dict(flight)
+
+    def bulk_update_flights(self, flight_updates: List[Tuple[str, Dict[str, Any]]]) -> None:
+        with self._lock:
+            for flight_id, update_data in flight_updates:
+                flight = self._flights.get(str(flight_id))
+                if not flight:
+                    continue
+                for field, value in update_data.items():
+                    if field == "expire_at":
+                        continue
+                    if field == "last_contact":
+                        self._touch(str(flight_id), value)
+                    else:
+                        flight[field] = value
+
+    def bulk_update_flight_last_contacts(self, flight_updates: List[Tuple[str, datetime]]) -> None:
+        with self._lock:
+            for flight_id, timestamp in flight_updates:
+                self._touch(str(flight_id), timestamp)
+            self._evict()
+
+    def insert_positions(self, positions: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            for position in positions:
+                trajectory = self._trajectories.get(str(position["flight_id"]))
+                # Positions of evicted flights are dropped
+                if trajectory is not None:
+                    trajectory.append_position(position)
+
+    def get_positions(self, flight_id: str, limit: Optional[int] = None, projection: Optional[Dict[str, Any]] = None,
+                      before: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            trajectory = self._trajectories.get(str(flight_id))
+            if trajectory is None:
+                return []
+            positions = trajectory.positions(None if before else limit, self._flights[str(flight_id)]["_id"])
+
+        if before:
+            before = _naive_utc(before)
+            positions = [p for p in positions if p["timestmp"] < before][:limit]
+
+        if projection:
+            fields = [k for k, v in projection.items() if v]
+            positions = [{k: p[k] for k in fields if k in p} for p in positions]
+
+        return positions
+
+    def _flights_last_pos(self, flights: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        results = []
+        for flight in flights:
+            position = self._trajectories[str(flight["_id"])].last(flight["_id"])
+            if position:
+                results.append({"flight": dict(flight), "position": position})
+
+        results.sort(key=lambda r: r["flight"]["last_contact"], reverse=True)
+        return results
+
+    def get_recent_flights_last_pos(self, min_timestamp: datetime = datetime.min, page_size: Optional[int] = None,
+                                    last_id: Optional[Any] = None) -> List[Dict[str, Any]]:
+        min_timestamp = _naive_utc(min_timestamp) if min_timestamp != datetime.min else datetime.min
+
+        with self._lock:
+            flights = sorted((f for f in self._flights.values() if f["last_contact"] > min_timestamp),
+                             key=lambda f: f["_id"])
+            if last_id:
+                flights = [f for f in flights if f["_id"] > ObjectId(last_id)]
+            if page_size:
+                flights = flights[:page_size]
+            return self._flights_last_pos(flights)
+
+    def get_all_flights_last_pos(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return self._flights_last_pos(list(self._flights.values()))
+
+    def get_flight_history(self, limit: int, after: Optional[Tuple[datetime, Any]] = None, military_only: bool = False,
+                           callsign_prefix: Optional[str] = None, since: Optional[datetime] = None,
+                           until: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        since = _naive_utc(since) if since else None
+        until = _naive_utc(until) if until else None
+        after = (_naive_utc(after[0]), ObjectId(after[1])) if after else None
+
+        def matches(flight):
+            return ((not military_only or flight["is_military"])
+                    and (not callsign_prefix or (flight.get("callsign") or "").startswith(callsign_prefix))
+                    and (not since or flight["last_contact"] >= since)
+                    and (not until or flight["last_contact"] < until)
+                    and (not after or (flight["last_contact"], flight["_id"]) < after))
+
+        with self._lock:
+            flights = [dict(f) for f in self._flights.values() if matches(f)]
+
+        flights.sort(key=lambda f: (f["last_contact"], f["_id"]), reverse=True)
+        return flights[:limit]
+
+    def get_flights_for_retention(self, cutoff: datetime, after: Optional[Tuple[datetime, Any]] = None,
+                                  limit: int = 100) -> List[Dict[str, Any]]:
+        cutoff = _naive_utc(cutoff)
+        with self._lock:
+            flights = sorted(((f["last_contact"], f["_id"]) for f in self._flights.values() if f["last_contact"] < cutoff))
+        if after:
+            flights = [f for f in flights if f > (after[0], after[1])]
+        return [{"_id": id, "last_contact": last_contact} for last_contact, id in flights[:limit]]
+
+    def get_retention_cursor(self) -> Optional[Tuple[datetime, Any]]:
+        return self._retention_cursor
+
+    def save_retention_cursor(self, cursor: Optional[Tuple[datetime, Any]]) -> None:
+        self._retention_cursor = cursor
+
+    def delete_flights_and_positions(self, flight_ids: List[str], chunk_size: int = 200) -> int:
+        assert len(flight_ids) > 0
+
+        with self._lock:
+            return sum(self._remove_flight(str(flight_id)) for flight_id in flight_ids)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Occupancy of the in-memory store"""
+        with self._lock:
+            return {
+                "flights": len(self._flights),
+                "max_flights": self.max_flights,
+                "positions": sum(len(t) for t in self._trajectories.values()),
+                "buffer_bytes": sum(t.nbytes for t in self._trajectories.values())
+            }
@@ -1,15 +1,24 @@
 from datetime import datetime, timedelta, timezone
-from typing import List, Dict, Tuple, Optional, Any, Set
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
 from pymongo.database import Database
+from pymongo.errors import CollectionInvalid
 from pymongo import ReturnDocument, UpdateOne
-from itertools import zip_longest
 from bson.objectid import ObjectId
 from functools import wraps
+import logging
+import re
+import time
 
 from ..models import Flight, IncompleteAircraft
+from ..partitioning import PositionPartitioning, as_utc
+from ..trajectory_chunks import POSITIONS_PER_CHUNK, build_chunks, read_chunks
+from ..position_encoding import QUANTIZED, QUANTIZED_FIELD, encode_position, decode_position
+from .base import FlightPositionStore
 
+logger = logging.getLogger("MongoDBRepository")
 
-def handle_mongodb_errors(func):
+
+def handle_mongodb_errors(func: Callable) -> Callable:
     """Decorator to handle MongoDB specidic errors"""
     @wraps(func)
     def wrapper(*args, **kwargs):
@@ -23,7 +32,7 @@ def handle_mongodb_errors(func):
     return wrapper
 
 
-class MongoDBRepository:
+class MongoDBRepository(FlightPositionStore):
     def __init__(self, db: Database):
         self.db = db
 
@@ -31,16 +40,33 @@ class MongoDBRepository:
         flights_collection_name = getattr(db, 'flights_collection', 'flights')
         positions_collection_name = getattr(db, 'positions_collection', 'positions')
         unknown_aircraft_collection_name = 'aircraft_to_process'
+        position_chunks_collection_name = 'position_chunks'
+        retention_state_collection_name = 'retention_state'
 
         self.flights_collection = db[flights_collection_name]
         self.positions_collection = db[positions_collection_name]
         self.unknown_aircraft_collection = db[unknown_aircraft_collection_name]
+        self.position_chunks_collection = db[position_chunks_collection_name]
+        self.retention_state_collection = db[retention_state_collection_name]
 
         # Store collection names for aggregation pipelines
         self.flights_collection_name = flights_collection_name
         self.positions_collection_name = positions_collection_name
         self.unknown_aircraft_collection_name = unknown_aircraft_collection_name
 
+        # Optional time-partitioned positions layout
+        partitioning = getattr(db, 'positions_partitioning', None)
+        self.partitioning = PositionPartitioning(positions_collection_name, partitioning) if partitioning else None
+        self._known_partitions = None
+        self._partitions_listed_at = 0.0
+
+        # Optional fixed-point storage encoding of new positions
+        self.quantize_positions = getattr(db, 'positions_encoding', None) == QUANTIZED
+
+        # Whether trajectory chunks exist, only then reads check the flight for whether it was compacted
+        self._chunks_exist = False
+        self._chunks_checked_at: Optional[float] = None
+
         # Create indexes for better performance
         self._ensure_indexes()
 
@@ -83,16 +109,137 @@ class MongoDBRepository:
             
         # Create index for last_contact
         self.flights_collection.create_index("last_contact")
+
+        # Keyset order of the retention worker and the flight history, callsign included for prefix filters
+        self.flights_collection.create_index([("last_contact", 1), ("_id", 1)])
+        self.flights_collection.create_index([("last_contact", 1), ("_id", 1), ("callsign", 1)])
+        self.flights_collection.create_index([("is_military", 1), ("last_contact", 1), ("_id", 1)])
         
         # Create compound index for modeS + callsign for faster lookups
         self.flights_collection.create_index([("modeS", 1), ("callsign", 1)])
 
         # Positions collection indexes
-        self.positions_collection.create_index([("flight_id", 1), ("timestmp", 1)])
+        if not self.partitioning:
+            self.positions_collection.create_index([("flight_id", 1), ("timestmp", 1)])
         
         self.unknown_aircraft_collection.create_index("modeS", unique=True)
         self.unknown_aircraft_collection.create_index("last_seen")
 
+        # Trajectory chunks of compacted flights, removed together with their flight by the retention worker
+        self.position_chunks_collection.create_index([("flight_id", 1), ("seq", 1)], unique=True)
+
+    # Minimum interval between re-reading the partition list on a cache miss
+    PARTITION_REFRESH_INTERVAL_SEC = 30
+
+    def _list_partitions(self, refresh: bool = False) -> Set[str]:
+        """Names of the existing position partitions (cached)"""
+        if refresh and time.monotonic() - self._partitions_listed_at < self.PARTITION_REFRESH_INTERVAL_SEC:
+            refresh = False
+
+        if self._known_partitions is None or refresh:
+            self._known_partitions = {
+                name for name in self.db.list_collection_names()
+                if self.partitioning.parse_partition_start(name) is not None
+            }
+            self._partitions_listed_at = time.monotonic()
+        return self._known_partitions
+
+    def _ensure_partition(self, collection_name: str):
+        """Create a position partition as time-series collection if it doesn't exist yet"""
+        if collection_name in self._list_partitions():
+            return
+
+        try:
+            self.db.create_collection(
+                collection_name,
+                timeseries={
+                    "timeField": "timestmp",
+                    "metaField": "flight_id",
+                    "granularity": "seconds"
+                }
+            )
+            logger.info(f"Created position partition {collection_name}")
+        except CollectionInvalid:
+            # Created concurrently
+            pass
+
+        self.db[collection_name].create_index([("flight_id", 1), ("timestmp", 1)])
+        self._known_partitions.add(collection_name)
+
+    def _position_partitions_between(self, start: datetime, end: datetime) -> List[str]:
+        """Existing partitions overlapping the given time range, in chronological order"""
+        names = self.partitioning.collection_names_between(start, end)
+        existing = self._list_partitions()
+
+        # Partitions might have been created by another repository instance or process
+        if names[-1] not in existing:
+            existing = self._list_partitions(refresh=True)
+
+        return [name for name in names if name in existing]
+
+    def _flight_position_partitions(self, flight: Dict[str, Any]) -> List[str]:
+        """Partitions that may contain positions of the given flight, pruned by first/last contact"""
+        # Positions of a new flight can be stamped slightly before its first_contact
+        margin = timedelta(minutes=1)
+        return self._position_partitions_between(
+            flight["first_contact"] - margin,
+            flight["last_contact"] + margin
+        )
+
+    def drop_expired_position_partitions(self, cutoff: datetime) -> List[str]:
+        """Drop all position partitions whose time range lies entirely before the cutoff"""
+        if not self.partitioning:
+            return []
+
+        # Re-read collection names, partitions might have been created by another process
+        self._known_partitions = None
+        expired = sorted(name for name in self._list_partitions() if self.partitioning.is_expired(name, cutoff))
+
+        for name in expired:
+            self.db.drop_collection(name)
+            self._known_partitions.discard(name)
+            logger.info(f"Dropped expired position partition {name}")
+
+        return expired
+
+    def _attach_latest_positions(self, flights: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Partitioned counterpart of the latest-position $lookup: pairs flights with their most recent position"""
+        flights_by_partition = {}
+        for flight in flights:
+            partitions = self._flight_position_partitions(flight)
+            if partitions:
+                flights_by_partition.setdefault(partitions[-1], []).append(flight)
+
+        latest_positions = {}
+        pending = flights_by_partition
+
+        # The latest position is usually in the partition of last_contact; walk back for the remaining ones
+        while pending:
+            unresolved = {}
+            for partition, partition_flights in pending.items():
+                pipeline = [
+                    {"$match": {"flight_id": {"$in": [f["_id"] for f in partition_flights]}}},
+                    {"$sort": {"timestmp": -1}},
+                    {"$group": {"_id": "$flight_id", "position": {"$first": "$$ROOT"}}}
+                ]
+                for result in self.db[partition].aggregate(pipeline):
+                    latest_positions[result["_id"]] = decode_position(result["position"])
+
+                for flight in partition_flights:
+                    if flight["_id"] in latest_positions:
+                        continue
+                    earlier = [p for p in self._flight_position_partitions(flight) if p < partition]
+                    if earlier:
+                        unresolved.setdefault(earlier[-1], []).append(flight)
+            pending = unresolved
+
+        results = [
+            {"flight": flight, "position": latest_positions[flight["_id"]]}
+            for flight in flights if flight["_id"] in latest_positions
+        ]
+        results.sort(key=lambda r: r["flight"]["last_contact"], reverse=True)
+        return results
+
     def get_flights(self, modeS_addr: str) -> List[Dict[str, Any]]:
         """Get flights by ICAO Mode-S address"""
         return list(self.flights_collection.find({"modeS": modeS_addr}))
@@ -120,6 +267,9 @@ class MongoDBRepository:
 
     def get_all_positions(self) -> Dict[str, List[Tuple[float, float, int]]]:
         """Get all positions for flights"""
+        if self.partitioning:
+            return self._get_all_positions_partitioned()
+
         pipeline = [
             {"$lookup": {
                 "from": self.positions_collection_name,
@@ -133,7 +283,8 @@ class MongoDBRepository:
                 "modeS": 1,
                 "lat": "$positions.lat",
                 "lon": "$positions.lon",
-                "alt": "$positions.alt"
+                "alt": "$positions.alt",
+                QUANTIZED_FIELD: f"$positions.{QUANTIZED_FIELD}"
             }}
         ]
 
@@ -141,6 +292,7 @@ class MongoDBRepository:
         results = list(self.flights_collection.aggregate(pipeline))
 
         for result in results:
+            decode_position(result)
             modeS = result["modeS"]
             if modeS not in positions_map:
                 positions_map[modeS] = []
@@ -148,12 +300,187 @@ class MongoDBRepository:
 
         return positions_map
 
-    def get_positions(self, flight_id: str) -> List[Dict[str, Any]]:
-        """Get all positions for a specific flight"""
-        return list(self.positions_collection.find(
-            {"flight_id": ObjectId(flight_id)}).sort("timestmp", 1))
+    def _get_all_positions_partitioned(self) -> Dict[str, List[Tuple[float, float, int]]]:
+        modeS_by_flight = {f["_id"]: f["modeS"] for f in self.flights_collection.find({}, {"modeS": 1})}
+
+        positions_map = {}
+        for partition in sorted(self._list_partitions()):
+            cursor = self.db[partition].find({}, {"flight_id": 1, "lat": 1, "lon": 1, "alt": 1, QUANTIZED_FIELD: 1}).sort("timestmp", 1)
+            for pos in cursor:
+                decode_position(pos)
+                modeS = modeS_by_flight.get(pos["flight_id"])
+                if modeS:
+                    positions_map.setdefault(modeS, []).append((pos["lat"], pos["lon"], pos["alt"]))
 
-    def get_recent_flights_last_pos(self, min_timestamp=datetime.min, page_size=None, last_id=None) -> List[Dict[str, Any]]:
+        return positions_map
+
+    def get_flight(self, flight_id: str) -> Optional[Dict[str, Any]]:
+        """Get flight by ID"""
+        return self.flights_collection.find_one({"_id": ObjectId(flight_id)})
+
+    def _has_chunks(self) -> bool:
+        """
+        Whether flights may have been compacted, regardless of whether compaction is enabled now.
+        Once chunks were seen this stays true, until then the chunks collection is re-checked at most every refresh interval.
+        """
+        if not self._chunks_exist and (self._chunks_checked_at is None or
+                                       time.monotonic() - self._chunks_checked_at >= self.PARTITION_REFRESH_INTERVAL_SEC):
+            self._chunks_exist = self.position_chunks_collection.find_one({}, {"_id": 1}) is not None
+            self._chunks_checked_at = time.monotonic()
+        return self._chunks_exist
+
+    def _get_read_flight(self, flight_id: str) -> Optional[Dict[str, Any]]:
+        """The flight document if reading its positions depends on it, i.e. on its compacted flag or the partitions it covers"""
+        if self.partitioning or self._has_chunks():
+            return self.get_flight(flight_id)
+        return None
+
+    def get_positions(self, flight_id: str, limit: Optional[int] = None, projection: Optional[Dict[str, Any]] = None,
+                      before: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Get all positions for a specific flight, ordered by time, optionally only those before a timestamp"""
+        flight = self._get_read_flight(flight_id)
+
+        # Finished flights may have been compacted into trajectory chunks
+        if flight and flight.get("compacted"):
+            positions = self._get_chunked_positions(flight["_id"], limit)
+            if before:
+                before_utc = as_utc(before).replace(tzinfo=None)
+                positions = [p for p in positions if p["timestmp"] < before_utc]
+            if limit:
+                positions = positions[:limit]
+            if projection:
+                fields = [k for k, v in projection.items() if v]
+                positions = [{k: p[k] for k in fields if k in p} for p in positions]
+            return positions
+
+        return self._get_raw_positions(flight_id, flight, limit, projection, before)
+
+    def iter_positions(self, flight_id: str, projection: Optional[Dict[str, Any]] = None,
+                       before: Optional[datetime] = None, batch_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        """Iterate the positions of a flight from a cursor, fetching batch_size documents per round trip"""
+        flight = self._get_read_flight(flight_id)
+
+        if flight and flight.get("compacted"):
+            before_utc = as_utc(before).replace(tzinfo=None) if before else None
+            fields = [k for k, v in projection.items() if v] if projection else None
+            chunks = self.position_chunks_collection.find({"flight_id": flight["_id"]}).sort("seq", 1)
+            for chunk in chunks.batch_size(max(1, batch_size // POSITIONS_PER_CHUNK)):
+                for position in read_chunks([chunk]):
+                    if before_utc and position["timestmp"] >= before_utc:
+                        return
+                    yield {k: position[k] for k in fields if k in position} if fields else position
+            return
+
+        query, projection = self._raw_positions_query(flight_id, projection, before)
+        if not self.partitioning:
+            collections = [self.positions_collection]
+        else:
+            collections = [self.db[partition] for partition in self._flight_position_partitions(flight)] if flight else []
+
+        for collection in collections:
+            cursor = collection.find(query, projection).sort("timestmp", 1).batch_size(batch_size)
+            for position in cursor:
+                yield decode_position(position)
+
+    @staticmethod
+    def _raw_positions_query(flight_id: str, projection: Optional[Dict[str, Any]],
+                             before: Optional[datetime]) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+        query = {"flight_id": ObjectId(flight_id)}
+        if before:
+            query["timestmp"] = {"$lt": before}
+
+        # The encoding flag is needed to decode quantized documents
+        if projection and any(v for k, v in projection.items() if k != "_id"):
+            projection = {**projection, QUANTIZED_FIELD: 1}
+
+        return query, projection
+
+    def _get_raw_positions(self, flight_id: str, flight: Optional[Dict[str, Any]], limit: Optional[int] = None,
+                           projection: Optional[Dict[str, Any]] = None, before: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Read positions of a flight from the position collection(s)"""
+        query, projection = self._raw_positions_query(flight_id, projection, before)
+
+        if not self.partitioning:
+            cursor = self.positions_collection.find(query, projection).sort("timestmp", 1)
+            if limit:
+                cursor = cursor.limit(limit)
+            return [decode_position(p) for p in cursor]
+
+        if not flight:
+            return []
+
+        positions = []
+        for partition in self._flight_position_partitions(flight):
+            cursor = self.db[partition].find(query, projection).sort("timestmp", 1)
+            if limit:
+                cursor = cursor.limit(limit - len(positions))
+            positions.extend(decode_position(p) for p in cursor)
+            if limit and len(positions) >= limit:
+                break
+
+        return positions
+
+    def _get_chunked_positions(self, flight_oid: ObjectId, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Positions of a compacted flight, with a limit only the chunks holding the first limit positions are decoded"""
+        chunks = self.position_chunks_collection.find({"flight_id": flight_oid}).sort("seq", 1)
+        if not limit:
+            return read_chunks(list(chunks))
+
+        positions = []
+        for chunk in chunks:
+            positions.extend(read_chunks([chunk]))
+            if len(positions) >= limit:
+                break
+        return positions
+
+    def compact_flight(self, flight: Dict[str, Any]) -> int:
+        """
+        Rewrite the positions of a finished flight into packed trajectory chunks.
+        Returns the number of compacted positions.
+        """
+        flight_oid = flight["_id"]
+        positions = self._get_raw_positions(str(flight_oid), flight)
+
+        if len(positions) < POSITIONS_PER_CHUNK:
+            # Below one chunk the raw positions are kept: a chunk is always decoded as a whole,
+            # so reads of a few positions would be slower than from the raw documents
+            self.flights_collection.update_one({"_id": flight_oid}, {"$set": {"compacted": False}})
+            return 0
+
+        # Remove leftovers of an interrupted compaction before writing the chunks
+        self.position_chunks_collection.delete_many({"flight_id": flight_oid})
+        if positions:
+            self.position_chunks_collection.insert_many(build_chunks(flight_oid, positions))
+            self._chunks_exist = True
+
+        # Readers switch to the chunks as soon as the flight is flagged, raw positions are removed afterwards
+        self.flights_collection.update_one({"_id": flight_oid}, {"$set": {"compacted": True}})
+        self._delete_raw_positions(flight)
+
+        return len(positions)
+
+    @handle_mongodb_errors
+    def compact_finished_flights(self, idle_before: datetime, limit: int = 50) -> Tuple[int, int]:
+        """
+        Compact flights without contact since the given timestamp, flights below one chunk are only flagged.
+        Returns the number of compacted flights and positions.
+        """
+        flights = list(self.flights_collection.find({
+            "last_contact": {"$lt": idle_before},
+            "compacted": {"$exists": False}
+        }).sort("last_contact", 1).limit(limit))
+
+        flight_count = position_count = 0
+        for flight in flights:
+            compacted = self.compact_flight(flight)
+            if compacted:
+                flight_count += 1
+                position_count += compacted
+
+        return flight_count, position_count
+
+    def get_recent_flights_last_pos(self, min_timestamp: datetime = datetime.min, page_size: Optional[int] = None,
+                                    last_id: Optional[ObjectId] = None) -> List[Dict[str, Any]]:
         """Get recent flights with their latest position, with optional pagination"""
         match_stage = {"last_contact": {"$gt": min_timestamp}}
 
@@ -170,6 +497,9 @@ class MongoDBRepository:
         if page_size:
             pipeline.append({"$limit": page_size})
 
+        if self.partitioning:
+            return self._attach_latest_positions(list(self.flights_collection.aggregate(pipeline)))
+
         # Continue with lookup for positions
         pipeline.extend([
             {"$lookup": {
@@ -192,10 +522,13 @@ class MongoDBRepository:
         # Use a properly indexed field for the sort
         pipeline.append({"$sort": {"flight.last_contact": -1}})
 
-        return list(self.flights_collection.aggregate(pipeline))
+        return self._decode_latest_positions(self.flights_collection.aggregate(pipeline))
         
     def get_all_flights_last_pos(self) -> List[Dict[str, Any]]:
         """Get all flights with their latest position"""
+        if self.partitioning:
+            return self._attach_latest_positions(list(self.flights_collection.find()))
+
         pipeline = [
             {"$lookup": {
                 "from": self.positions_collection_name,
@@ -216,7 +549,14 @@ class MongoDBRepository:
             {"$sort": {"flight.last_contact": -1}}
         ]
         
-        return list(self.flights_collection.aggregate(pipeline))
+        return self._decode_latest_positions(self.flights_collection.aggregate(pipeline))
+
+    @staticmethod
+    def _decode_latest_positions(results) -> List[Dict[str, Any]]:
+        results = list(results)
+        for result in results:
+            decode_position(result["position"])
+        return results
 
     def get_flights_older_than(self, timestamp: datetime) -> List[Dict[str, Any]]:
         """Get flights with last contact older than given timestamp"""
@@ -224,19 +564,99 @@ class MongoDBRepository:
             "last_contact": {"$lt": timestamp}
         }))
 
-    def delete_flights_and_positions(self, flight_ids: List[str]):
-        """Delete flights and their positions"""
+    def get_flight_history(self, limit: int, after: Optional[Tuple[datetime, Any]] = None, military_only: bool = False,
+                           callsign_prefix: Optional[str] = None, since: Optional[datetime] = None,
+                           until: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Get flights newest first in (last_contact, _id) order, continuing after the keyset cursor"""
+        query = {}
+
+        if military_only:
+            query["is_military"] = True
+        if callsign_prefix:
+            # Anchored, case-sensitive prefix so the index can be used
+            query["callsign"] = {"$regex": f"^{re.escape(callsign_prefix)}"}
+        if since or until:
+            query["last_contact"] = {}
+            if since:
+                query["last_contact"]["$gte"] = since
+            if until:
+                query["last_contact"]["$lt"] = until
+
+        if after:
+            last_contact, last_id = after
+            query["$or"] = [
+                {"last_contact": {"$lt": last_contact}},
+                {"last_contact": last_contact, "_id": {"$lt": ObjectId(last_id)}}
+            ]
+
+        cursor = self.flights_collection.find(query).sort([("last_contact", -1), ("_id", -1)]).limit(limit)
+        return list(cursor)
+
+    def get_flights_for_retention(self, cutoff: datetime, after: Optional[Tuple[datetime, ObjectId]] = None,
+                                  limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        Get flights with last contact before the cutoff in (last_contact, _id) order,
+        starting after the given keyset cursor
+        """
+        query = {"last_contact": {"$lt": cutoff}}
+        if after:
+            last_contact, last_id = after
+            query["$or"] = [
+                {"last_contact": {"$gt": last_contact}},
+                {"last_contact": last_contact, "_id": {"$gt": last_id}}
+            ]
+
+        return list(self.flights_collection.find(query, {"_id": 1, "last_contact": 1})
+                    .sort([("last_contact", 1), ("_id", 1)])
+                    .limit(limit))
+
+    def get_retention_cursor(self) -> Optional[Tuple[datetime, ObjectId]]:
+        """Get the persisted position of the retention worker"""
+        state = self.retention_state_collection.find_one({"_id": "flights"})
+        if state and state.get("last_contact") and state.get("last_id"):
+            return state["last_contact"], state["last_id"]
+        return None
+
+    def save_retention_cursor(self, cursor: Optional[Tuple[datetime, ObjectId]]) -> None:
+        """Persist the position of the retention worker so it can resume after a restart"""
+        last_contact, last_id = cursor if cursor else (None, None)
+        self.retention_state_collection.update_one(
+            {"_id": "flights"},
+            {"$set": {"last_contact": last_contact, "last_id": last_id, "updated": datetime.now(timezone.utc)}},
+            upsert=True
+        )
+
+    def delete_flights_and_positions(self, flight_ids: List[str], chunk_size: int = 200) -> int:
+        """
+        Delete flights and their positions, returns the number of deleted documents.
+        Partitioned positions are left to drop_expired_position_partitions, which drops them with their partition
+        """
         assert len(flight_ids) > 0
 
-        for ids_chunk in self._get_chunks(flight_ids, 200):
-            # Filter out None values added by zip_longest
-            ids = [ObjectId(id) for id in ids_chunk if id is not None]
+        deleted = 0
+        for i in range(0, len(flight_ids), chunk_size):
+            ids = [ObjectId(id) for id in flight_ids[i:i + chunk_size]]
 
             # Delete positions first
-            self.positions_collection.delete_many({"flight_id": {"$in": ids}})
+            if not self.partitioning:
+                deleted += self.positions_collection.delete_many({"flight_id": {"$in": ids}}).deleted_count
+            deleted += self.position_chunks_collection.delete_many({"flight_id": {"$in": ids}}).deleted_count
 
             # Then delete flights
-            self.flights_collection.delete_many({"_id": {"$in": ids}})
+            deleted += self.flights_collection.delete_many({"_id": {"$in": ids}}).deleted_count
+
+        return deleted
+
+    def _delete_raw_positions(self, flight: Dict[str, Any]) -> int:
+        """Delete the raw positions of a flight, only from the partitions it covers if partitioned"""
+        query = {"flight_id": flight["_id"]}
+        if not self.partitioning:
+            return self.positions_collection.delete_many(query).deleted_count
+
+        deleted = 0
+        for partition in self._flight_position_partitions(flight):
+            deleted += self.db[partition].delete_many(query).deleted_count
+        return deleted
 
     def insert_flight(self, flight: Flight) -> str:
         """Insert a new flight and return its ID"""
@@ -310,8 +730,23 @@ class MongoDBRepository:
     @handle_mongodb_errors
     def insert_positions(self, positions: List[Dict[str, Any]]) -> None:
         """Insert multiple position documents"""
-        if positions:
+        if not positions:
+            return
+
+        if self.quantize_positions:
+            positions = [encode_position(p) for p in positions]
+
+        if not self.partitioning:
             self.positions_collection.insert_many(positions)
+            return
+
+        positions_by_partition = {}
+        for position in positions:
+            positions_by_partition.setdefault(self.partitioning.collection_name(position["timestmp"]), []).append(position)
+
+        for partition, partition_positions in positions_by_partition.items():
+            self._ensure_partition(partition)
+            self.db[partition].insert_many(partition_positions)
 
     @handle_mongodb_errors
     def get_or_create_flight(self, modeS: str, is_military: bool, callsign: Optional[str] = None, expire_at: Optional[datetime] = None) -> Dict[str, Any]:
@@ -464,8 +899,3 @@ class MongoDBRepository:
         if aircraft_ids:
             object_ids = [ObjectId(id) for id in aircraft_ids]
             self.unknown_aircraft_collection.delete_many({"_id": {"$in": object_ids}})
-
-    @staticmethod
-    def _get_chunks(iterable, chunk_size):
-        args = [iter(iterable)] * chunk_size
-        return zip_longest(*args, fillvalue=None)
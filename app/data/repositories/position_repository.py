@@ -1,12 +1,12 @@
 import logging
-from typing import List, Dict, Tuple, Any
+from typing import List, Dict, Tuple, Any, Optional, Iterator
 from datetime import datetime
-from .mongodb_repository import MongoDBRepository
+from .base import FlightPositionStore
 
 logger = logging.getLogger('PositionRepository')
 
 class PositionRepository:
-    def __init__(self, db_repo: MongoDBRepository) -> None:
+    def __init__(self, db_repo: FlightPositionStore) -> None:
         self.db_repo = db_repo
         
     def insert_positions(self, positions: List[Dict[str, Any]]) -> None:
@@ -15,4 +15,14 @@ class PositionRepository:
         
     def bulk_update_flight_last_contacts(self, updates: List[Tuple[str, datetime]]) -> None:
         """Update last contact times for multiple flights"""
-        return self.db_repo.bulk_update_flight_last_contacts(updates)
\ No newline at end of file
+        return self.db_repo.bulk_update_flight_last_contacts(updates)
+
+    def get_positions(self, flight_id: str, limit: Optional[int] = None, projection: Optional[Dict[str, Any]] = None,
+                      before: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Get positions of a flight from the database, ordered by time"""
+        return self.db_repo.get_positions(flight_id, limit, projection, before)
+
+    def iter_positions(self, flight_id: str, projection: Optional[Dict[str, Any]] = None,
+                       before: Optional[datetime] = None, batch_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        """Iterate positions of a flight from the database in batches, ordered by time"""
+        return self.db_repo.iter_positions(flight_id, projection, before, batch_size)
@@ -0,0 +1,98 @@
+import logging
+import sqlite3
+from typing import List
+
+from ..sqlite_database import SQLiteDatabase
+from .base import AircraftProcessingStore
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteAircraftProcessingRepository(AircraftProcessingStore):
+    """Queue of aircraft that need metadata processing, stored in SQLite"""
+
+    def __init__(self, db: SQLiteDatabase):
+        self.db = db
+
+    def add_aircraft(self, icao24: str) -> bool:
+        """Add aircraft to processing queue"""
+        try:
+            with self.db.transaction() as conn:
+                conn.execute("INSERT OR IGNORE INTO aircraft_to_process (modeS) VALUES (?)", (icao24.upper(),))
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"Failed to add aircraft {icao24}: {e}")
+            return False
+
+    def get_aircraft_for_processing(self, limit: int = 50) -> List[str]:
+        """Get aircraft with less than 3 attempts"""
+        try:
+            rows = self.db.connection().execute(
+                "SELECT modeS FROM aircraft_to_process WHERE query_attempts < ? ORDER BY query_attempts, seq LIMIT ?",
+                (self.MAX_QUERY_ATTEMPTS, limit))
+            return [row["modeS"] for row in rows]
+        except sqlite3.Error as e:
+            logger.error(f"Failed to get aircraft for processing: {e}")
+            return []
+
+    def increment_attempts(self, icao24: str) -> bool:
+        """Increment query attempts for an aircraft"""
+        try:
+            with self.db.transaction() as conn:
+                cursor = conn.execute("UPDATE aircraft_to_process SET query_attempts = query_attempts + 1 WHERE modeS = ?",
+                                      (icao24.upper(),))
+            return cursor.rowcount > 0
+        except sqlite3.Error as e:
+            logger.error(f"Failed to increment attempts for {icao24}: {e}")
+            return False
+
+    def remove_aircraft(self, icao24: str) -> bool:
+        """Remove aircraft from processing queue (successfully processed)"""
+        try:
+            with self.db.transaction() as conn:
+                cursor = conn.execute("DELETE FROM aircraft_to_process WHERE modeS = ?", (icao24.upper(),))
+            return cursor.rowcount > 0
+        except sqlite3.Error as e:
+            logger.error(f"Failed to remove aircraft {icao24}: {e}")
+            return False
+
+    def aircraft_exists(self, icao24: str) -> bool:
+        """Check if aircraft exists in processing queue"""
+        try:
+            row = self.db.connection().execute("SELECT 1 FROM aircraft_to_process WHERE modeS = ?", (icao24.upper(),)).fetchone()
+            return row is not None
+        except sqlite3.Error as e:
+            logger.error(f"Failed to check if aircraft {icao24} exists: {e}")
+            return False
+
+    def cleanup_failed_aircraft(self) -> int:
+        """Remove aircraft that have reached max attempts (3)"""
+        try:
+            with self.db.transaction() as conn:
+                deleted = conn.execute("DELETE FROM aircraft_to_process WHERE query_attempts >= ?",
+                                       (self.MAX_QUERY_ATTEMPTS,)).rowcount
+
+            if deleted > 0:
+                logger.info(f"Cleaned up {deleted} aircraft with max attempts")
+
+            return deleted
+        except sqlite3.Error as e:
+            logger.error(f"Failed to cleanup failed aircraft: {e}")
+            return 0
+
+    def get_stats(self) -> dict:
+        """Get simple statistics"""
+        try:
+            row = self.db.connection().execute(
+                "SELECT COUNT(*) AS total, SUM(query_attempts = 0) AS zero_attempts FROM aircraft_to_process").fetchone()
+            total = row["total"]
+            zero_attempts = row["zero_attempts"] or 0
+
+            return {
+                "total_count": total,
+                "zero_attempts": zero_attempts,
+                "in_progress": total - zero_attempts
+            }
+        except sqlite3.Error as e:
+            logger.error(f"Failed to get stats: {e}")
+            return {"total_count": 0, "zero_attempts": 0, "in_progress": 0}
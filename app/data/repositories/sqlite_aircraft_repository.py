@@ -0,0 +1,166 @@
+from datetime import datetime
+import logging
+import sqlite3
+from typing import Any, Dict, Optional
+
+from ...core.models.aircraft import Aircraft
+from ..sqlite_database import SQLiteDatabase, to_millis, from_millis
+from .base import AircraftStore
+
+logger = logging.getLogger(__name__)
+
+_AIRCRAFT_COLUMNS = ("modeS", "registration", "icaoTypeCode", "type", "registeredOwners", "source",
+                     "icaoTypeDesignator", "country", "manufacturer", "firstCreated", "lastModified")
+
+
+class SQLiteAircraftRepository(AircraftStore):
+    """ SQLite implementation of Aircraft Repository """
+
+    def __init__(self, db: SQLiteDatabase):
+        self.db = db
+        self._designators_cache = {}
+        self._cache_loaded = False
+
+    def _load_icao_designators(self):
+        """Load ICAO type designators into cache"""
+        if self._cache_loaded:
+            return
+
+        try:
+            for row in self.db.connection().execute("SELECT icaoTypeCode, icaoTypeDesignator FROM icao_type_designators"):
+                self._designators_cache[row["icaoTypeCode"]] = row["icaoTypeDesignator"]
+
+            self._cache_loaded = True
+            logger.debug(f"Loaded {len(self._designators_cache)} ICAO type designators into cache")
+
+        except Exception as e:
+            logger.warning(f"Failed to load ICAO designators: {e}")
+
+    def _get_icao_designator(self, icao_type_code):
+        """Get ICAO type designator for given type code"""
+        if not icao_type_code:
+            return None
+
+        self._load_icao_designators()
+        return self._designators_cache.get(icao_type_code)
+
+    def query_aircraft(self, icao24addr: str) -> Optional[Aircraft]:
+        """Query aircraft information by ICAO24 address"""
+        result = self.get_aircraft_record(icao24addr)
+
+        if result:
+            return Aircraft(
+                result["modeS"],
+                reg=result.get("registration"),
+                icao_type_code=result.get("icaoTypeCode"),
+                aircraft_type_description=result.get("type"),
+                operator=result.get("registeredOwners"),
+                source=result.get("source"),
+                icao_type_designator=result.get("icaoTypeDesignator")
+            )
+        else:
+            return None
+
+    def get_aircraft_record(self, icao24addr: str) -> Optional[Dict[str, Any]]:
+        """Raw aircraft record including bookkeeping fields such as lastModified"""
+        row = self.db.connection().execute(
+            f"SELECT {', '.join(_AIRCRAFT_COLUMNS)} FROM aircraft WHERE modeS = ?", (icao24addr.strip().upper(),)).fetchone()
+
+        if not row:
+            return None
+
+        record = dict(row)
+        record["firstCreated"] = from_millis(record["firstCreated"])
+        record["lastModified"] = from_millis(record["lastModified"])
+        return record
+
+    def _build_update_dict(self, aircraft):
+        """Build update dictionary with ICAO designator if available"""
+        base_fields = {"lastModified": to_millis(datetime.now())}
+
+        if aircraft.is_complete_with_operator():
+            update_dict = {
+                "registration": aircraft.reg,
+                "icaoTypeCode": aircraft.icao_type_code,
+                "type": aircraft.aircraft_type_description,
+                "registeredOwners": aircraft.operator,
+                "source": aircraft.source,
+                **base_fields
+            }
+        elif aircraft.is_complete():
+            update_dict = {
+                "registration": aircraft.reg,
+                "icaoTypeCode": aircraft.icao_type_code,
+                "type": aircraft.aircraft_type_description,
+                "source": aircraft.source,
+                **base_fields
+            }
+        elif aircraft.reg:
+            update_dict = {
+                "registration": aircraft.reg,
+                "source": aircraft.source,
+                **base_fields
+            }
+        else:
+            return {}
+
+        # Add ICAO designator if type code is present
+        if aircraft.icao_type_code:
+            icao_designator = self._get_icao_designator(aircraft.icao_type_code)
+            if icao_designator:
+                update_dict["icaoTypeDesignator"] = icao_designator
+
+        return update_dict
+
+    def update_aircraft(self, aircraft: Aircraft) -> bool:
+        """Update existing aircraft information"""
+        try:
+            update_dict = self._build_update_dict(aircraft)
+
+            if not update_dict:
+                return False
+
+            assignments = ", ".join(f"{field} = ?" for field in update_dict)
+            with self.db.transaction() as conn:
+                cursor = conn.execute(f"UPDATE aircraft SET {assignments} WHERE modeS = ?",
+                                      (*update_dict.values(), aircraft.modes_hex))
+            return cursor.rowcount > 0
+
+        except sqlite3.Error as e:
+            logger.exception(e)
+            logger.error(f'Could not update aircraft: {str(aircraft)}')
+            return False
+
+    def insert_aircraft(self, acrft: Aircraft) -> bool:
+        """Insert new aircraft into database"""
+        if acrft:
+            try:
+                timestamp = to_millis(datetime.now())
+
+                aircraft_doc = {
+                    "modeS": acrft.modes_hex,
+                    "firstCreated": timestamp,
+                    "lastModified": timestamp,
+                    "registration": acrft.reg,
+                    "icaoTypeCode": acrft.icao_type_code,
+                    "type": acrft.aircraft_type_description,
+                    "registeredOwners": acrft.operator,
+                    "source": acrft.source,
+                    "country": "",
+                    "manufacturer": "",
+                    "icaoTypeDesignator": self._get_icao_designator(acrft.icao_type_code)
+                }
+
+                placeholders = ", ".join("?" * len(aircraft_doc))
+                with self.db.transaction() as conn:
+                    conn.execute(f"INSERT INTO aircraft ({', '.join(aircraft_doc)}) VALUES ({placeholders})",
+                                 tuple(aircraft_doc.values()))
+                return True
+
+            except sqlite3.IntegrityError:
+                return self.update_aircraft(acrft)
+            except sqlite3.Error as e:
+                logger.exception(e)
+                logger.error(f'Could not insert aircraft: {str(acrft)}')
+
+        return False
@@ -0,0 +1,320 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Tuple, Optional, Any, Set, Iterator
+
+from bson.objectid import ObjectId
+
+from ..sqlite_database import SQLiteDatabase, to_millis, from_millis
+from .base import FlightPositionStore
+
+logger = logging.getLogger("SQLiteRepository")
+
+_FLIGHT_COLUMNS = "id, modeS, callsign, is_military, first_contact, last_contact, expire_at"
+_POSITION_COLUMNS = "flight_id, timestmp, lat, lon, alt, track, gs"
+
+# Flight fields that may be changed through bulk_update_flights
+_UPDATABLE_FLIGHT_FIELDS = ("callsign", "last_contact", "expire_at")
+_TIMESTAMP_FIELDS = ("last_contact", "expire_at")
+
+# SQLite limits the number of bound parameters per statement
+_MAX_IN_PARAMS = 500
+
+
+def _flight_doc(row) -> Dict[str, Any]:
+    flight = {
+        "_id": ObjectId(row["id"]),
+        "modeS": row["modeS"],
+        "is_military": bool(row["is_military"]),
+        "first_contact": from_millis(row["first_contact"]),
+        "last_contact": from_millis(row["last_contact"])
+    }
+    if row["callsign"] is not None:
+        flight["callsign"] = row["callsign"]
+    if row["expire_at"] is not None:
+        flight["expire_at"] = from_millis(row["expire_at"])
+    return flight
+
+
+def _position_doc(row) -> Dict[str, Any]:
+    position = {
+        "flight_id": ObjectId(row["flight_id"]),
+        "timestmp": from_millis(row["timestmp"]),
+        "lat": row["lat"],
+        "lon": row["lon"],
+        "alt": row["alt"],
+        "track": row["track"]
+    }
+    if row["gs"] is not None:
+        position["gs"] = row["gs"]
+    return position
+
+
+def _chunks(items: List[Any], size: int = _MAX_IN_PARAMS):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class SQLiteRepository(FlightPositionStore):
+    """Flights and positions in an embedded SQLite database, positions in time-partitioned tables"""
+
+    def __init__(self, db: SQLiteDatabase):
+        self.db = db
+        self.partitioning = db.partitioning
+
+    def _flight_partitions(self, flight: Dict[str, Any]) -> List[str]:
+        """Partition tables that may contain positions of the flight, pruned by first/last contact"""
+        margin = timedelta(minutes=1)
+        names = self.db.partitioning.collection_names_between(flight["first_contact"] - margin, flight["last_contact"] + margin)
+        existing = self.db.list_partitions()
+        if names[-1] not in existing:
+            existing = self.db.list_partitions(refresh=True)
+        return [name for name in names if name in existing]
+
+    def get_flight(self, flight_id: str) -> Optional[Dict[str, Any]]:
+        row = self.db.connection().execute(
+            f"SELECT {_FLIGHT_COLUMNS} FROM flights WHERE id = ?", (str(flight_id),)).fetchone()
+        return _flight_doc(row) if row else None
+
+    def flight_exists(self, flight_id: str) -> bool:
+        return self.db.connection().execute("SELECT 1 FROM flights WHERE id = ?", (str(flight_id),)).fetchone() is not None
+
+    def get_flights_batch(self, modeS_addrs: Set[str]) -> Dict[str, List[Dict[str, Any]]]:
+        if not modeS_addrs:
+            return {}
+
+        flights_by_modeS = {}
+        conn = self.db.connection()
+        for addrs in _chunks(list(modeS_addrs)):
+            placeholders = ",".join("?" * len(addrs))
+            rows = conn.execute(
+                f"SELECT {_FLIGHT_COLUMNS} FROM flights WHERE modeS IN ({placeholders}) ORDER BY last_contact DESC", addrs)
+            for row in rows:
+                flights_by_modeS.setdefault(row["modeS"], []).append(_flight_doc(row))
+
+        return flights_by_modeS
+
+    def get_or_create_flight(self, modeS: str, is_military: bool, callsign: Optional[str] = None,
+                             expire_at: Optional[datetime] = None) -> Dict[str, Any]:
+        now = to_millis(datetime.now(timezone.utc))
+        flight_id = str(ObjectId())
+
+        with self.db.transaction() as conn:
+            conn.execute(
+                f"INSERT INTO flights ({_FLIGHT_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (flight_id, modeS, callsign, int(is_military), now, now, to_millis(expire_at)))
+
+        return self.get_flight(flight_id)
+
+    def bulk_update_flights(self, flight_updates: List[Tuple[str, Dict[str, Any]]]) -> None:
+        if not flight_updates:
+            return
+
+        with self.db.transaction() as conn:
+            for flight_id, update_data in flight_updates:
+                fields = [f for f in _UPDATABLE_FLIGHT_FIELDS if f in update_data]
+                if not fields:
+                    continue
+                values = [to_millis(update_data[f]) if f in _TIMESTAMP_FIELDS else update_data[f] for f in fields]
+                assignments = ", ".join(f"{f} = ?" for f in fields)
+                conn.execute(f"UPDATE flights SET {assignments} WHERE id = ?", (*values, str(flight_id)))
+
+    def bulk_update_flight_last_contacts(self, flight_updates: List[Tuple[str, datetime]]) -> None:
+        if not flight_updates:
+            return
+
+        with self.db.transaction() as conn:
+            conn.executemany("UPDATE flights SET last_contact = ? WHERE id = ?",
+                             [(to_millis(ts), str(flight_id)) for flight_id, ts in flight_updates])
+
+    def insert_positions(self, positions: List[Dict[str, Any]]) -> None:
+        if not positions:
+            return
+
+        rows_by_partition = {}
+        for pos in positions:
+            rows_by_partition.setdefault(self.partitioning.collection_name(pos["timestmp"]), []).append((
+                str(pos["flight_id"]), to_millis(pos["timestmp"]), pos["lat"], pos["lon"],
+                pos.get("alt"), pos.get("track"), pos.get("gs")
+            ))
+
+        # One transaction per batch, that's where SQLite spends its time
+        with self.db.transaction() as conn:
+            for table, rows in rows_by_partition.items():
+                self.db.ensure_partition(conn, table)
+                conn.executemany(f"INSERT OR REPLACE INTO {table} ({_POSITION_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def get_positions(self, flight_id: str, limit: Optional[int] = None, projection: Optional[Dict[str, Any]] = None,
+                      before: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        flight = self.get_flight(flight_id)
+        if not flight:
+            return []
+
+        conn = self.db.connection()
+        positions = []
+        for table in self._flight_partitions(flight):
+            query = f"SELECT {_POSITION_COLUMNS} FROM {table} WHERE flight_id = ?"
+            params = [str(flight_id)]
+            if before:
+                query += " AND timestmp < ?"
+                params.append(to_millis(before))
+            query += " ORDER BY timestmp"
+            if limit:
+                query += " LIMIT ?"
+                params.append(limit - len(positions))
+            positions.extend(_position_doc(row) for row in conn.execute(query, params))
+            if limit and len(positions) >= limit:
+                break
+
+        if projection:
+            fields = [k for k, v in projection.items() if v]
+            positions = [{k: p[k] for k in fields if k in p} for p in positions]
+
+        return positions
+
+    def iter_positions(self, flight_id: str, projection: Optional[Dict[str, Any]] = None,
+                       before: Optional[datetime] = None, batch_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        """
+        Iterate the positions of a flight in batches of batch_size rows. Each batch is a separate
+        range query continuing after the last timestamp, no statement stays open between batches.
+        """
+        flight = self.get_flight(flight_id)
+        if not flight:
+            return
+
+        fields = [k for k, v in projection.items() if v] if projection else None
+        before = to_millis(before) if before else None
+
+        for table in self._flight_partitions(flight):
+            after = -1
+            while True:
+                query = f"SELECT {_POSITION_COLUMNS} FROM {table} WHERE flight_id = ? AND timestmp > ?"
+                params = [str(flight_id), after]
+                if before is not None:
+                    query += " AND timestmp < ?"
+                    params.append(before)
+                query += " ORDER BY timestmp LIMIT ?"
+                params.append(batch_size)
+
+                rows = self.db.connection().execute(query, params).fetchall()
+                for row in rows:
+                    position = _position_doc(row)
+                    yield {k: position[k] for k in fields if k in position} if fields else position
+
+                if len(rows) < batch_size:
+                    break
+                after = rows[-1]["timestmp"]
+
+    def _attach_latest_positions(self, flights: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        conn = self.db.connection()
+        results = []
+        for flight in flights:
+            for table in reversed(self._flight_partitions(flight)):
+                row = conn.execute(
+                    f"SELECT {_POSITION_COLUMNS} FROM {table} WHERE flight_id = ? ORDER BY timestmp DESC LIMIT 1",
+                    (str(flight["_id"]),)).fetchone()
+                if row:
+                    results.append({"flight": flight, "position": _position_doc(row)})
+                    break
+
+        results.sort(key=lambda r: r["flight"]["last_contact"], reverse=True)
+        return results
+
+    def get_recent_flights_last_pos(self, min_timestamp: datetime = datetime.min, page_size: Optional[int] = None,
+                                    last_id: Optional[Any] = None) -> List[Dict[str, Any]]:
+        query = f"SELECT {_FLIGHT_COLUMNS} FROM flights WHERE last_contact > ?"
+        params = [to_millis(min_timestamp) if min_timestamp != datetime.min else -1]
+
+        if last_id:
+            query += " AND id > ?"
+            params.append(str(last_id))
+
+        query += " ORDER BY id"
+        if page_size:
+            query += " LIMIT ?"
+            params.append(page_size)
+
+        flights = [_flight_doc(row) for row in self.db.connection().execute(query, params)]
+        return self._attach_latest_positions(flights)
+
+    def get_all_flights_last_pos(self) -> List[Dict[str, Any]]:
+        flights = [_flight_doc(row) for row in self.db.connection().execute(f"SELECT {_FLIGHT_COLUMNS} FROM flights")]
+        return self._attach_latest_positions(flights)
+
+    def get_flight_history(self, limit: int, after: Optional[Tuple[datetime, Any]] = None, military_only: bool = False,
+                           callsign_prefix: Optional[str] = None, since: Optional[datetime] = None,
+                           until: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        conditions = []
+        params = []
+
+        if military_only:
+            conditions.append("is_military = 1")
+        if callsign_prefix:
+            # Range instead of LIKE, which is case-insensitive and can't use the index
+            conditions.append("callsign >= ? AND callsign < ?")
+            params.extend([callsign_prefix, callsign_prefix + "\uffff"])
+        if since:
+            conditions.append("last_contact >= ?")
+            params.append(to_millis(since))
+        if until:
+            conditions.append("last_contact < ?")
+            params.append(to_millis(until))
+        if after:
+            conditions.append("(last_contact, id) < (?, ?)")
+            params.extend([to_millis(after[0]), str(after[1])])
+
+        query = f"SELECT {_FLIGHT_COLUMNS} FROM flights"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY last_contact DESC, id DESC LIMIT ?"
+        params.append(limit)
+
+        return [_flight_doc(row) for row in self.db.connection().execute(query, params)]
+
+    def get_flights_for_retention(self, cutoff: datetime, after: Optional[Tuple[datetime, Any]] = None,
+                                  limit: int = 100) -> List[Dict[str, Any]]:
+        query = "SELECT id, last_contact FROM flights WHERE last_contact < ?"
+        params = [to_millis(cutoff)]
+
+        if after:
+            query += " AND (last_contact, id) > (?, ?)"
+            params.extend([to_millis(after[0]), str(after[1])])
+
+        query += " ORDER BY last_contact, id LIMIT ?"
+        params.append(limit)
+
+        return [{"_id": ObjectId(row["id"]), "last_contact": from_millis(row["last_contact"])}
+                for row in self.db.connection().execute(query, params)]
+
+    def get_retention_cursor(self) -> Optional[Tuple[datetime, Any]]:
+        row = self.db.connection().execute(
+            "SELECT last_contact, last_id FROM retention_state WHERE name = 'flights'").fetchone()
+        if row and row["last_contact"] is not None and row["last_id"]:
+            return from_millis(row["last_contact"]), ObjectId(row["last_id"])
+        return None
+
+    def save_retention_cursor(self, cursor: Optional[Tuple[datetime, Any]]) -> None:
+        last_contact, last_id = cursor if cursor else (None, None)
+        with self.db.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO retention_state (name, last_contact, last_id) VALUES ('flights', ?, ?)",
+                (to_millis(last_contact), str(last_id) if last_id else None))
+
+    def delete_flights_and_positions(self, flight_ids: List[str], chunk_size: int = 200) -> int:
+        """Delete flights, their positions are removed by drop_expired_position_partitions with their partition"""
+        assert len(flight_ids) > 0
+
+        deleted = 0
+        for ids in _chunks([str(id) for id in flight_ids], min(chunk_size, _MAX_IN_PARAMS)):
+            placeholders = ",".join("?" * len(ids))
+            with self.db.transaction() as conn:
+                deleted += conn.execute(f"DELETE FROM flights WHERE id IN ({placeholders})", ids).rowcount
+
+        return deleted
+
+    def drop_expired_position_partitions(self, cutoff: datetime) -> List[str]:
+        """Retention by dropping whole partition tables"""
+        expired = sorted(t for t in self.db.list_partitions(refresh=True) if self.partitioning.is_expired(t, cutoff))
+        for table in expired:
+            self.db.drop_partition(table)
+            logger.info(f"Dropped expired position partition {table}")
+        return expired
@@ -0,0 +1,266 @@
+"""
+Uniform lat/lon grid index of the live aircraft positions
+
+Each flight is kept in the cell containing its last position. Cells are
+created when the first flight enters them and removed when the last one
+leaves, so memory is proportional to the number of tracked flights.
+Bounding box queries visit only the cells overlapping the box, their cost
+depends on the aircraft in view rather than on all tracked aircraft. Nearest
+neighbour queries search rings of cells around the query point until no
+unvisited cell can hold a closer aircraft.
+Distances are great-circle distances in kilometers.
+"""
+
+import heapq
+import math
+import threading
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+DEFAULT_CELL_DEGREES = 1.0
+
+EARTH_RADIUS_KM = 6371.0088
+_KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def distance_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Haversine distance"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _wrap_lon(lon: float) -> float:
+    return (lon + 180) % 360 - 180
+
+
+class BoundingBox(NamedTuple):
+    """Degrees, in GeoJSON order. A box with west > east crosses the antimeridian"""
+    west: float
+    south: float
+    east: float
+    north: float
+
+    @classmethod
+    def parse(cls, value: str) -> 'BoundingBox':
+        """Parse 'west,south,east,north'"""
+        try:
+            west, south, east, north = (float(v) for v in value.split(','))
+        except ValueError:
+            raise ValueError("Bounding box must be 'west,south,east,north'")
+
+        if not (-90 <= south <= north <= 90) or not (-180 <= west <= 180 and -180 <= east <= 180):
+            raise ValueError("Bounding box out of range")
+        return cls(west, south, east, north)
+
+    @classmethod
+    def around(cls, lat: float, lon: float, radius_km: float) -> 'BoundingBox':
+        """Smallest box containing the circle"""
+        dlat = radius_km / _KM_PER_DEGREE
+        south, north = max(-90.0, lat - dlat), min(90.0, lat + dlat)
+        if south == -90.0 or north == 90.0:
+            return cls(-180.0, south, 180.0, north)
+
+        # Widest extent in longitude of a small circle
+        sin_ratio = math.sin(radius_km / EARTH_RADIUS_KM) / math.cos(math.radians(lat))
+        if sin_ratio >= 1:
+            return cls(-180.0, south, 180.0, north)
+        dlon = math.degrees(math.asin(sin_ratio))
+        return cls(_wrap_lon(lon - dlon), south, _wrap_lon(lon + dlon), north)
+
+    def quantized(self, step: float) -> 'BoundingBox':
+        """Smallest box with edges on multiples of step containing this box"""
+        # Edges already on the grid stay, despite the rounding of the division
+        def down(value, low):
+            return max(low, round(math.floor(round(value / step, 6)) * step, 9))
+
+        def up(value, high):
+            return min(high, round(math.ceil(round(value / step, 6)) * step, 9))
+
+        west, east = down(self.west, -180.0), up(self.east, 180.0)
+        if self.west > self.east and west <= east:
+            # Crossing the antimeridian, the expanded edges meet
+            west, east = -180.0, 180.0
+        return BoundingBox(west, down(self.south, -90.0), east, up(self.north, 90.0))
+
+    def contains(self, lat: float, lon: float) -> bool:
+        if not self.south <= lat <= self.north:
+            return False
+        if self.west <= self.east:
+            return self.west <= lon <= self.east
+        return lon >= self.west or lon <= self.east
+
+
+class SpatialGrid:
+    """Flight ids bucketed by the grid cell of their position, safe for one writer and concurrent readers"""
+
+    def __init__(self, cell_degrees: float = DEFAULT_CELL_DEGREES):
+        self.cell_degrees = cell_degrees
+        self._cells: Dict[Tuple[int, int], Set[str]] = {}
+        self._positions: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def __contains__(self, flight_id: str) -> bool:
+        return flight_id in self._positions
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return math.floor(lat / self.cell_degrees), math.floor(lon / self.cell_degrees)
+
+    def _discard(self, flight_id: str):
+        position = self._positions.pop(flight_id, None)
+        if position is None:
+            return
+        cell = self._cell(*position)
+        flights = self._cells.get(cell)
+        if flights is not None:
+            flights.discard(flight_id)
+            if not flights:
+                del self._cells[cell]
+
+    def update(self, flight_id: str, lat: float, lon: float):
+        with self._lock:
+            previous = self._positions.get(flight_id)
+            cell = self._cell(lat, lon)
+            if previous is not None and self._cell(*previous) != cell:
+                self._discard(flight_id)
+            self._positions[flight_id] = (lat, lon)
+            self._cells.setdefault(cell, set()).add(flight_id)
+
+    def remove(self, flight_ids: Iterable[str]):
+        with self._lock:
+            for flight_id in flight_ids:
+                self._discard(flight_id)
+
+    def flight_ids(self) -> Set[str]:
+        with self._lock:
+            return set(self._positions)
+
+    def _column_ranges(self, bbox: BoundingBox) -> List[Tuple[int, int]]:
+        if bbox.west <= bbox.east:
+            return [(self._cell(0, bbox.west)[1], self._cell(0, bbox.east)[1])]
+        return [(self._cell(0, bbox.west)[1], self._cell(0, 180)[1]),
+                (self._cell(0, -180)[1], self._cell(0, bbox.east)[1])]
+
+    def query(self, bbox: BoundingBox) -> Set[str]:
+        """Ids of the flights positioned within the bounding box"""
+        first_row, last_row = self._cell(bbox.south, 0)[0], self._cell(bbox.north, 0)[0]
+        columns = self._column_ranges(bbox)
+        result = set()
+
+        with self._lock:
+            # A box larger than the populated area is cheaper to answer from the occupied cells
+            box_cells = (last_row - first_row + 1) * sum(last - first + 1 for first, last in columns)
+            if box_cells > len(self._cells):
+                cells = self._cells.items()
+            else:
+                cells = ((cell, self._cells[cell]) for cell in
+                         ((row, column) for row in range(first_row, last_row + 1)
+                          for first, last in columns for column in range(first, last + 1))
+                         if cell in self._cells)
+
+            for (row, column), flights in cells:
+                if not (first_row <= row <= last_row and any(first <= column <= last for first, last in columns)):
+                    continue
+                # Only cells on the border of the box may contain flights outside of it
+                inner = (first_row < row < last_row and any(first < column < last for first, last in columns))
+                if inner:
+                    result.update(flights)
+                else:
+                    result.update(f for f in flights if bbox.contains(*self._positions[f]))
+
+        return result
+
+    def within(self, lat: float, lon: float, radius_km: float,
+               accept: Optional[Callable[[str], bool]] = None) -> List[Tuple[float, str]]:
+        """(distance, flight id) of the flights within the radius, closest first"""
+        candidates = self.query(BoundingBox.around(lat, lon, radius_km))
+
+        with self._lock:
+            result = []
+            for flight_id in candidates:
+                if accept and not accept(flight_id):
+                    continue
+                position = self._positions.get(flight_id)
+                if position:
+                    distance = distance_km(lat, lon, *position)
+                    if distance <= radius_km:
+                        result.append((distance, flight_id))
+
+        result.sort()
+        return result
+
+    def _ring(self, row: int, column: int, r: int) -> Iterable[Tuple[int, int]]:
+        """Cells at Chebyshev distance r around a cell, columns wrapped around the antimeridian"""
+        if r == 0:
+            return [(row, column)]
+
+        columns = round(360 / self.cell_degrees)
+        first_column = math.floor(-180 / self.cell_degrees)
+        offsets = [(-r, dc) for dc in range(-r, r + 1)] + [(r, dc) for dc in range(-r, r + 1)]
+        offsets += [(dr, -r) for dr in range(-r + 1, r)] + [(dr, r) for dr in range(-r + 1, r)]
+        # A ring wider than the globe wraps onto itself
+        return {(row + dr, first_column + (column + dc - first_column) % columns) for dr, dc in offsets}
+
+    def nearest(self, lat: float, lon: float, k: int,
+                accept: Optional[Callable[[str], bool]] = None) -> List[Tuple[float, str]]:
+        """(distance, flight id) of the k flights closest to the point, closest first"""
+        if k <= 0:
+            return []
+
+        row, column = self._cell(lat, lon)
+        max_rings = max(round(180 / self.cell_degrees), round(360 / self.cell_degrees))
+        heap = []  # k closest so far as (-distance, flight id)
+
+        def consider(flights):
+            for flight_id in flights:
+                if accept and not accept(flight_id):
+                    continue
+                distance = distance_km(lat, lon, *self._positions[flight_id])
+                if len(heap) < k:
+                    heapq.heappush(heap, (-distance, flight_id))
+                elif distance < -heap[0][0]:
+                    heapq.heapreplace(heap, (-distance, flight_id))
+
+        with self._lock:
+            for r in range(max_rings + 1):
+                if len(heap) == k and -heap[0][0] <= self._beyond_ring_km(lat, r):
+                    break
+
+                # Sparse grid: the occupied cells are fewer than the cells searched so far
+                if (2 * r + 1) ** 2 > len(self._cells):
+                    consider(f for (cell_row, cell_column), flights in self._cells.items()
+                             if max(abs(cell_row - row), self._column_distance(cell_column, column)) >= r
+                             for f in flights)
+                    break
+
+                for cell in self._ring(row, column, r):
+                    flights = self._cells.get(cell)
+                    if flights:
+                        consider(flights)
+
+        return sorted((-distance, flight_id) for distance, flight_id in heap)
+
+    def _beyond_ring_km(self, lat: float, r: int) -> float:
+        """Lower bound of the distance from a point to any cell outside of ring r around its cell"""
+        # Such cells are either at least r cells away in latitude ...
+        degrees = r * self.cell_degrees
+        bound = degrees * _KM_PER_DEGREE
+
+        # ... or at least r cells away in longitude and j rows away, with the haversine formula
+        # a >= sin²(dlat/2) + cos(lat) cos(lat_cell) sin²(dlon/2) bounded for each row distance j
+        cos_lat = math.cos(math.radians(lat))
+        lon_term = math.sin(math.radians(min(180.0, degrees)) / 2) ** 2
+        for j in range(r + 1):
+            lat_gap = math.radians(max(0, j - 1) * self.cell_degrees)
+            max_lat = math.radians(min(90.0, abs(lat) + (j + 1) * self.cell_degrees))
+            a = math.sin(lat_gap / 2) ** 2 + cos_lat * math.cos(max_lat) * lon_term
+            bound = min(bound, 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a))))
+        return bound
+
+    def _column_distance(self, a: int, b: int) -> int:
+        columns = round(360 / self.cell_degrees)
+        difference = abs(a - b) % columns
+        return min(difference, columns - difference)
@@ -0,0 +1,163 @@
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Iterator, Optional
+
+from .partitioning import PositionPartitioning, as_utc
+
+logger = logging.getLogger("SQLiteInit")
+
+_EPOCH = datetime(1970, 1, 1)
+_MILLISECOND = timedelta(milliseconds=1)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS flights (
+    id TEXT PRIMARY KEY,
+    modeS TEXT NOT NULL,
+    callsign TEXT,
+    is_military INTEGER NOT NULL DEFAULT 0,
+    first_contact INTEGER NOT NULL,
+    last_contact INTEGER NOT NULL,
+    expire_at INTEGER
+);
+CREATE INDEX IF NOT EXISTS flights_modeS_last_contact ON flights (modeS, last_contact, id);
+CREATE INDEX IF NOT EXISTS flights_last_contact_id ON flights (last_contact, id, callsign);
+CREATE INDEX IF NOT EXISTS flights_military_last_contact_id ON flights (is_military, last_contact, id);
+
+CREATE TABLE IF NOT EXISTS retention_state (
+    name TEXT PRIMARY KEY,
+    last_contact INTEGER,
+    last_id TEXT
+);
+
+CREATE TABLE IF NOT EXISTS aircraft (
+    modeS TEXT PRIMARY KEY,
+    registration TEXT,
+    icaoTypeCode TEXT,
+    type TEXT,
+    registeredOwners TEXT,
+    source TEXT,
+    icaoTypeDesignator TEXT,
+    country TEXT,
+    manufacturer TEXT,
+    firstCreated INTEGER,
+    lastModified INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS icao_type_designators (
+    icaoTypeCode TEXT PRIMARY KEY,
+    icaoTypeDesignator TEXT
+);
+
+CREATE TABLE IF NOT EXISTS aircraft_to_process (
+    seq INTEGER PRIMARY KEY,
+    modeS TEXT NOT NULL UNIQUE,
+    query_attempts INTEGER NOT NULL DEFAULT 0,
+    sources_queried TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS aircraft_to_process_attempts ON aircraft_to_process (query_attempts, seq);
+"""
+
+# Clustered on (flight_id, timestmp): trajectory reads are a single range scan without table lookups
+POSITIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS {table} (
+    flight_id TEXT NOT NULL,
+    timestmp INTEGER NOT NULL,
+    lat REAL NOT NULL,
+    lon REAL NOT NULL,
+    alt INTEGER,
+    track REAL,
+    gs REAL,
+    PRIMARY KEY (flight_id, timestmp)
+) WITHOUT ROWID
+"""
+
+
+def to_millis(timestamp: Optional[datetime]) -> Optional[int]:
+    """Store timestamps as integer milliseconds since the epoch (UTC)"""
+    if timestamp is None:
+        return None
+    return (as_utc(timestamp).replace(tzinfo=None) - _EPOCH) // _MILLISECOND
+
+
+def from_millis(value: Optional[int]) -> Optional[datetime]:
+    """Naive UTC datetime, like the timestamps returned by pymongo"""
+    if value is None:
+        return None
+    return _EPOCH + value * _MILLISECOND
+
+
+class SQLiteDatabase:
+    """
+    Embedded SQLite storage for single-board deployments.
+
+    Each thread gets its own connection; the database runs in WAL mode so readers
+    (API requests) never block the updater's writes.
+    """
+
+    def __init__(self, path: str, position_partitioning: Optional[str] = None):
+        self.path = path
+        self.partitioning = PositionPartitioning('positions', position_partitioning or PositionPartitioning.DAY)
+        self._local = threading.local()
+        self._partition_lock = threading.Lock()
+        self._known_partitions = None
+
+        self.connection().executescript(SCHEMA)
+
+    def connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA temp_store=MEMORY")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run statements in a single transaction, committed on success"""
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def list_partitions(self, refresh: bool = False) -> set:
+        """Names of the existing position partition tables"""
+        if self._known_partitions is None or refresh:
+            rows = self.connection().execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall()
+            self._known_partitions = {
+                row["name"] for row in rows if self.partitioning.parse_partition_start(row["name"]) is not None
+            }
+        return self._known_partitions
+
+    def ensure_partition(self, conn: sqlite3.Connection, table: str) -> None:
+        """Create a position partition table if it doesn't exist yet"""
+        if table in self.list_partitions():
+            return
+
+        with self._partition_lock:
+            conn.execute(POSITIONS_TABLE.format(table=table))
+            self._known_partitions.add(table)
+            logger.info(f"Created position partition {table}")
+
+    def drop_partition(self, table: str) -> None:
+        """Drop a position partition table"""
+        with self._partition_lock:
+            self.connection().execute(f"DROP TABLE IF EXISTS {table}")
+            self.list_partitions().discard(table)
+
+
+def init_sqlite(path: str, position_partitioning: Optional[str] = None) -> SQLiteDatabase:
+    """Open (and create if needed) the embedded SQLite database"""
+    logger.info(f"Opening SQLite database at {path}")
+    db = SQLiteDatabase(path, position_partitioning)
+    logger.info(f"SQLite database ready, {len(db.list_partitions())} position partitions")
+    return db
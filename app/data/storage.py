@@ -0,0 +1,74 @@
+import logging
+from typing import Any, Optional
+
+from ..config import Config
+from .repositories.base import FlightPositionStore, AircraftStore, AircraftProcessingStore
+
+logger = logging.getLogger("Storage")
+
+MONGODB = 'mongodb'
+SQLITE = 'sqlite'
+MEMORY = 'memory'
+BACKENDS = (MONGODB, SQLITE, MEMORY)
+
+
+class Storage:
+    """The repositories of one storage backend, shared by the updater, crawler and API"""
+
+    def __init__(self, backend: str, repository: FlightPositionStore, aircraft_repository: AircraftStore,
+                 processing_repository: AircraftProcessingStore, mongodb: Optional[Any] = None):
+        self.backend = backend
+        self.repository = repository
+        self.aircraft_repository = aircraft_repository
+        self.processing_repository = processing_repository
+        # Raw database handle, only set for the MongoDB backend
+        self.mongodb = mongodb
+
+
+class StorageFactory:
+    @staticmethod
+    def create(config: Config) -> Storage:
+        """Create the storage backend selected in the configuration"""
+        backend = (config.DB_BACKEND or MONGODB).strip().lower()
+
+        if backend == MONGODB:
+            from .database import init_mongodb
+            from .repositories.mongodb_repository import MongoDBRepository
+            from .repositories.aircraft_repository import AircraftRepository
+            from .repositories.aircraft_processing_repository import AircraftProcessingRepository
+
+            mongodb = init_mongodb(
+                config.MONGODB_URI,
+                config.MONGODB_DB_NAME,
+                config.DB_RETENTION_MIN,
+                config.DB_POSITION_PARTITIONING,
+                config.DB_POSITION_ENCODING
+            )
+            return Storage(backend, MongoDBRepository(mongodb), AircraftRepository(mongodb),
+                           AircraftProcessingRepository(mongodb), mongodb)
+
+        elif backend == SQLITE:
+            from .sqlite_database import init_sqlite
+            from .repositories.sqlite_repository import SQLiteRepository
+            from .repositories.sqlite_aircraft_repository import SQLiteAircraftRepository
+            from .repositories.sqlite_aircraft_processing_repository import SQLiteAircraftProcessingRepository
+
+            if config.DB_TRAJECTORY_COMPACTION:
+                logger.warning("Trajectory compaction is only supported by the MongoDB backend, ignoring")
+
+            db = init_sqlite(config.SQLITE_PATH, config.DB_POSITION_PARTITIONING)
+            return Storage(backend, SQLiteRepository(db), SQLiteAircraftRepository(db),
+                           SQLiteAircraftProcessingRepository(db))
+
+        elif backend == MEMORY:
+            from .repositories.memory_repository import MemoryRepository
+            from .repositories.memory_aircraft_repository import MemoryAircraftRepository
+            from .repositories.memory_aircraft_processing_repository import MemoryAircraftProcessingRepository
+
+            logger.info(f"Live-only mode: keeping at most {config.MEMORY_MAX_FLIGHTS} flights with "
+                        f"{config.MEMORY_POSITIONS_PER_FLIGHT} positions each for {config.MEMORY_RETENTION_MIN} minutes, nothing is persisted")
+            repository = MemoryRepository(config.MEMORY_MAX_FLIGHTS, config.MEMORY_POSITIONS_PER_FLIGHT, config.MEMORY_RETENTION_MIN)
+            return Storage(backend, repository, MemoryAircraftRepository(), MemoryAircraftProcessingRepository())
+
+        else:
+            raise ValueError(f'Unknown database backend: {config.DB_BACKEND}, expected one of {", ".join(BACKENDS)}')
@@ -0,0 +1,130 @@
+"""
+Fixed-capacity in-memory trajectory of a single flight
+
+Positions are kept column-wise in arrays (44 bytes per position) that grow up
+to the capacity and are then used as a ring: once the buffer is full the
+oldest position is overwritten.
+Missing altitude, track and ground speed values are stored as sentinels and
+returned as None.
+"""
+
+import math
+from array import array
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional
+
+from bson import ObjectId
+
+from .partitioning import as_utc
+
+_EPOCH = datetime(1970, 1, 1)
+_MILLISECOND = timedelta(milliseconds=1)
+
+# Stands in for a missing altitude, far outside of the valid range
+_MISSING_ALT = -1_000_000
+
+BYTES_PER_POSITION = 8 + 8 + 8 + 4 + 8 + 8
+
+
+def _to_millis(timestamp: datetime) -> int:
+    return (as_utc(timestamp).replace(tzinfo=None) - _EPOCH) // _MILLISECOND
+
+
+class TrajectoryBuffer:
+    """Ring buffer of the most recent positions of a flight, in time order"""
+
+    __slots__ = ('capacity', 'dropped', '_start', '_count', '_time', '_lat', '_lon', '_alt', '_track', '_gs')
+
+    def __init__(self, capacity: int):
+        if capacity <= 0:
+            raise ValueError('Trajectory buffer capacity must be positive')
+
+        self.capacity = capacity
+        # Number of positions overwritten since the buffer was created
+        self.dropped = 0
+        self._start = 0
+        self._count = 0
+        self._time = array('q')
+        self._lat = array('d')
+        self._lon = array('d')
+        self._alt = array('i')
+        self._track = array('d')
+        self._gs = array('d')
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def nbytes(self) -> int:
+        return self._count * BYTES_PER_POSITION
+
+    def append(self, timestmp: datetime, lat: float, lon: float, alt: Optional[int] = None,
+               track: Optional[float] = None, gs: Optional[float] = None) -> None:
+        time = _to_millis(timestmp)
+        alt = _MISSING_ALT if alt is None else int(alt)
+        track = math.nan if track is None else track
+        gs = math.nan if gs is None else gs
+
+        if self._count < self.capacity:
+            self._time.append(time)
+            self._lat.append(lat)
+            self._lon.append(lon)
+            self._alt.append(alt)
+            self._track.append(track)
+            self._gs.append(gs)
+            self._count += 1
+        else:
+            i = self._start
+            self._start = (self._start + 1) % self.capacity
+            self.dropped += 1
+
+            self._time[i] = time
+            self._lat[i] = lat
+            self._lon[i] = lon
+            self._alt[i] = alt
+            self._track[i] = track
+            self._gs[i] = gs
+
+    def append_position(self, position: Dict[str, Any]) -> None:
+        """Append a position document as written to the repository"""
+        self.append(position["timestmp"], position["lat"], position["lon"],
+                    position.get("alt"), position.get("track"), position.get("gs"))
+
+    def _indices(self, first: int, last: int) -> Iterator[int]:
+        for n in range(first, last):
+            yield (self._start + n) % self.capacity
+
+    def _position(self, i: int, flight_id: Optional[ObjectId] = None) -> Dict[str, Any]:
+        alt = self._alt[i]
+        track = self._track[i]
+        gs = self._gs[i]
+
+        position = {
+            "timestmp": _EPOCH + self._time[i] * _MILLISECOND,
+            "lat": self._lat[i],
+            "lon": self._lon[i],
+            "alt": None if alt == _MISSING_ALT else alt,
+            "track": None if math.isnan(track) else track
+        }
+        if not math.isnan(gs):
+            position["gs"] = gs
+        if flight_id is not None:
+            position["flight_id"] = flight_id
+        return position
+
+    @property
+    def first_timestamp(self) -> Optional[datetime]:
+        """Timestamp (naive UTC) of the oldest buffered position"""
+        if not self._count:
+            return None
+        return _EPOCH + self._time[self._start] * _MILLISECOND
+
+    def positions(self, limit: Optional[int] = None, flight_id: Optional[ObjectId] = None) -> List[Dict[str, Any]]:
+        """Buffered positions, oldest first, with naive UTC timestamps"""
+        last = self._count if not limit else min(limit, self._count)
+        return [self._position(i, flight_id) for i in self._indices(0, last)]
+
+    def last(self, flight_id: Optional[ObjectId] = None) -> Optional[Dict[str, Any]]:
+        if not self._count:
+            return None
+        return self._position((self._start + self._count - 1) % self.capacity, flight_id)
@@ -0,0 +1,136 @@
+"""
+Packed trajectory chunks for finished flights
+
+A chunk stores a run of positions of one flight in a single document. The
+positions are stored column-wise: time (ms), lat and lon (micro-degrees),
+alt (ft), track (tenths of a degree) and ground speed (tenths of a knot) are
+delta-encoded against the previous point, written as little-endian int32 arrays
+and zlib-compressed. Decoding is done with array/itertools primitives instead
+of a per-byte Python loop. Chunks of format version 1 have no ground speed column.
+"""
+
+import sys
+import zlib
+from array import array
+from datetime import datetime, timedelta
+from itertools import accumulate, repeat
+from typing import List, Dict, Any, Optional
+
+from bson import ObjectId
+from bson.binary import Binary
+
+from .partitioning import as_utc
+
+CHUNK_FORMAT_VERSION = 2
+POSITIONS_PER_CHUNK = 1000
+
+_COORD_SCALE = 1_000_000
+_TRACK_SCALE = 10
+_GS_SCALE = 10
+
+# Stands in for missing altitude/track/ground speed values, far outside of the valid range
+_MISSING = -1_000_000
+
+# Number of columns by format version
+_COLUMNS = {1: 5, 2: 6}
+
+
+_EPOCH = datetime(1970, 1, 1)
+_MILLISECOND = timedelta(milliseconds=1)
+
+
+def _to_millis(timestamp: datetime) -> int:
+    return (as_utc(timestamp).replace(tzinfo=None) - _EPOCH) // _MILLISECOND
+
+
+def _deltas(values: List[int]) -> List[int]:
+    return [values[0]] + [b - a for a, b in zip(values, values[1:])] if values else []
+
+
+def encode_positions(positions: List[Dict[str, Any]], start: datetime) -> bytes:
+    """Encode position documents (ordered by time) into the packed chunk format"""
+    start_ms = _to_millis(start)
+
+    times = [_to_millis(p["timestmp"]) - start_ms for p in positions]
+    lats = [round(p["lat"] * _COORD_SCALE) for p in positions]
+    lons = [round(p["lon"] * _COORD_SCALE) for p in positions]
+    alts = [_MISSING if p.get("alt") is None else int(p["alt"]) for p in positions]
+    tracks = [_MISSING if p.get("track") is None else round(p["track"] * _TRACK_SCALE) for p in positions]
+    speeds = [_MISSING if p.get("gs") is None else round(p["gs"] * _GS_SCALE) for p in positions]
+
+    packed = array('i')
+    for column in (times, lats, lons, alts, tracks, speeds):
+        packed.extend(_deltas(column))
+
+    if sys.byteorder != 'little':
+        packed.byteswap()
+
+    return bytes([CHUNK_FORMAT_VERSION]) + zlib.compress(packed.tobytes())
+
+
+def decode_positions(data: bytes, start: datetime, count: int, flight_id: Optional[ObjectId] = None) -> List[Dict[str, Any]]:
+    """Decode a packed chunk back into position dicts shaped like the stored position documents"""
+    columns = _COLUMNS.get(data[0]) if data else None
+    if columns is None:
+        raise ValueError('Unsupported trajectory chunk format')
+
+    packed = array('i')
+    packed.frombytes(zlib.decompress(data[1:]))
+    if sys.byteorder != 'little':
+        packed.byteswap()
+
+    if len(packed) != count * columns:
+        raise ValueError('Corrupt trajectory chunk')
+
+    values = [accumulate(packed[i * count:(i + 1) * count]) for i in range(columns)]
+    if columns < _COLUMNS[CHUNK_FORMAT_VERSION]:
+        values.append(repeat(_MISSING, count))
+
+    # Naive UTC, like the timestamps returned by pymongo
+    start = _EPOCH + _to_millis(start) * _MILLISECOND
+
+    positions = []
+    for t, lat, lon, alt, track, gs in zip(*values):
+        position = {
+            "flight_id": flight_id,
+            "timestmp": start + t * _MILLISECOND,
+            "lat": lat / _COORD_SCALE,
+            "lon": lon / _COORD_SCALE,
+            "alt": None if alt == _MISSING else alt,
+            "track": None if track == _MISSING else track / _TRACK_SCALE
+        }
+        # Like in the position documents, gs is only present if it was reported
+        if gs != _MISSING:
+            position["gs"] = gs / _GS_SCALE
+        positions.append(position)
+
+    return positions
+
+
+def build_chunks(flight_id: ObjectId, positions: List[Dict[str, Any]], chunk_size: int = POSITIONS_PER_CHUNK) -> List[Dict[str, Any]]:
+    """Split a flight's positions (ordered by time) into chunk documents"""
+    chunks = []
+
+    for seq, i in enumerate(range(0, len(positions), chunk_size)):
+        chunk_positions = positions[i:i + chunk_size]
+        start = chunk_positions[0]["timestmp"]
+
+        chunk = {
+            "flight_id": flight_id,
+            "seq": seq,
+            "start": start,
+            "end": chunk_positions[-1]["timestmp"],
+            "count": len(chunk_positions),
+            "data": Binary(encode_positions(chunk_positions, start))
+        }
+        chunks.append(chunk)
+
+    return chunks
+
+
+def read_chunks(chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Decode chunk documents (ordered by seq) into a flat list of positions"""
+    positions = []
+    for chunk in chunks:
+        positions.extend(decode_positions(chunk["data"], chunk["start"], chunk["count"], chunk["flight_id"]))
+    return positions
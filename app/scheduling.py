@@ -1,4 +1,6 @@
+import asyncio
 import logging
+from datetime import datetime, timedelta, timezone
 from fastapi import FastAPI
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.events import *
@@ -7,15 +9,38 @@ from apscheduler.executors.pool import ThreadPoolExecutor
 from .config import Config
 from .core.services.flight_updater_coordinator import FlightUpdaterCoordinator
 from .crawling.crawler import AirplaneCrawler
+from .core.services.retention_worker import RetentionWorker
+from .core.services.live_hub import LiveHub, LiveReplica, acquire_ingest_lock
+from .core.services.live_shared_memory import LiveStateReader, LiveStateWriter
+from .core.services.leader_lease import HEARTBEATS_PER_LEASE, LEASE_COLLECTION, LeaderLease
+from .core.services.position_manager import TRAJECTORY_EVICTION_INTERVAL_SEC
+from .data.database import create_client
+from .core.constants import MINUTES_BEFORE_CONSIDERED_NEW_FLIGHT
 
 logger = logging.getLogger(__name__)
 
 UPDATER_JOB_NAME = 'flight_updater_job'
 CRAWLER_RUN_INTERVAL_SEC = 20
+PARTITION_RETENTION_JOB_NAME = 'position_partition_retention'
+PARTITION_RETENTION_INTERVAL_MIN = 10
+RETENTION_JOB_NAME = 'retention_purge'
+RETENTION_RUN_INTERVAL_SEC = 30
+COMPACTION_JOB_NAME = 'trajectory_compaction'
+COMPACTION_RUN_INTERVAL_SEC = 60
+# Extra idle time before a flight is compacted, on top of the new-flight threshold
+COMPACTION_IDLE_MARGIN_MIN = 5
+LEADER_LEASE_JOB_NAME = 'leader_lease'
+TRAJECTORY_EVICTION_JOB_NAME = 'trajectory_eviction'
+LIVE_EXPIRY_JOB_NAME = 'live_flight_expiry'
+LIVE_EXPIRY_INTERVAL_SEC = 5
+CRAWLER_JOB_NAME = 'airplane_crawler'
+INGEST_JOB_NAMES = (UPDATER_JOB_NAME, RETENTION_JOB_NAME, PARTITION_RETENTION_JOB_NAME, COMPACTION_JOB_NAME, CRAWLER_JOB_NAME)
+# Flights followers load from the database, the live flights are those with contact within the last minute
+FOLLOWER_LIVE_WINDOW_MIN = 1
 
-def create_updater(config, mongodb=None):
+def create_updater(config, storage):
     updater = FlightUpdaterCoordinator()
-    updater.initialize(config, mongodb)
+    updater.initialize(config, storage)
     return updater
 
 def ensure_db_indexes(app):
@@ -28,6 +53,131 @@ def ensure_db_indexes(app):
         repo._ensure_indexes()
         logger.info("MongoDB indexes have been verified and updated if needed")
 
+def drop_expired_position_partitions(repository, retention_minutes: int):
+    """Retention for partitioned positions: drops whole partitions instead of deleting documents"""
+    cutoff = datetime.now(timezone.utc) - timedelta(minutes=retention_minutes)
+    try:
+        dropped = repository.drop_expired_position_partitions(cutoff)
+        if dropped:
+            logger.info(f"Dropped {len(dropped)} expired position partitions")
+    except Exception as e:
+        logger.exception(f"Error dropping expired position partitions: {str(e)}")
+
+def compact_finished_flights(repository):
+    """Rewrite positions of flights idle past the new-flight threshold into trajectory chunks"""
+    idle_before = datetime.now(timezone.utc) - timedelta(minutes=MINUTES_BEFORE_CONSIDERED_NEW_FLIGHT + COMPACTION_IDLE_MARGIN_MIN)
+    try:
+        flight_count, position_count = repository.compact_finished_flights(idle_before)
+        if flight_count:
+            logger.info(f"Compacted {position_count} positions of {flight_count} finished flights")
+    except Exception as e:
+        logger.exception(f"Error compacting finished flights: {str(e)}")
+
+def schedule_ingest_jobs(app: FastAPI, conf: Config):
+    """Schedule the updater, the crawler and the database jobs, run by a single process"""
+    scheduler = app.state.apscheduler
+
+    scheduler.add_job(
+        id=UPDATER_JOB_NAME,
+        func=lambda: app.state.updater.update(),
+        trigger='interval',
+        seconds=2.0,  # Changed from 1.0 to 2.0 to avoid overloading
+        misfire_grace_time=10,  # Increased for reliability
+        coalesce=True
+    )
+
+    if conf.DB_RETENTION_MIN > 0:
+        retention_worker = RetentionWorker(conf, app.state.repository)
+        app.state.retention_worker = retention_worker
+
+        logger.info(f"Scheduling retention purge job (every {RETENTION_RUN_INTERVAL_SEC} seconds, "
+                    f"max {conf.DB_RETENTION_DELETES_PER_SEC} deletes/s)...")
+        scheduler.add_job(
+            id=RETENTION_JOB_NAME,
+            func=lambda: app.state.retention_worker.run(),
+            trigger='interval',
+            seconds=RETENTION_RUN_INTERVAL_SEC,
+            misfire_grace_time=120,
+            coalesce=True
+        )
+
+    if app.state.repository.partitioning and conf.DB_RETENTION_MIN > 0:
+        logger.info(f"Scheduling position partition retention job (every {PARTITION_RETENTION_INTERVAL_MIN} minutes)...")
+        scheduler.add_job(
+            id=PARTITION_RETENTION_JOB_NAME,
+            func=lambda: drop_expired_position_partitions(app.state.repository, conf.DB_RETENTION_MIN),
+            trigger='interval',
+            minutes=PARTITION_RETENTION_INTERVAL_MIN,
+            misfire_grace_time=120,
+            coalesce=True
+        )
+
+    if conf.DB_TRAJECTORY_COMPACTION:
+        logger.info(f"Scheduling trajectory compaction job (every {COMPACTION_RUN_INTERVAL_SEC} seconds)...")
+        scheduler.add_job(
+            id=COMPACTION_JOB_NAME,
+            func=lambda: compact_finished_flights(app.state.repository),
+            trigger='interval',
+            seconds=COMPACTION_RUN_INTERVAL_SEC,
+            misfire_grace_time=120,
+            coalesce=True
+        )
+
+    if conf.UNKNOWN_AIRCRAFT_CRAWLING:
+        crawler = AirplaneCrawler(conf, app.state.storage.aircraft_repository, app.state.storage.processing_repository)
+        app.state.crawler = crawler
+
+        logger.info(f"Scheduling aircraft metadata crawler job (every {CRAWLER_RUN_INTERVAL_SEC} seconds)...")
+        scheduler.add_job(
+            id=CRAWLER_JOB_NAME,
+            func=lambda: app.state.crawler.crawl_sources(),
+            trigger='interval',
+            seconds=CRAWLER_RUN_INTERVAL_SEC,
+            misfire_grace_time=120,
+            coalesce=True
+        )
+    else:
+        logger.info("Unknown aircraft crawling disabled")
+
+def unschedule_ingest_jobs(scheduler):
+    for job_id in INGEST_JOB_NAMES:
+        if scheduler.get_job(job_id) is not None:
+            scheduler.remove_job(job_id)
+
+def lease_collection(conf: Config):
+    """
+    Lease collection on a client of its own, with timeouts well below the lease so that a
+    renewal does not block past the point the leader has to step down
+    """
+    timeout_ms = int(conf.LEADER_LEASE_SEC * 1000 / HEARTBEATS_PER_LEASE)
+    client = create_client(conf.MONGODB_URI, serverSelectionTimeoutMS=timeout_ms,
+                           connectTimeoutMS=timeout_ms, socketTimeoutMS=timeout_ms)
+    return client[conf.MONGODB_DB_NAME][LEASE_COLLECTION]
+
+def renew_leader_lease(app: FastAPI, conf: Config):
+    """
+    Heartbeat of the leader lease: the leader ingests, the other replicas refresh their live
+    state from the database. A replica taking over first loads the flights of the previous leader.
+    """
+    lease = app.state.leader_lease
+    was_leader = lease.is_leader
+    is_leader = lease.renew()
+    updater = app.state.updater
+
+    if is_leader != was_leader:
+        # The buffered trajectories miss the positions stored by the other leader
+        updater.reset_trajectories()
+
+    if is_leader and not was_leader:
+        logger.info("Elected leader, starting the updater and the scheduled jobs")
+        updater.load_recent_state(datetime.now(timezone.utc) - timedelta(minutes=MINUTES_BEFORE_CONSIDERED_NEW_FLIGHT))
+        schedule_ingest_jobs(app, conf)
+    elif was_leader and not is_leader:
+        logger.warning("No longer the leader, stopping the updater and the scheduled jobs")
+        unschedule_ingest_jobs(app.state.apscheduler)
+    elif not is_leader:
+        updater.load_recent_state(datetime.now(timezone.utc) - timedelta(minutes=FOLLOWER_LIVE_WINDOW_MIN))
+
 def configure_scheduling(app: FastAPI, conf: Config):
     jobstores = {
         'default': MemoryJobStore()
@@ -42,8 +192,6 @@ def configure_scheduling(app: FastAPI, conf: Config):
         'max_instances': 1
     }
 
-    ensure_db_indexes(app)
-
     scheduler = AsyncIOScheduler(
         jobstores=jobstores, 
         executors=executors, 
@@ -51,10 +199,34 @@ def configure_scheduling(app: FastAPI, conf: Config):
     )
     
     app.state.apscheduler = scheduler
-    
-    updater = create_updater(conf, app.state.mongodb)
+    # Called on startup, the running loop is the one serving the websockets
+    loop = asyncio.get_running_loop()
+
+    if conf.LIVE_HUB_SOCKET:
+        app.state.ingest_lock = acquire_ingest_lock(conf.LIVE_HUB_SOCKET)
+        if app.state.ingest_lock is None:
+            # Another worker process runs the updater and the jobs, this one serves its live state
+            logger.info(f"Following the live state of the ingest process on {conf.LIVE_HUB_SOCKET}")
+            shared_state = LiveStateReader(conf.LIVE_SHARED_MEMORY) if conf.LIVE_SHARED_MEMORY else None
+            replica = LiveReplica(conf.LIVE_HUB_SOCKET, app.state.repository, shared_state)
+            replica.attach_event_loop(loop)
+            replica.start()
+            app.state.live_replica = replica
+            app.state.updater = replica
+            scheduler.start()
+            return
+
+    ensure_db_indexes(app)
+
+    updater = create_updater(conf, app.state.storage)
+    updater.attach_event_loop(loop)
     app.state.updater = updater
 
+    if conf.LIVE_HUB_SOCKET:
+        shared_state = LiveStateWriter(conf.LIVE_SHARED_MEMORY) if conf.LIVE_SHARED_MEMORY else None
+        # Started by the application startup, which fails if the socket cannot be served
+        app.state.live_hub = LiveHub(updater, conf.LIVE_HUB_SOCKET, shared_state)
+
     # Reduce logging noise
     logging.getLogger('apscheduler.executors.default').setLevel(logging.ERROR)  
     logging.getLogger('apscheduler.scheduler').setLevel(logging.ERROR)
@@ -66,29 +238,43 @@ def configure_scheduling(app: FastAPI, conf: Config):
     scheduler.add_listener(my_listener, EVENT_JOB_MAX_INSTANCES | EVENT_JOB_MISSED)
     
 
-    scheduler.add_job(
-        id=UPDATER_JOB_NAME,
-        func=lambda: app.state.updater.update(),
-        trigger='interval',
-        seconds=2.0,  # Changed from 1.0 to 2.0 to avoid overloading
-        misfire_grace_time=10,  # Increased for reliability
-        coalesce=True
-    )
-
-    if conf.UNKNOWN_AIRCRAFT_CRAWLING:
-        crawler = AirplaneCrawler(conf, app.state.mongodb)
-        app.state.crawler = crawler
-
-        logger.info(f"Scheduling aircraft metadata crawler job (every {CRAWLER_RUN_INTERVAL_SEC} seconds)...")
+    if conf.LEADER_ELECTION and app.state.mongodb is not None:
+        # Replicas sharing the database: the ingest jobs are scheduled while this one holds the lease
+        app.state.leader_lease = LeaderLease(lease_collection(conf), conf.LEADER_LEASE_SEC)
+        updater.set_ingest_guard(lambda: app.state.leader_lease.is_leader)
+        logger.info(f"Leader election enabled, renewing the lease every {app.state.leader_lease.heartbeat_sec:.1f} seconds")
         scheduler.add_job(
-            id='airplane_crawler',
-            func=lambda: app.state.crawler.crawl_sources(),
+            id=LEADER_LEASE_JOB_NAME,
+            func=lambda: renew_leader_lease(app, conf),
             trigger='interval',
-            seconds=CRAWLER_RUN_INTERVAL_SEC,
-            misfire_grace_time=120,
+            seconds=app.state.leader_lease.heartbeat_sec,
+            next_run_time=datetime.now(timezone.utc),
+            misfire_grace_time=app.state.leader_lease.heartbeat_sec,
             coalesce=True
         )
     else:
-        logger.info("Unknown aircraft crawling disabled")
+        if conf.LEADER_ELECTION:
+            logger.warning("Leader election requires the MongoDB backend, running the updater in this process")
+        schedule_ingest_jobs(app, conf)
+
+    # Also on replicas that do not ingest, their buffers go idle as well
+    scheduler.add_job(
+        id=TRAJECTORY_EVICTION_JOB_NAME,
+        func=lambda: app.state.updater.evict_idle_trajectories(),
+        trigger='interval',
+        seconds=TRAJECTORY_EVICTION_INTERVAL_SEC,
+        misfire_grace_time=120,
+        coalesce=True
+    )
+
+    # Flights that stopped reporting leave the live state even while no update cycle publishes it
+    scheduler.add_job(
+        id=LIVE_EXPIRY_JOB_NAME,
+        func=lambda: app.state.updater.expire_stale_flights(),
+        trigger='interval',
+        seconds=LIVE_EXPIRY_INTERVAL_SEC,
+        misfire_grace_time=LIVE_EXPIRY_INTERVAL_SEC,
+        coalesce=True
+    )
 
     scheduler.start()
@@ -0,0 +1,132 @@
+"""
+Sequence-numbered history of the live position updates
+
+Every updater cycle with changed positions appends a delta. Deltas are encoded
+at most once per encoding and shared by all consumers, and a short history is
+kept so that reconnecting clients only receive what they missed.
+
+Sequence numbers start from the wall clock in milliseconds when the log is
+created and grow by one per delta. A sequence number from before a restart is
+therefore always older than the log, and resuming from it falls back to a full
+snapshot instead of replaying unrelated deltas.
+"""
+
+import json
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Set
+
+from ..core.models.position_report import PositionReport
+from ..core.utils.position_codec import POSITIONS_UPDATE, pack_positions
+
+DEFAULT_HISTORY_DELTAS = 150        # 5 minutes of 2 second cycles
+DEFAULT_HISTORY_POSITIONS = 200_000
+
+
+def position_updates(all_cached_flights: Dict[str, PositionReport], changed_flight_ids: Set[str]) -> Dict[str, Any]:
+    """Update entries of the changed flights: flight id -> {lat, lon, alt, track, gs}"""
+    positions_dict = {}
+    for flight_id, pos in all_cached_flights.items():
+        if str(flight_id) in changed_flight_ids:
+            position_data = {
+                "lat": pos.lat,
+                "lon": pos.lon,
+                "alt": pos.alt,
+                "track": pos.track
+            }
+            if pos.gs is not None:
+                position_data["gs"] = pos.gs
+            positions_dict[str(flight_id)] = position_data
+    return positions_dict
+
+
+class Delta:
+    """Changed positions of one updater cycle, never modified once appended"""
+
+    __slots__ = ('seq', 'generation', 'positions', 'created', '_text', '_packed', '_event')
+
+    def __init__(self, seq: int, generation: int, positions: Dict[str, Any], created: Optional[float] = None):
+        self.seq = seq
+        self.generation = generation
+        self.positions = positions
+        self.created = created if created is not None else time.monotonic()
+        self._text = None
+        self._packed = None
+        self._event = None
+
+    def text(self) -> str:
+        """JSON update message, encoded on first use"""
+        if self._text is None:
+            self._text = json.dumps({
+                "type": "update",
+                "seq": self.seq,
+                "count": len(self.positions),
+                "positions": self.positions
+            }, separators=(",", ":"), ensure_ascii=False)
+        return self._text
+
+    def packed(self) -> bytes:
+        """Packed update message, encoded on first use"""
+        if self._packed is None:
+            self._packed = pack_positions({flight_id: (p["lat"], p["lon"], p["alt"])
+                                           for flight_id, p in self.positions.items()}, POSITIONS_UPDATE, self.seq)
+        return self._packed
+
+    def event(self) -> bytes:
+        """Server-sent event of the JSON update message, encoded on first use"""
+        if self._event is None:
+            self._event = f"id: {self.seq}\nevent: update\ndata: {self.text()}\n\n".encode()
+        return self._event
+
+
+class DeltaLog:
+    """Bounded history of deltas, appended by the updater thread and read by the server event loop"""
+
+    def __init__(self, max_deltas: int = DEFAULT_HISTORY_DELTAS, max_positions: int = DEFAULT_HISTORY_POSITIONS,
+                 first_seq: Optional[int] = None):
+        self.max_deltas = max_deltas
+        self.max_positions = max_positions
+        self._deltas: Deque[Delta] = deque()
+        self._positions = 0
+        self._next_seq = first_seq if first_seq is not None else int(time.time() * 1000)
+        # Resuming is possible from this sequence number on, later deltas are all retained
+        self._resumable_from = self._next_seq - 1
+        self._lock = threading.Lock()
+
+    @property
+    def last_seq(self) -> int:
+        """Sequence number of the latest delta, or the one before the first delta"""
+        return self._next_seq - 1
+
+    def append(self, generation: int, positions: Dict[str, Any], seq: Optional[int] = None) -> Delta:
+        """Append the changed positions of a generation, seq continues the numbering of another log"""
+        with self._lock:
+            if seq is not None and seq != self._next_seq:
+                # Not a continuation of the retained deltas, they cannot be resumed from anymore
+                self._deltas.clear()
+                self._positions = 0
+                self._next_seq = seq
+                self._resumable_from = seq - 1
+            delta = Delta(self._next_seq, generation, positions)
+            self._next_seq += 1
+            self._deltas.append(delta)
+            self._positions += len(positions)
+
+            while len(self._deltas) > self.max_deltas or (self._positions > self.max_positions and len(self._deltas) > 1):
+                evicted = self._deltas.popleft()
+                self._positions -= len(evicted.positions)
+                self._resumable_from = evicted.seq
+            return delta
+
+    def deltas(self) -> List[Delta]:
+        """All retained deltas, oldest first"""
+        with self._lock:
+            return list(self._deltas)
+
+    def since(self, seq: int) -> Optional[List[Delta]]:
+        """Deltas after seq, None if some of them are no longer retained (or seq is unknown)"""
+        with self._lock:
+            if seq < self._resumable_from or seq >= self._next_seq:
+                return None
+            return [delta for delta in self._deltas if delta.seq > seq]
@@ -0,0 +1,119 @@
+"""
+Server-sent events and long polling of the live position updates
+
+Event stream readers share the deltas of the delta log with the live websocket:
+every delta is encoded once as an event and written to all of them. A reader
+keeps no queue, only the sequence number of the last delta it wrote. Readers
+that fall behind the retained history receive a full snapshot again.
+Long polling requests wait for the next delta the same way.
+"""
+
+import asyncio
+import logging
+from contextlib import contextmanager
+from typing import AsyncIterator, List, Optional
+
+from .delta_log import Delta
+
+logger = logging.getLogger('LiveFeed')
+
+DEFAULT_KEEPALIVE_SEC = 15.0
+# Reconnection delay advertised to EventSource clients
+RETRY_MS = 2000
+
+
+def parse_event_id(value: Optional[str]) -> Optional[int]:
+    """Sequence number of a Last-Event-ID, None if it is not one of ours"""
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+class LiveFeed:
+    """
+    Wakes up the event stream readers and long polling requests once the updater published a delta.
+    All methods run on the server event loop, publish is registered as WebSocket notifier callback
+    while there are readers.
+    """
+
+    def __init__(self, keepalive_sec: float = DEFAULT_KEEPALIVE_SEC):
+        self.keepalive_sec = keepalive_sec
+        self.readers = 0
+        # Sequence number of the latest delta published
+        self._seq: Optional[int] = None
+        self._published: Optional[asyncio.Condition] = None
+
+    def _condition(self) -> asyncio.Condition:
+        # Created on first use, on the loop of the server
+        if self._published is None:
+            self._published = asyncio.Condition()
+        return self._published
+
+    async def publish(self, delta: Delta):
+        """WebSocket notifier callback: wake up the readers"""
+        published = self._condition()
+        async with published:
+            self._seq = delta.seq
+            published.notify_all()
+
+    async def wait(self, seq: int, timeout: float) -> bool:
+        """Wait until a delta after seq is published, False on timeout"""
+        published = self._condition()
+        async with published:
+            try:
+                await asyncio.wait_for(published.wait_for(lambda: self._seq is not None and self._seq > seq), timeout)
+                return True
+            except asyncio.TimeoutError:
+                return False
+
+    @contextmanager
+    def _reading(self, live):
+        # One callback serves all readers, registering it again is a no-op
+        live.register_websocket_callback(self.publish)
+        self.readers += 1
+        try:
+            yield
+        finally:
+            self.readers -= 1
+            if not self.readers:
+                live.unregister_websocket_callback(self.publish)
+
+    async def changes(self, live, seq: int, timeout: float) -> Optional[List[Delta]]:
+        """
+        Deltas after seq of the live state (the flight updater), waiting up to timeout for the next
+        one if there are none yet. None if some of them are no longer retained (or seq is unknown)
+        """
+        delta_log = live.delta_log
+        with self._reading(live):
+            deltas = delta_log.since(seq)
+            if deltas == [] and await self.wait(seq, timeout):
+                deltas = delta_log.since(seq)
+        return deltas
+
+    async def events(self, live, seq: Optional[int] = None) -> AsyncIterator[bytes]:
+        """
+        Event stream of the live state (the flight updater): the missed deltas after seq if they
+        are still retained, all positions as initial event otherwise, then every following delta
+        """
+        delta_log = live.delta_log
+        deltas = delta_log.since(seq) if seq is not None else None
+        with self._reading(live):
+            yield f"retry: {RETRY_MS}\n\n".encode()
+            while True:
+                if deltas is None:
+                    snapshot = live.snapshot
+                    seq = snapshot.seq
+                    # The initial message is shared by all readers, it is not copied into an event
+                    yield f"id: {seq}\nevent: initial\ndata: ".encode()
+                    yield snapshot.initial_message
+                    yield b"\n\n"
+                else:
+                    for delta in deltas:
+                        yield delta.event()
+                        seq = delta.seq
+
+                if not await self.wait(seq, self.keepalive_sec):
+                    # Comment line, keeps proxies from closing the idle connection
+                    yield b": keepalive\n\n"
+                deltas = delta_log.since(seq)
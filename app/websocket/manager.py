@@ -1,86 +1,445 @@
+import asyncio
+import json
 import logging
-import threading
-from typing import Dict, Set, Any
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, NamedTuple, Optional, Set, Tuple, Union
 from fastapi import WebSocket
 
+from ..core.models.live_snapshot import LiveSnapshot
+from ..core.utils.position_codec import PACKED, POSITIONS, POSITIONS_UPDATE, pack_positions
+from .delta_log import Delta
+from .viewport import Viewport
+
 logger = logging.getLogger("WebSocketManager")
 
+DEFAULT_SEND_QUEUE_SIZE = 4
+DEFAULT_MAX_LAG_SEC = 30.0
+# Close code for clients that do not keep up with the updates
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+
+def _encode_json(message: Dict[str, Any]) -> str:
+    # Same encoding as WebSocket.send_json
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
+
+def _encode_packed(positions: Dict[str, Any], kind: int, seq: int) -> bytes:
+    return pack_positions({flight_id: (p["lat"], p["lon"], p["alt"]) for flight_id, p in positions.items()}, kind, seq)
+
+
+def _positions_message(positions: Dict[str, Any], message_type: str, seq: int) -> Dict[str, Any]:
+    return {
+        "type": message_type,
+        "seq": seq,
+        "count": len(positions),
+        "positions": positions
+    }
+
+
+def _viewport_message(enter: Iterable[str], leave: Iterable[str]) -> str:
+    return _encode_json({"type": "viewport", "enter": list(enter), "leave": list(leave)})
+
+
+class Broadcast(NamedTuple):
+    """
+    Positions message queued for a client. Broadcasts to unfiltered clients are encoded once for all of them.
+    A reset replaces the client's positions (an initial message), enter and leave list the flights that
+    entered or left the client's viewport. seq is the sequence number of the latest delta included.
+    """
+    positions: Dict[str, Any]
+    created: float
+    text: Optional[str]
+    packed: Optional[bytes]
+    enter: Tuple[str, ...] = ()
+    leave: Tuple[str, ...] = ()
+    reset: bool = False
+    seq: int = 0
+
+    @classmethod
+    def of_delta(cls, delta: Delta, encodings: Set[Optional[str]], created: float) -> 'Broadcast':
+        """Broadcast of a delta, sharing its encoded messages"""
+        return cls(
+            positions=delta.positions,
+            created=created,
+            text=delta.text() if encodings - {PACKED} else None,
+            packed=delta.packed() if PACKED in encodings else None,
+            seq=delta.seq
+        )
+
+
+class ClientConnection:
+    """
+    Outbound state of a single connection, written by its own writer task.
+
+    Up to queue_size broadcasts are queued as they were encoded. When the client falls further
+    behind, the queued broadcasts are merged into a backlog with the latest position per flight,
+    which is encoded for this client alone once it is ready to receive again.
+    """
+
+    def __init__(self, websocket: WebSocket, encoding: Optional[str], queue_size: int,
+                 initial: Optional[Union[str, bytes]] = None):
+        self.websocket = websocket
+        self.encoding = encoding
+        self.queue_size = queue_size
+        self.queue: Deque[Broadcast] = deque()
+        self.initial = initial
+        self.wakeup = asyncio.Event()
+        self.writer: Optional[asyncio.Task] = None
+        self.sent = 0
+        self.coalesced = 0
+        # Sequence number of the latest delta queued, older deltas are not sent again
+        self.last_seq: Optional[int] = None
+
+        # Merged updates, waiting for the client to catch up
+        self.backlog: Dict[str, Any] = {}
+        self.backlog_since: Optional[float] = None
+        self.backlog_reset = False
+        self.backlog_enter: Set[str] = set()
+        self.backlog_leave: Set[str] = set()
+        self.backlog_seq = 0
+
+        # Viewport subscription, the flights the client currently sees (None without viewport)
+        self.viewport: Optional[Viewport] = None
+        self.visible: Optional[Set[str]] = None
+
+    def enqueue(self, broadcast: Broadcast):
+        if self.backlog_since is None and len(self.queue) < self.queue_size:
+            self.queue.append(broadcast)
+        else:
+            # Latest value wins per flight, older updates of the same flight are dropped
+            if self.backlog_since is None:
+                self.backlog_since = self.queue[0].created if self.queue else broadcast.created
+            while self.queue:
+                self._merge(self.queue.popleft())
+            self._merge(broadcast)
+        self.wakeup.set()
+
+    def _merge(self, broadcast: Broadcast):
+        if broadcast.reset:
+            self.backlog = dict(broadcast.positions)
+            self.backlog_reset = True
+            self.backlog_enter.clear()
+            self.backlog_leave.clear()
+        else:
+            for flight_id in broadcast.leave:
+                self.backlog.pop(flight_id, None)
+                if flight_id in self.backlog_enter:
+                    self.backlog_enter.discard(flight_id)
+                elif not self.backlog_reset:
+                    self.backlog_leave.add(flight_id)
+            for flight_id in broadcast.enter:
+                if flight_id in self.backlog_leave:
+                    self.backlog_leave.discard(flight_id)
+                elif not self.backlog_reset:
+                    self.backlog_enter.add(flight_id)
+            self.backlog.update(broadcast.positions)
+        self.backlog_seq = max(self.backlog_seq, broadcast.seq)
+        self.coalesced += 1
+
+    def lag(self, now: float) -> float:
+        """Age of the oldest update not yet sent"""
+        if self.backlog_since is not None:
+            return now - self.backlog_since
+        if self.queue:
+            return now - self.queue[0].created
+        return 0.0
+
+    def depth(self) -> int:
+        return len(self.queue) + (1 if self.backlog_since is not None else 0)
+
+    async def _send(self, data: Union[str, bytes]):
+        if isinstance(data, bytes):
+            await self.websocket.send_bytes(data)
+        else:
+            await self.websocket.send_text(data)
+        self.sent += 1
+
+    async def _send_broadcast(self, broadcast: Broadcast):
+        if self.encoding == PACKED and broadcast.packed is not None:
+            await self._send(broadcast.packed)
+        elif broadcast.text is not None:
+            await self._send(broadcast.text)
+        if broadcast.enter or broadcast.leave:
+            await self._send(_viewport_message(broadcast.enter, broadcast.leave))
+
+    async def _send_backlog(self):
+        positions, reset, seq = self.backlog, self.backlog_reset, self.backlog_seq
+        enter, leave = sorted(self.backlog_enter), sorted(self.backlog_leave)
+        self.backlog, self.backlog_since, self.backlog_reset = {}, None, False
+        self.backlog_enter, self.backlog_leave = set(), set()
+
+        if positions or reset:
+            if self.encoding == PACKED:
+                await self._send(_encode_packed(positions, POSITIONS if reset else POSITIONS_UPDATE, seq))
+            else:
+                await self._send(_encode_json(_positions_message(positions, "initial" if reset else "update", seq)))
+        if enter or leave:
+            await self._send(_viewport_message(enter, leave))
+
+    async def run(self):
+        """Writer task: send the initial message, then the queued updates in order"""
+        if self.initial is not None:
+            await self._send(self.initial)
+            self.initial = None
+
+        while True:
+            await self.wakeup.wait()
+            self.wakeup.clear()
+
+            while self.queue or self.backlog_since is not None:
+                if self.queue:
+                    await self._send_broadcast(self.queue.popleft())
+                else:
+                    await self._send_backlog()
+
+
+def _point_positions(snapshot: LiveSnapshot, flight_ids: Iterable[str]) -> Dict[str, Any]:
+    """Positions messages entries of flights of the snapshot"""
+    positions = {}
+    for flight_id in flight_ids:
+        lat, lon, alt = snapshot.points[flight_id]
+        positions[flight_id] = {"lat": lat, "lon": lon, "alt": alt}
+    return positions
+
 
 class ConnectionManager:
     """
     Manages WebSocket connections for real-time position updates
+
+    Each broadcast is encoded once per encoding and handed to the per-connection send queues,
+    a slow client only delays itself. Clients lagging more than max_lag_sec are disconnected.
+    Clients may subscribe to a viewport, they only receive the flights within it and
+    enter/leave events when flights cross its border.
+    All methods run on the server event loop.
     """
 
-    def __init__(self):
-        # Store active connections
-        self.active_connections: Set[WebSocket] = set()
-        # Lock for thread safety when modifying connections
-        self._lock = threading.Lock()
+    def __init__(self, queue_size: int = DEFAULT_SEND_QUEUE_SIZE, max_lag_sec: float = DEFAULT_MAX_LAG_SEC):
+        self.queue_size = queue_size
+        self.max_lag_sec = max_lag_sec
+        self._clients: Dict[WebSocket, ClientConnection] = {}
+        # Close handshakes of dropped slow clients, which do not hold up the broadcasts
+        self._closing: Set[asyncio.Task] = set()
+        # Live state the viewports are evaluated against, the flight updater
+        self._live = None
+        self._stats = {
+            "broadcasts": 0,
+            "coalesced": 0,
+            "slow_disconnects": 0,
+            "send_errors": 0
+        }
+
+    def configure(self, queue_size: int, max_lag_sec: float):
+        """Apply the configured limits to connections opened from now on"""
+        self.queue_size = queue_size
+        self.max_lag_sec = max_lag_sec
 
-    async def connect(self, websocket: WebSocket):
+    @property
+    def active_connections(self) -> Set[WebSocket]:
+        return set(self._clients)
+
+    async def connect(self, websocket: WebSocket, encoding: Optional[str] = None,
+                      initial: Optional[Union[str, bytes]] = None, seq: Optional[int] = None,
+                      replay: Iterable[Delta] = ()):
         """
-        Accept a new WebSocket connection and add it to active connections
+        Accept a new WebSocket connection and add it to active connections.
+        The initial message, or the replayed deltas of a resumed connection, are sent before any update,
+        seq is the sequence number of the latest delta the client has. The client is registered before
+        the connection is accepted, deltas broadcast meanwhile are queued after the initial message.
         """
-        await websocket.accept()
-        with self._lock:
-            self.active_connections.add(websocket)
+        client = ClientConnection(websocket, encoding, self.queue_size, initial)
+        client.last_seq = seq
+        now = time.monotonic()
+        for delta in replay:
+            client.enqueue(Broadcast.of_delta(delta, {encoding}, now))
+            client.last_seq = delta.seq
+        self._clients[websocket] = client
+
+        try:
+            await websocket.accept()
+        except Exception:
+            self.disconnect(websocket)
+            raise
+        if self._clients.get(websocket) is not client:
+            # Disconnected as too slow while accepting
+            return
+        client.writer = asyncio.create_task(self._write(client))
 
         client_info = f"New WebSocket connection established"
         if "x-forwarded-for" in websocket.headers:
             client_info += f" from {websocket.headers['x-forwarded-for']}"
-        logger.debug(f"{client_info}. Total active: {len(self.active_connections)}")
+        logger.debug(f"{client_info}. Total active: {len(self._clients)}")
 
     def disconnect(self, websocket: WebSocket):
         """
         Remove a WebSocket connection from active connections
         """
-        with self._lock:
-            if websocket in self.active_connections:
-                self.active_connections.remove(websocket)
-        logger.debug(f"WebSocket connection closed. Total active: {len(self.active_connections)}")
+        client = self._clients.pop(websocket, None)
+        if client is not None:
+            self._stats["coalesced"] += client.coalesced
+            if client.writer is not None:
+                client.writer.cancel()
+        logger.debug(f"WebSocket connection closed. Total active: {len(self._clients)}")
+
+    async def _write(self, client: ClientConnection):
+        try:
+            await client.run()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error sending to WebSocket: {str(e)}")
+            self._stats["send_errors"] += 1
+            self.disconnect(client.websocket)
+
+    def _close_slow(self, client: ClientConnection, lag: float):
+        """Drop a lagging client now, its close handshake runs in a task of its own"""
+        logger.warning(f"Disconnecting WebSocket client lagging {lag:.1f}s behind")
+        self._stats["slow_disconnects"] += 1
+        self.disconnect(client.websocket)
+        task = asyncio.create_task(self._close(client.websocket))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    @staticmethod
+    async def _close(websocket: WebSocket):
+        try:
+            await asyncio.wait_for(websocket.close(code=SLOW_CONSUMER_CLOSE_CODE, reason="Client too slow"), timeout=5)
+        except Exception:
+            pass
+
+    def handle_message(self, websocket: WebSocket, message: str, live):
+        """
+        Handle a client message: {"type": "subscribe", "bbox": ...} sets or moves the viewport,
+        {"type": "unsubscribe"} returns to all flights. live is the flight updater.
+        """
+        client = self._clients.get(websocket)
+        if client is None:
+            return
+
+        try:
+            request = json.loads(message)
+            if not isinstance(request, dict):
+                raise ValueError("Messages must be JSON objects")
+            if request.get("type") == "subscribe":
+                self.set_viewport(websocket, Viewport.parse(request), live)
+            elif request.get("type") == "unsubscribe":
+                self.set_viewport(websocket, None, live)
+            else:
+                raise ValueError(f"Unknown message type {request.get('type')}")
+        except ValueError as e:
+            client.enqueue(Broadcast({}, time.monotonic(), _encode_json({"type": "error", "message": str(e)}), None))
+
+    def set_viewport(self, websocket: WebSocket, viewport: Optional[Viewport], live):
+        """
+        Restrict a client to a viewport, or remove the restriction with None.
+        The first subscription and the removal reset the client's positions with an initial message,
+        moving the viewport sends enter/leave events.
+        """
+        client = self._clients.get(websocket)
+        if client is None or (viewport is None and client.viewport is None):
+            return
+
+        self._live = live
+        snapshot = live.snapshot
+        now = time.monotonic()
+
+        if viewport is None:
+            client.viewport, client.visible = None, None
+            positions = _point_positions(snapshot, snapshot.points)
+            client.enqueue(Broadcast(positions, now, snapshot.initial_message.decode(), snapshot.packed_positions,
+                                     reset=True, seq=snapshot.seq))
+            client.last_seq = max(client.last_seq or 0, snapshot.seq)
+            return
+
+        # The viewport is evaluated on the snapshot, later deltas are still to be sent
+        seq = max(client.last_seq or 0, snapshot.seq)
+        visible = viewport.visible_flights(live)
+        if client.viewport is None:
+            positions = _point_positions(snapshot, visible)
+            client.enqueue(Broadcast(positions, now, *self._encode_for(client, positions, "initial", seq),
+                                     reset=True, seq=seq))
+        else:
+            enter, leave = visible - client.visible, client.visible - visible
+            positions = _point_positions(snapshot, enter)
+            client.enqueue(Broadcast(positions, now, *self._encode_for(client, positions, "update", seq),
+                                     enter=tuple(sorted(enter)), leave=tuple(sorted(leave)), seq=seq))
+        client.viewport, client.visible = viewport, visible
+        client.last_seq = seq
+
+    @staticmethod
+    def _encode_for(client: ClientConnection, positions: Dict[str, Any], message_type: str, seq: int):
+        """Text and packed encoding of a positions message for a single client"""
+        if client.encoding == PACKED:
+            return None, _encode_packed(positions, POSITIONS if message_type == "initial" else POSITIONS_UPDATE, seq)
+        return _encode_json(_positions_message(positions, message_type, seq)), None
+
+    def _viewport_update(self, client: ClientConnection, delta: Delta, now: float) -> Optional[Broadcast]:
+        """Changed positions within the client's viewport, with the flights that entered or left it"""
+        positions = delta.positions
+        snapshot = self._live.snapshot
+        visible = client.viewport.visible_flights(self._live)
+        enter, leave = visible - client.visible, client.visible - visible
+        client.visible = visible
 
-    async def broadcast_positions(self, positions: Dict[str, Any]):
+        if len(visible) < len(positions):
+            selected = {flight_id: positions[flight_id] for flight_id in visible if flight_id in positions}
+        else:
+            selected = {flight_id: p for flight_id, p in positions.items() if flight_id in visible}
+        selected.update(_point_positions(snapshot, (flight_id for flight_id in enter if flight_id not in selected)))
+
+        if not selected and not enter and not leave:
+            return None
+        return Broadcast(selected, now, *self._encode_for(client, selected, "update", delta.seq),
+                         enter=tuple(sorted(enter)), leave=tuple(sorted(leave)), seq=delta.seq)
+
+    async def broadcast(self, delta: Delta):
         """
-        Broadcast position data to all connected clients
+        Broadcast the delta of an updater cycle to all connected clients
         """
-        # Make a thread-safe copy of the connections
-        with self._lock:
-            if not self.active_connections:
-                logger.debug("No active connections, skipping broadcast")
-                return
-            # Create a copy to avoid modification during iteration
-            connections = set(self.active_connections)
+        if not self._clients:
+            logger.debug("No active connections, skipping broadcast")
+            return
 
         # Validate positions is not empty
-        if not positions:
+        if not delta.positions:
             logger.warning("Attempted to broadcast empty positions, skipping")
             return
 
-        # Create a message with metadata about the update
-        message = {
-            "type": "update",
-            "count": len(positions),
-            "positions": positions
-        }
+        # Clients that connected after this delta already have it
+        clients = [client for client in self._clients.values() if client.last_seq is None or client.last_seq < delta.seq]
+        now = time.monotonic()
 
-        logger.debug(f"Broadcasting {len(positions)} position updates to {len(connections)} connected clients")
-
-        disconnected = set()
-
-        # Broadcast to all connected clients
-        for connection in connections:
-            try:
-                await connection.send_json(message)
-            except Exception as e:
-                logger.error(f"Error sending to WebSocket: {str(e)}")
-                # If connection is closed or had an error, mark for removal
-                disconnected.add(connection)
-
-        # Remove disconnected connections
-        if disconnected:
-            with self._lock:
-                for conn in disconnected:
-                    if conn in self.active_connections:
-                        self.active_connections.remove(conn)
-                logger.debug(
-                    f"Removed {len(disconnected)} disconnected clients. {len(self.active_connections)} remaining.")
+        # Encoded once by the delta for every encoding in use by clients without viewport
+        broadcast = Broadcast.of_delta(delta, {client.encoding for client in clients if client.viewport is None}, now)
+        self._stats["broadcasts"] += 1
+
+        logger.debug(f"Broadcasting {len(delta.positions)} position updates to {len(clients)} connected clients")
+
+        for client in clients:
+            lag = client.lag(now)
+            client.last_seq = delta.seq
+            if lag > self.max_lag_sec:
+                self._close_slow(client, lag)
+            elif client.viewport is None:
+                client.enqueue(broadcast)
+            else:
+                update = self._viewport_update(client, delta, now)
+                if update is not None:
+                    client.enqueue(update)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Send queue metrics of the connected clients"""
+        clients = list(self._clients.values())
+        now = time.monotonic()
+        return {
+            **self._stats,
+            "coalesced": self._stats["coalesced"] + sum(c.coalesced for c in clients),
+            "clients": len(clients),
+            "viewport_clients": sum(1 for c in clients if c.viewport is not None),
+            "queue_depth": sum(c.depth() for c in clients),
+            "max_queue_depth": max((c.depth() for c in clients), default=0),
+            "backlog_flights": sum(len(c.backlog) for c in clients),
+            "max_lag_sec": round(max((c.lag(now) for c in clients), default=0.0), 3),
+            "queue_size": self.queue_size,
+            "max_lag_limit_sec": self.max_lag_sec
+        }
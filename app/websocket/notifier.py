@@ -1,18 +1,38 @@
+import asyncio
 import logging
-from typing import Any, Dict, Set, Callable
+from typing import Any, Awaitable, Callable, Optional, Set
 
 logger = logging.getLogger('WebSocketNotifier')
 
+PositionsCallback = Callable[[Any], Awaitable[None]]
+
+
 class WebSocketNotifier:
+    """
+    Hands position updates from the updater thread to the server event loop.
+
+    Callbacks are coroutine functions run on the event loop the notifier is attached to, they
+    are called with the delta of changed positions of each updater cycle.
+    Each update is passed with call_soon_threadsafe and delivered by a single fan-out task,
+    the updater thread never touches the websockets itself.
+    """
+
     def __init__(self):
-        self._callbacks: Set[Callable] = set()
-        
-    def register_callback(self, callback: Callable[[Dict[str, Any]], None]):
+        self._callbacks: Set[PositionsCallback] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Running fan-out tasks, referenced until done so they are not garbage collected
+        self._tasks: Set[asyncio.Task] = set()
+
+    def attach_loop(self, loop: asyncio.AbstractEventLoop):
+        """Set the event loop the websockets are served on"""
+        self._loop = loop
+
+    def register_callback(self, callback: PositionsCallback):
         """Register a callback function to notify when positions are updated"""
         self._callbacks.add(callback)
         return callback
         
-    def unregister_callback(self, callback: Callable[[Dict[str, Any]], None]):
+    def unregister_callback(self, callback: PositionsCallback):
         """Unregister a previously registered callback"""
         if callback in self._callbacks:
             self._callbacks.remove(callback)
@@ -24,64 +44,34 @@ class WebSocketNotifier:
         return len(self._callbacks) > 0
         
     def notify_clients(self, positions_dict):
-        """Notify all registered clients with position updates"""
+        """Schedule the delivery of position updates on the event loop, safe to call from any thread"""
         if not positions_dict or not self._callbacks:
             return
-        
+
+        if self._loop is None or self._loop.is_closed():
+            logger.debug("No event loop attached, skipping notification")
+            return
+
+        try:
+            self._loop.call_soon_threadsafe(self._start_fan_out, positions_dict)
+        except RuntimeError:
+            # The loop was closed in the meantime, the application is shutting down
+            logger.debug("Event loop closed, skipping notification")
+
+    def _start_fan_out(self, positions_dict):
+        task = self._loop.create_task(self._fan_out(positions_dict))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _fan_out(self, positions_dict):
+        """Deliver one update to all callbacks, runs on the event loop"""
         callbacks_to_remove = set()
-        for callback in self._callbacks:
+        for callback in list(self._callbacks):
             try:
-                callback(positions_dict)
+                await callback(positions_dict)
             except Exception as e:
                 logger.error(f"Error in WebSocket callback: {str(e)}")
                 callbacks_to_remove.add(callback)
         
         if callbacks_to_remove:
             self._callbacks.difference_update(callbacks_to_remove)
-            
-    def notify_position_changes(self, all_cached_flights: Dict[str, Any], changed_flight_ids: Set[str]):
-        """
-        Notify clients of position changes with proper data transformation
-        
-        Args:
-            all_cached_flights: Dictionary of flight_id -> PositionReport
-            changed_flight_ids: Set of flight IDs that have changed
-        """
-        if not self.has_callbacks() or not changed_flight_ids:
-            return
-            
-        positions_dict = {}
-        for flight_id, pos in all_cached_flights.items():
-            if str(flight_id) in changed_flight_ids:
-                position_data = {
-                    "lat": pos.lat,
-                    "lon": pos.lon,
-                    "alt": pos.alt,
-                    "track": pos.track
-                }
-                if pos.gs is not None:
-                    position_data["gs"] = pos.gs
-                positions_dict[str(flight_id)] = position_data
-        
-        # Fallback if no positions matched (should be rare)
-        if not positions_dict and all_cached_flights:
-            logger.warning("No changed positions match cached flights")
-
-            count = 0
-            for flight_id, pos in all_cached_flights.items():
-                if count < 50:  # Limit to 50 positions
-                    position_data = {
-                        "lat": pos.lat,
-                        "lon": pos.lon,
-                        "alt": pos.alt,
-                        "track": pos.track
-                    }
-                    if pos.gs is not None:
-                        position_data["gs"] = pos.gs
-                    positions_dict[str(flight_id)] = position_data
-                    count += 1
-                else:
-                    break
-
-        if positions_dict:
-            self.notify_clients(positions_dict)
\ No newline at end of file
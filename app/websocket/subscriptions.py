@@ -0,0 +1,57 @@
+import logging
+from typing import Any, Callable, Dict, Set
+
+from .delta_log import Delta
+
+logger = logging.getLogger('FlightSubscriptions')
+
+Subscriber = Callable[[Dict[str, Any]], None]
+
+
+class FlightSubscriptions:
+    """
+    Subscribers of single flights, indexed by flight id.
+
+    Subscribers are non-blocking callables taking the new position of their flight, they hand
+    it to their connection's writer. Publishing an update only touches the subscribers of the
+    changed flights, not every open flight stream. All methods run on the server event loop.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[Subscriber]] = {}
+
+    def __len__(self) -> int:
+        return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def __bool__(self) -> bool:
+        return bool(self._subscribers)
+
+    def subscribe(self, flight_id: str, subscriber: Subscriber):
+        self._subscribers.setdefault(flight_id, set()).add(subscriber)
+
+    def unsubscribe(self, flight_id: str, subscriber: Subscriber):
+        subscribers = self._subscribers.get(flight_id)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._subscribers[flight_id]
+
+    def subscribed_flights(self) -> Set[str]:
+        return set(self._subscribers)
+
+    async def publish(self, delta: Delta):
+        """WebSocket notifier callback: deliver the changed positions to the subscribers of their flight"""
+        positions = delta.positions
+        # Walk the smaller side, usually the few subscribed flights
+        if len(self._subscribers) < len(positions):
+            flight_ids = [flight_id for flight_id in self._subscribers if flight_id in positions]
+        else:
+            flight_ids = [flight_id for flight_id in positions if flight_id in self._subscribers]
+
+        for flight_id in flight_ids:
+            for subscriber in list(self._subscribers.get(flight_id, ())):
+                try:
+                    subscriber(positions[flight_id])
+                except Exception as e:
+                    logger.error(f"Error delivering update of flight {flight_id}: {str(e)}")
+                    self.unsubscribe(flight_id, subscriber)
@@ -0,0 +1,57 @@
+from typing import Any, Dict, NamedTuple, Optional, Set
+
+from ..data.spatial_grid import BoundingBox
+
+
+class Viewport(NamedTuple):
+    """
+    Aircraft a live websocket client subscribed to: a bounding box, optionally limited
+    to an altitude band and to military aircraft. Aircraft without altitude are only
+    visible without altitude limits.
+    """
+    bbox: BoundingBox
+    min_alt: Optional[int] = None
+    max_alt: Optional[int] = None
+    military_only: bool = False
+
+    @classmethod
+    def parse(cls, message: Dict[str, Any]) -> 'Viewport':
+        """
+        Viewport of a subscribe message, e.g.
+        {"type": "subscribe", "bbox": "5.9,45.8,10.5,47.8", "minAlt": 10000, "maxAlt": 45000, "mil": true}
+        The bounding box may also be a [west, south, east, north] list
+        """
+        bbox = message.get("bbox")
+        if isinstance(bbox, (list, tuple)):
+            bbox = ','.join(str(v) for v in bbox)
+        if not isinstance(bbox, str):
+            raise ValueError("Subscribe message requires a bbox")
+
+        try:
+            min_alt = int(message["minAlt"]) if message.get("minAlt") is not None else None
+            max_alt = int(message["maxAlt"]) if message.get("maxAlt") is not None else None
+        except (TypeError, ValueError):
+            raise ValueError("minAlt and maxAlt must be numbers")
+
+        return cls(BoundingBox.parse(bbox), min_alt, max_alt, bool(message.get("mil", False)))
+
+    def visible_flights(self, live) -> Set[str]:
+        """Ids of the flights of the live state (the flight updater) within the viewport"""
+        snapshot = live.snapshot
+        points = snapshot.points
+        filtered_alt = self.min_alt is not None or self.max_alt is not None
+
+        visible = set()
+        for flight_id in live.flights_in_bbox(self.bbox):
+            point = points.get(flight_id)
+            if point is None:
+                continue
+            if self.military_only and flight_id not in snapshot.military:
+                continue
+            if filtered_alt:
+                alt = point[2]
+                if (alt < 0 or (self.min_alt is not None and alt < self.min_alt) or
+                        (self.max_alt is not None and alt > self.max_alt)):
+                    continue
+            visible.add(flight_id)
+        return visible
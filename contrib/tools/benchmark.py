@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+
+"""
+Synthetic benchmarks for storage and payload encodings.
+
+Usage: uv run python contrib/tools/benchmark.py <command> --help
+"""
+
+import math
+import os
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from timeit import default_timer as timer
+
+import bson
+import typer
+from bson import ObjectId
+
+# Add the parent directory to the path to import from app
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from app.data.trajectory_chunks import build_chunks, read_chunks
+from app.data.position_encoding import encode_position, decode_position
+from app.core.utils.position_codec import decode_polyline, encode_polyline, pack_positions, pack_trajectory, unpack
+from app.data.spatial_grid import SpatialGrid, distance_km
+
+cli = typer.Typer()
+
+
+@cli.callback()
+def main():
+    """Synthetic benchmarks, run a single command at a time"""
+
+
+def synthetic_flight(points: int, seed: int = 42):
+    """Position documents of a plausible flight: climb, cruise, turns, one report every ~4 seconds"""
+    rnd = random.Random(seed)
+    flight_id = ObjectId()
+    timestamp = datetime(2026, 10, 17, 8, 0, tzinfo=timezone.utc)
+    lat, lon, alt, track = 47.45, 8.56, 1400, 90.0
+
+    positions = []
+    for i in range(points):
+        track = (track + rnd.uniform(-1.5, 1.5)) % 360
+        speed_deg = 0.0012
+        lat += speed_deg * math.cos(math.radians(track))
+        lon += speed_deg * math.sin(math.radians(track))
+        alt = min(alt + rnd.randint(0, 60), 38000) if i < points // 3 else alt
+        timestamp += timedelta(milliseconds=rnd.randint(3500, 4500))
+
+        positions.append({
+            "flight_id": flight_id,
+            "lat": round(lat, 6),
+            "lon": round(lon, 6),
+            "alt": alt,
+            "track": round(track, 1),
+            "gs": round(160 + alt / 150, 1),
+            "timestmp": timestamp
+        })
+
+    return positions
+
+
+def _best_of(func, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = timer()
+        func()
+        best = min(best, timer() - start)
+    return best
+
+
+@cli.command()
+def chunks(points: int = 10000, repeat: int = 5, limit: int = 100):
+    """Compare per-position documents with packed trajectory chunks"""
+    positions = synthetic_flight(points)
+    chunk_docs = build_chunks(positions[0]["flight_id"], positions)
+
+    position_bson = [bson.encode({"_id": ObjectId(), **p}) for p in positions]
+    chunk_bson = [bson.encode({"_id": ObjectId(), **c}) for c in chunk_docs]
+
+    raw_size = sum(len(b) for b in position_bson)
+    chunk_size = sum(len(b) for b in chunk_bson)
+
+    # Client-side cost of a history read: decoding the BSON documents returned by the server
+    raw_read = _best_of(lambda: [bson.decode(b) for b in position_bson], repeat)
+    chunk_read = _best_of(lambda: read_chunks([bson.decode(b) for b in chunk_bson]), repeat)
+    # A short read (the first limit positions) decodes limit documents, but always a whole chunk
+    raw_short_read = _best_of(lambda: [bson.decode(b) for b in position_bson[:limit]], repeat)
+    chunk_short_read = _best_of(lambda: read_chunks([bson.decode(chunk_bson[0])])[:limit], repeat)
+
+    print(f"positions:           {points}")
+    print(f"documents:           {len(position_bson)} raw vs {len(chunk_bson)} chunks")
+    print(f"BSON size:           {raw_size / 1024:.1f} KiB raw vs {chunk_size / 1024:.1f} KiB chunks ({raw_size / chunk_size:.1f}x)")
+    print(f"bytes per position:  {raw_size / points:.1f} raw vs {chunk_size / points:.1f} chunks")
+    print(f"decode latency:      {raw_read * 1000:.2f} ms raw vs {chunk_read * 1000:.2f} ms chunks")
+    print(f"first {limit} positions: {raw_short_read * 1000:.2f} ms raw vs {chunk_short_read * 1000:.2f} ms chunks")
+
+
+@cli.command()
+def encoding(points: int = 10000, aircraft: int = 1000, repeat: int = 5):
+    """Compare JSON with the compact polyline and packed encodings of API payloads"""
+    import json
+
+    trajectory = [(p["lat"], p["lon"], p["alt"]) for p in synthetic_flight(points)]
+    live = {str(ObjectId()): (p["lat"], p["lon"], p["alt"]) for p in synthetic_flight(aircraft, seed=7)}
+
+    def to_json(obj):
+        return json.dumps(obj, separators=(',', ':')).encode()
+
+    trajectory_json = to_json([list(p) for p in trajectory])
+    live_json = to_json({k: [list(v)] for k, v in live.items()})
+    polyline = encode_polyline(trajectory).encode()
+    packed = pack_trajectory(trajectory)
+    live_packed = pack_positions(live)
+
+    print(f"trajectory of {points} positions")
+    print(f"  size:    {len(trajectory_json) / 1024:.1f} KiB json, {len(polyline) / 1024:.1f} KiB polyline, {len(packed) / 1024:.1f} KiB packed")
+    print(f"  encode:  {_best_of(lambda: to_json([list(p) for p in trajectory]), repeat) * 1000:.2f} ms json, "
+          f"{_best_of(lambda: encode_polyline(trajectory), repeat) * 1000:.2f} ms polyline, "
+          f"{_best_of(lambda: pack_trajectory(trajectory), repeat) * 1000:.2f} ms packed")
+    print(f"  decode:  {_best_of(lambda: json.loads(trajectory_json), repeat) * 1000:.2f} ms json, "
+          f"{_best_of(lambda: decode_polyline(polyline.decode()), repeat) * 1000:.2f} ms polyline, "
+          f"{_best_of(lambda: unpack(packed), repeat) * 1000:.2f} ms packed")
+    print(f"live positions of {aircraft} aircraft")
+    print(f"  size:    {len(live_json) / 1024:.1f} KiB json, {len(live_packed) / 1024:.1f} KiB packed")
+    print(f"  encode:  {_best_of(lambda: to_json({k: [list(v)] for k, v in live.items()}), repeat) * 1000:.2f} ms json, "
+          f"{_best_of(lambda: pack_positions(live), repeat) * 1000:.2f} ms packed")
+
+
+@cli.command()
+def spatial(aircraft: int = 10000, queries: int = 1000, k: int = 10, radius: float = 100.0, seed: int = 42):
+    """Latency of nearest and radius queries on the live position index"""
+    rnd = random.Random(seed)
+
+    # Dense over Europe and North America, sparse elsewhere, like real ADS-B coverage
+    def position():
+        region = rnd.random()
+        if region < 0.4:
+            return rnd.uniform(35, 65), rnd.uniform(-10, 30)
+        if region < 0.8:
+            return rnd.uniform(25, 55), rnd.uniform(-125, -65)
+        return rnd.uniform(-60, 70), rnd.uniform(-180, 180)
+
+    positions = {f"flight{i}": position() for i in range(aircraft)}
+    grid = SpatialGrid()
+    start = timer()
+    for flight_id, (lat, lon) in positions.items():
+        grid.update(flight_id, lat, lon)
+    build = timer() - start
+
+    points = [position() for _ in range(queries)]
+
+    def per_query(func):
+        """Mean and 99th percentile latency"""
+        latencies = []
+        for lat, lon in points:
+            start = timer()
+            func(lat, lon)
+            latencies.append(timer() - start)
+        latencies.sort()
+        return sum(latencies) / queries, latencies[int(queries * 0.99)]
+
+    def scan(lat, lon):
+        return sorted((distance_km(lat, lon, *p), f) for f, p in positions.items())[:k]
+
+    nearest = per_query(lambda lat, lon: grid.nearest(lat, lon, k))
+    within = per_query(lambda lat, lon: grid.within(lat, lon, radius))
+    brute_force = _best_of(lambda: scan(*points[0]), 3)
+
+    print(f"aircraft:            {aircraft}")
+    print(f"index build:         {build * 1000:.2f} ms")
+    print(f"nearest k={k}:        {nearest[0] * 1000:.3f} ms mean, {nearest[1] * 1000:.3f} ms p99")
+    print(f"within {radius:g} km:       {within[0] * 1000:.3f} ms mean, {within[1] * 1000:.3f} ms p99")
+    print(f"scan of all flights: {brute_force * 1000:.3f} ms per query")
+
+
+def _timeseries_storage_size(db, name: str, docs) -> int:
+    db.drop_collection(name)
+    db.create_collection(name, timeseries={"timeField": "timestmp", "metaField": "flight_id", "granularity": "seconds"})
+    db[name].insert_many(docs)
+    size = db.command("collStats", name)["storageSize"]
+    db.drop_collection(name)
+    return size
+
+
+@cli.command()
+def quantization(points: int = 10000, repeat: int = 5, mongodb_uri: str = None, mongodb_db_name: str = 'flightradar_benchmark'):
+    """Compare double and quantized fixed-point position documents"""
+    positions = synthetic_flight(points)
+    for p in positions:
+        p["gs"] = 451.5
+
+    quantized = [encode_position(p) for p in positions]
+
+    double_size = sum(len(bson.encode(p)) for p in positions)
+    quantized_size = sum(len(bson.encode(p)) for p in quantized)
+
+    # Decode overhead in get_positions: copies of the documents as returned by the driver
+    double_docs = [bson.encode(p) for p in positions]
+    quantized_docs = [bson.encode(p) for p in quantized]
+    double_read = _best_of(lambda: [decode_position(bson.decode(b)) for b in double_docs], repeat)
+    quantized_read = _best_of(lambda: [decode_position(bson.decode(b)) for b in quantized_docs], repeat)
+
+    print(f"positions:           {points}")
+    print(f"BSON size:           {double_size / 1024:.1f} KiB double vs {quantized_size / 1024:.1f} KiB quantized")
+    print(f"read + decode:       {double_read * 1000:.2f} ms double vs {quantized_read * 1000:.2f} ms quantized")
+
+    if mongodb_uri:
+        from pymongo import MongoClient
+
+        db = MongoClient(mongodb_uri)[mongodb_db_name]
+        double_storage = _timeseries_storage_size(db, 'benchmark_positions_double', positions)
+        quantized_storage = _timeseries_storage_size(db, 'benchmark_positions_quantized', quantized)
+        print(f"time-series storage: {double_storage / 1024:.1f} KiB double vs {quantized_storage / 1024:.1f} KiB quantized")
+
+
+def _run_storage_workload(repository, aircraft: int, cycles: int, reads: int):
+    """Updater-like write load followed by trajectory and live-position reads, returns timings in seconds"""
+    rnd = random.Random(7)
+    flights = [repository.get_or_create_flight(modeS=f"{0x400000 + i:06X}", is_military=False) for i in range(aircraft)]
+    timestamp = datetime.now(timezone.utc) - timedelta(seconds=2 * cycles)
+
+    write_times = []
+    for cycle in range(cycles):
+        timestamp += timedelta(seconds=2)
+        positions = [{
+            "flight_id": f["_id"],
+            "timestmp": timestamp,
+            "lat": 47.0 + rnd.uniform(-2, 2),
+            "lon": 8.0 + rnd.uniform(-2, 2),
+            "alt": rnd.randint(0, 40000),
+            "track": round(rnd.uniform(0, 360), 1),
+            "gs": float(rnd.randint(100, 500))
+        } for f in flights]
+
+        start = timer()
+        repository.insert_positions(positions)
+        repository.bulk_update_flight_last_contacts([(str(f["_id"]), timestamp) for f in flights])
+        write_times.append(timer() - start)
+
+    flight_ids = [str(f["_id"]) for f in rnd.sample(flights, min(reads, len(flights)))]
+    start = timer()
+    for flight_id in flight_ids:
+        repository.get_positions(flight_id)
+    trajectory_time = (timer() - start) / len(flight_ids)
+
+    start = timer()
+    repository.get_recent_flights_last_pos(timestamp - timedelta(minutes=5))
+    live_time = timer() - start
+
+    write_times.sort()
+    return {
+        "write_p50": write_times[len(write_times) // 2],
+        "write_p95": write_times[int(len(write_times) * 0.95)],
+        "trajectory": trajectory_time,
+        "live": live_time
+    }
+
+
+def _print_storage_results(name: str, results, aircraft: int, cycles: int):
+    print(f"{name}:")
+    print(f"  write cycle:       {results['write_p50'] * 1000:.2f} ms p50, {results['write_p95'] * 1000:.2f} ms p95 ({aircraft} positions)")
+    print(f"  trajectory read:   {results['trajectory'] * 1000:.2f} ms ({cycles} positions)")
+    print(f"  live positions:    {results['live'] * 1000:.2f} ms ({aircraft} flights)")
+
+
+@cli.command()
+def storage(aircraft: int = 300, cycles: int = 200, reads: int = 20, mongodb_uri: str = None,
+            mongodb_db_name: str = 'flightradar_benchmark'):
+    """Compare the memory, SQLite and MongoDB storage backends under a synthetic updater load"""
+    from app.data.sqlite_database import SQLiteDatabase
+    from app.data.repositories.sqlite_repository import SQLiteRepository
+    from app.data.repositories.memory_repository import MemoryRepository
+
+    results = _run_storage_workload(MemoryRepository(aircraft, cycles, 60), aircraft, cycles, reads)
+    _print_storage_results("memory", results, aircraft, cycles)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db = SQLiteDatabase(os.path.join(tmpdir, 'benchmark.sqlite'))
+        results = _run_storage_workload(SQLiteRepository(db), aircraft, cycles, reads)
+        size = sum(os.path.getsize(os.path.join(tmpdir, f)) for f in os.listdir(tmpdir))
+        db.connection().close()
+
+    _print_storage_results("sqlite", results, aircraft, cycles)
+    print(f"  file size:         {size / 1024:.1f} KiB (including WAL)")
+
+    if mongodb_uri:
+        from pymongo import MongoClient
+        from app.data.database import init_mongodb
+        from app.data.repositories.mongodb_repository import MongoDBRepository
+
+        MongoClient(mongodb_uri).drop_database(mongodb_db_name)
+        mongodb = init_mongodb(mongodb_uri, mongodb_db_name, 0)
+        results = _run_storage_workload(MongoDBRepository(mongodb), aircraft, cycles, reads)
+        mongodb.client.drop_database(mongodb_db_name)
+
+        _print_storage_results("mongodb", results, aircraft, cycles)
+
+
+if __name__ == "__main__":
+    cli()
@@ -10,14 +10,14 @@ cli = typer.Typer()
 
 @cli.command()
 def initschema():
-    """Initialize MongoDB schema."""
+    """Initialize the database schema of the configured backend."""
 
-    from app.data import init_mongodb
+    from app.data import StorageFactory
     from app.config import Config
 
     conf = Config()
-    mongodb = init_mongodb(conf.MONGODB_URI, conf.MONGODB_DB_NAME, conf.DB_RETENTION_MIN)
-    print("MongoDB database initialized successfully")
+    storage = StorageFactory.create(conf)
+    print(f"{storage.backend} database initialized successfully")
 
 
 @cli.command()
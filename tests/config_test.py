@@ -1,3 +1,6 @@
+import json
+import os
+import tempfile
 import unittest
 from test import support
 
@@ -28,4 +31,21 @@ class ConfigTest(unittest.TestCase):
             self.assertEqual(True, config.UNKNOWN_AIRCRAFT_CRAWLING)
             self.assertTrue(isinstance(config.LOGGING_CONFIG, LoggingConfig) )
 
-    
\ No newline at end of file
+    
+    def test_file_values_normalized(self):
+        "Test that option values of the config file are case-insensitive like in env"
+
+        with tempfile.TemporaryDirectory() as folder:
+            config_file = os.path.join(folder, 'config.json')
+            with open(config_file, 'w') as f:
+                json.dump({'dataFolder': folder, 'database': {
+                    'backend': ' MongoDB ',
+                    'position_partitioning': ' Day ',
+                    'position_encoding': 'QUANTIZED'
+                }}, f)
+
+            config = Config(config_file)
+            self.assertEqual(ConfigSource.FILE, config.config_src)
+            self.assertEqual('mongodb', config.DB_BACKEND)
+            self.assertEqual('day', config.DB_POSITION_PARTITIONING)
+            self.assertEqual('quantized', config.DB_POSITION_ENCODING)
@@ -1,8 +1,12 @@
+from datetime import datetime, timedelta, timezone
 from unittest.mock import MagicMock
 
+from app.core.models.position_report import PositionReport
 from app.core.services.flight_updater_coordinator import FlightUpdaterCoordinator
 from tests.db_base_test import MongoDBBaseTestCase
 
+FLIGHT_ID = "683f570bd570101935e7ff63"
+
 
 class FlightUpdaterCoordinatorTest(MongoDBBaseTestCase):
 
@@ -65,4 +69,39 @@ class FlightUpdaterCoordinatorTest(MongoDBBaseTestCase):
         result = self.sut.get_silhouete_params()
         
         self.assertEqual(result, expected_params)
-        self.mock_radar_service.get_silhouete_params.assert_called_once()
\ No newline at end of file
+        self.mock_radar_service.get_silhouete_params.assert_called_once()
+
+    def test_update_skips_writes_without_ingest_guard(self):
+        """Test that a replica not allowed to ingest does not write the positions it queried"""
+        self.sut._performance_monitor = MagicMock()
+        self.sut._unknown_aircraft_manager = MagicMock()
+        self.mock_radar_service.query_live_flights.return_value = [MagicMock(icao24="4B1234")]
+        self.sut.set_ingest_guard(lambda: False)
+
+        self.sut.update()
+
+        self.mock_flight_manager.update_flights.assert_not_called()
+        self.mock_position_manager.add_positions.assert_not_called()
+        self.assertEqual(1, self.sut.generation)
+
+    def test_stale_flights_expire_without_update(self):
+        """Test that flights that stopped reporting are removed from the snapshot between update cycles"""
+        now = datetime.now(timezone.utc)
+        self.mock_flight_manager.flight_last_contact = {FLIGHT_ID: now - timedelta(seconds=30)}
+        self.mock_flight_manager.mil_ranges.is_military.return_value = False
+        self.mock_position_manager.get_cached_flights.return_value = {FLIGHT_ID: PositionReport("4b1234", 47.0, 8.0, 30000)}
+        self.mock_position_manager.has_positions_changed.return_value = False
+        self.sut._publish_snapshot()
+        self.assertIn(FLIGHT_ID, self.sut.snapshot.points)
+
+        self.sut.expire_stale_flights()
+        self.assertEqual(0, self.sut.generation)
+
+        # Last contacts read from the database are naive
+        self.mock_flight_manager.flight_last_contact[FLIGHT_ID] = (now - timedelta(seconds=90)).replace(tzinfo=None)
+        self.sut._publish_snapshot()
+        self.mock_position_manager.get_cached_flights.return_value = {}
+
+        self.sut.expire_stale_flights()
+        self.assertEqual(1, self.sut.generation)
+        self.assertNotIn(FLIGHT_ID, self.sut.snapshot.points)
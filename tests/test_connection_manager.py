@@ -0,0 +1,247 @@
+import asyncio
+import json
+import unittest
+from datetime import datetime
+
+from app.core.models.live_snapshot import LiveSnapshot
+from app.core.models.position_report import PositionReport
+from app.core.utils.position_codec import PACKED, unpack
+from app.data.spatial_grid import BoundingBox, SpatialGrid
+from app.websocket.delta_log import DeltaLog
+from app.websocket.manager import SLOW_CONSUMER_CLOSE_CODE, ConnectionManager
+from app.websocket.viewport import Viewport
+
+FLIGHT_ID = "6ad5e11c3c3c5bf4c0a249f8"
+
+
+class FakeWebSocket:
+
+    def __init__(self):
+        self.headers = {}
+        self.sent = []
+        self.closed = None
+        # Cleared to block sends like a client that does not read
+        self.ready = asyncio.Event()
+        self.ready.set()
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, data):
+        await self.ready.wait()
+        self.sent.append(data)
+
+    async def send_bytes(self, data):
+        await self.ready.wait()
+        self.sent.append(data)
+
+    async def close(self, code=1000, reason=None):
+        self.closed = code
+
+
+class FakeLive:
+    """Snapshot and spatial index like the flight updater"""
+
+    def __init__(self):
+        self.grid = SpatialGrid()
+        self.snapshot = LiveSnapshot.empty()
+
+    def publish(self, reports):
+        for flight_id, report in reports.items():
+            self.grid.update(flight_id, report.lat, report.lon)
+        contacts = {flight_id: datetime(2026, 10, 19) for flight_id in reports}
+        self.snapshot = LiveSnapshot.build(1, reports, contacts, lambda icao24: icao24.startswith("ae"))
+
+    def flights_in_bbox(self, bbox):
+        return self.grid.query(bbox)
+
+
+def _positions(alt):
+    return {FLIGHT_ID: {"lat": 47.1, "lon": 8.1, "alt": alt, "track": 90.0}}
+
+
+def _alts(messages):
+    return [json.loads(m)["positions"][FLIGHT_ID]["alt"] for m in messages]
+
+
+class ConnectionManagerTest(unittest.TestCase):
+
+    def test_broadcast_encoded_once(self):
+        async def run():
+            manager = ConnectionManager()
+            log = DeltaLog(first_seq=1)
+            clients = [FakeWebSocket() for _ in range(3)]
+            packed_client = FakeWebSocket()
+            for ws in clients:
+                await manager.connect(ws, initial="init")
+            await manager.connect(packed_client, PACKED)
+
+            await manager.broadcast(log.append(1, _positions(1000)))
+            await asyncio.sleep(0.01)
+            return clients, packed_client
+
+        clients, packed_client = asyncio.run(run())
+        self.assertEqual("init", clients[0].sent[0])
+        self.assertEqual({"type": "update", "seq": 1, "count": 1, "positions": _positions(1000)}, json.loads(clients[0].sent[1]))
+        # The same encoded message object is sent to every client
+        self.assertIs(clients[0].sent[1], clients[2].sent[1])
+        self.assertEqual({FLIGHT_ID: (47.1, 8.1, 1000)}, unpack(packed_client.sent[0])[1])
+
+    def test_slow_client_gets_latest_value(self):
+        async def run():
+            manager = ConnectionManager(queue_size=2)
+            log = DeltaLog(first_seq=1)
+            fast, slow = FakeWebSocket(), FakeWebSocket()
+            slow.ready.clear()
+            await manager.connect(fast)
+            await manager.connect(slow)
+
+            for alt in range(1000, 6000, 1000):
+                await manager.broadcast(log.append(alt, _positions(alt)))
+                await asyncio.sleep(0)
+            stats = manager.get_stats()
+
+            slow.ready.set()
+            await asyncio.sleep(0.01)
+            return fast, slow, stats
+
+        fast, slow, stats = asyncio.run(run())
+        self.assertEqual([1000, 2000, 3000, 4000, 5000], _alts(fast.sent))
+        # The first update was already being sent, the later ones were merged
+        self.assertEqual([1000, 5000], _alts(slow.sent))
+        self.assertEqual(5, json.loads(slow.sent[1])["seq"])
+        self.assertEqual(4, stats["coalesced"])
+        self.assertEqual(1, stats["max_queue_depth"])
+
+    def test_lagging_client_disconnected(self):
+        async def run():
+            manager = ConnectionManager(max_lag_sec=0.01)
+            log = DeltaLog()
+            stuck = FakeWebSocket()
+            stuck.ready.clear()
+            await manager.connect(stuck)
+
+            await manager.broadcast(log.append(1, _positions(1000)))
+            await manager.broadcast(log.append(1, _positions(2000)))
+            await asyncio.sleep(0.02)
+            await manager.broadcast(log.append(1, _positions(3000)))
+            await asyncio.sleep(0.01)
+            return manager, stuck
+
+        manager, stuck = asyncio.run(run())
+        self.assertEqual(SLOW_CONSUMER_CLOSE_CODE, stuck.closed)
+        self.assertEqual(0, len(manager.active_connections))
+        self.assertEqual(1, manager.get_stats()["slow_disconnects"])
+
+    def test_resume_sends_missed_deltas_once(self):
+        async def run():
+            manager = ConnectionManager()
+            log = DeltaLog(first_seq=1)
+            for alt in (1000, 2000, 3000):
+                log.append(1, _positions(alt))
+            ws = FakeWebSocket()
+            await manager.connect(ws, seq=1, replay=log.since(1))
+
+            # The fan-out of the latest delta may still be pending when a client resumes
+            await manager.broadcast(log.since(2)[-1])
+            await manager.broadcast(log.append(2, _positions(4000)))
+            await asyncio.sleep(0.01)
+            return ws
+
+        ws = asyncio.run(run())
+        self.assertEqual([2000, 3000, 4000], _alts(ws.sent))
+        self.assertEqual([2, 3, 4], [json.loads(m)["seq"] for m in ws.sent])
+
+
+    def test_broadcast_while_accepting_is_queued(self):
+        async def run():
+            manager = ConnectionManager()
+            log = DeltaLog(first_seq=1)
+            ws = FakeWebSocket()
+            accepted = asyncio.Event()
+
+            async def accept():
+                await accepted.wait()
+            ws.accept = accept
+
+            connecting = asyncio.create_task(manager.connect(ws, initial="init", seq=0))
+            await asyncio.sleep(0)
+            await manager.broadcast(log.append(1, _positions(1000)))
+            accepted.set()
+            await connecting
+            await asyncio.sleep(0.01)
+            return ws
+
+        ws = asyncio.run(run())
+        self.assertEqual("init", ws.sent[0])
+        self.assertEqual([1000], _alts(ws.sent[1:]))
+
+    def test_stalled_close_does_not_delay_broadcast(self):
+        async def run():
+            manager = ConnectionManager(max_lag_sec=0.01)
+            log = DeltaLog(first_seq=1)
+            stuck, other = FakeWebSocket(), FakeWebSocket()
+            stuck.ready.clear()
+
+            async def close(code=1000, reason=None):
+                await asyncio.sleep(10)
+            stuck.close = close
+
+            await manager.connect(stuck)
+            await manager.broadcast(log.append(1, _positions(1000)))
+            await manager.broadcast(log.append(1, _positions(2000)))
+            await asyncio.sleep(0.02)
+            await manager.connect(other)
+            await asyncio.wait_for(manager.broadcast(log.append(1, _positions(3000))), timeout=1)
+            await asyncio.sleep(0.01)
+            return manager, other
+
+        manager, other = asyncio.run(run())
+        self.assertEqual([3000], _alts(other.sent))
+        self.assertEqual(1, manager.get_stats()["slow_disconnects"])
+
+class ViewportSubscriptionTest(unittest.TestCase):
+
+    def test_enter_and_leave(self):
+        swiss, uk = "f" * 23 + "1", "f" * 23 + "2"
+        live = FakeLive()
+        live.publish({swiss: PositionReport("4b1234", 47.1, 8.1, 30000), uk: PositionReport("400001", 51.5, -0.1, 9000)})
+
+        async def run():
+            manager = ConnectionManager()
+            ws = FakeWebSocket()
+            await manager.connect(ws, initial="init")
+            manager.handle_message(ws, json.dumps({"type": "subscribe", "bbox": "5.9,45.8,10.5,47.8"}), live)
+
+            # The swiss flight leaves the viewport, the other one enters it
+            reports = {swiss: PositionReport("4b1234", 48.5, 8.1, 30000), uk: PositionReport("400001", 47.0, 7.0, 9000)}
+            live.publish(reports)
+            delta = DeltaLog(first_seq=1).append(2, {f: {"lat": r.lat, "lon": r.lon, "alt": r.alt} for f, r in reports.items()})
+            await manager.broadcast(delta)
+
+            manager.handle_message(ws, json.dumps({"type": "subscribe", "bbox": [5.9, 45.8, 10.5, 49], "minAlt": 20000}), live)
+            manager.handle_message(ws, "{}", live)
+            await asyncio.sleep(0.01)
+            return [m if m == "init" else json.loads(m) for m in ws.sent]
+
+        messages = asyncio.run(run())
+        self.assertEqual("init", messages[0])
+        self.assertEqual({"type": "initial", "seq": 0, "count": 1, "positions": {swiss: {"lat": 47.1, "lon": 8.1, "alt": 30000}}},
+                         messages[1])
+        self.assertEqual({uk: {"lat": 47.0, "lon": 7.0, "alt": 9000}}, messages[2]["positions"])
+        self.assertEqual({"type": "viewport", "enter": [uk], "leave": [swiss]}, messages[3])
+        # Moving the viewport: the swiss flight is back, the other one is too low
+        self.assertEqual({swiss: {"lat": 48.5, "lon": 8.1, "alt": 30000}}, messages[4]["positions"])
+        self.assertEqual({"type": "viewport", "enter": [swiss], "leave": [uk]}, messages[5])
+        self.assertEqual("error", messages[6]["type"])
+
+    def test_parse(self):
+        viewport = Viewport.parse({"type": "subscribe", "bbox": [5.9, 45.8, 10.5, 47.8], "maxAlt": "20000", "mil": True})
+        self.assertEqual(Viewport(BoundingBox(5.9, 45.8, 10.5, 47.8), None, 20000, True), viewport)
+        for message in ({"type": "subscribe"}, {"bbox": "1,2,3"}, {"bbox": "0,0,1,1", "minAlt": "high"}):
+            with self.assertRaises(ValueError):
+                Viewport.parse(message)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import json
+import unittest
+
+from app.websocket.delta_log import DeltaLog
+
+
+class DeltaLogTest(unittest.TestCase):
+
+    def test_since_returns_missed_deltas(self):
+        log = DeltaLog(first_seq=10)
+        self.assertEqual(9, log.last_seq)
+        for generation in range(1, 4):
+            log.append(generation, {"f1": {"alt": generation}})
+
+        self.assertEqual(12, log.last_seq)
+        self.assertEqual([11, 12], [delta.seq for delta in log.since(10)])
+        self.assertEqual([], log.since(12))
+        # Nothing missed from before the first delta
+        self.assertEqual([10, 11, 12], [delta.seq for delta in log.since(9)])
+
+    def test_unknown_or_evicted_seq(self):
+        log = DeltaLog(max_deltas=2, first_seq=1)
+        for generation in range(1, 5):
+            log.append(generation, {"f1": {"alt": generation}})
+
+        # Deltas 1 and 2 were evicted, resuming after 2 still works
+        self.assertIsNone(log.since(1))
+        self.assertEqual([3, 4], [delta.seq for delta in log.since(2)])
+        # Sequence numbers from the future, e.g. of another server, are unknown
+        self.assertIsNone(log.since(5))
+
+    def test_bounded_by_positions(self):
+        log = DeltaLog(max_positions=3, first_seq=1)
+        log.append(1, {"f1": {}, "f2": {}})
+        log.append(2, {"f1": {}, "f2": {}})
+        self.assertIsNone(log.since(0))
+        self.assertEqual([2], [delta.seq for delta in log.since(1)])
+
+    def test_text_encoded_once(self):
+        log = DeltaLog(first_seq=1)
+        delta = log.append(1, {"f1": {"lat": 1.0}})
+        self.assertIs(delta.text(), delta.text())
+        self.assertEqual({"type": "update", "seq": 1, "count": 1, "positions": {"f1": {"lat": 1.0}}},
+                         json.loads(delta.text()))
+
+
+if __name__ == '__main__':
+    unittest.main()
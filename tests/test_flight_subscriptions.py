@@ -0,0 +1,49 @@
+import asyncio
+import unittest
+
+from app.websocket.delta_log import Delta
+from app.websocket.subscriptions import FlightSubscriptions
+
+
+class FlightSubscriptionsTest(unittest.TestCase):
+
+    def test_only_subscribers_of_changed_flights(self):
+        subscriptions = FlightSubscriptions()
+        received = {"a": [], "b": [], "c": []}
+        subscribers = {name: received[name].append for name in received}
+        subscriptions.subscribe("f1", subscribers["a"])
+        subscriptions.subscribe("f1", subscribers["b"])
+        subscriptions.subscribe("f2", subscribers["c"])
+
+        asyncio.run(subscriptions.publish(Delta(1, 1, {"f1": {"lat": 1}, "f3": {"lat": 3}})))
+        self.assertEqual({"a": [{"lat": 1}], "b": [{"lat": 1}], "c": []}, received)
+
+        # Many changed flights, few subscribed ones
+        asyncio.run(subscriptions.publish(Delta(1, 1, {f"x{i}": {} for i in range(100)} | {"f2": {"lat": 2}})))
+        self.assertEqual([{"lat": 2}], received["c"])
+
+    def test_unsubscribe(self):
+        subscriptions = FlightSubscriptions()
+        received = []
+        subscriptions.subscribe("f1", received.append)
+        self.assertEqual(1, len(subscriptions))
+
+        subscriptions.unsubscribe("f1", received.append)
+        subscriptions.unsubscribe("unknown", received.append)
+        self.assertFalse(subscriptions)
+        asyncio.run(subscriptions.publish(Delta(1, 1, {"f1": {}})))
+        self.assertEqual([], received)
+
+    def test_failing_subscriber_removed(self):
+        subscriptions = FlightSubscriptions()
+
+        def failing(position):
+            raise RuntimeError("closed")
+
+        subscriptions.subscribe("f1", failing)
+        asyncio.run(subscriptions.publish(Delta(1, 1, {"f1": {}})))
+        self.assertEqual(set(), subscriptions.subscribed_flights())
+
+
+if __name__ == '__main__':
+    unittest.main()
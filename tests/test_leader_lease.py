@@ -0,0 +1,79 @@
+import unittest
+from unittest.mock import patch
+
+from pymongo.errors import DuplicateKeyError, ServerSelectionTimeoutError
+
+from app.core.services.leader_lease import LeaderLease
+
+
+class FakeLeaseCollection:
+    """Lock documents with the upsert semantics of find_one_and_update, expiry by a settable server clock"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.documents = {}
+        self.unavailable = False
+
+    def find_one_and_update(self, query, update, upsert, return_document):
+        if self.unavailable:
+            raise ServerSelectionTimeoutError("no servers")
+        owner = update[0]["$set"]["owner"]
+        ttl_sec = update[0]["$set"]["expires"]["$add"][1] / 1000
+        document = self.documents.get(query["_id"])
+        if document is not None and document["owner"] != owner and document["expires"] >= self.now:
+            # Not matched, the upsert conflicts with the existing lock document
+            raise DuplicateKeyError("duplicate key")
+        document = {"_id": query["_id"], "owner": owner, "expires": self.now + ttl_sec}
+        self.documents[query["_id"]] = document
+        return document
+
+    def delete_one(self, query):
+        document = self.documents.get(query["_id"])
+        if document is not None and document["owner"] == query["owner"]:
+            del self.documents[query["_id"]]
+
+
+class LeaderLeaseTest(unittest.TestCase):
+
+    def setUp(self):
+        self.collection = FakeLeaseCollection()
+        self.first = LeaderLease(self.collection, ttl_sec=15, owner="first")
+        self.second = LeaderLease(self.collection, ttl_sec=15, owner="second")
+
+    def test_single_leader(self):
+        self.assertTrue(self.first.renew())
+        self.assertFalse(self.second.renew())
+
+        self.assertTrue(self.first.renew())
+        self.assertTrue(self.first.is_leader)
+        self.assertFalse(self.second.is_leader)
+        self.assertEqual(5, self.first.heartbeat_sec)
+
+    def test_expired_lease_is_taken_over(self):
+        self.first.renew()
+
+        self.collection.now += 16
+        self.assertTrue(self.second.renew())
+        self.assertFalse(self.first.renew())
+        self.assertEqual("second", self.collection.documents["ingest"]["owner"])
+
+    def test_leader_steps_down_when_renewals_fail(self):
+        with patch('app.core.services.leader_lease.time.monotonic', return_value=100.0):
+            self.first.renew()
+
+        self.collection.unavailable = True
+        with patch('app.core.services.leader_lease.time.monotonic', return_value=110.0):
+            self.assertTrue(self.first.renew())
+        with patch('app.core.services.leader_lease.time.monotonic', return_value=115.0):
+            self.assertFalse(self.first.renew())
+
+    def test_released_lease_is_taken_over_immediately(self):
+        self.first.renew()
+        self.first.release()
+
+        self.assertTrue(self.second.renew())
+        self.assertFalse(self.first.renew())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import asyncio
+import json
+import unittest
+
+from app.core.models.live_snapshot import LiveSnapshot
+from app.websocket.delta_log import DeltaLog
+from app.websocket.live_feed import LiveFeed, parse_event_id
+
+
+class FakeLive:
+    """Delta log, snapshot and callbacks like the flight updater"""
+
+    def __init__(self):
+        self.delta_log = DeltaLog(first_seq=1)
+        self.snapshot = LiveSnapshot.empty()._replace(seq=self.delta_log.last_seq)
+        self.callbacks = set()
+
+    def register_websocket_callback(self, callback):
+        self.callbacks.add(callback)
+
+    def unregister_websocket_callback(self, callback):
+        self.callbacks.discard(callback)
+
+    async def update(self, alt):
+        delta = self.delta_log.append(alt, {"f1": {"alt": alt}})
+        for callback in list(self.callbacks):
+            await callback(delta)
+
+
+def _parse(chunks):
+    """(event, id, data) of the complete events among the chunks"""
+    events = []
+    for block in b"".join(chunks).decode().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if ": " in line and not line.startswith(":"))
+        if "event" in fields:
+            events.append((fields["event"], int(fields["id"]), json.loads(fields["data"])))
+    return events
+
+
+class LiveFeedTest(unittest.TestCase):
+
+    def _read(self, feed, live, seq, updates):
+        async def run():
+            chunks = []
+
+            async def read():
+                async for chunk in feed.events(live, seq):
+                    chunks.append(chunk)
+
+            reader = asyncio.create_task(read())
+            await asyncio.sleep(0.01)
+            for alt in updates:
+                await live.update(alt)
+                await asyncio.sleep(0)
+            await asyncio.sleep(0.01)
+            readers = feed.readers
+            reader.cancel()
+            await asyncio.gather(reader, return_exceptions=True)
+            return chunks, readers
+
+        return asyncio.run(run())
+
+    def test_initial_then_updates(self):
+        feed, live = LiveFeed(), FakeLive()
+        chunks, readers = self._read(feed, live, None, [1000, 2000])
+
+        events = _parse(chunks)
+        self.assertEqual(("initial", 0), (events[0][0], events[0][1]))
+        self.assertEqual([("update", 1, 1000), ("update", 2, 2000)],
+                         [(event, seq, data["positions"]["f1"]["alt"]) for event, seq, data in events[1:]])
+        # The encoded event of a delta is shared by all readers
+        self.assertIs(live.delta_log.since(1)[0].event(), chunks[-1])
+        self.assertEqual(1, readers)
+        self.assertEqual(0, feed.readers)
+        self.assertFalse(live.callbacks)
+
+    def test_resume_from_last_event_id(self):
+        feed, live = LiveFeed(), FakeLive()
+        asyncio.run(live.update(1000))
+        asyncio.run(live.update(2000))
+        chunks, _ = self._read(feed, live, parse_event_id("1"), [3000])
+        self.assertEqual([("update", 2), ("update", 3)], [(event, seq) for event, seq, _ in _parse(chunks)])
+
+    def test_keepalive(self):
+        feed, live = LiveFeed(keepalive_sec=0.001), FakeLive()
+        chunks, _ = self._read(feed, live, None, [])
+        self.assertIn(b": keepalive\n\n", chunks)
+
+    def test_changes_wait_for_next_seq(self):
+        feed, live = LiveFeed(), FakeLive()
+        asyncio.run(live.update(1))
+
+        async def run():
+            poll = asyncio.create_task(feed.changes(live, 1, 1))
+            await asyncio.sleep(0.01)
+            waiting = feed.readers
+            await live.update(2)
+            return waiting, await poll, await feed.changes(live, 2, 0.01)
+
+        waiting, deltas, timed_out = asyncio.run(run())
+        self.assertEqual(1, waiting)
+        self.assertEqual([2], [delta.seq for delta in deltas])
+        self.assertEqual([], timed_out)
+        self.assertFalse(live.callbacks)
+        # Changes that are already there are returned right away
+        self.assertEqual([1, 2], [delta.seq for delta in asyncio.run(feed.changes(live, 0, 10))])
+
+    def test_changes_of_another_process(self):
+        feed, live = LiveFeed(), FakeLive()
+        asyncio.run(live.update(1))
+
+        # A seq from before a restart or of another process cannot be resumed from
+        self.assertIsNone(asyncio.run(feed.changes(live, -1, 10)))
+        self.assertIsNone(asyncio.run(feed.changes(live, 5, 10)))
+
+    def test_parse_event_id(self):
+        self.assertEqual(12, parse_event_id("12"))
+        self.assertIsNone(parse_event_id("abc"))
+        self.assertIsNone(parse_event_id(None))
+
+
+if __name__ == '__main__':
+    unittest.main()
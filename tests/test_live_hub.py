@@ -0,0 +1,158 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+from app.core.models.live_snapshot import LiveSnapshot
+from app.core.models.position_report import PositionReport
+from app.core.services.live_hub import LiveHub, LiveReplica, acquire_ingest_lock
+from app.core.services.live_shared_memory import LiveStateReader, LiveStateWriter, encode_flights
+from app.data.spatial_grid import BoundingBox
+from app.websocket.delta_log import DeltaLog
+
+FLIGHT_ID = "6ad5e11c3c3c5bf4c0a249f8"
+
+
+class FakeUpdater:
+    """Snapshot, delta log and cycle listeners like the flight updater"""
+
+    def __init__(self):
+        self.generation = 0
+        self.snapshot = LiveSnapshot.empty()
+        self.delta_log = DeltaLog(first_seq=1)
+        self.listeners = []
+
+    def register_cycle_listener(self, listener):
+        self.listeners.append(listener)
+
+    def live_state(self):
+        return self.flights, self.contacts, lambda icao24: False
+
+    def cycle(self, lat):
+        self.generation += 1
+        self.flights = {FLIGHT_ID: PositionReport("4b1234", lat, 8.1, 30000)}
+        self.contacts = {FLIGHT_ID: datetime(2026, 10, 19)}
+        delta = self.delta_log.append(self.generation, {FLIGHT_ID: {"lat": lat, "lon": 8.1, "alt": 30000}})
+        self.snapshot = LiveSnapshot.build(self.generation, self.flights, self.contacts, lambda icao24: False, seq=delta.seq)
+        for listener in self.listeners:
+            listener(self.snapshot, delta)
+
+
+class LiveHubTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.socket_path = os.path.join(self.directory.name, 'live.sock')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_ingest_lock_taken_once(self):
+        fd = acquire_ingest_lock(self.socket_path)
+        self.assertIsNotNone(fd)
+        self.assertIsNone(acquire_ingest_lock(self.socket_path))
+        os.close(fd)
+        os.close(acquire_ingest_lock(self.socket_path))
+
+    def test_replica_follows_ingest(self):
+        self._follow_ingest(None, None)
+
+    def test_replica_follows_ingest_shared_memory(self):
+        name = f"frtest{os.getpid()}"
+        self._follow_ingest(LiveStateWriter(name), LiveStateReader(name))
+
+    def _follow_ingest(self, writer, reader):
+        updater = FakeUpdater()
+        updater.cycle(47.1)
+
+        async def run():
+            hub = LiveHub(updater, self.socket_path, writer)
+            await hub.start()
+            if writer is not None:
+                hub.publish(updater.snapshot, None)
+            replica = LiveReplica(self.socket_path, None, reader)
+            replica.attach_event_loop(asyncio.get_running_loop())
+            received = []
+
+            async def callback(delta):
+                received.append(delta)
+
+            replica.register_websocket_callback(callback)
+            replica.start()
+            for _ in range(100):
+                await asyncio.sleep(0.01)
+                if replica.connected:
+                    break
+            initial = replica.snapshot.generation
+
+            updater.cycle(47.2)
+            await asyncio.sleep(0.05)
+            replica.close()
+            hub.close()
+            return replica, initial, received
+
+        replica, initial, received = asyncio.run(run())
+        self.assertEqual(1, initial)
+        self.assertEqual(2, replica.generation)
+        self.assertEqual(updater.snapshot.positions, replica.snapshot.positions)
+        self.assertEqual({FLIGHT_ID}, replica.flights_in_bbox(BoundingBox.parse("8,47.15,8.2,47.3")))
+        # Deltas keep the sequence numbers of the ingest process, clients can resume on any worker
+        self.assertEqual([2], [delta.seq for delta in received])
+        self.assertEqual([2], [delta.seq for delta in replica.delta_log.since(1)])
+
+    def test_cycle_already_in_state_ignored(self):
+        updater = FakeUpdater()
+        replica = LiveReplica(self.socket_path, None)
+        updater.cycle(47.1)
+        delta = updater.delta_log.deltas()[-1]
+        flights = encode_flights(*updater.live_state())
+        replica.apply({"type": "state", "generation": 1, "seq": delta.seq, "flights": 1,
+                       "deltas": [[delta.seq, delta.generation, delta.positions]], "last_seq": delta.seq}, flights)
+        replica.apply({"type": "cycle", "generation": 1, "seq": delta.seq, "flights": 1,
+                       "delta": [delta.seq, delta.generation, delta.positions]}, flights)
+        self.assertEqual([1], [d.seq for d in replica.delta_log.deltas()])
+        self.assertEqual(updater.snapshot.positions, replica.snapshot.positions)
+
+    def test_other_user_is_not_followed(self):
+        updater = FakeUpdater()
+        updater.cycle(47.1)
+
+        async def run():
+            hub = LiveHub(updater, self.socket_path)
+            await hub.start()
+            replica = LiveReplica(self.socket_path, None)
+            with patch('app.core.services.live_hub.os.geteuid', return_value=os.geteuid() + 1):
+                replica.start()
+                await asyncio.sleep(0.1)
+            workers = hub.workers
+            replica.close()
+            hub.close()
+            return replica, workers
+
+        replica, workers = asyncio.run(run())
+        self.assertFalse(replica.connected)
+        self.assertEqual(0, workers)
+        self.assertEqual(0, replica.generation)
+
+    def test_shared_memory_read_when_a_cycle_is_applied(self):
+        name = f"frtest{os.getpid()}"
+        writer, reader = LiveStateWriter(name), LiveStateReader(name)
+        updater = FakeUpdater()
+        replica = LiveReplica(self.socket_path, None, reader)
+        try:
+            reader.open()
+            updater.cycle(47.1)
+            writer.write(1, updater.snapshot.seq, *updater.live_state())
+
+            # Reading the snapshot does not rebuild it, applying the message of the cycle does
+            self.assertEqual(0, replica.snapshot.generation)
+            replica.apply({"type": "cycle", "generation": 1, "seq": updater.snapshot.seq, "flights": None, "delta": None})
+            self.assertEqual(1, replica.snapshot.generation)
+        finally:
+            reader.close()
+            writer.close()
+
+if __name__ == '__main__':
+    unittest.main()
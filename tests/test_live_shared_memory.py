@@ -0,0 +1,79 @@
+import json
+import os
+import unittest
+from datetime import datetime, timezone
+
+from app.core.models.live_snapshot import LiveSnapshot
+from app.core.models.position_report import PositionReport
+from app.core.services.live_shared_memory import (_BUFFER_HEADER, LiveStateReader, LiveStateWriter,
+                                                   _buffer_header_offset, decode_flights, encode_flights)
+
+SWISS, MIL = "6ad5e11c3c3c5bf4c0a249f8", "6ad5e11c3c3c5bf4c0a249f9"
+
+
+def _flights(lat):
+    return {
+        SWISS: PositionReport("4b1234", lat, 8.1, 30000, gs=420, track=91.5, callsign="SWR123"),
+        MIL: PositionReport("ae0001", 47.5, 8.6, None),
+    }
+
+
+def _contacts():
+    return {SWISS: datetime(2026, 10, 19, 9, 30, 1, 123456, tzinfo=timezone.utc), MIL: datetime(2026, 10, 19, 9, 30)}
+
+
+def _is_military(icao24):
+    return icao24.startswith("ae")
+
+
+class LiveSharedMemoryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.name = f"frtest{os.getpid()}"
+        self.writer = LiveStateWriter(self.name, capacity=4)
+        self.reader = LiveStateReader(self.name)
+        self.assertTrue(self.reader.open())
+
+    def tearDown(self):
+        self.reader.close()
+        self.writer.close()
+
+    def test_snapshot_as_written(self):
+        self.assertIsNone(self.reader.snapshot())
+        self.writer.write(1, 10, _flights(47.1), _contacts(), _is_military)
+        expected = LiveSnapshot.build(1, _flights(47.1), _contacts(), _is_military, seq=10)
+
+        snapshot = self.reader.snapshot()
+        self.assertEqual(expected.positions, snapshot.positions)
+        self.assertEqual(expected.flights, snapshot.flights)
+        self.assertEqual(expected.military, snapshot.military)
+        self.assertEqual(json.loads(expected.initial_message), json.loads(snapshot.initial_message))
+        self.assertEqual((1, 10), (snapshot.generation, snapshot.seq))
+
+    def test_latest_generation_wins(self):
+        for generation in range(1, 4):
+            self.writer.write(generation, generation, _flights(47 + generation / 10), _contacts(), _is_military)
+        self.assertEqual(3, self.reader.generation())
+        self.assertEqual(47.3, self.reader.snapshot().points[SWISS][0])
+
+    def test_buffer_being_rewritten_is_not_read(self):
+        self.writer.write(1, 1, _flights(47.1), _contacts(), _is_military)
+        # The writer lapped the reader and is filling the active buffer again
+        _BUFFER_HEADER.pack_into(self.writer._segment.buf, _buffer_header_offset(self.writer._active), 0, 1, 0)
+        self.assertIsNone(self.reader.read())
+
+    def test_capacity(self):
+        flights = {f"{i:024x}": PositionReport("4b1234", 47.0, 8.0, 1000) for i in range(6)}
+        self.writer.write(1, 1, flights, {}, _is_military)
+        self.assertEqual(4, len(self.reader.snapshot().points))
+
+
+    def test_encoded_flights(self):
+        flights, contacts, military = decode_flights(encode_flights(_flights(47.1), _contacts(), _is_military))
+
+        self.assertEqual(_flights(47.1), flights)
+        self.assertEqual(_contacts()[SWISS], contacts[SWISS])
+        self.assertEqual({"ae0001"}, military)
+
+if __name__ == '__main__':
+    unittest.main()
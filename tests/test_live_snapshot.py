@@ -0,0 +1,63 @@
+import json
+import unittest
+from datetime import datetime
+
+from app.core.models.live_snapshot import LiveSnapshot
+from app.core.models.position_report import PositionReport
+
+
+class LiveSnapshotTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cached_flights = {
+            "a1": PositionReport("4b1234", 47.1, 8.1, 30000, callsign="SWR1"),
+            "a2": PositionReport("3c0001", 47.2, 8.2, None, gs=420.0, track=90.0),
+            "a3": PositionReport("ae0001", 47.3, 8.3, 12000, callsign="RCH1")
+        }
+        self.last_contacts = {
+            "a1": datetime(2025, 6, 3, 20, 0, 1),
+            "a2": datetime(2025, 6, 3, 20, 0, 3),
+            "a3": datetime(2025, 6, 3, 20, 0, 2)
+        }
+        self.snapshot = LiveSnapshot.build(7, self.cached_flights, self.last_contacts,
+                                           lambda icao24: icao24.startswith("ae"))
+
+    def test_flights_most_recent_first(self):
+        flights = json.loads(self.snapshot.flights_body())
+        self.assertEqual(["a2", "a3", "a1"], [f["id"] for f in flights])
+        self.assertEqual({"id": "a1", "icao24": "4b1234", "cls": "SWR1", "lstCntct": "2025-06-03T20:00:01Z",
+                          "firstCntct": "2025-06-03T20:00:01Z"}, flights[2])
+
+        self.assertEqual(["a2"], [f["id"] for f in json.loads(self.snapshot.flights_body(limit=1))])
+        self.assertEqual(["a3"], [f["id"] for f in json.loads(self.snapshot.flights_body(military_only=True))])
+
+    def test_positions(self):
+        positions = json.loads(self.snapshot.positions)
+        self.assertEqual([[47.2, 8.2, -1]], positions["a2"])
+        self.assertEqual({"a3": [[47.3, 8.3, 12000]]}, json.loads(self.snapshot.mil_positions))
+
+    def test_initial_message(self):
+        message = json.loads(self.snapshot.initial_message)
+        self.assertEqual("initial", message["type"])
+        self.assertEqual(3, message["count"])
+        self.assertEqual(self.cached_flights["a2"].__dict__, message["positions"]["a2"])
+
+    def test_subsets(self):
+        flights = json.loads(self.snapshot.flights_body(flight_ids={"a1", "a2", "unknown"}))
+        self.assertEqual(["a2", "a1"], [f["id"] for f in flights])
+        self.assertEqual([], json.loads(self.snapshot.flights_body(military_only=True, flight_ids={"a1"})))
+
+        self.assertEqual({"a3": [[47.3, 8.3, 12000]]}, json.loads(self.snapshot.positions_body(flight_ids=["a3"])))
+        self.assertEqual({}, json.loads(self.snapshot.positions_body(flight_ids=[])))
+        self.assertEqual(json.loads(self.snapshot.positions), json.loads(self.snapshot.positions_body()))
+
+    def test_empty(self):
+        snapshot = LiveSnapshot.empty()
+        self.assertEqual(0, snapshot.generation)
+        self.assertEqual(b'[]', snapshot.flights_body())
+        self.assertEqual(b'{}', snapshot.positions)
+        self.assertEqual(0, json.loads(snapshot.initial_message)["count"])
+
+
+if __name__ == '__main__':
+    unittest.main()
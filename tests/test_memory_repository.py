@@ -0,0 +1,75 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from app.data.repositories.memory_repository import MemoryRepository
+
+
+class MemoryRepositoryTest(unittest.TestCase):
+
+    def _position(self, flight, timestamp, lat=47.0):
+        return {"flight_id": flight["_id"], "timestmp": timestamp, "lat": lat, "lon": 8.0, "alt": 10000, "track": 90.0}
+
+    def test_positions_are_bounded_per_flight(self):
+        repository = MemoryRepository(max_flights=10, positions_per_flight=3, retention_minutes=30)
+        flight = repository.get_or_create_flight(modeS="4B1234", is_military=False, callsign="SWR1")
+        now = datetime.now(timezone.utc)
+
+        repository.insert_positions([self._position(flight, now + timedelta(seconds=i), 47.0 + i) for i in range(5)])
+
+        positions = repository.get_positions(str(flight["_id"]), projection={"lat": 1, "lon": 1, "_id": 0})
+        self.assertEqual([{"lat": 49.0, "lon": 8.0}, {"lat": 50.0, "lon": 8.0}, {"lat": 51.0, "lon": 8.0}], positions)
+
+        last = repository.get_recent_flights_last_pos(now - timedelta(minutes=1))
+        self.assertEqual(51.0, last[0]["position"]["lat"])
+        self.assertEqual(flight["_id"], last[0]["position"]["flight_id"])
+        self.assertEqual("SWR1", repository.get_flights_batch({"4B1234"})["4B1234"][0]["callsign"])
+
+    def test_flight_table_is_bounded(self):
+        repository = MemoryRepository(max_flights=3, positions_per_flight=3, retention_minutes=30)
+        flights = [repository.get_or_create_flight(modeS=f"4B00{i:02d}", is_military=False) for i in range(3)]
+
+        # The first flight is seen again, so the second one is the least recently seen
+        repository.bulk_update_flight_last_contacts([(str(flights[0]["_id"]), datetime.now(timezone.utc))])
+        repository.get_or_create_flight(modeS="4B0099", is_military=False)
+
+        self.assertTrue(repository.flight_exists(str(flights[0]["_id"])))
+        self.assertFalse(repository.flight_exists(str(flights[1]["_id"])))
+        self.assertEqual(3, repository.get_stats()["flights"])
+
+    def test_idle_flights_are_evicted(self):
+        repository = MemoryRepository(max_flights=10, positions_per_flight=3, retention_minutes=30)
+        idle = repository.get_or_create_flight(modeS="4B0001", is_military=False)
+        active = repository.get_or_create_flight(modeS="4B0002", is_military=False)
+
+        repository.bulk_update_flights([(str(idle["_id"]), {"last_contact": datetime.now(timezone.utc) - timedelta(hours=1)})])
+        repository.bulk_update_flight_last_contacts([(str(active["_id"]), datetime.now(timezone.utc))])
+
+        self.assertFalse(repository.flight_exists(str(idle["_id"])))
+        self.assertEqual([], repository.get_positions(str(idle["_id"])))
+        self.assertTrue(repository.flight_exists(str(active["_id"])))
+
+
+    def test_flight_history_pages(self):
+        repository = MemoryRepository(max_flights=100, positions_per_flight=3, retention_minutes=30)
+        now = datetime.now(timezone.utc)
+        flights = []
+        for i in range(7):
+            flight = repository.get_or_create_flight(modeS=f"4B00{i:02d}", is_military=i % 2 == 0, callsign=f"SWR{i}" if i < 5 else f"EZY{i}")
+            repository.bulk_update_flight_last_contacts([(str(flight["_id"]), now - timedelta(minutes=10 - i))])
+            flights.append(flight)
+
+        first = repository.get_flight_history(3)
+        second = repository.get_flight_history(3, after=(first[-1]["last_contact"], first[-1]["_id"]))
+        third = repository.get_flight_history(3, after=(second[-1]["last_contact"], second[-1]["_id"]))
+
+        self.assertEqual([f["_id"] for f in reversed(flights)], [f["_id"] for f in first + second + third])
+        self.assertEqual(["EZY6", "SWR4", "SWR2", "SWR0"], [f["callsign"] for f in repository.get_flight_history(10, military_only=True)])
+        self.assertEqual(["SWR4", "SWR3"], [f["callsign"] for f in repository.get_flight_history(10, callsign_prefix="SWR", since=now - timedelta(minutes=7))])
+
+        self.assertEqual([f["_id"] for f in reversed(flights)], [f["_id"] for f in repository.iter_flight_history(batch_size=3)])
+        self.assertEqual(["SWR4", "SWR2", "SWR0"], [f["callsign"] for f in repository.iter_flight_history(
+            after=(first[0]["last_contact"], first[0]["_id"]), military_only=True, callsign_prefix="SWR", batch_size=1)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,25 @@
+import unittest
+from datetime import datetime, timezone
+
+from bson import ObjectId
+
+from app.api.pagination import encode_cursor, decode_cursor
+
+
+class PaginationTest(unittest.TestCase):
+
+    def test_cursor_roundtrip(self):
+        flight_id = ObjectId()
+        cursor = encode_cursor(datetime(2026, 10, 19, 8, 30, 15, 123000, tzinfo=timezone.utc), flight_id)
+
+        self.assertNotIn(str(flight_id), cursor)
+        self.assertEqual((datetime(2026, 10, 19, 8, 30, 15, 123000), flight_id), decode_cursor(cursor))
+
+    def test_invalid_cursor(self):
+        for cursor in ("", "not a cursor", encode_cursor(datetime(2026, 1, 1), "abc")):
+            with self.assertRaises(ValueError):
+                decode_cursor(cursor)
+
+
+if __name__ == '__main__':
+    unittest.main()
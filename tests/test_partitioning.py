@@ -0,0 +1,78 @@
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import MagicMock
+
+from bson import ObjectId
+
+from app.data.partitioning import PositionPartitioning
+from app.data.repositories.mongodb_repository import MongoDBRepository
+from tests.db_base_test import MongoDBBaseTestCase
+
+
+class PositionPartitioningTest(unittest.TestCase):
+
+    def test_daily_collection_name(self):
+        partitioning = PositionPartitioning('positions', 'day')
+        ts = datetime(2026, 10, 17, 13, 45, tzinfo=timezone.utc)
+
+        self.assertEqual('positions_2026_10_17', partitioning.collection_name(ts))
+
+    def test_hourly_collection_name_naive_is_utc(self):
+        partitioning = PositionPartitioning('positions', 'hour')
+
+        self.assertEqual('positions_2026_10_17_13', partitioning.collection_name(datetime(2026, 10, 17, 13, 45)))
+
+    def test_collection_names_between(self):
+        partitioning = PositionPartitioning('positions', 'day')
+        names = partitioning.collection_names_between(datetime(2026, 10, 16, 23, 50), datetime(2026, 10, 18, 0, 10))
+
+        self.assertEqual(['positions_2026_10_16', 'positions_2026_10_17', 'positions_2026_10_18'], names)
+
+    def test_is_expired(self):
+        partitioning = PositionPartitioning('positions', 'day')
+        cutoff = datetime(2026, 10, 18, 6, 0, tzinfo=timezone.utc)
+
+        self.assertTrue(partitioning.is_expired('positions_2026_10_17', cutoff))
+        self.assertFalse(partitioning.is_expired('positions_2026_10_18', cutoff))
+        self.assertFalse(partitioning.is_expired('positions', cutoff))
+        self.assertFalse(partitioning.is_expired('flights', cutoff))
+
+    def test_invalid_granularity(self):
+        with self.assertRaises(ValueError):
+            PositionPartitioning('positions', 'week')
+
+
+class PartitionedRepositoryTest(MongoDBBaseTestCase):
+
+    def setUp(self):
+        MongoDBBaseTestCase.setUp(self)
+        self.mock_db.positions_partitioning = 'day'
+        self.collections = {}
+        self.mock_db.__getitem__ = MagicMock(side_effect=lambda name: self.collections.setdefault(name, MagicMock()))
+        self.mock_db.list_collection_names.return_value = ['flights', 'positions_2026_10_16', 'positions_2026_10_17']
+
+    def test_insert_positions_routed_to_partitions(self):
+        repo = MongoDBRepository(self.mock_db)
+        repo.insert_positions([
+            {"flight_id": 1, "timestmp": datetime(2026, 10, 17, 23, 59)},
+            {"flight_id": 1, "timestmp": datetime(2026, 10, 18, 0, 1)},
+        ])
+
+        self.assertEqual(1, len(self.collections['positions_2026_10_17'].insert_many.call_args[0][0]))
+        self.assertEqual(1, len(self.collections['positions_2026_10_18'].insert_many.call_args[0][0]))
+        self.mock_db.create_collection.assert_called_once()
+
+    def test_drop_expired_partitions(self):
+        repo = MongoDBRepository(self.mock_db)
+        dropped = repo.drop_expired_position_partitions(datetime(2026, 10, 17, 12, 0, tzinfo=timezone.utc))
+
+        self.assertEqual(['positions_2026_10_16'], dropped)
+        self.mock_db.drop_collection.assert_called_once_with('positions_2026_10_16')
+
+    def test_delete_flights_leaves_positions_to_partition_drops(self):
+        repo = MongoDBRepository(self.mock_db)
+        self.collections['flights'].delete_many.return_value.deleted_count = 1
+        self.collections['position_chunks'].delete_many.return_value.deleted_count = 0
+
+        self.assertEqual(1, repo.delete_flights_and_positions([str(ObjectId())]))
+        self.assertFalse([name for name in self.collections if name.startswith('positions_')])
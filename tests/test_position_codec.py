@@ -0,0 +1,54 @@
+import unittest
+
+from app.core.utils.position_codec import (POSITIONS, TRAJECTORY, TRAJECTORY_UPDATE, decode_polyline,
+                                           encode_polyline, pack_positions, pack_trajectory, unpack, unpack_seq)
+
+
+class PositionCodecTest(unittest.TestCase):
+
+    points = [(47.520152, 7.920509, 32025), (47.655716, 11.048882, None), (-33.94, 151.17, 0)]
+
+    def test_polyline_reference_example(self):
+        # Example of the Google polyline documentation, with a constant altitude
+        encoded = encode_polyline([(38.5, -120.2, 0), (40.7, -120.95, 0), (43.252, -126.453, 0)])
+        self.assertEqual("_p~iF~ps|U?_ulLnnqC?_mqNvxq`@?", encoded)
+
+    def test_polyline_roundtrip(self):
+        decoded = decode_polyline(encode_polyline(self.points))
+
+        self.assertEqual([(47.52015, 7.92051, 32025), (47.65572, 11.04888, -1), (-33.94, 151.17, 0)], decoded)
+        self.assertEqual([], decode_polyline(encode_polyline([])))
+
+    def test_packed_trajectory(self):
+        data = pack_trajectory(self.points)
+
+        self.assertEqual(8 + 12 * len(self.points), len(data))
+        kind, decoded = unpack(data)
+        self.assertEqual(TRAJECTORY, kind)
+        self.assertEqual([(47.520152, 7.920509, 32025), (47.655716, 11.048882, -1), (-33.94, 151.17, 0)], decoded)
+        self.assertEqual(TRAJECTORY_UPDATE, unpack(pack_trajectory(self.points[:1], TRAJECTORY_UPDATE))[0])
+
+    def test_packed_positions(self):
+        positions = {"683f570bd570101935e7ff63": (47.1, 8.1, 3000), "683f570bd570101935e7ff64": (47.2, 8.2, None)}
+
+        kind, decoded = unpack(pack_positions(positions))
+
+        self.assertEqual(POSITIONS, kind)
+        self.assertEqual({"683f570bd570101935e7ff63": (47.1, 8.1, 3000), "683f570bd570101935e7ff64": (47.2, 8.2, -1)}, decoded)
+
+    def test_packed_positions_seq(self):
+        data = pack_positions({"683f570bd570101935e7ff63": (47.1, 8.1, 3000)}, seq=1760860800123)
+
+        self.assertEqual(8 + 8 + 24, len(data))
+        self.assertEqual(1760860800123, unpack_seq(data))
+        self.assertEqual(0, unpack_seq(pack_positions({})))
+        with self.assertRaises(ValueError):
+            unpack_seq(pack_trajectory(self.points))
+
+    def test_unpack_rejects_other_data(self):
+        with self.assertRaises(ValueError):
+            unpack(b'[1,2,3]\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+import unittest
+from datetime import datetime
+
+from app.data.position_encoding import encode_position, decode_position, QUANTIZED_FIELD
+
+
+class PositionEncodingTest(unittest.TestCase):
+
+    def test_quantized_roundtrip(self):
+        position = {"flight_id": 1, "lat": 47.520152, "lon": -7.920509, "alt": 32025, "track": 271.36, "gs": 451.6,
+                    "timestmp": datetime(2026, 10, 17)}
+
+        encoded = encode_position(position)
+        self.assertEqual(47520152, encoded["lat"])
+        self.assertEqual(-7920509, encoded["lon"])
+        self.assertEqual(2714, encoded["track"])
+        self.assertEqual(452, encoded["gs"])
+        self.assertEqual(1, encoded[QUANTIZED_FIELD])
+
+        decoded = decode_position(encoded)
+        self.assertAlmostEqual(47.520152, decoded["lat"], places=6)
+        self.assertAlmostEqual(-7.920509, decoded["lon"], places=6)
+        self.assertEqual(32025, decoded["alt"])
+        self.assertEqual(271.4, decoded["track"])
+        self.assertNotIn(QUANTIZED_FIELD, decoded)
+
+    def test_missing_values(self):
+        decoded = decode_position(encode_position({"lat": 1.0, "lon": 2.0, "alt": None, "track": None}))
+
+        self.assertIsNone(decoded["alt"])
+        self.assertIsNone(decoded["track"])
+
+    def test_unquantized_unchanged(self):
+        position = {"lat": 47.5, "lon": 7.9, "alt": 1000}
+        self.assertEqual({"lat": 47.5, "lon": 7.9, "alt": 1000}, decode_position(position))
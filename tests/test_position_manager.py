@@ -0,0 +1,106 @@
+import unittest
+from datetime import datetime
+from unittest.mock import MagicMock
+
+from bson import ObjectId
+
+from app.core.models.position_report import PositionReport
+from app.core.services.position_manager import PositionManager
+
+
+class PositionManagerTrajectoryTest(unittest.TestCase):
+
+    def setUp(self):
+        config = MagicMock()
+        config.DB_BACKEND = 'mongodb'
+        config.TRAJECTORY_BUFFER_POSITIONS = 3
+
+        self.repository = MagicMock()
+        self.sut = PositionManager(config)
+        self.sut.initialize(self.repository)
+
+        self.flight_id = str(ObjectId())
+        self.flight_manager = MagicMock()
+        self.flight_manager.modeS_flightid_map = {"4B1234": self.flight_id}
+        self.flight_manager.flight_last_contact = {}
+
+    def _report(self, i):
+        return PositionReport("4B1234", 47.0 + i * 0.01, 8.0, 10000 + i, gs=420.0, track=90.0)
+
+    def test_active_flight_is_served_from_memory(self):
+        for i in range(2):
+            self.sut.add_positions([self._report(i)], self.flight_manager)
+
+        positions = self.sut.get_flight_positions(self.flight_id, projection={"lat": 1, "alt": 1, "_id": 0})
+
+        self.assertEqual([{"lat": 47.0, "alt": 10000}, {"lat": 47.01, "alt": 10001}], positions)
+        self.repository.get_positions.assert_not_called()
+
+    def test_older_segment_is_read_from_database(self):
+        for i in range(5):
+            self.sut.add_positions([self._report(i)], self.flight_manager)
+
+        older = [{"lat": 47.0, "lon": 8.0, "alt": 10000}, {"lat": 47.01, "lon": 8.0, "alt": 10001}]
+        self.repository.get_positions.return_value = older
+
+        positions = self.sut.get_flight_positions(self.flight_id, limit=4)
+
+        self.assertEqual([47.0, 47.01, 47.02, 47.03], [p["lat"] for p in positions])
+        before = self.repository.get_positions.call_args.kwargs["before"]
+        self.assertIsInstance(before, datetime)
+
+    def test_iter_reads_older_segment_in_batches(self):
+        for i in range(5):
+            self.sut.add_positions([self._report(i)], self.flight_manager)
+
+        self.repository.iter_positions.return_value = iter([{"lat": 47.0}, {"lat": 47.01}])
+
+        positions = list(self.sut.iter_flight_positions(self.flight_id, projection={"lat": 1}, batch_size=100))
+
+        self.assertEqual([47.0, 47.01, 47.02, 47.03, 47.04], [p["lat"] for p in positions])
+        self.assertEqual(100, self.repository.iter_positions.call_args.kwargs["batch_size"])
+        self.assertIsInstance(self.repository.iter_positions.call_args.kwargs["before"], datetime)
+
+    def test_unbuffered_flight_is_read_from_database(self):
+        self.repository.get_positions.return_value = []
+
+        self.assertEqual([], self.sut.get_flight_positions(str(ObjectId()), limit=10))
+        self.repository.get_positions.assert_called_once()
+
+
+    def test_last_positions_from_database_are_not_stored(self):
+        self.sut.set_last_positions({self.flight_id: self._report(0)})
+
+        self.assertEqual({self.flight_id}, self.sut.get_changed_flight_ids())
+        self.assertEqual(47.0, self.sut.flight_lastpos_map[self.flight_id].lat)
+        self.repository.insert_positions.assert_not_called()
+
+        self.sut.clear_changes()
+        self.sut.set_last_positions({self.flight_id: self._report(0)})
+        self.assertFalse(self.sut.has_positions_changed())
+
+        self.sut.set_last_positions({self.flight_id: self._report(1)})
+        self.assertEqual({self.flight_id}, self.sut.get_changed_flight_ids())
+
+    def test_idle_trajectories_are_evicted(self):
+        self.sut.add_positions([self._report(0)], self.flight_manager)
+        self.flight_manager.flight_last_contact[self.flight_id] = datetime(2020, 1, 1)
+
+        self.sut.evict_idle_trajectories(self.flight_manager)
+
+        self.repository.get_positions.return_value = []
+        self.assertEqual([], self.sut.get_flight_positions(self.flight_id))
+        self.repository.get_positions.assert_called_once()
+
+    def test_cleared_trajectories_are_read_from_database(self):
+        self.sut.add_positions([self._report(0)], self.flight_manager)
+
+        self.sut.clear_trajectories()
+
+        self.repository.get_positions.return_value = []
+        self.assertEqual([], self.sut.get_flight_positions(self.flight_id))
+        self.repository.get_positions.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
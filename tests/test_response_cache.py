@@ -0,0 +1,55 @@
+import unittest
+from unittest.mock import MagicMock
+
+from app.api.response_cache import ResponseCache, etag_matches
+
+
+class ResponseCacheTest(unittest.TestCase):
+
+    def _request(self, if_none_match=None):
+        request = MagicMock()
+        request.headers = {"if-none-match": if_none_match} if if_none_match else {}
+        return request
+
+    def test_body_is_built_once_per_generation(self):
+        cache = ResponseCache()
+        build = MagicMock(return_value=b'[1,2]')
+
+        first = cache.respond(self._request(), 'flights', 1, build)
+        second = cache.respond(self._request(), 'flights', 1, build)
+        self.assertEqual(1, build.call_count)
+        self.assertEqual(b'[1,2]', second.body)
+        self.assertEqual(first.headers["etag"], second.headers["etag"])
+
+        cache.respond(self._request(), 'flights', 2, build)
+        self.assertEqual(2, build.call_count)
+
+    def test_not_modified(self):
+        cache = ResponseCache()
+        etag = cache.respond(self._request(), 'positions', 1, lambda: b'{}').headers["etag"]
+
+        # Unchanged content keeps its ETag in the next generation
+        response = cache.respond(self._request(etag), 'positions', 2, lambda: b'{}')
+        self.assertEqual(304, response.status_code)
+        self.assertEqual(b'', response.body)
+
+        response = cache.respond(self._request(etag), 'positions', 3, lambda: b'{"a":1}')
+        self.assertEqual(200, response.status_code)
+
+    def test_bounded(self):
+        cache = ResponseCache(max_entries=2)
+        for limit in range(3):
+            cache.put(('flights', limit), 1, b'[]')
+
+        self.assertIsNone(cache.get(('flights', 0), 1))
+        self.assertIsNotNone(cache.get(('flights', 2), 1))
+
+    def test_etag_matching(self):
+        self.assertTrue(etag_matches('W/"abc", "def"', '"abc"'))
+        self.assertTrue(etag_matches('*', '"abc"'))
+        self.assertFalse(etag_matches('"abd"', '"abc"'))
+        self.assertFalse(etag_matches(None, '"abc"'))
+
+
+if __name__ == '__main__':
+    unittest.main()
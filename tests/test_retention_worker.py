@@ -0,0 +1,75 @@
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+from bson import ObjectId
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import router
+from app.core.services.retention_worker import RetentionWorker
+
+
+class RetentionWorkerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.config = MagicMock()
+        self.config.DB_RETENTION_MIN = 60
+        self.config.DB_RETENTION_DELETES_PER_SEC = 1000000
+
+        start = datetime(2026, 1, 1)
+        self.flights = [{"_id": ObjectId(), "last_contact": start + timedelta(minutes=i)} for i in range(23)]
+
+        self.repository = MagicMock()
+        self.repository.get_retention_cursor.return_value = None
+        self.repository.get_flights_for_retention.side_effect = self._flights_page
+        self.repository.delete_flights_and_positions.side_effect = lambda ids: len(ids) * 10
+
+    def _flights_page(self, cutoff, after, limit):
+        remaining = [f for f in self.flights if not after or (f["last_contact"], f["_id"]) > after]
+        return remaining[:limit]
+
+    def test_purges_backlog_in_batches(self):
+        worker = RetentionWorker(self.config, self.repository)
+        worker.run()
+
+        deleted_ids = [i for call in self.repository.delete_flights_and_positions.call_args_list for i in call[0][0]]
+        self.assertEqual([str(f["_id"]) for f in self.flights], deleted_ids)
+        self.assertGreater(self.repository.delete_flights_and_positions.call_count, 1)
+
+        stats = worker.get_stats()
+        self.assertEqual(23, stats["deleted_flights"])
+        self.assertEqual(230, stats["deleted_documents"])
+        self.assertTrue(stats["caught_up"])
+        self.repository.save_retention_cursor.assert_called_with(None)
+
+    def test_resumes_from_persisted_cursor(self):
+        self.repository.get_retention_cursor.return_value = (self.flights[19]["last_contact"], self.flights[19]["_id"])
+
+        worker = RetentionWorker(self.config, self.repository)
+        worker.run()
+
+        self.assertEqual(3, worker.get_stats()["deleted_flights"])
+
+    def test_backs_off_on_slow_deletes(self):
+        worker = RetentionWorker(self.config, self.repository)
+        worker._batch_size = 100
+
+        worker._adapt_to_latency(RetentionWorker.LATENCY_BACKOFF_THRESHOLD_SEC * 2)
+
+        stats = worker.get_stats()
+        self.assertEqual(50, stats["batch_size"])
+        self.assertEqual(2, stats["backoff_factor"])
+        self.assertEqual(1, stats["backoffs"])
+
+    def test_stats_endpoint(self):
+        app = FastAPI()
+        app.include_router(router, prefix="/api/v1")
+        client = TestClient(app)
+        self.assertEqual(404, client.get("/api/v1/retention/stats").status_code)
+
+        app.state.retention_worker = RetentionWorker(self.config, self.repository)
+        app.state.retention_worker.run()
+        stats = client.get("/api/v1/retention/stats").json()
+        self.assertEqual(23, stats["deleted_flights"])
+        self.assertTrue(stats["caught_up"])
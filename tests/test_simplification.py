@@ -0,0 +1,44 @@
+import math
+import unittest
+
+from app.core.utils.simplification import simplify, tolerance_bucket, zoom_tolerance
+
+
+class SimplificationTest(unittest.TestCase):
+
+    def test_straight_line_keeps_endpoints(self):
+        points = [(47.0 + i * 0.001, 8.0, 10000) for i in range(100)]
+
+        self.assertEqual([points[0], points[-1]], simplify(points, 1.0))
+
+    def test_corner_is_kept(self):
+        leg1 = [(47.0 + i * 0.01, 8.0, 10000) for i in range(50)]
+        leg2 = [(47.49, 8.0 + i * 0.01, 10000) for i in range(1, 50)]
+
+        simplified = simplify(leg1 + leg2, 50.0)
+
+        self.assertEqual([leg1[0], leg1[-1], leg2[-1]], simplified)
+
+    def test_deviation_within_tolerance(self):
+        # Gentle sine wave with an amplitude of ~110 m
+        points = [(47.0 + 0.001 * math.sin(i / 5), 8.0 + i * 0.001, 10000) for i in range(200)]
+
+        self.assertEqual(2, len(simplify(points, 500.0)))
+        self.assertLess(len(simplify(points, 20.0)), len(points))
+        self.assertGreater(len(simplify(points, 20.0)), 2)
+        self.assertEqual(points, simplify(points, 0.001))
+
+    def test_short_trajectories_are_unchanged(self):
+        self.assertEqual([], simplify([], 10.0))
+        self.assertEqual([(47.0, 8.0, 1), (47.1, 8.1, 2)], simplify([(47.0, 8.0, 1), (47.1, 8.1, 2)], 10.0))
+
+    def test_tolerance_buckets(self):
+        self.assertEqual(tolerance_bucket(100.0), tolerance_bucket(127.0))
+        self.assertEqual(6, tolerance_bucket(100.0))
+        self.assertEqual(0, tolerance_bucket(0.1))
+        self.assertEqual(17, tolerance_bucket(1e9))
+        self.assertGreater(tolerance_bucket(zoom_tolerance(5)), tolerance_bucket(zoom_tolerance(10)))
+
+
+if __name__ == '__main__':
+    unittest.main()
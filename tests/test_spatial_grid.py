@@ -0,0 +1,79 @@
+import random
+import unittest
+
+from app.data.spatial_grid import BoundingBox, SpatialGrid, distance_km
+
+
+class SpatialGridTest(unittest.TestCase):
+
+    def test_query_matches_scan(self):
+        rnd = random.Random(3)
+        grid = SpatialGrid(cell_degrees=2.0)
+        positions = {f"f{i}": (rnd.uniform(-60, 70), rnd.uniform(-180, 180)) for i in range(2000)}
+        for flight_id, (lat, lon) in positions.items():
+            grid.update(flight_id, lat, lon)
+
+        for bbox in (BoundingBox(5.9, 45.8, 10.5, 47.8), BoundingBox(-180, -90, 180, 90),
+                     BoundingBox(170, -20, -170, 20), BoundingBox(0.5, 0.5, 0.7, 0.7)):
+            expected = {f for f, (lat, lon) in positions.items() if bbox.contains(lat, lon)}
+            self.assertEqual(expected, grid.query(bbox))
+
+    def test_nearest_and_within_match_scan(self):
+        rnd = random.Random(5)
+        grid = SpatialGrid()
+        positions = {f"f{i}": (rnd.uniform(-80, 80), rnd.uniform(-180, 180)) for i in range(3000)}
+        for flight_id, (lat, lon) in positions.items():
+            grid.update(flight_id, lat, lon)
+
+        for lat, lon in ((47.4, 8.5), (0.0, 179.9), (-33.9, -151.2), (78.2, 15.6), (89.9, 0.0)):
+            scan = sorted((distance_km(lat, lon, *p), f) for f, p in positions.items())
+            self.assertEqual(scan[:7], grid.nearest(lat, lon, 7))
+            self.assertEqual([m for m in scan if m[0] <= 800], grid.within(lat, lon, 800))
+
+        even = lambda flight_id: int(flight_id[1:]) % 2 == 0
+        scan = sorted((distance_km(10, 10, *p), f) for f, p in positions.items() if even(f))
+        self.assertEqual(scan[:3], grid.nearest(10, 10, 3, even))
+
+    def test_nearest_sparse(self):
+        grid = SpatialGrid()
+        self.assertEqual([], grid.nearest(0, 0, 3))
+
+        grid.update("a", 47.1, 8.1)
+        grid.update("b", -33.9, 151.2)
+        self.assertEqual(["a", "b"], [f for _, f in grid.nearest(46, 7, 5)])
+        self.assertEqual([], grid.within(46, 7, 10))
+        self.assertEqual(["a"], [f for _, f in grid.within(46, 7, 200)])
+
+    def test_moves_and_removals(self):
+        grid = SpatialGrid()
+        grid.update("a", 47.1, 8.1)
+        grid.update("b", 47.2, 8.2)
+        swiss = BoundingBox(5.9, 45.8, 10.5, 47.8)
+        self.assertEqual({"a", "b"}, grid.query(swiss))
+
+        grid.update("a", 51.5, -0.1)
+        self.assertEqual({"b"}, grid.query(swiss))
+        self.assertEqual({"a"}, grid.query(BoundingBox(-1, 51, 1, 52)))
+
+        grid.remove(["b", "unknown"])
+        self.assertEqual(set(), grid.query(swiss))
+        self.assertEqual(1, len(grid))
+
+    def test_parse(self):
+        self.assertEqual(BoundingBox(5.9, 45.8, 10.5, 47.8), BoundingBox.parse("5.9,45.8,10.5,47.8"))
+        self.assertTrue(BoundingBox.parse("170,-10,-170,10").contains(0, 179))
+        for value in ("1,2,3", "a,b,c,d", "0,50,1,40", "0,-91,1,0"):
+            with self.assertRaises(ValueError):
+                BoundingBox.parse(value)
+
+    def test_quantized(self):
+        self.assertEqual(BoundingBox(5.9, 45.7, 10.6, 47.9), BoundingBox(5.93, 45.78, 10.51, 47.81).quantized(0.1))
+        self.assertEqual(BoundingBox(5.9, 45.8, 10.5, 47.8), BoundingBox(5.9, 45.8, 10.5, 47.8).quantized(0.1))
+        self.assertEqual(BoundingBox(-180.0, -90.0, 180.0, 90.0), BoundingBox(-179.99, -89.99, 179.99, 89.99).quantized(0.1))
+        self.assertEqual(BoundingBox(169.9, -10.0, -169.9, 10.0), BoundingBox(169.95, -10, -169.95, 10).quantized(0.1))
+        # Expanding a box across the antimeridian may cover all longitudes
+        self.assertEqual(BoundingBox(-180.0, 0.0, 180.0, 1.0), BoundingBox(10.05, 0, 10.01, 1).quantized(0.1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,157 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from app.core.models.aircraft import Aircraft
+from app.data.sqlite_database import SQLiteDatabase
+from app.data.repositories.sqlite_repository import SQLiteRepository
+from app.data.repositories.sqlite_aircraft_repository import SQLiteAircraftRepository
+from app.data.repositories.sqlite_aircraft_processing_repository import SQLiteAircraftProcessingRepository
+
+
+class SQLiteRepositoryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db = SQLiteDatabase(os.path.join(self.tmpdir.name, 'test.sqlite'))
+        self.repository = SQLiteRepository(self.db)
+
+    def tearDown(self):
+        self.db.connection().close()
+        self.tmpdir.cleanup()
+
+    def _positions(self, flight, start, count):
+        return [{
+            "flight_id": flight["_id"],
+            "timestmp": start + timedelta(seconds=10 * i),
+            "lat": 47.0 + i * 0.001,
+            "lon": 8.0 + i * 0.001,
+            "alt": 10000 + i,
+            "track": 90.0,
+            "gs": 420.0
+        } for i in range(count)]
+
+    def test_flight_roundtrip(self):
+        flight = self.repository.get_or_create_flight(modeS="4B1234", is_military=True, callsign="SWR123")
+
+        self.assertTrue(self.repository.flight_exists(str(flight["_id"])))
+        self.assertEqual("SWR123", self.repository.get_flight(str(flight["_id"]))["callsign"])
+
+        new_contact = datetime.now(timezone.utc) + timedelta(minutes=1)
+        self.repository.bulk_update_flights([(str(flight["_id"]), {"callsign": "SWR124"})])
+        self.repository.bulk_update_flight_last_contacts([(str(flight["_id"]), new_contact)])
+
+        flights = self.repository.get_flights_batch({"4B1234", "000000"})
+        self.assertEqual(["4B1234"], list(flights.keys()))
+        self.assertEqual("SWR124", flights["4B1234"][0]["callsign"])
+        self.assertTrue(flights["4B1234"][0]["is_military"])
+        self.assertEqual(new_contact.replace(tzinfo=None, microsecond=new_contact.microsecond // 1000 * 1000),
+                         flights["4B1234"][0]["last_contact"])
+
+    def test_positions_across_partitions(self):
+        flight = self.repository.get_or_create_flight(modeS="4B1234", is_military=False)
+        start = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0) - timedelta(minutes=30)
+        positions = self._positions(flight, start, 300)
+        self.repository.insert_positions(positions)
+        self.repository.bulk_update_flight_last_contacts([(str(flight["_id"]), positions[-1]["timestmp"])])
+        self.repository.bulk_update_flights([(str(flight["_id"]), {"last_contact": positions[-1]["timestmp"]})])
+
+        # Pretend the flight started a day earlier, so it spans two partitions
+        earlier = dict(positions[0], timestmp=start - timedelta(days=1))
+        self.repository.insert_positions([earlier])
+        self.db.connection().execute("UPDATE flights SET first_contact = first_contact - 86400000")
+
+        stored = self.repository.get_positions(str(flight["_id"]))
+        self.assertEqual(301, len(stored))
+        self.assertEqual(earlier["timestmp"], stored[0]["timestmp"])
+        self.assertEqual(positions[-1]["timestmp"], stored[-1]["timestmp"])
+        self.assertEqual(420.0, stored[-1]["gs"])
+
+        limited = self.repository.get_positions(str(flight["_id"]), limit=10, projection={"lat": 1, "lon": 1, "_id": 0})
+        self.assertEqual(10, len(limited))
+        self.assertEqual({"lat", "lon"}, set(limited[0].keys()))
+
+        last = self.repository.get_all_flights_last_pos()
+        self.assertEqual(1, len(last))
+        self.assertEqual(positions[-1]["timestmp"], last[0]["position"]["timestmp"])
+
+        recent = self.repository.get_recent_flights_last_pos(start, page_size=10)
+        self.assertEqual(1, len(recent))
+
+    def test_iter_positions_in_batches(self):
+        flight = self.repository.get_or_create_flight(modeS="4B1234", is_military=False)
+        start = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0) - timedelta(minutes=30)
+        positions = self._positions(flight, start, 25)
+        self.repository.insert_positions(positions)
+        self.repository.bulk_update_flights([(str(flight["_id"]), {"last_contact": positions[-1]["timestmp"]})])
+
+        streamed = list(self.repository.iter_positions(str(flight["_id"]), batch_size=10))
+        self.assertEqual(self.repository.get_positions(str(flight["_id"])), streamed)
+
+        before = list(self.repository.iter_positions(str(flight["_id"]), projection={"alt": 1, "_id": 0},
+                                                     before=positions[20]["timestmp"], batch_size=10))
+        self.assertEqual([{"alt": 10000 + i} for i in range(20)], before)
+
+    def test_retention(self):
+        flights = [self.repository.get_or_create_flight(modeS=f"4B00{i:02d}", is_military=False) for i in range(5)]
+        start = datetime(2026, 1, 1)
+        for i, flight in enumerate(flights):
+            self.repository.insert_positions(self._positions(flight, start + timedelta(days=i), 3))
+            self.repository.bulk_update_flights([(str(flight["_id"]), {"last_contact": start + timedelta(days=i)})])
+
+        expired = self.repository.get_flights_for_retention(start + timedelta(days=2, hours=1), limit=10)
+        self.assertEqual([f["_id"] for f in flights[:3]], [f["_id"] for f in expired])
+
+        cursor = (expired[0]["last_contact"], expired[0]["_id"])
+        self.repository.save_retention_cursor(cursor)
+        self.assertEqual(cursor, self.repository.get_retention_cursor())
+        self.assertEqual(2, len(self.repository.get_flights_for_retention(start + timedelta(days=2, hours=1), cursor)))
+
+        # Only the flight is deleted, its positions go with their partition
+        self.assertEqual(1, self.repository.delete_flights_and_positions([str(flights[0]["_id"])]))
+        self.assertFalse(self.repository.flight_exists(str(flights[0]["_id"])))
+
+        dropped = self.repository.drop_expired_position_partitions(start + timedelta(days=3))
+        self.assertEqual(["positions_2026_01_01", "positions_2026_01_02", "positions_2026_01_03"], dropped)
+
+    def test_flight_history(self):
+        start = datetime(2026, 1, 1)
+        flights = []
+        for i in range(5):
+            flight = self.repository.get_or_create_flight(modeS=f"4B00{i:02d}", is_military=i == 3, callsign=f"SWR{i}" if i else "EZY0")
+            self.repository.bulk_update_flights([(str(flight["_id"]), {"last_contact": start + timedelta(minutes=i)})])
+            flights.append(flight)
+
+        first = self.repository.get_flight_history(2)
+        rest = self.repository.get_flight_history(10, after=(first[-1]["last_contact"], first[-1]["_id"]))
+
+        self.assertEqual([f["_id"] for f in reversed(flights)], [f["_id"] for f in first + rest])
+        self.assertEqual(["SWR3"], [f["callsign"] for f in self.repository.get_flight_history(10, military_only=True)])
+        self.assertEqual(["SWR2", "SWR1"], [f["callsign"] for f in self.repository.get_flight_history(
+            10, callsign_prefix="SWR", until=start + timedelta(minutes=3))])
+
+    def test_aircraft_repositories(self):
+        aircraft_repo = SQLiteAircraftRepository(self.db)
+        self.assertTrue(aircraft_repo.insert_aircraft(Aircraft("4B1234", reg="HB-JVA", source="test")))
+        self.assertTrue(aircraft_repo.insert_aircraft(
+            Aircraft("4B1234", reg="HB-JVA", icao_type_code="E190", aircraft_type_description="Embraer 190", source="test")))
+        self.assertEqual("E190", aircraft_repo.query_aircraft("4b1234").icao_type_code)
+        self.assertIsInstance(aircraft_repo.get_aircraft_record("4B1234")["lastModified"], datetime)
+
+        processing_repo = SQLiteAircraftProcessingRepository(self.db)
+        processing_repo.add_aircraft("4b1234")
+        processing_repo.add_aircraft("4B1234")
+        processing_repo.add_aircraft("4B5678")
+        self.assertEqual(["4B1234", "4B5678"], processing_repo.get_aircraft_for_processing())
+
+        for _ in range(3):
+            processing_repo.increment_attempts("4B1234")
+        self.assertEqual(["4B5678"], processing_repo.get_aircraft_for_processing())
+        self.assertEqual({"total_count": 2, "zero_attempts": 1, "in_progress": 1}, processing_repo.get_stats())
+        self.assertEqual(1, processing_repo.cleanup_failed_aircraft())
+        self.assertFalse(processing_repo.aircraft_exists("4B1234"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,29 @@
+import json
+import unittest
+
+from app.api.streaming import json_array_chunks, ndjson_chunks
+
+
+class StreamingTest(unittest.TestCase):
+
+    def test_json_array(self):
+        items = [[47.0, 8.0, 1000], [47.1, 8.1, -1], [47.2, 8.2, 1200]]
+
+        chunks = list(json_array_chunks(iter(items), chunk_items=2))
+
+        self.assertEqual(3, len(chunks))
+        self.assertEqual(items, json.loads(b''.join(chunks)))
+        self.assertEqual([], json.loads(b''.join(json_array_chunks(iter([])))))
+
+    def test_ndjson(self):
+        items = [{"id": "a"}, {"id": "b"}, {"id": "c"}]
+
+        chunks = list(ndjson_chunks(iter(items), chunk_items=2))
+
+        self.assertEqual(2, len(chunks))
+        self.assertEqual(items, [json.loads(line) for line in b''.join(chunks).splitlines()])
+        self.assertEqual([], list(ndjson_chunks(iter([]))))
+
+
+if __name__ == '__main__':
+    unittest.main()
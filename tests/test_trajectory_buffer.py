@@ -0,0 +1,34 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from app.data.trajectory_buffer import TrajectoryBuffer
+
+
+class TrajectoryBufferTest(unittest.TestCase):
+
+    def test_keeps_most_recent_positions(self):
+        start = datetime(2026, 10, 19, 8, 0)
+        buffer = TrajectoryBuffer(5)
+        for i in range(8):
+            buffer.append(start + timedelta(seconds=i), 47.0 + i, 8.0 + i, 1000 * i, 90.5, 420.0)
+
+        positions = buffer.positions()
+        self.assertEqual(5, len(buffer))
+        self.assertEqual(3, buffer.dropped)
+        self.assertEqual([50.0, 51.0, 52.0, 53.0, 54.0], [p["lat"] for p in positions])
+        self.assertEqual(start + timedelta(seconds=3), buffer.first_timestamp)
+        self.assertEqual(7000, buffer.last()["alt"])
+        self.assertEqual([50.0, 51.0], [p["lat"] for p in buffer.positions(limit=2)])
+
+    def test_missing_values(self):
+        buffer = TrajectoryBuffer(2)
+        self.assertIsNone(buffer.last())
+
+        buffer.append_position({"timestmp": datetime(2026, 10, 19, 8, 0, tzinfo=timezone.utc), "lat": 47.1, "lon": 8.2, "alt": None, "track": None})
+        position = buffer.last(flight_id="abc")
+
+        self.assertEqual({"timestmp": datetime(2026, 10, 19, 8, 0), "lat": 47.1, "lon": 8.2, "alt": None, "track": None, "flight_id": "abc"}, position)
+
+
+if __name__ == '__main__':
+    unittest.main()
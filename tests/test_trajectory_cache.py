@@ -0,0 +1,44 @@
+import unittest
+from datetime import datetime, timedelta
+
+from app.api.trajectory_cache import TrajectoryCache
+
+
+class TrajectoryCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.contact = datetime(2025, 6, 3, 20, 0, 0)
+        self.points = [(47.0, 8.0, 1000), (47.1, 8.1, 2000)]
+
+    def test_finished_flight_is_cached(self):
+        cache = TrajectoryCache()
+        cache.put("a", 6, self.contact, self.points)
+
+        self.assertEqual(self.points, cache.get("a", 6, self.contact))
+        self.assertIsNone(cache.get("a", 7, self.contact))
+        self.assertEqual(1, cache.hits)
+
+    def test_growing_flight_is_invalidated(self):
+        cache = TrajectoryCache()
+        cache.put("a", 6, self.contact, self.points)
+
+        self.assertIsNone(cache.get("a", 6, self.contact + timedelta(seconds=2)))
+        self.assertEqual(0, cache.points)
+
+    def test_bounded_by_points(self):
+        cache = TrajectoryCache(max_points=5)
+        cache.put("a", 6, self.contact, self.points)
+        cache.put("b", 6, self.contact, self.points)
+        cache.get("a", 6, self.contact)
+        cache.put("c", 6, self.contact, self.points)
+
+        self.assertIsNotNone(cache.get("a", 6, self.contact))
+        self.assertIsNone(cache.get("b", 6, self.contact))
+        self.assertEqual(4, cache.points)
+
+        cache.put("d", 6, self.contact, self.points * 3)
+        self.assertIsNone(cache.get("d", 6, self.contact))
+
+
+if __name__ == '__main__':
+    unittest.main()
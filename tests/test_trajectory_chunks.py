@@ -0,0 +1,178 @@
+import sys
+import unittest
+import zlib
+from array import array
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+from bson import ObjectId
+
+from app.data.trajectory_chunks import POSITIONS_PER_CHUNK, build_chunks, decode_positions, read_chunks
+from app.data.repositories.mongodb_repository import MongoDBRepository
+from tests.db_base_test import MongoDBBaseTestCase
+
+
+def make_positions(flight_id, count):
+    start = datetime(2026, 10, 17, 8, 0, 0, 250000)
+    positions = []
+    for i in range(count):
+        position = {
+            "flight_id": flight_id,
+            "timestmp": start + timedelta(seconds=4 * i),
+            "lat": 47.123456 + i * 0.001,
+            "lon": 8.654321 - i * 0.002,
+            "alt": None if i % 7 == 0 else 3000 + 25 * i,
+            "track": None if i % 5 == 0 else 271.3
+        }
+        if i % 3:
+            position["gs"] = 250.5 + i
+        positions.append(position)
+    return positions
+
+
+class TrajectoryChunksTest(unittest.TestCase):
+
+    def test_roundtrip(self):
+        flight_id = ObjectId()
+        positions = make_positions(flight_id, 25)
+
+        chunks = build_chunks(flight_id, positions, chunk_size=10)
+        self.assertEqual([0, 1, 2], [c["seq"] for c in chunks])
+        self.assertEqual(25, sum(c["count"] for c in chunks))
+
+        decoded = read_chunks(chunks)
+        self.assertEqual(len(positions), len(decoded))
+        for original, restored in zip(positions, decoded):
+            self.assertEqual(original["timestmp"], restored["timestmp"])
+            self.assertAlmostEqual(original["lat"], restored["lat"], places=6)
+            self.assertAlmostEqual(original["lon"], restored["lon"], places=6)
+            self.assertEqual(original["alt"], restored["alt"])
+            self.assertEqual(original["track"], restored["track"])
+            self.assertEqual(original.get("gs"), restored.get("gs"))
+            self.assertEqual("gs" in original, "gs" in restored)
+            self.assertEqual(flight_id, restored["flight_id"])
+
+    def test_decode_version_1_chunk(self):
+        # Chunks written before ground speed was stored: time, lat, lon, alt and track columns only
+        start = datetime(2026, 10, 17, 8, 0)
+        packed = array('i', [0, 4000, 47_000_000, 1000, 8_000_000, -2000, 3000, 25, 2710, 0])
+        if sys.byteorder != 'little':
+            packed.byteswap()
+
+        decoded = decode_positions(bytes([1]) + zlib.compress(packed.tobytes()), start, 2)
+        self.assertEqual([start, start + timedelta(seconds=4)], [p["timestmp"] for p in decoded])
+        self.assertEqual([47.0, 47.001], [p["lat"] for p in decoded])
+        self.assertEqual([3000, 3025], [p["alt"] for p in decoded])
+        self.assertFalse(any("gs" in p for p in decoded))
+
+
+class CompactionRepositoryTest(MongoDBBaseTestCase):
+
+    def test_compacted_flight_reads_chunks(self):
+        flight_id = ObjectId()
+        positions = make_positions(flight_id, POSITIONS_PER_CHUNK + 12)
+
+        chunks_collection = MagicMock()
+        positions_collection = MagicMock()
+        flights_collection = MagicMock()
+        self.mock_db.__getitem__ = MagicMock(side_effect=lambda name: {
+            'position_chunks': chunks_collection,
+            'positions': positions_collection,
+            'flights': flights_collection
+        }.get(name, MagicMock()))
+
+        repo = MongoDBRepository(self.mock_db)
+
+        flight = {"_id": flight_id, "first_contact": positions[0]["timestmp"], "last_contact": positions[-1]["timestmp"]}
+        positions_collection.find.return_value.sort.return_value = positions
+        self.assertEqual(POSITIONS_PER_CHUNK + 12, repo.compact_flight(flight))
+
+        stored_chunks = chunks_collection.insert_many.call_args[0][0]
+        flights_collection.update_one.assert_called_once_with({"_id": flight_id}, {"$set": {"compacted": True}})
+        positions_collection.delete_many.assert_called_once()
+
+        flights_collection.find_one.return_value = {**flight, "compacted": True}
+        chunks_collection.find.return_value.sort.return_value = stored_chunks
+
+        result = repo.get_positions(str(flight_id), projection={"lat": 1, "lon": 1, "alt": 1, "_id": 0})
+        self.assertEqual(POSITIONS_PER_CHUNK + 12, len(result))
+        self.assertEqual({"lat", "lon", "alt"}, set(result[0].keys()))
+
+        # Only the first chunk is decoded for a short read
+        cursor = iter(stored_chunks)
+        chunks_collection.find.return_value.sort.return_value = cursor
+        result = repo.get_positions(str(flight_id), limit=10)
+        self.assertEqual([p["timestmp"] for p in positions[:10]], [p["timestmp"] for p in result])
+        self.assertIs(stored_chunks[1], next(cursor))
+
+    def test_flight_below_one_chunk_keeps_raw_positions(self):
+        flight_id = ObjectId()
+        chunks_collection = MagicMock()
+        positions_collection = MagicMock()
+        flights_collection = MagicMock()
+        self.mock_db.__getitem__ = MagicMock(side_effect=lambda name: {
+            'position_chunks': chunks_collection,
+            'positions': positions_collection,
+            'flights': flights_collection
+        }.get(name, MagicMock()))
+
+        repo = MongoDBRepository(self.mock_db)
+
+        positions_collection.find.return_value.sort.return_value = make_positions(flight_id, POSITIONS_PER_CHUNK - 1)
+        self.assertEqual(0, repo.compact_flight({"_id": flight_id}))
+
+        chunks_collection.insert_many.assert_not_called()
+        positions_collection.delete_many.assert_not_called()
+        flights_collection.update_one.assert_called_once_with({"_id": flight_id}, {"$set": {"compacted": False}})
+
+    def test_compacted_flight_readable_after_compaction_is_disabled(self):
+        flight_id = ObjectId()
+        positions = make_positions(flight_id, POSITIONS_PER_CHUNK + 12)
+        flight = {"_id": flight_id, "first_contact": positions[0]["timestmp"], "last_contact": positions[-1]["timestmp"]}
+
+        chunks_collection = MagicMock()
+        positions_collection = MagicMock()
+        flights_collection = MagicMock()
+        self.mock_db.__getitem__ = MagicMock(side_effect=lambda name: {
+            'position_chunks': chunks_collection,
+            'positions': positions_collection,
+            'flights': flights_collection
+        }.get(name, MagicMock()))
+
+        positions_collection.find.return_value.sort.return_value = positions
+        MongoDBRepository(self.mock_db).compact_flight(flight)
+        stored_chunks = chunks_collection.insert_many.call_args[0][0]
+
+        # Restarted without compaction: the raw positions are gone, the chunks are still there
+        positions_collection.find.return_value.sort.return_value = []
+        chunks_collection.find_one.return_value = stored_chunks[0]
+        chunks_collection.find.return_value.sort.return_value = stored_chunks
+        flights_collection.find_one.return_value = {**flight, "compacted": True}
+
+        repo = MongoDBRepository(self.mock_db)
+        self.assertEqual(POSITIONS_PER_CHUNK + 12, len(repo.get_positions(str(flight_id))))
+        chunks_collection.find.return_value.sort.return_value = MagicMock()
+        chunks_collection.find.return_value.sort.return_value.batch_size.return_value = stored_chunks
+        self.assertEqual(POSITIONS_PER_CHUNK + 12, len(list(repo.iter_positions(str(flight_id)))))
+
+    def test_flight_not_looked_up_without_chunks(self):
+        flight_id = ObjectId()
+        chunks_collection = MagicMock()
+        positions_collection = MagicMock()
+        flights_collection = MagicMock()
+        self.mock_db.__getitem__ = MagicMock(side_effect=lambda name: {
+            'position_chunks': chunks_collection,
+            'positions': positions_collection,
+            'flights': flights_collection
+        }.get(name, MagicMock()))
+        chunks_collection.find_one.return_value = None
+
+        repo = MongoDBRepository(self.mock_db)
+
+        positions = make_positions(flight_id, 3)
+        positions_collection.find.return_value.sort.return_value = positions
+        self.assertEqual(3, len(repo.get_positions(str(flight_id))))
+        positions_collection.find.return_value.sort.return_value = MagicMock()
+        positions_collection.find.return_value.sort.return_value.batch_size.return_value = positions
+        self.assertEqual(3, len(list(repo.iter_positions(str(flight_id)))))
+        flights_collection.find_one.assert_not_called()
@@ -0,0 +1,138 @@
+import threading
+import unittest
+from unittest.mock import MagicMock
+
+from bson import ObjectId
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import router
+from app.core.models.live_snapshot import LiveSnapshot
+from app.core.models.position_report import PositionReport
+from app.core.utils.position_codec import (POSITIONS, POSITIONS_UPDATE, TRAJECTORY, TRAJECTORY_UPDATE,
+                                           decode_polyline, unpack, unpack_seq)
+from app.websocket.delta_log import Delta, DeltaLog
+
+
+class FakeUpdater:
+    """Read side of the flight updater used by the websocket endpoints"""
+
+    def __init__(self, positions):
+        self._positions = positions
+        self.callbacks = []
+        self.registered = threading.Event()
+
+    def get_flight_positions(self, flight_id, limit=None, projection=None):
+        return self._positions
+
+    def register_websocket_callback(self, callback):
+        self.callbacks.append(callback)
+        self.registered.set()
+
+    def unregister_websocket_callback(self, callback):
+        if callback in self.callbacks:
+            self.callbacks.remove(callback)
+
+
+class FakeLiveUpdater(FakeUpdater):
+    """Delta log and snapshot of the live websocket"""
+
+    def __init__(self, flight_id):
+        super().__init__([])
+        self.flight_id = flight_id
+        self.delta_log = DeltaLog(first_seq=1)
+        self.snapshot = LiveSnapshot.empty()
+
+    def update(self, lat):
+        delta = self.delta_log.append(self.delta_log.last_seq, {self.flight_id: {"lat": lat, "lon": 8.1, "alt": 30000, "track": 90.0}})
+        self.snapshot = LiveSnapshot.build(delta.generation, {self.flight_id: PositionReport("4b1234", lat, 8.1, 30000)},
+                                           {}, lambda icao24: False, seq=delta.seq)
+        return delta
+
+
+def create_test_app(updater) -> FastAPI:
+    app = FastAPI()
+    app.include_router(router, prefix="/api/v1")
+    app.state.repository = MagicMock()
+    app.state.updater = updater
+    return app
+
+
+class FlightWebSocketEncodingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.flight_id = str(ObjectId())
+        self.updater = FakeUpdater([
+            {"lat": 47.45, "lon": 8.56, "alt": 1200},
+            {"lat": 47.46, "lon": 8.57, "alt": None}
+        ])
+        self.client = TestClient(create_test_app(self.updater))
+        self.path = f"/api/v1/ws/flights/{self.flight_id}/positions"
+
+    def _publish(self, ws, lat, lon, alt):
+        self.assertTrue(self.updater.registered.wait(5))
+        delta = Delta(1, 1, {self.flight_id: {"lat": lat, "lon": lon, "alt": alt, "track": 90.0}})
+        for callback in list(self.updater.callbacks):
+            ws.portal.call(callback, delta)
+
+    def test_packed(self):
+        with self.client.websocket_connect(self.path + "?encoding=packed") as ws:
+            kind, points = unpack(ws.receive_bytes())
+            self.assertEqual(TRAJECTORY, kind)
+            self.assertEqual([(47.45, 8.56, 1200), (47.46, 8.57, -1)], points)
+
+            self._publish(ws, 47.47, 8.58, 1300)
+            kind, points = unpack(ws.receive_bytes())
+            self.assertEqual(TRAJECTORY_UPDATE, kind)
+            self.assertEqual([(47.47, 8.58, 1300)], points)
+
+    def test_polyline(self):
+        with self.client.websocket_connect(self.path + "?encoding=polyline") as ws:
+            self.assertEqual([(47.45, 8.56, 1200), (47.46, 8.57, -1)], decode_polyline(ws.receive_text()))
+
+            self._publish(ws, 47.47, 8.58, 1300)
+            self.assertEqual([(47.47, 8.58, 1300)], decode_polyline(ws.receive_text()))
+
+
+class LiveWebSocketResumeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.flight_id = str(ObjectId())
+        self.updater = FakeLiveUpdater(self.flight_id)
+        self.client = TestClient(create_test_app(self.updater))
+
+    def test_packed_messages_carry_seq(self):
+        self.updater.update(47.1)
+
+        with self.client.websocket_connect("/api/v1/ws/positions/live?encoding=packed") as ws:
+            data = ws.receive_bytes()
+            self.assertEqual(POSITIONS, unpack(data)[0])
+            self.assertEqual(1, unpack_seq(data))
+
+            self.assertTrue(self.updater.registered.wait(5))
+            delta = self.updater.update(47.2)
+            for callback in list(self.updater.callbacks):
+                ws.portal.call(callback, delta)
+            data = ws.receive_bytes()
+            self.assertEqual((POSITIONS_UPDATE, {self.flight_id: (47.2, 8.1, 30000)}), unpack(data))
+            self.assertEqual(2, unpack_seq(data))
+
+    def test_packed_resume(self):
+        for lat in (47.1, 47.2, 47.3):
+            self.updater.update(lat)
+
+        # Resuming from the seq of a packed message only sends the updates after it
+        with self.client.websocket_connect("/api/v1/ws/positions/live?encoding=packed&since=2") as ws:
+            data = ws.receive_bytes()
+            self.assertEqual((POSITIONS_UPDATE, {self.flight_id: (47.3, 8.1, 30000)}), unpack(data))
+            self.assertEqual(3, unpack_seq(data))
+
+        # Updates that are no longer retained are replaced by all positions
+        with self.client.websocket_connect("/api/v1/ws/positions/live?encoding=packed&since=-5") as ws:
+            data = ws.receive_bytes()
+            self.assertEqual((POSITIONS, {self.flight_id: (47.3, 8.1, 30000)}), unpack(data))
+            self.assertEqual(3, unpack_seq(data))
+
+
+if __name__ == '__main__':
+    unittest.main()
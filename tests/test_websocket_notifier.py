@@ -0,0 +1,67 @@
+import asyncio
+import threading
+import unittest
+
+from app.websocket.notifier import WebSocketNotifier
+
+
+class WebSocketNotifierTest(unittest.TestCase):
+
+    def test_updates_delivered_on_loop(self):
+        notifier = WebSocketNotifier()
+        received = []
+
+        async def run():
+            loop = asyncio.get_running_loop()
+            notifier.attach_loop(loop)
+            done = asyncio.Event()
+
+            async def callback(positions):
+                received.append((threading.get_ident(), positions))
+                done.set()
+
+            notifier.register_callback(callback)
+            # Notified from the updater thread
+            updater = threading.Thread(target=notifier.notify_clients, args=({"a1": {"lat": 47.1}},))
+            updater.start()
+            await asyncio.wait_for(done.wait(), 2)
+            updater.join()
+            return threading.get_ident()
+
+        loop_thread = asyncio.run(run())
+        self.assertEqual([(loop_thread, {"a1": {"lat": 47.1}})], received)
+
+    def test_failing_callback_unregistered(self):
+        notifier = WebSocketNotifier()
+        calls = []
+
+        async def failing(positions):
+            raise ConnectionError("closed")
+
+        async def working(positions):
+            calls.append(positions)
+
+        async def run():
+            notifier.attach_loop(asyncio.get_running_loop())
+            notifier.register_callback(failing)
+            notifier.register_callback(working)
+            notifier.notify_clients({"a1": {}})
+            await asyncio.sleep(0.05)
+
+        asyncio.run(run())
+        self.assertEqual([{"a1": {}}], calls)
+        self.assertNotIn(failing, notifier._callbacks)
+
+    def test_without_loop(self):
+        notifier = WebSocketNotifier()
+
+        async def callback(positions):
+            pass
+
+        notifier.register_callback(callback)
+        notifier.notify_clients({"a1": {}})
+        self.assertTrue(notifier.has_callbacks())
+
+
+if __name__ == '__main__':
+    unittest.main()